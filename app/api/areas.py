@@ -6,6 +6,7 @@ import logging
 import asyncio
 from flask import jsonify, request, current_app
 from . import api_bp
+from response_cache import path_version, response_cache
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +16,15 @@ def get_web_server():
     return current_app.config.get("web_server")
 
 
+def _areas_version():
+    web_server = get_web_server()
+    if not web_server:
+        return None
+    return path_version(web_server.storage_path / "core.area_registry")
+
+
 @api_bp.route("/areas", methods=["GET"])
+@response_cache.cached(_areas_version)
 def get_areas():
     """Get available areas from Home Assistant"""
     try:
@@ -4,14 +4,27 @@ Command API endpoints
 
 import logging
 import asyncio
+import itertools
 import json
 import time
 from pathlib import Path
 from datetime import datetime
-from flask import jsonify, request, current_app, Response
+from flask import jsonify, request, current_app, Response, stream_with_context
 from . import api_bp
+from json_stream import iter_members
+from .devices import devices_version, summarize_commands
+from response_cache import response_cache
+from hot_path_log import HotPathLogger
+from ha_learning import learn_via_ha
+from direct_learning import (
+    iterate_blocking,
+    learn_direct_events,
+    learn_direct_result,
+    sse,
+)
 
 logger = logging.getLogger(__name__)
+hot_log = HotPathLogger("commands")
 
 
 def get_web_server():
@@ -79,278 +92,19 @@ async def verify_command_in_storage(
 @api_bp.route("/commands/learn", methods=["POST"])
 def learn_command():
     """Start learning a new command (synchronous call to HA)"""
-    try:
-        data = request.json
-        logger.info(f"Learn command request data: {data}")
+    web_server = get_web_server()
+    if not web_server:
+        return jsonify({"error": "Web server not available"}), 500
 
-        entity_id = data.get("entity_id")
-        device = data.get("device")
-        command = data.get("command")
-        command_type = data.get("command_type", "ir")
-        device_id = data.get("device_id")  # For managed devices
-        save_destination = data.get(
-            "save_destination", "manager_only"
-        )  # manager_only, integration_only, both
-
-        logger.info(
-            f"Parsed: entity_id={entity_id}, device={device}, "
-            f"command={command}, type={command_type}, "
-            f"device_id={device_id}, save_destination={save_destination}"
+    loop = asyncio.new_event_loop()
+    try:
+        body, status = loop.run_until_complete(
+            learn_via_ha(web_server, request.json or {})
         )
-
-        # If device is not provided, try to derive it from device_id
-        if not device and device_id:
-            # For managed devices, use the device_id as the device name
-            # Remove entity_type prefix if present (e.g., "switch.office_lamp" -> "office_lamp")
-            device = device_id.split(".")[-1] if "." in device_id else device_id
-            logger.info(f"Derived device name from device_id: {device}")
-
-        if not all([entity_id, device, command]):
-            missing = []
-            if not entity_id:
-                missing.append("entity_id")
-            if not device:
-                missing.append("device (or device_id)")
-            if not command:
-                missing.append("command")
-
-            error_msg = f'Missing required fields: {", ".join(missing)}'
-            logger.error(error_msg)
-            return jsonify({"success": False, "error": error_msg}), 400
-
-        # Update data with derived device name if it was derived
-        if device and not data.get("device"):
-            data["device"] = device
-            logger.info(f"Updated data with derived device: {device}")
-
-        # Get web server instance to use its _learn_command method
-        web_server = get_web_server()
-        if not web_server:
-            return jsonify({"error": "Web server not available"}), 500
-
-        # Call the existing async learn_command method synchronously
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(web_server._learn_command(data))
-
-        # If HA API returned success, handle based on save destination
-        if result.get("success"):
-            logger.info(
-                f"✅ Learn command API call succeeded for '{command}' on device '{device}'"
-            )
-
-            # Initialize learned_code variable
-            learned_code = None
-
-            # For RF commands, keep the original notification message
-            if command_type == "rf":
-                # Use the message from _learn_command which tells user to check HA notifications
-                logger.info(
-                    f"RF command - using notification message from _learn_command"
-                )
-                # RF commands are always "pending" since they require multi-step process
-                learned_code = "pending"
-                # Add to cache only for integration_only (not both, since HA will save to storage)
-                if save_destination == "integration_only":
-                    web_server._add_to_storage_cache(device, command, "pending")
-                    logger.info(f"✅ Added {device}/{command} to storage cache")
-            # For IR commands with integration_only: Add to cache immediately and trust it
-            elif save_destination == "integration_only":
-                web_server._add_to_storage_cache(device, command, "pending")
-                logger.info(
-                    f"✅ Added {device}/{command} to storage cache - will appear as untracked immediately"
-                )
-                learned_code = "pending"
-                result["code"] = "pending"
-                result["message"] = (
-                    f"✅ Command '{command}' learned and added to storage!"
-                )
-            else:
-                # For manager_only: Save as pending and schedule background update
-                # Don't block the user waiting for storage file to be written
-                learned_code = "pending"
-                result["code"] = "pending"
-                result["message"] = (
-                    f"✅ Command '{command}' learned! Code will be updated automatically in background."
-                )
-
-                # Schedule background task to poll for the actual code
-                # Pass entity_id so it can delete after fetching
-                # For SmartIR devices, also pass profile metadata
-                smartir_metadata = None
-
-                # Try to detect SmartIR device from devices.json first
-                device_manager = current_app.config.get("device_manager")
-                if device_manager and device_id:
-                    managed_device = device_manager.get_device(device_id)
-                    if (
-                        managed_device
-                        and managed_device.get("device_type") == "smartir"
-                    ):
-                        # This is a SmartIR device - add metadata for profile update
-                        device_code = managed_device.get("device_code")
-                        entity_type = managed_device.get("entity_type", "climate")
-                        if device_code:
-                            config_path = current_app.config.get(
-                                "config_path", "/config"
-                            )
-
-                            profile_path = (
-                                Path(config_path)
-                                / "custom_components"
-                                / "smartir"
-                                / "custom_codes"
-                                / entity_type
-                                / f"{device_code}.json"
-                            )
-                            smartir_metadata = {
-                                "smartir_profile": str(profile_path),
-                                "device_code": device_code,
-                                "platform": entity_type,
-                            }
-                            logger.info(
-                                f"📋 SmartIR device detected from devices.json - will update profile {device_code}.json"
-                            )
-
-                # If not found in devices.json, scan SmartIR profiles by device name
-                if not smartir_metadata:
-                    try:
-                        config_path = current_app.config.get("config_path", "/config")
-                        from pathlib import Path
-
-                        smartir_path = (
-                            Path(config_path) / "custom_components" / "smartir"
-                        )
-                        custom_codes_path = smartir_path / "custom_codes"
-
-                        if custom_codes_path.exists():
-                            # Scan all platforms for matching profile
-                            for platform_dir in custom_codes_path.iterdir():
-                                if platform_dir.is_dir():
-                                    platform = platform_dir.name
-                                    for profile_file in platform_dir.glob("*.json"):
-                                        try:
-                                            import json
-
-                                            with open(
-                                                profile_file, "r", encoding="utf-8"
-                                            ) as f:
-                                                profile_data = json.load(f)
-
-                                            # Generate device name from manufacturer/model
-                                            import re
-
-                                            manufacturer = profile_data.get(
-                                                "manufacturer", ""
-                                            )
-                                            model = profile_data.get(
-                                                "supportedModels", [""]
-                                            )[0]
-                                            profile_device_name = f"{manufacturer.lower()}_{model.lower()}"
-                                            profile_device_name = re.sub(
-                                                r"[^a-z0-9]+", "_", profile_device_name
-                                            )
-
-                                            # Check if this profile matches the device being learned
-                                            if profile_device_name == device.lower():
-                                                device_code = profile_file.stem
-                                                smartir_metadata = {
-                                                    "smartir_profile": str(
-                                                        profile_file
-                                                    ),
-                                                    "device_code": device_code,
-                                                    "platform": platform,
-                                                }
-                                                logger.info(
-                                                    f"📋 SmartIR device detected by profile scan - "
-                                                    f"will update profile {device_code}.json"
-                                                )
-                                                break
-                                        except Exception as e:
-                                            logger.debug(
-                                                f"Error checking profile {profile_file}: {e}"
-                                            )
-                                    if smartir_metadata:
-                                        break
-                    except Exception as e:
-                        logger.debug(f"Error scanning SmartIR profiles: {e}")
-
-                logger.info(
-                    f"Scheduling background poll for command '{command}' on device '{device}'"
-                )
-                web_server.schedule_command_poll(
-                    device_id,
-                    device,
-                    command,
-                    entity_id if save_destination == "manager_only" else None,
-                    smartir_metadata,
-                )
-
-                # NOTE: We DON'T add to storage cache for manager_only commands
-                # because we want to fetch the actual code from storage files
-
-            # Handle save destination logic
-            if device_id:
-                device_manager = current_app.config.get("device_manager")
-
-                # Save to devices.json if destination allows it
-                if save_destination in ["manager_only", "both"]:
-                    try:
-                        if device_manager:
-                            managed_device = device_manager.get_device(device_id)
-                            if managed_device:
-                                # Add the new command to the device's commands
-                                if "commands" not in managed_device:
-                                    managed_device["commands"] = {}
-
-                                # Store the learned code so we don't depend on .storage files
-                                managed_device["commands"][command] = {
-                                    "data": learned_code if learned_code else "pending",
-                                    "type": command_type,
-                                    "name": command,
-                                }
-
-                                # Save updated device
-                                device_manager.update_device(device_id, managed_device)
-                                logger.info(
-                                    f"✅ Updated devices.json for {device_id} "
-                                    f"with new command '{command}' "
-                                    f"(save_destination={save_destination})"
-                                )
-                            else:
-                                logger.warning(
-                                    f"⚠️ Device {device_id} not found in device manager"
-                                )
-                        else:
-                            logger.warning("⚠️ Device manager not available")
-                    except Exception as save_error:
-                        logger.error(f"❌ Error updating devices.json: {save_error}")
-                        # Don't fail the request if devices.json update fails
-
-                # For manager_only, deletion will happen in background AFTER fetching the code
-                # This is handled by the polling thread (see schedule_command_poll above)
-                if save_destination == "manager_only":
-                    logger.info(
-                        f"ℹ️ Deletion of '{command}' from integration storage will happen after code is fetched"
-                    )
-
-                # Log if integration_only (no devices.json update)
-                if save_destination == "integration_only":
-                    logger.info(
-                        f"ℹ️ Skipping devices.json update for '{command}' - save_destination=integration_only"
-                    )
-
-            # Close the event loop
-            loop.close()
-
-            return jsonify(result)
-        else:
-            loop.close()
-            return jsonify(result), 400
-
-    except Exception as e:
-        logger.error(f"Error learning command: {e}")
-        return jsonify({"success": False, "error": str(e)}), 500
+    finally:
+        loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
+    return jsonify(body), status
 
 
 @api_bp.route("/commands/send-raw", methods=["POST"])
@@ -441,15 +195,18 @@ def test_command():
     """Test a learned command by sending it"""
     try:
         data = request.json
-        logger.info(f"Test command request data: {data}")
 
         entity_id = data.get("entity_id")
         device = data.get("device")
         command = data.get("command")
         device_id = data.get("device_id")  # Entity ID to look up command mapping
 
-        logger.info(
-            f"Parsed - entity_id: {entity_id}, device: {device}, command: {command}, device_id: {device_id}"
+        hot_log.debug(
+            "command.test",
+            entity_id=entity_id,
+            device=device,
+            command=command,
+            device_id=device_id,
         )
 
         # If device is not provided, try to derive it from device_id
@@ -457,7 +214,7 @@ def test_command():
             # For managed devices, use the device_id as the device name
             # Remove entity_type prefix if present (e.g., "switch.office_lamp" -> "office_lamp")
             device = device_id.split(".")[-1] if "." in device_id else device_id
-            logger.info(f"Derived device name from device_id: {device}")
+            hot_log.debug("command.test.device_derived", device=device)
 
         if not all([entity_id, device, command]):
             missing = []
@@ -479,13 +236,13 @@ def test_command():
 
         if device_id and device_manager:
             entity_data = device_manager.get_device(device_id)
-            if entity_data:
-                logger.info(f"Found device in device_manager: {device_id}")
 
         if entity_data:
             is_smartir = entity_data.get("device_type") == "smartir"
-            logger.info(
-                f"Device type detected: {'SmartIR' if is_smartir else 'Broadlink'}"
+            hot_log.debug(
+                "command.test.device",
+                device_id=device_id,
+                type="smartir" if is_smartir else "broadlink",
             )
             commands_mapping = entity_data.get("commands", {})
 
@@ -498,17 +255,19 @@ def test_command():
                 actual_command = command_data.get(
                     "code", command_data.get("data", command)
                 )
-                logger.info(
-                    f"Command mapping: '{command}' -> extracted code from metadata"
-                )
+                hot_log.debug("command.test.mapped", command=command, source="metadata")
             else:
                 # Command stored as string directly
                 actual_command = command_data
-                logger.info(f"Command mapping: '{command}' -> '{actual_command}'")
+                hot_log.debug(
+                    "command.test.mapped",
+                    command=command,
+                    length=lambda: len(str(actual_command)),
+                )
 
             command = actual_command
         else:
-            logger.warning(f"Entity data not found for device_id: {device_id}")
+            hot_log.warning("command.test.unmanaged", device_id=device_id)
 
         # Get web server instance
         web_server = get_web_server()
@@ -521,9 +280,6 @@ def test_command():
 
         # For SmartIR devices, we need to look up the raw IR code from the SmartIR code file
         if is_smartir:
-            logger.info(
-                f"SmartIR device detected - looking up raw IR code for command '{command}'"
-            )
 
             # Get SmartIR code service to look up the raw code
             smartir_code_service = current_app.config.get("smartir_code_service")
@@ -578,9 +334,12 @@ def test_command():
                         fan = parts[2] if len(parts) > 2 else None
                         swing = parts[3] if len(parts) > 3 else None
 
-                        logger.info(
-                            f"Parsing command: mode='{mode}', temp='{temp}', "
-                            f"fan='{fan}', swing='{swing}'"
+                        hot_log.debug(
+                            "command.test.smartir_parsed",
+                            mode=mode,
+                            temp=temp,
+                            fan=fan,
+                            swing=swing,
                         )
 
                         # SmartIR nesting: mode → fan → swing → temp
@@ -595,16 +354,8 @@ def test_command():
                                         swing_data = fan_data[swing]
                                         if isinstance(swing_data, dict) and temp:
                                             raw_code = swing_data.get(temp)
-                                            logger.info(
-                                                f"Found code for {mode}/{fan}/"
-                                                f"{swing}/{temp}°C"
-                                            )
                                         elif isinstance(swing_data, str):
                                             raw_code = swing_data
-                                            logger.info(
-                                                f"Found code for {mode}/{fan}/"
-                                                f"{swing}"
-                                            )
                                         else:
                                             # No temp match, try first
                                             raw_code = (
@@ -615,9 +366,6 @@ def test_command():
                                     elif temp and temp in fan_data:
                                         # mode → fan → temp (no swing)
                                         raw_code = fan_data[temp]
-                                        logger.info(
-                                            f"Found code for {mode}/{fan}/" f"{temp}°C"
-                                        )
                                     else:
                                         # No specific temp, use default
                                         default_temp = "24"
@@ -629,10 +377,6 @@ def test_command():
                                                 if fan_data
                                                 else None
                                             )
-                                        logger.info(
-                                            f"Using default/first temp "
-                                            f"for {mode}/{fan}"
-                                        )
                                 else:
                                     raw_code = fan_data
                             else:
@@ -659,17 +403,9 @@ def test_command():
 
                 # For climate devices, commands may still be nested
                 if isinstance(raw_code, dict):
-                    logger.info(
-                        f"Command '{command}' has additional nesting, "
-                        f"extracting first value"
-                    )
                     raw_code = next(iter(raw_code.values())) if raw_code else None
 
                     if isinstance(raw_code, dict):
-                        logger.info(
-                            f"Command '{command}' has multiple levels of "
-                            f"nesting, extracting first value again"
-                        )
                         raw_code = next(iter(raw_code.values())) if raw_code else None
 
                 if not raw_code or not isinstance(raw_code, str):
@@ -695,18 +431,17 @@ def test_command():
                         400,
                     )
 
-                logger.info(
-                    f"Found raw IR code for command '{command}' in SmartIR code file {device_code}"
-                )
-
                 # Send the raw code directly with b64: prefix
                 # The b64: prefix tells Broadlink it's a base64-encoded raw command
                 service_payload = {
                     "entity_id": entity_id,
                     "command": f"b64:{raw_code}",
                 }  # Prefix with b64: for raw codes
-                logger.info(
-                    f"Sending SmartIR raw code to HA (code length: {len(raw_code)} chars)"
+                hot_log.debug(
+                    "command.test.send",
+                    source="smartir",
+                    device_code=device_code,
+                    length=len(raw_code),
                 )
 
             except Exception as e:
@@ -726,16 +461,15 @@ def test_command():
 
             # If command is "pending" or "error", send command name instead of raw code
             if command in ["pending", "error"]:
-                logger.info(
-                    f"Command is '{command}' - sending command name to HA instead of raw code"
-                )
                 # Send the command name - HA will look it up from its storage
                 service_payload = {
                     "entity_id": entity_id,
                     "command": data.get("command"),  # Use original command name
                 }
-                logger.info(
-                    f"Sending command name '{data.get('command')}' to HA (will be looked up from storage)"
+                hot_log.debug(
+                    "command.test.send",
+                    source="ha_storage",
+                    command=data.get("command"),
                 )
             else:
                 # Send raw code with b64: prefix
@@ -743,9 +477,7 @@ def test_command():
                     "entity_id": entity_id,
                     "command": f"b64:{command}",
                 }
-                logger.info(
-                    f"Sending Broadlink raw code to HA (code length: {len(command)} chars)"
-                )
+                hot_log.debug("command.test.send", source="raw", length=len(command))
 
         result = loop.run_until_complete(
             web_server._make_ha_request(
@@ -755,12 +487,11 @@ def test_command():
         loop.close()
 
         # HA service calls return empty dict/list on success, None on failure
-        logger.info(f"HA API result: {result} (type: {type(result)})")
         if result is not None:
-            logger.info("✅ Command sent successfully")
+            hot_log.debug("command.test.sent", entity_id=entity_id)
             return jsonify({"success": True, "message": "Command sent successfully"})
         else:
-            logger.error("❌ HA API returned None - command failed")
+            hot_log.error("command.test.failed", entity_id=entity_id)
             return jsonify({"success": False, "error": "Failed to send command"}), 400
 
     except Exception as e:
@@ -768,6 +499,28 @@ def test_command():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@api_bp.route("/commands/<device_id>/<command_name>", methods=["GET"])
+@response_cache.cached(devices_version)
+def get_command(device_id, command_name):
+    """Get a single command including its code (for summary listings)"""
+    try:
+        device_manager = current_app.config.get("device_manager")
+        if not device_manager:
+            return jsonify({"error": "Device manager not available"}), 500
+
+        command = device_manager.get_command(device_id, command_name)
+        if command is None:
+            return jsonify({"error": "Command not found"}), 404
+
+        return jsonify(
+            {"command": command, "device_id": device_id, "command_name": command_name}
+        )
+
+    except Exception as e:
+        logger.error(f"Error getting command: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
 @api_bp.route("/commands/<device_id>/<command_name>", methods=["DELETE"])
 def delete_command(device_id, command_name):
     """Delete a command from a device"""
@@ -825,6 +578,7 @@ def delete_command(device_id, command_name):
                         device_manager=device_manager,
                         config_path=str(web_server.config_loader.get_config_path()),
                         package_output_path=web_server.config_loader.get_package_output_path(),
+                        parallel_build=web_server.config_loader.get_parallel_entity_build(),
                     )
                     result = generator.generate_all_devices(broadlink_devices)
                     if result.get("success"):
@@ -958,20 +712,43 @@ def delete_command_from_storage():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@api_bp.route("/commands/duplicates", methods=["GET"])
+@response_cache.cached(devices_version)
+def get_duplicate_commands():
+    """Get groups of learned commands that are the same code"""
+    try:
+        device_manager = current_app.config.get("device_manager")
+        if not device_manager:
+            return jsonify({"error": "Device manager not available"}), 500
+
+        groups = device_manager.find_duplicate_commands()
+        logger.info(f"Found {len(groups)} groups of duplicate commands")
+
+        return jsonify({"groups": groups, "count": len(groups)})
+
+    except Exception as e:
+        logger.error(f"Error finding duplicate commands: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
 @api_bp.route("/commands/<device_id>", methods=["GET"])
+@response_cache.cached(devices_version)
 def get_device_commands(device_id):
-    """Get all commands for a device"""
+    """Get all commands for a device (?summary=1 leaves out the codes)"""
     try:
         device_manager = current_app.config.get("device_manager")
         if not device_manager:
             return jsonify({"error": "Device manager not available"}), 500
 
-        device = device_manager.get_device(device_id)
+        summary = request.args.get("summary", "").lower() in ("1", "true", "yes")
+        device = device_manager.get_device(device_id, resolve_payloads=not summary)
         if not device:
             logger.warning(f"Device '{device_id}' not found")
             return jsonify({"error": "Device not found"}), 404
 
         commands = device.get("commands", {})
+        if summary:
+            commands = summarize_commands(commands)
         logger.info(f"Returning {len(commands)} commands for device '{device_id}'")
 
         return jsonify({"commands": commands, "device_id": device_id})
@@ -1336,83 +1113,23 @@ def detect_command_type(command_data):
     """
     Detect command type (IR/RF) from Broadlink command data.
 
-    RF commands can start with various byte patterns:
+    Only the packet header is decoded (see pulse_decoder.packet_type):
+    - 0x26 0x00 (base64: JgA) - Standard IR
     - 0x26 0x01+ (base64: Jg but NOT JgA) - Standard RF
-    - 0xb2 (base64: sg, sc, etc.) - RF 433MHz
+    - 0xb0-0xbf (base64: sg, sc, etc.) - RF 433MHz
     - 0xd7 (base64: 1w, 10, etc.) - RF 315MHz
-
-    IR commands:
-    - 0x26 0x00 (base64: JgA) - Standard IR
-
-    More reliable detection based on byte analysis.
     """
     if isinstance(command_data, str):
-        import base64
+        # Imported here so NumPy is not loaded at startup
+        from pulse_decoder import base64_header, packet_type
 
-        try:
-            # Decode base64 to get raw bytes
-            raw_bytes = base64.b64decode(command_data)
-
-            if len(raw_bytes) < 2:
-                return "ir"  # Too short, default to IR
-
-            # Check first byte
-            first_byte = raw_bytes[0]
-            second_byte = raw_bytes[1] if len(raw_bytes) > 1 else 0x00
-
-            # RF command patterns
-            # 0xb0-0xbf range = RF 433MHz (base64 starts with 's')
-            if 0xB0 <= first_byte <= 0xBF:
-                logger.debug(f"Detected RF 433MHz command (0x{first_byte:02x} prefix)")
-                return "rf"
-            # 0xd7 = RF 315MHz
-            elif first_byte == 0xD7:
-                logger.debug(f"Detected RF 315MHz command (0xd7 prefix)")
-                return "rf"
-            elif first_byte == 0x26:
-                if second_byte == 0x00:
-                    # IR command (0x26 0x00)
-                    return "ir"
-                else:
-                    # RF command (0x26 followed by non-zero)
-                    logger.debug(
-                        f"Detected RF command (0x26 0x{second_byte:02x} prefix)"
-                    )
-                    return "rf"
-
-            # Fallback: check base64 prefix patterns
-            # IR: Starts with 'JgA'
-            if command_data.startswith("JgA"):
-                return "ir"
-            # RF: Various patterns
-            elif (
-                command_data.startswith("Jg")
-                or command_data.startswith("Jh")
-                or command_data.startswith("sg")
-                or command_data.startswith("sc")
-                or command_data.startswith("1w")
-                or command_data.startswith("10")
-            ):
-                return "rf"
-
-            # Additional heuristic: RF commands are typically longer
-            if len(command_data) > 200:
-                return "rf"
+        command_type = packet_type(base64_header(command_data))
+        if command_type:
+            return command_type
 
-        except Exception as e:
-            logger.debug(f"Error decoding command for type detection: {e}")
-            # Fallback to simple heuristic
-            if command_data.startswith("JgA"):
-                return "ir"
-            elif (
-                command_data.startswith("Jg")
-                or command_data.startswith("Jh")
-                or command_data.startswith("sg")
-                or command_data.startswith("sc")
-                or command_data.startswith("1w")
-                or command_data.startswith("10")
-            ):
-                return "rf"
+        # Not a Broadlink header; RF commands are typically longer
+        if len(command_data) > 200:
+            return "rf"
 
     return "ir"  # Default to IR if we can't determine
 
@@ -1440,188 +1157,11 @@ def check_pending_commands():
 @api_bp.route("/commands/learn/direct/stream", methods=["POST"])
 def learn_command_direct_stream():
     """Learn a command with SSE progress updates"""
-    from flask import Response, stream_with_context
-
-    data = request.json
-    device_id = data.get("device_id")
-    entity_id = data.get("entity_id")
-    command_name = data.get("command_name")
-    command_type = data.get("command_type", "ir")
-    rf_frequency = data.get("rf_frequency")  # Optional fixed RF frequency in MHz
-    if rf_frequency is not None:
-        try:
-            rf_frequency = float(rf_frequency)
-        except (ValueError, TypeError):
-            rf_frequency = None
-
-    def generate():
-        try:
-            from broadlink_learner import BroadlinkLearner
-            from broadlink_device_manager import BroadlinkDeviceManager
-            from device_manager import DeviceManager
-
-            yield f"data: {json.dumps({'status': 'starting', 'message': 'Initializing...'})}\n\n"
-
-            if not all([device_id, entity_id, command_name]):
-                yield f"data: {json.dumps({'status': 'error', 'message': 'Missing required fields'})}\n\n"
-                return
-
-            # Get HA config
-            web_server = get_web_server()
-            ha_url = web_server.ha_url
-            ha_token = web_server.ha_token
-
-            # Get device connection info (try cache first)
-            connection_info = web_server.get_cached_connection_info(entity_id)
-
-            if not connection_info:
-                yield f"data: {json.dumps({'status': 'connecting', 'message': 'Connecting to device...'})}\n\n"
-                device_manager_bl = BroadlinkDeviceManager(
-                    ha_url, ha_token, str(web_server.config_loader.get_config_path())
-                )
-                connection_info = device_manager_bl.get_device_connection_info(
-                    entity_id
-                )
-
-                if connection_info:
-                    # Cache for future use
-                    web_server.cache_connection_info(entity_id, connection_info)
-            else:
-                yield f"data: {json.dumps({'status': 'connecting', 'message': 'Using cached connection...'})}\n\n"
-
-            if not connection_info:
-                yield f"data: {json.dumps({'status': 'error', 'message': 'Could not get connection info'})}\n\n"
-                return
-
-            # Create learner
-            learner = BroadlinkLearner(
-                host=connection_info["host"],
-                mac=connection_info["mac_bytes"],
-                device_type=connection_info["type"],
-            )
-
-            # Authenticate
-            if not learner.authenticate():
-                yield f"data: {json.dumps({'status': 'error', 'message': 'Failed to authenticate'})}\n\n"
-                return
-
-            yield f"data: {json.dumps({'status': 'ready', 'message': f'Ready to learn {command_type.upper()} command'})}\n\n"
-
-            # Learn command with progress
-            if command_type == "rf":
-                # Create a list to capture progress messages
-                progress_messages = []
-
-                def progress_handler(message, step):
-                    progress_messages.append((message, step))
-
-                # Start RF learning in a thread so we can yield progress
-                import threading
-
-                result_container = [None]
-
-                if rf_frequency is not None:
-                    msg = f"Using fixed frequency {rf_frequency} MHz - press your remote button now..."
-                    yield f"data: {json.dumps({'status': 'learning', 'message': msg, 'step': 'capture'})}\n\n"
-
-                    def learn_thread():
-                        result_container[0] = learner.learn_rf_command_fixed_frequency(
-                            frequency=rf_frequency,
-                            timeout=30,
-                            progress_callback=progress_handler,
-                        )
-
-                else:
-
-                    def learn_thread():
-                        result_container[0] = learner.learn_rf_command_with_progress(
-                            timeout=30, progress_callback=progress_handler
-                        )
-
-                thread = threading.Thread(target=learn_thread)
-                thread.start()
-
-                # Poll for progress updates
-                last_message_count = 0
-                while thread.is_alive():
-                    time.sleep(0.5)
-                    if len(progress_messages) > last_message_count:
-                        for msg, step in progress_messages[last_message_count:]:
-                            yield f"data: {json.dumps({'status': 'learning', 'message': msg, 'step': step})}\n\n"
-                        last_message_count = len(progress_messages)
-
-                thread.join()
-                result = result_container[0]
-
-                if result:
-                    base64_data, frequency = result
-                    data = {
-                        "status": "captured",
-                        "message": f"RF command captured at {frequency} MHz",
-                        "frequency": frequency,
-                    }
-                    yield f"data: {json.dumps(data)}\n\n"
-                else:
-                    yield f"data: {json.dumps({'status': 'error', 'message': 'Timeout - no RF signal detected'})}\n\n"
-                    return
-            else:
-                data = {
-                    "status": "learning",
-                    "message": "Waiting for IR signal...",
-                    "step": "capture",
-                }
-                yield f"data: {json.dumps(data)}\n\n"
-                result = learner.learn_ir_command(timeout=30)
-                if result:
-                    base64_data = result
-                    frequency = None
-                    yield f"data: {json.dumps({'status': 'captured', 'message': 'IR command captured'})}\n\n"
-                else:
-                    yield f"data: {json.dumps({'status': 'error', 'message': 'Timeout - no IR signal detected'})}\n\n"
-                    return
-
-            # Save command
-            yield f"data: {json.dumps({'status': 'saving', 'message': 'Saving command...'})}\n\n"
-
-            device_manager = DeviceManager(
-                storage_path=str(web_server.broadlink_manager_path)
-            )
-            success = device_manager.add_learned_command(
-                device_id=device_id,
-                command_name=command_name,
-                command_data=base64_data,
-                command_type=command_type,
-                frequency=frequency,
-            )
-
-            if not success:
-                yield f"data: {json.dumps({'status': 'error', 'message': 'Failed to save command'})}\n\n"
-                return
-
-            # Update connection info
-            device_manager.update_device_connection_info(
-                device_id,
-                {
-                    "host": connection_info["host"],
-                    "mac": connection_info["mac"],
-                    "type": connection_info["type"],
-                    "type_hex": connection_info["type_hex"],
-                    "model": connection_info["model"],
-                },
-            )
-
-            data = {
-                "status": "complete",
-                "message": "Command learned successfully!",
-                "command_name": command_name,
-            }
-            yield f"data: {json.dumps(data)}\n\n"
-
-        except Exception as e:
-            logger.error(f"Error in SSE learning: {e}", exc_info=True)
-            yield f"data: {json.dumps({'status': 'error', 'message': str(e)})}\n\n"
-
-    return Response(stream_with_context(generate()), mimetype="text/event-stream")
+    events = learn_direct_events(get_web_server(), request.json or {})
+    return Response(
+        (sse(event) for event in iterate_blocking(events)),
+        mimetype="text/event-stream",
+    )
 
 
 @api_bp.route("/commands/learn/direct", methods=["POST"])
@@ -1647,170 +1187,9 @@ def learn_command_direct():
         "frequency": 433.92  // RF only
     }
     """
-    try:
-        from broadlink_learner import BroadlinkLearner
-        from broadlink_device_manager import BroadlinkDeviceManager
-        from device_manager import DeviceManager
-
-        data = request.get_json()
-        device_id = data.get("device_id")
-        entity_id = data.get("entity_id")
-        command_name = data.get("command_name")
-        command_type = data.get("command_type", "ir")
-
-        if not all([device_id, entity_id, command_name]):
-            return (
-                jsonify(
-                    {
-                        "success": False,
-                        "error": "Missing required fields: device_id, entity_id, command_name",
-                    }
-                ),
-                400,
-            )
-
-        if command_type not in ["ir", "rf"]:
-            return (
-                jsonify(
-                    {
-                        "success": False,
-                        "error": 'Invalid command_type. Must be "ir" or "rf"',
-                    }
-                ),
-                400,
-            )
-
-        # Get HA config
-        web_server = get_web_server()
-        ha_url = web_server.ha_url
-        ha_token = web_server.ha_token
-
-        # Get device connection info (try cache first)
-        connection_info = web_server.get_cached_connection_info(entity_id)
-
-        if not connection_info:
-            device_manager_bl = BroadlinkDeviceManager(
-                ha_url, ha_token, str(web_server.config_loader.get_config_path())
-            )
-            connection_info = device_manager_bl.get_device_connection_info(entity_id)
-
-            if connection_info:
-                # Cache for future use
-                web_server.cache_connection_info(entity_id, connection_info)
-
-        if not connection_info:
-            return (
-                jsonify(
-                    {
-                        "success": False,
-                        "error": f"Could not get connection info for {entity_id}",
-                    }
-                ),
-                404,
-            )
-
-        # Create learner
-        learner = BroadlinkLearner(
-            host=connection_info["host"],
-            mac=connection_info["mac_bytes"],
-            device_type=connection_info["type"],
-        )
-
-        # Authenticate
-        if not learner.authenticate():
-            return (
-                jsonify(
-                    {"success": False, "error": "Failed to authenticate with device"}
-                ),
-                500,
-            )
-
-        # Learn command
-        logger.info(
-            f"Learning {command_type} command '{command_name}' for device {device_id}"
-        )
-
-        if command_type == "ir":
-            result = learner.learn_ir_command(timeout=30)
-            if result:
-                base64_data = result
-                frequency = None
-            else:
-                return (
-                    jsonify(
-                        {
-                            "success": False,
-                            "error": "Timeout - no IR signal detected within 30 seconds",
-                        }
-                    ),
-                    408,
-                )
-        else:  # RF
-            result = learner.learn_rf_command(timeout=30)
-            if result:
-                base64_data, frequency = result
-            else:
-                return (
-                    jsonify(
-                        {
-                            "success": False,
-                            "error": "Timeout - no RF signal detected within 30 seconds",
-                        }
-                    ),
-                    408,
-                )
-
-        # Save to devices.json
-        device_manager = DeviceManager(
-            storage_path=str(web_server.broadlink_manager_path)
-        )
-        success = device_manager.add_learned_command(
-            device_id=device_id,
-            command_name=command_name,
-            command_data=base64_data,
-            command_type=command_type,
-            frequency=frequency,
-        )
-
-        if not success:
-            return (
-                jsonify(
-                    {"success": False, "error": "Failed to save command to storage"}
-                ),
-                500,
-            )
-
-        # Also update connection info in device
-        device_manager.update_device_connection_info(
-            device_id,
-            {
-                "host": connection_info["host"],
-                "mac": connection_info["mac"],
-                "type": connection_info["type"],
-                "type_hex": connection_info["type_hex"],
-                "model": connection_info["model"],
-            },
-        )
-
-        response = {
-            "success": True,
-            "command_name": command_name,
-            "command_type": command_type,
-            "data": base64_data,
-            "data_length": len(base64_data),
-        }
-
-        if frequency:
-            response["frequency"] = frequency
-
-        logger.info(
-            f"Successfully learned command '{command_name}' ({len(base64_data)} chars)"
-        )
-        return jsonify(response)
-
-    except Exception as e:
-        logger.error(f"Error learning command: {e}", exc_info=True)
-        return jsonify({"success": False, "error": str(e)}), 500
+    events = learn_direct_events(get_web_server(), request.get_json() or {})
+    body, status = learn_direct_result(list(iterate_blocking(events))[-1])
+    return jsonify(body), status
 
 
 @api_bp.route("/commands/test/direct", methods=["POST"])
@@ -1834,7 +1213,6 @@ def test_command_direct():
     try:
         from broadlink_learner import BroadlinkLearner
         from broadlink_device_manager import BroadlinkDeviceManager
-        from device_manager import DeviceManager
 
         data = request.get_json()
         device_id = data.get("device_id")
@@ -1847,11 +1225,9 @@ def test_command_direct():
         # Get web server for storage path
         web_server = get_web_server()
 
-        # Get command data and device info
-        device_manager = DeviceManager(
-            storage_path=str(web_server.broadlink_manager_path)
-        )
-        command_data = device_manager.get_command_data(device_id, command_name)
+        # Get raw command bytes (sliced from the payload store, no base64 step)
+        device_manager = web_server.device_manager
+        command_data = device_manager.get_command_bytes(device_id, command_name)
 
         if not command_data:
             return (
@@ -2080,7 +1456,6 @@ def test_command_ha():
     }
     """
     try:
-        from device_manager import DeviceManager
         import requests
 
         data = request.get_json()
@@ -2095,9 +1470,7 @@ def test_command_ha():
         web_server = get_web_server()
 
         # Get command data
-        device_manager = DeviceManager(
-            storage_path=str(web_server.broadlink_manager_path)
-        )
+        device_manager = web_server.device_manager
         command_data = device_manager.get_command_data(device_id, command_name)
 
         if not command_data:
@@ -2156,6 +1529,38 @@ def test_command_ha():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+def _export_device_info(device_id, device):
+    """Device fields included in command exports"""
+    return {
+        "id": device_id,
+        "name": device.get("name", ""),
+        "entity_type": device.get("entity_type", ""),
+        "device_type": device.get("device_type", "broadlink"),
+        "broadlink_entity": device.get("broadlink_entity", ""),
+        "area": device.get("area", ""),
+        "icon": device.get("icon", ""),
+    }
+
+
+def _export_commands(commands):
+    """Commands in export format (data, type and RF frequency only)"""
+    exported = {}
+    for cmd_name, cmd_data in commands.items():
+        if isinstance(cmd_data, dict):
+            exported[cmd_name] = {
+                "data": cmd_data.get("data", ""),
+                "type": cmd_data.get("type", cmd_data.get("command_type", "ir")),
+            }
+            if cmd_data.get("frequency"):
+                exported[cmd_name]["frequency"] = cmd_data["frequency"]
+        else:
+            exported[cmd_name] = {
+                "data": cmd_data,
+                "type": "ir",
+            }
+    return exported
+
+
 @api_bp.route("/commands/export/<device_id>", methods=["GET"])
 def export_device_commands(device_id):
     """Export a device's commands as a JSON file for backup/transfer"""
@@ -2176,34 +1581,10 @@ def export_device_commands(device_id):
             "export_format": "broadlink_manager_v2",
             "export_version": 1,
             "exported_at": datetime.now().isoformat(),
-            "device": {
-                "id": device_id,
-                "name": device.get("name", ""),
-                "entity_type": device.get("entity_type", ""),
-                "device_type": device.get("device_type", "broadlink"),
-                "broadlink_entity": device.get("broadlink_entity", ""),
-                "area": device.get("area", ""),
-                "icon": device.get("icon", ""),
-            },
-            "commands": {},
+            "device": _export_device_info(device_id, device),
+            "commands": _export_commands(commands),
         }
 
-        for cmd_name, cmd_data in commands.items():
-            if isinstance(cmd_data, dict):
-                export_data["commands"][cmd_name] = {
-                    "data": cmd_data.get("data", ""),
-                    "type": cmd_data.get("type", cmd_data.get("command_type", "ir")),
-                }
-                if cmd_data.get("frequency"):
-                    export_data["commands"][cmd_name]["frequency"] = cmd_data[
-                        "frequency"
-                    ]
-            else:
-                export_data["commands"][cmd_name] = {
-                    "data": cmd_data,
-                    "type": "ir",
-                }
-
         json_str = json.dumps(export_data, indent=2)
         filename = f"{device_id}_commands.json"
 
@@ -2220,61 +1601,60 @@ def export_device_commands(device_id):
 
 @api_bp.route("/commands/export-all", methods=["GET"])
 def export_all_commands():
-    """Export all devices and their commands as a single JSON file"""
+    """
+    Export all devices and their commands as a single JSON file
+
+    The file is streamed device by device (same layout as json.dumps with
+    indent=2), so only one device's codes are in memory at a time. An error
+    once streaming has started still ends the document as valid JSON, with
+    an "error" member in place of the remaining devices.
+    """
     try:
         device_manager = current_app.config.get("device_manager")
         if not device_manager:
             return jsonify({"error": "Device manager not available"}), 500
 
-        all_devices = device_manager.get_all_devices()
-
-        export_data = {
-            "export_format": "broadlink_manager_v2",
-            "export_version": 1,
-            "exported_at": datetime.now().isoformat(),
-            "devices": [],
-        }
-
-        for device_id, device in all_devices.items():
-            commands = device.get("commands", {})
-            if not commands:
-                continue
-
-            device_export = {
-                "id": device_id,
-                "name": device.get("name", ""),
-                "entity_type": device.get("entity_type", ""),
-                "device_type": device.get("device_type", "broadlink"),
-                "broadlink_entity": device.get("broadlink_entity", ""),
-                "area": device.get("area", ""),
-                "icon": device.get("icon", ""),
-                "commands": {},
-            }
-
-            for cmd_name, cmd_data in commands.items():
-                if isinstance(cmd_data, dict):
-                    device_export["commands"][cmd_name] = {
-                        "data": cmd_data.get("data", ""),
-                        "type": cmd_data.get(
-                            "type", cmd_data.get("command_type", "ir")
-                        ),
-                    }
-                    if cmd_data.get("frequency"):
-                        device_export["commands"][cmd_name]["frequency"] = cmd_data[
-                            "frequency"
-                        ]
-                else:
-                    device_export["commands"][cmd_name] = {
-                        "data": cmd_data,
-                        "type": "ir",
-                    }
+        # Codes are resolved one device at a time as the file is written. The
+        # first one is resolved here, so storage errors still get a 500.
+        devices = device_manager.iter_devices()
+        first = next(devices, None)
+        header = json.dumps(
+            {
+                "export_format": "broadlink_manager_v2",
+                "export_version": 1,
+                "exported_at": datetime.now().isoformat(),
+            },
+            indent=2,
+        )[:-2]
 
-            export_data["devices"].append(device_export)
+        def generate():
+            yield header + ',\n  "devices": ['
+            separator = "\n"
+            error = None
+            try:
+                for device_id, device in itertools.chain(
+                    [first] if first else [], devices
+                ):
+                    commands = device.get("commands", {})
+                    if not commands:
+                        continue
+
+                    device_export = _export_device_info(device_id, device)
+                    device_export["commands"] = _export_commands(commands)
+                    body = json.dumps(device_export, indent=2).replace("\n", "\n    ")
+                    yield f"{separator}    {body}"
+                    separator = ",\n"
+            except Exception as e:
+                logger.error(f"Error exporting all commands: {e}", exc_info=True)
+                error = str(e)
 
-        json_str = json.dumps(export_data, indent=2)
+            end = "\n  ]" if separator == ",\n" else "]"
+            if error is not None:
+                end += f',\n  "error": {json.dumps(error)}'
+            yield end + "\n}"
 
         return Response(
-            json_str,
+            stream_with_context(generate()),
             mimetype="application/json",
             headers={
                 "Content-Disposition": "attachment; filename=broadlink_manager_export.json"
@@ -2286,130 +1666,115 @@ def export_all_commands():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+def _iter_import_entries(stream):
+    """
+    Yield device entries of an export file while it is being parsed
+
+    Raises:
+        ValueError: The upload is not valid JSON or not an export file
+    """
+    found = False
+    single = {}
+    for key, value in iter_members(stream, stream_keys=("devices",)):
+        if key == "devices":
+            found = True
+            if isinstance(value, list):  # Not streamed if it isn't an array
+                yield from value
+            else:
+                yield value
+        elif key in ("device", "commands"):
+            single[key] = value
+        elif key == "error":
+            # Written by export-all when it failed partway through
+            raise ValueError(f"Export file is incomplete: {value}")
+
+    if not found:
+        if "device" not in single or "commands" not in single:
+            raise ValueError(
+                "Invalid export format. Expected 'device' + 'commands' or 'devices' array."
+            )
+        yield single
+
+
 @api_bp.route("/commands/import-json", methods=["POST"])
 def import_json_commands():
-    """Import commands from a JSON file (single device or multi-device export)"""
+    """
+    Import commands from a JSON file (single device or multi-device export)
+
+    The upload is parsed incrementally and applied in one batched save.
+    With ?stream=1 progress is reported as server-sent events, ending with
+    a "complete" (or "error") event carrying the results.
+    """
+    device_manager = current_app.config.get("device_manager")
+    if not device_manager:
+        return jsonify({"error": "Device manager not available"}), 500
+
+    if request.args.get("stream", "").lower() in ("1", "true", "yes"):
+        return _import_json_commands_stream(device_manager)
+
     try:
-        data = request.json
-        if not data:
+        # Chunked uploads (async server mode) have no length
+        if request.content_length == 0:
             return jsonify({"success": False, "error": "No data provided"}), 400
 
-        device_manager = current_app.config.get("device_manager")
-        if not device_manager:
-            return jsonify({"error": "Device manager not available"}), 500
-
-        # Determine if this is a single-device or multi-device export
-        is_multi = "devices" in data
-        is_single = "device" in data and "commands" in data
+        results = device_manager.import_commands(
+            _iter_import_entries(request.stream),
+            progress=_log_import_progress,
+        )
+        results["success"] = True
+        return jsonify(results)
 
-        if not is_multi and not is_single:
-            return (
-                jsonify(
-                    {
-                        "success": False,
-                        "error": "Invalid export format. Expected 'device' + 'commands' or 'devices' array.",
-                    }
-                ),
-                400,
-            )
+    except ValueError as e:
+        logger.warning(f"Rejected command import: {e}")
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error importing commands: {e}", exc_info=True)
+        return jsonify({"success": False, "error": str(e)}), 500
 
-        results = {"imported": 0, "skipped": 0, "errors": [], "devices": []}
 
-        if is_single:
-            devices_to_import = [data]
-        else:
-            devices_to_import = data["devices"]
+def _log_import_progress(results):
+    done = len(results["devices"]) + results["skipped"]
+    if done % 100 == 0:
+        logger.info(
+            f"Import progress: {done} device(s), {results['imported']} command(s)"
+        )
 
-        for entry in devices_to_import:
-            dev_info = entry.get("device", entry)
-            commands = entry.get("commands", {})
-            device_id = dev_info.get("id", "")
 
-            if not device_id:
-                results["errors"].append("Missing device ID in export entry")
-                results["skipped"] += 1
-                continue
+def _import_json_commands_stream(device_manager):
+    """Run an import in a worker thread, streaming progress events"""
+    import queue
+    import threading
 
-            if not commands:
-                results["errors"].append(
-                    f"Device '{device_id}' has no commands to import"
-                )
-                results["skipped"] += 1
-                continue
-
-            existing = device_manager.get_device(device_id)
-
-            if existing:
-                # Merge commands into existing device
-                existing_commands = existing.get("commands", {})
-                for cmd_name, cmd_data in commands.items():
-                    existing_commands[cmd_name] = {
-                        "data": cmd_data.get("data", ""),
-                        "type": cmd_data.get("type", "ir"),
-                        "command_type": cmd_data.get("type", "ir"),
-                        "name": cmd_name,
-                    }
-                    if cmd_data.get("frequency"):
-                        existing_commands[cmd_name]["frequency"] = cmd_data["frequency"]
+    stream = request.stream
+    events = queue.Queue()
 
-                existing["commands"] = existing_commands
-                device_manager.update_device(device_id, existing)
-                results["imported"] += len(commands)
-                results["devices"].append(
-                    {
-                        "id": device_id,
-                        "name": existing.get("name", device_id),
-                        "commands_imported": len(commands),
-                        "action": "merged",
-                    }
-                )
-                logger.info(
-                    f"Imported {len(commands)} commands into existing device '{device_id}'"
-                )
-            else:
-                # Create new device with imported commands
-                new_commands = {}
-                for cmd_name, cmd_data in commands.items():
-                    new_commands[cmd_name] = {
-                        "data": cmd_data.get("data", ""),
-                        "type": cmd_data.get("type", "ir"),
-                        "command_type": cmd_data.get("type", "ir"),
-                        "name": cmd_name,
-                    }
-                    if cmd_data.get("frequency"):
-                        new_commands[cmd_name]["frequency"] = cmd_data["frequency"]
-
-                device_data = {
-                    "name": dev_info.get("name", device_id),
-                    "entity_type": dev_info.get("entity_type", "switch"),
-                    "device_type": dev_info.get("device_type", "broadlink"),
-                    "broadlink_entity": dev_info.get("broadlink_entity", ""),
-                    "area": dev_info.get("area", ""),
-                    "icon": dev_info.get("icon", ""),
-                    "commands": new_commands,
-                }
+    def progress(results):
+        events.put(
+            {
+                "status": "progress",
+                "devices": len(results["devices"]) + results["skipped"],
+                "imported": results["imported"],
+            }
+        )
 
-                success = device_manager.create_device(device_id, device_data)
-                if success:
-                    results["imported"] += len(commands)
-                    results["devices"].append(
-                        {
-                            "id": device_id,
-                            "name": device_data["name"],
-                            "commands_imported": len(commands),
-                            "action": "created",
-                        }
-                    )
-                    logger.info(
-                        f"Created new device '{device_id}' with {len(commands)} imported commands"
-                    )
-                else:
-                    results["errors"].append(f"Failed to create device '{device_id}'")
-                    results["skipped"] += 1
+    def run():
+        try:
+            results = device_manager.import_commands(
+                _iter_import_entries(stream), progress=progress
+            )
+            events.put({"status": "complete", "success": True, **results})
+        except Exception as e:
+            logger.error(f"Error importing commands: {e}")
+            events.put({"status": "error", "success": False, "error": str(e)})
 
-        results["success"] = True
-        return jsonify(results)
+    def generate():
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        while True:
+            event = events.get()
+            yield f"data: {json.dumps(event)}\n\n"
+            if event["status"] != "progress":
+                break
+        worker.join()
 
-    except Exception as e:
-        logger.error(f"Error importing commands: {e}", exc_info=True)
-        return jsonify({"success": False, "error": str(e)}), 500
+    return Response(stream_with_context(generate()), mimetype="text/event-stream")
@@ -9,6 +9,7 @@ import io
 import zipfile
 from flask import jsonify, request, current_app, send_file
 from . import api_bp
+from response_cache import response_cache
 
 logger = logging.getLogger(__name__)
 
@@ -39,14 +40,112 @@ def normalize_device_name(name):
     return name.strip().replace(" ", "_").lower()
 
 
+def _truthy_arg(name):
+    """Check a boolean query argument (?summary=1, ?summary=true)"""
+    return request.args.get(name, "").lower() in ("1", "true", "yes")
+
+
+def _requested_fields():
+    """Fields requested with ?fields=a,b,c (None means all fields)"""
+    fields = request.args.get("fields")
+    if not fields:
+        return None
+    return {field.strip() for field in fields.split(",") if field.strip()} | {"id"}
+
+
+def summarize_commands(commands):
+    """
+    Strip payload data from a commands dict, keeping names, types and test status
+
+    Pending and failed commands keep a "pending" or "error" flag so the UI
+    can still show them.
+    """
+    summary = {}
+    for name, command in (commands or {}).items():
+        if isinstance(command, dict):
+            summary[name] = {
+                key: value
+                for key, value in command.items()
+                if key not in ("data", "data_hash")
+            }
+            if command.get("data") in ("pending", "error"):
+                summary[name][command["data"]] = True
+        else:
+            # Entity command mappings are plain strings, not payloads
+            summary[name] = command
+    return summary
+
+
+def shape_device(device, fields=None, summary=False):
+    """Apply ?summary and ?fields to a device dict for listing responses"""
+    if summary:
+        commands = device.get("commands") or {}
+        device = {
+            **device,
+            "commands": summarize_commands(commands),
+            "command_count": len(commands),
+        }
+    if fields is not None:
+        device = {key: value for key, value in device.items() if key in fields}
+    return device
+
+
+def restore_payloads(commands, existing_commands):
+    """
+    Keep stored codes for commands sent back as summaries (no data/data_hash)
+
+    Args:
+        commands: Commands from an update request
+        existing_commands: Commands currently stored for the device
+
+    Returns:
+        Commands with payload fields of summarized entries restored
+    """
+    restored = {}
+    for name, command in (commands or {}).items():
+        existing = (existing_commands or {}).get(name)
+        if (
+            isinstance(command, dict)
+            and "data" not in command
+            and "data_hash" not in command
+            and isinstance(existing, dict)
+        ):
+            command = {
+                **{k: v for k, v in command.items() if k not in ("pending", "error")},
+                **{k: v for k, v in existing.items() if k in ("data", "data_hash")},
+            }
+        restored[name] = command
+    return restored
+
+
+def devices_version(*args, **kwargs):
+    """Response cache version of everything read through the device manager"""
+    device_manager = get_device_manager()
+    return device_manager.backend.version() if device_manager else None
+
+
+def _needs_payloads(fields, summary):
+    """Whether a listing needs command payloads resolved"""
+    return not summary and (fields is None or "commands" in fields)
+
+
 @api_bp.route("/devices", methods=["GET"])
 def get_devices():
-    """Get all managed devices"""
+    """
+    Get all managed devices
+
+    Query parameters:
+        fields: Comma-separated fields to return (e.g. "id,name,area")
+        summary: Replace commands with payload-free metadata and a count
+    """
     try:
         storage = get_storage_manager()
         if not storage:
             return jsonify({"error": "Storage manager not available"}), 500
 
+        fields = _requested_fields()
+        summary = _truthy_arg("summary")
+
         # Get all entities from storage (reload from disk to get latest data)
         entities = storage.get_all_entities(reload=True)
 
@@ -74,7 +173,7 @@ def get_devices():
                     "commands": entity_data.get("commands", {}),
                     "enabled": entity_data.get("enabled", True),
                 }
-                devices.append(device)
+                devices.append(shape_device(device, fields, summary))
             except Exception as e:
                 logger.error(f"Error processing entity {entity_id}: {e}")
                 continue
@@ -727,21 +826,36 @@ def create_managed_device():
 
 
 @api_bp.route("/devices/managed", methods=["GET"])
+@response_cache.cached(devices_version)
 def get_managed_devices():
-    """Get all managed devices from device manager"""
+    """
+    Get all managed devices from device manager
+
+    Query parameters:
+        fields: Comma-separated fields to return (e.g. "id,name,area")
+        summary: Replace commands with payload-free metadata and a count
+            (fetch a code with GET /api/commands/<device_id>/<command_name>)
+    """
     try:
         device_manager = get_device_manager()
 
         if not device_manager:
             return jsonify({"error": "Device manager not available"}), 500
 
-        # Get all devices
-        devices = device_manager.get_all_devices()
+        fields = _requested_fields()
+        summary = _truthy_arg("summary")
+
+        # Payloads stay as references unless the response includes them
+        devices = device_manager.get_all_devices(
+            resolve_payloads=_needs_payloads(fields, summary)
+        )
 
         # Convert to list format for frontend
         device_list = []
         for device_id, device_data in devices.items():
-            device_list.append({"id": device_id, **device_data})
+            device_list.append(
+                shape_device({"id": device_id, **device_data}, fields, summary)
+            )
 
         return jsonify(
             {"success": True, "devices": device_list, "count": len(device_list)}
@@ -753,6 +867,7 @@ def get_managed_devices():
 
 
 @api_bp.route("/devices/managed/<device_id>", methods=["GET"])
+@response_cache.cached(devices_version)
 def get_managed_device(device_id):
     """Get a specific managed device"""
     try:
@@ -791,6 +906,13 @@ def update_managed_device(device_id):
         if not existing_device:
             return jsonify({"error": f"Device {device_id} not found"}), 404
 
+        # Listings are summaries: never store their count or drop codes
+        data.pop("command_count", None)
+        if "commands" in data:
+            data["commands"] = restore_payloads(
+                data["commands"], existing_device.get("commands")
+            )
+
         # Update device data (preserve device_type - it cannot be changed)
         updated_data = {
             **existing_device,
@@ -945,6 +1067,7 @@ def delete_managed_device(device_id):
                         device_manager=device_manager,
                         config_path=str(web_server.config_loader.get_config_path()),
                         package_output_path=web_server.config_loader.get_package_output_path(),
+                        parallel_build=web_server.config_loader.get_parallel_entity_build(),
                     )
                     result = generator.generate_all_devices(broadlink_devices)
                     if result.get("success"):
@@ -1305,3 +1428,51 @@ def download_diagnostics():
     except Exception as e:
         logger.error(f"Error creating diagnostic bundle: {e}")
         return jsonify({"error": str(e)}), 500
+
+
+@api_bp.route("/diagnostics/profiles", methods=["GET"])
+def list_request_profiles():
+    """List stored request profiles (newest first)"""
+    profiler = current_app.config.get("request_profiler")
+    if not profiler:
+        return jsonify({"success": True, "enabled": False, "profiles": []})
+    return jsonify(
+        {
+            "success": True,
+            "enabled": True,
+            "all_requests": profiler.enabled,
+            "profiles": [record.summary() for record in profiler.profiles()],
+        }
+    )
+
+
+@api_bp.route("/diagnostics/profiles", methods=["DELETE"])
+def clear_request_profiles():
+    """Discard stored request profiles"""
+    profiler = current_app.config.get("request_profiler")
+    if profiler:
+        profiler.clear()
+    return jsonify({"success": True})
+
+
+@api_bp.route("/diagnostics/profiles/<int:profile_id>.<fmt>", methods=["GET"])
+def download_request_profile(profile_id, fmt):
+    """Download a request profile as pstats or collapsed stacks"""
+    profiler = current_app.config.get("request_profiler")
+    record = profiler.get(profile_id) if profiler else None
+    if record is None:
+        return jsonify({"error": f"Profile {profile_id} not found"}), 404
+
+    if fmt == "pstats":
+        data, mimetype = record.pstats_bytes(), "application/octet-stream"
+    elif fmt == "collapsed":
+        data, mimetype = record.collapsed().encode(), "text/plain"
+    else:
+        return jsonify({"error": "Format must be pstats or collapsed"}), 400
+
+    return send_file(
+        io.BytesIO(data),
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=f"broadlink_manager_profile_{profile_id}.{fmt}",
+    )
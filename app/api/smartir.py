@@ -7,7 +7,8 @@ import logging
 import json
 import yaml
 from pathlib import Path
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
+from response_cache import glob_version, path_version, response_cache
 
 logger = logging.getLogger(__name__)
 
@@ -129,6 +130,29 @@ def init_smartir_routes(smartir_detector, smartir_code_service=None):
         # Routes already registered, just return the blueprint
         return smartir_bp
 
+    # Response cache versions: SmartIR install plus the code directories
+    # (and, for profile listings, the controller YAML and learned codes)
+    def _platforms_version():
+        return path_version(
+            smartir_detector.smartir_path / "manifest.json",
+            smartir_detector.codes_path,
+        )
+
+    def _platform_version(platform, **kwargs):
+        return path_version(
+            smartir_detector.smartir_path / "manifest.json",
+            smartir_detector.codes_path / platform,
+            smartir_detector.custom_codes_path / platform,
+        )
+
+    def _profiles_version(platform):
+        config_path = Path(current_app.config.get("config_path", "/config"))
+        return (
+            _platform_version(platform),
+            path_version(config_path / "smartir" / f"{platform}.yaml"),
+            glob_version(config_path / ".storage", "broadlink_remote_*_codes"),
+        )
+
     @smartir_bp.route("/status", methods=["GET"])
     def get_status():
         """Get SmartIR installation status"""
@@ -140,6 +164,7 @@ def init_smartir_routes(smartir_detector, smartir_code_service=None):
             return jsonify({"error": str(e)}), 500
 
     @smartir_bp.route("/platforms", methods=["GET"])
+    @response_cache.cached(_platforms_version)
     def get_platforms():
         """Get available SmartIR platforms"""
         try:
@@ -162,6 +187,7 @@ def init_smartir_routes(smartir_detector, smartir_code_service=None):
             return jsonify({"error": str(e)}), 500
 
     @smartir_bp.route("/platforms/<platform>/codes", methods=["GET"])
+    @response_cache.cached(_platform_version)
     def get_platform_codes(platform):
         """Get device codes for a specific platform"""
         try:
@@ -513,6 +539,7 @@ def init_smartir_routes(smartir_detector, smartir_code_service=None):
             return jsonify({"error": str(e)}), 500
 
     @smartir_bp.route("/platforms/<platform>/profiles", methods=["GET"])
+    @response_cache.cached(_profiles_version)
     def list_platform_profiles(platform):
         """List all profiles for a platform"""
         try:
@@ -708,6 +735,7 @@ def init_smartir_routes(smartir_detector, smartir_code_service=None):
             return jsonify({"success": False, "error": str(e)}), 500
 
     @smartir_bp.route("/platforms/<platform>/profiles/<code>", methods=["GET"])
+    @response_cache.cached(_platform_version)
     def get_profile(platform, code):
         """Get a specific profile - checks custom_codes first, then codes"""
         try:
@@ -1633,6 +1661,42 @@ def init_smartir_routes(smartir_detector, smartir_code_service=None):
                 logger.error(f"Error refreshing codes: {e}")
                 return jsonify({"success": False, "error": str(e)}), 500
 
+        @smartir_bp.route("/codes/mirror", methods=["POST"])
+        def mirror_codes():
+            """
+            Mirror aggregator codes into the local code store for offline previews
+
+            Always mirrors the aggregator's own archive; the request only picks
+            platforms, so it cannot point the server at other URLs or files.
+            """
+            try:
+                data = request.get_json(silent=True) or {}
+                platforms = data.get("platforms")
+
+                if platforms is not None:
+                    invalid = [
+                        p
+                        for p in platforms
+                        if p not in ["climate", "fan", "media_player", "light"]
+                    ]
+                    if invalid:
+                        return (
+                            jsonify(
+                                {
+                                    "success": False,
+                                    "error": f"Invalid platform(s): {', '.join(invalid)}",
+                                }
+                            ),
+                            400,
+                        )
+
+                result = smartir_code_service.mirror_codes(platforms=platforms)
+                return jsonify(result), 200 if result.get("success") else 500
+
+            except Exception as e:
+                logger.error(f"Error mirroring codes: {e}")
+                return jsonify({"success": False, "error": str(e)}), 500
+
         @smartir_bp.route("/codes/cache-status", methods=["GET"])
         def get_cache_status():
             """Get cache status"""
@@ -1647,7 +1711,10 @@ def init_smartir_routes(smartir_detector, smartir_code_service=None):
         def clear_cache():
             """Clear code cache"""
             try:
-                success = smartir_code_service.clear_cache()
+                data = request.get_json(silent=True) or {}
+                success = smartir_code_service.clear_cache(
+                    include_mirror=data.get("include_mirror", False)
+                )
 
                 if success:
                     return (
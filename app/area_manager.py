@@ -10,6 +10,8 @@ import asyncio
 import websockets
 from typing import Dict, List, Any, Optional
 
+from metrics import timed_ha_call
+
 logger = logging.getLogger(__name__)
 
 
@@ -38,6 +40,25 @@ class AreaManager:
         """
         Send a command via WebSocket and wait for response
 
+        Latency is recorded in metrics by command type.
+
+        Args:
+            command_type: WebSocket command type (e.g., 'config/area_registry/list')
+            **kwargs: Additional parameters for the command
+
+        Returns:
+            Response data or None on error
+        """
+        return await timed_ha_call(
+            "websocket", command_type, self._ws_command(command_type, **kwargs)
+        )
+
+    async def _ws_command(
+        self, command_type: str, **kwargs
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Connect, authenticate and run one WebSocket command
+
         Args:
             command_type: WebSocket command type (e.g., 'config/area_registry/list')
             **kwargs: Additional parameters for the command
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Async Server for Broadlink Manager Add-on
+aiohttp front end: learning runs on the event loop, everything else is
+handed to the Flask app on a bounded worker pool
+"""
+
+import asyncio
+import io
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from aiohttp import web
+
+from direct_learning import learn_direct_events, learn_direct_result, sse
+from ha_learning import learn_via_ha
+from metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Managed by aiohttp for the client connection, not forwarded from WSGI
+_HOP_BY_HOP = {"connection", "keep-alive", "transfer-encoding", "upgrade"}
+
+# Largest request body (JSON imports, backups) passed to the Flask app
+MAX_BODY_SIZE = 256 * 1024 * 1024
+# Read size of wsgi.input from the client connection
+BODY_CHUNK_SIZE = 64 * 1024
+
+_END = object()
+
+
+def _wsgi_path(path: str) -> str:
+    # PEP 3333: PATH_INFO is the decoded path as latin-1 "bytes in a str"
+    return path.encode("utf-8").decode("latin-1")
+
+
+class _BodyReader(io.RawIOBase):
+    """
+    Request body for wsgi.input, read from the connection as the app asks
+
+    Used from a worker thread: each read waits for the event loop to
+    receive the next chunk, so an upload (e.g. a streamed import) is never
+    held in memory whole.
+    """
+
+    def __init__(self, content, loop: asyncio.AbstractEventLoop, limit: int):
+        self._content = content
+        self._loop = loop
+        self._remaining = limit
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = asyncio.run_coroutine_threadsafe(
+            self._content.read(len(buffer)), self._loop
+        ).result()
+        self._remaining -= len(data)
+        if self._remaining < 0:
+            raise OSError(f"Request body larger than {MAX_BODY_SIZE} bytes")
+        buffer[: len(data)] = data
+        return len(data)
+
+
+class AsyncServer:
+    """
+    Serve the add-on from an asyncio event loop
+
+    Waitress gives every request a worker thread for its whole lifetime,
+    so a 30 s learn or a long SSE stream blocks one of a few workers. Here
+    client connections live on the event loop. The learning routes run on
+    it: direct learning waits for the button press with asyncio.sleep and
+    learning through Home Assistant awaits its service call, and both only
+    use a thread for short device and storage calls. Other requests, HA
+    calls made by other routes included, run the Flask app on a pool of
+    threads workers. Request bodies are fed to it and response bodies
+    pulled from it one chunk at a time, so large uploads are not buffered
+    and slow clients do not pin a worker between chunks.
+
+    Native routes are counted in the request metrics like Flask routes, but
+    are not profiled.
+    """
+
+    NATIVE_ROUTES = {
+        ("POST", "/api/commands/learn/direct/stream"): "_learn_direct_stream",
+        ("POST", "/api/commands/learn/direct"): "_learn_direct",
+        ("POST", "/api/commands/learn"): "_learn_ha",
+    }
+
+    def __init__(
+        self,
+        web_server,
+        threads: int = 8,
+        connection_limit: int = 100,
+        channel_timeout: int = 120,
+    ):
+        self.web_server = web_server
+        self.wsgi_app = web_server.app
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix="wsgi"
+        )
+        self.connection_limit = connection_limit
+        self.channel_timeout = channel_timeout
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=MAX_BODY_SIZE)
+        app.router.add_route("*", "/{tail:.*}", self._dispatch)
+        app.on_shutdown.append(self._shutdown)
+        return app
+
+    async def _shutdown(self, app):
+        self.executor.shutdown(wait=False)
+
+    async def _dispatch(self, request: web.Request) -> web.StreamResponse:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.connection_limit)
+        # Over the limit, requests wait here (as waitress stops accepting)
+        async with self._slots:
+            route = self._route(request)
+            handler = self.NATIVE_ROUTES.get((request.method, route))
+            if handler:
+                return await self._call_native(handler, route, request)
+            return await self._call_wsgi(request)
+
+    async def _call_native(
+        self, handler: str, route: str, request: web.Request
+    ) -> web.StreamResponse:
+        """Run a native route, recording it as RequestMetrics does for Flask"""
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await getattr(self, handler)(request)
+            status = response.status
+            return response
+        finally:
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start, method=request.method, route=route
+            )
+            HTTP_REQUESTS.inc(method=request.method, route=route, status=status)
+
+    @staticmethod
+    def _route(request: web.Request) -> str:
+        path = request.path
+        ingress_path = request.headers.get("X-Ingress-Path", "")
+        if ingress_path and path.startswith(ingress_path):
+            path = path[len(ingress_path) :] or "/"
+        return path
+
+    async def _learn_direct_stream(self, request: web.Request) -> web.StreamResponse:
+        data = await request.json()
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+        )
+        await response.prepare(request)
+        async for event in learn_direct_events(self.web_server, data or {}):
+            await response.write(sse(event).encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    async def _learn_direct(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        async for event in learn_direct_events(self.web_server, data or {}):
+            pass
+        body, status = learn_direct_result(event)
+        return web.json_response(body, status=status)
+
+    async def _learn_ha(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        body, status = await learn_via_ha(self.web_server, data or {})
+        return web.json_response(body, status=status)
+
+    def _environ(self, request: web.Request, body) -> Dict[str, Any]:
+        host, _, port = (request.host or "localhost").partition(":")
+        environ = {
+            "REQUEST_METHOD": request.method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": _wsgi_path(request.path),
+            "QUERY_STRING": request.query_string,
+            "SERVER_NAME": host,
+            "SERVER_PORT": port or ("443" if request.secure else "80"),
+            "SERVER_PROTOCOL": f"HTTP/{request.version.major}.{request.version.minor}",
+            "REMOTE_ADDR": request.remote or "",
+            "CONTENT_TYPE": request.headers.get("Content-Type", ""),
+            "CONTENT_LENGTH": request.headers.get("Content-Length", ""),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": request.scheme,
+            "wsgi.input": body,
+            # Chunked uploads have no length; the reader ends at their end
+            "wsgi.input_terminated": True,
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in request.headers.items():
+            key = "HTTP_" + name.upper().replace("-", "_")
+            if key in ("HTTP_CONTENT_TYPE", "HTTP_CONTENT_LENGTH"):
+                continue
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    def _start(self, environ: Dict[str, Any]):
+        """Run the WSGI app up to its first body chunk (in a worker)"""
+        started: Dict[str, Any] = {}
+        written: List[bytes] = []
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and started:
+                raise exc_info[1].with_traceback(exc_info[2])
+            started["status"] = status
+            started["headers"] = headers
+            return written.append
+
+        body = self.wsgi_app(environ, start_response)
+        chunks = iter(body)
+        first = next(chunks, _END)
+        return started, written, body, chunks, first
+
+    async def _call_wsgi(self, request: web.Request) -> web.StreamResponse:
+        loop = asyncio.get_running_loop()
+        if (request.content_length or 0) > MAX_BODY_SIZE:
+            raise web.HTTPRequestEntityTooLarge(MAX_BODY_SIZE, request.content_length)
+        if request.body_exists:
+            body = io.BufferedReader(
+                _BodyReader(request.content, loop, MAX_BODY_SIZE), BODY_CHUNK_SIZE
+            )
+        else:
+            body = io.BytesIO()
+        environ = self._environ(request, body)
+        started, written, result, chunks, chunk = await loop.run_in_executor(
+            self.executor, self._start, environ
+        )
+        try:
+            code, _, reason = started["status"].partition(" ")
+            response = web.StreamResponse(status=int(code), reason=reason or None)
+            for name, value in started["headers"]:
+                if name.lower() not in _HOP_BY_HOP:
+                    response.headers.add(name, value)
+            await response.prepare(request)
+            for data in written:
+                await response.write(data)
+            while chunk is not _END:
+                if chunk:
+                    await response.write(chunk)
+                chunk = await loop.run_in_executor(self.executor, next, chunks, _END)
+            await response.write_eof()
+            return response
+        finally:
+            if hasattr(result, "close"):
+                await loop.run_in_executor(self.executor, result.close)
+
+
+def serve_async(
+    web_server,
+    host: str,
+    port: int,
+    threads: int = 8,
+    connection_limit: int = 100,
+    channel_timeout: int = 120,
+    on_ready: Optional[Callable[[], None]] = None,
+):
+    """Serve the add-on until the process exits"""
+    server = AsyncServer(web_server, threads, connection_limit, channel_timeout)
+    asyncio.run(_serve(server.make_app(), host, port, channel_timeout, on_ready))
+
+
+async def _serve(app, host, port, channel_timeout, on_ready):
+    # web.run_app without its signal handling, with a hook once listening
+    runner = web.AppRunner(
+        app, keepalive_timeout=channel_timeout, access_log=None, handle_signals=False
+    )
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+        logger.info(f"Serving on http://{host}:{port}")
+        if on_ready:
+            on_ready()
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
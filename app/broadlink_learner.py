@@ -6,13 +6,69 @@ without relying on Home Assistant's Broadlink integration.
 """
 
 import broadlink
+import asyncio
 import base64
 import time
 import logging
-from typing import Optional, Tuple, Callable
+from typing import Any, Callable, Generator, Optional, Tuple, Union
+
+from metrics import timed_learning
 
 logger = logging.getLogger(__name__)
 
+# Learning procedures are generators yielding these steps, so the same code
+# runs blocking (time.sleep) or on an event loop (asyncio.sleep, device calls
+# in the default executor) without holding a thread while waiting
+_SLEEP = "sleep"
+_CALL = "call"
+
+Steps = Generator[tuple, Any, Any]
+
+
+def _sleep(seconds: float) -> tuple:
+    return (_SLEEP, seconds)
+
+
+def _call(func: Callable, *args) -> tuple:
+    return (_CALL, func, args)
+
+
+def _run_steps(steps: Steps) -> Any:
+    """Run a learning procedure in the calling thread"""
+    value, error = None, None
+    while True:
+        try:
+            step = steps.throw(error) if error else steps.send(value)
+        except StopIteration as stop:
+            return stop.value
+        value, error = None, None
+        if step[0] == _SLEEP:
+            time.sleep(step[1])
+        else:
+            try:
+                value = step[1](*step[2])
+            except Exception as e:
+                error = e
+
+
+async def _run_steps_async(steps: Steps) -> Any:
+    """Run a learning procedure on the event loop"""
+    loop = asyncio.get_running_loop()
+    value, error = None, None
+    while True:
+        try:
+            step = steps.throw(error) if error else steps.send(value)
+        except StopIteration as stop:
+            return stop.value
+        value, error = None, None
+        if step[0] == _SLEEP:
+            await asyncio.sleep(step[1])
+        else:
+            try:
+                value = await loop.run_in_executor(None, step[1], *step[2])
+            except Exception as e:
+                error = e
+
 
 class BroadlinkLearner:
     """
@@ -23,6 +79,9 @@ class BroadlinkLearner:
     - 30 second timeout for all operations
     - 1 second sleep between polling attempts
     - Returns base64 encoded command data
+
+    Each learn method has an *_async variant that waits on the event loop
+    instead of sleeping in a thread.
     """
 
     def __init__(self, host: str, mac: bytes, device_type: str):
@@ -64,7 +123,17 @@ class BroadlinkLearner:
             self._authenticated = False
             return False
 
+    @timed_learning("ir")
     def learn_ir_command(self, timeout: int = 30) -> Optional[str]:
+        """Learn an IR command, blocking (see _learn_ir)"""
+        return _run_steps(self._learn_ir(timeout))
+
+    @timed_learning("ir")
+    async def learn_ir_command_async(self, timeout: int = 30) -> Optional[str]:
+        """Learn an IR command without blocking the event loop"""
+        return await _run_steps_async(self._learn_ir(timeout))
+
+    def _learn_ir(self, timeout: int) -> Steps:
         """
         Learn an IR command (1-step process)
 
@@ -87,7 +156,7 @@ class BroadlinkLearner:
         try:
             # Step 1: Enter learning mode
             logger.info("Entering IR learning mode")
-            self.device.enter_learning()
+            yield _call(self.device.enter_learning)
 
             # Step 2: Poll for data
             start_time = time.time()
@@ -95,7 +164,7 @@ class BroadlinkLearner:
             check_count = 0
 
             while time.time() - start_time < timeout:
-                time.sleep(1)
+                yield _sleep(1)
                 elapsed = int(time.time() - start_time)
                 check_count += 1
 
@@ -105,7 +174,7 @@ class BroadlinkLearner:
                     )
 
                 try:
-                    packet = self.device.check_data()
+                    packet = yield _call(self.device.check_data)
                 except (
                     broadlink.exceptions.ReadError,
                     broadlink.exceptions.StorageError,
@@ -138,9 +207,23 @@ class BroadlinkLearner:
             logger.error(f"Error during IR learning: {e}")
             return None
 
+    @timed_learning("rf")
     def learn_rf_command_with_progress(
         self, timeout: int = 30, progress_callback: Callable[[str, str], None] = None
     ) -> Optional[Tuple[str, float]]:
+        """Learn an RF command with progress callbacks, blocking (see _learn_rf)"""
+        return _run_steps(self._learn_rf(timeout, progress_callback))
+
+    @timed_learning("rf")
+    async def learn_rf_command_async(
+        self, timeout: int = 30, progress_callback: Callable[[str, str], None] = None
+    ) -> Optional[Tuple[str, float]]:
+        """Learn an RF command without blocking the event loop"""
+        return await _run_steps_async(self._learn_rf(timeout, progress_callback))
+
+    def _learn_rf(
+        self, timeout: int, progress_callback: Optional[Callable[[str, str], None]]
+    ) -> Steps:
         """
         Learn an RF command with progress callbacks
 
@@ -166,16 +249,16 @@ class BroadlinkLearner:
                 progress_callback(
                     "Ready! Press and HOLD your remote button now...", "sweep"
                 )
-            self.device.sweep_frequency()
+            yield _call(self.device.sweep_frequency)
 
             start_time = time.time()
             frequency = None
 
             while time.time() - start_time < timeout:
-                time.sleep(1)
+                yield _sleep(1)
 
                 # Check if frequency was found (returns tuple: is_found, frequency)
-                is_found, freq = self.device.check_frequency()
+                is_found, freq = yield _call(self.device.check_frequency)
                 if is_found:
                     frequency = freq
                     logger.info(f"RF frequency locked: {frequency} MHz")
@@ -190,11 +273,11 @@ class BroadlinkLearner:
                 logger.warning(
                     f"Timeout - no RF frequency found after {timeout} seconds"
                 )
-                self.device.cancel_sweep_frequency()
+                yield _call(self.device.cancel_sweep_frequency)
                 return None
 
             # Sleep 1 second (let user release button, like HA does)
-            time.sleep(1)
+            yield _sleep(1)
 
             # Step 2: Find and capture RF packet
             logger.info("Capturing RF packet")
@@ -204,18 +287,18 @@ class BroadlinkLearner:
                 )
 
             # Give user time to see the message and prepare
-            time.sleep(2)
+            yield _sleep(2)
 
-            self.device.find_rf_packet()
+            yield _call(self.device.find_rf_packet)
 
             start_time = time.time()
             storage_errors = 0
 
             while time.time() - start_time < timeout:
-                time.sleep(1)
+                yield _sleep(1)
 
                 try:
-                    packet = self.device.check_data()
+                    packet = yield _call(self.device.check_data)
                 except (
                     broadlink.exceptions.ReadError,
                     broadlink.exceptions.StorageError,
@@ -247,12 +330,34 @@ class BroadlinkLearner:
             logger.error(f"Error during RF learning: {e}")
             return None
 
+    @timed_learning("rf")
     def learn_rf_command_fixed_frequency(
         self,
         frequency: float,
         timeout: int = 30,
         progress_callback: Callable[[str, str], None] = None,
     ) -> Optional[Tuple[str, float]]:
+        """Learn an RF command at a fixed frequency, blocking (see _learn_rf_fixed)"""
+        return _run_steps(self._learn_rf_fixed(frequency, timeout, progress_callback))
+
+    @timed_learning("rf")
+    async def learn_rf_command_fixed_frequency_async(
+        self,
+        frequency: float,
+        timeout: int = 30,
+        progress_callback: Callable[[str, str], None] = None,
+    ) -> Optional[Tuple[str, float]]:
+        """Learn an RF command at a fixed frequency without blocking the event loop"""
+        return await _run_steps_async(
+            self._learn_rf_fixed(frequency, timeout, progress_callback)
+        )
+
+    def _learn_rf_fixed(
+        self,
+        frequency: float,
+        timeout: int,
+        progress_callback: Optional[Callable[[str, str], None]],
+    ) -> Steps:
         """
         Learn an RF command at a fixed (manually specified) frequency.
 
@@ -281,16 +386,16 @@ class BroadlinkLearner:
                 )
 
             # Pass frequency directly - skips the sweep phase entirely
-            self.device.find_rf_packet(frequency)
+            yield _call(self.device.find_rf_packet, frequency)
 
             start_time = time.time()
             storage_errors = 0
 
             while time.time() - start_time < timeout:
-                time.sleep(1)
+                yield _sleep(1)
 
                 try:
-                    packet = self.device.check_data()
+                    packet = yield _call(self.device.check_data)
                 except (
                     broadlink.exceptions.ReadError,
                     broadlink.exceptions.StorageError,
@@ -339,12 +444,12 @@ class BroadlinkLearner:
             timeout=timeout, progress_callback=None
         )
 
-    def test_command(self, base64_data: str) -> bool:
+    def test_command(self, base64_data: Union[str, bytes, memoryview]) -> bool:
         """
         Test a command by sending it directly to the device
 
         Args:
-            base64_data: Base64 encoded command data
+            base64_data: Base64 encoded command data, or the raw bytes
 
         Returns:
             True if command sent successfully, False otherwise
@@ -354,8 +459,11 @@ class BroadlinkLearner:
             return False
 
         try:
-            # Decode base64 to bytes
-            packet = base64.b64decode(base64_data)
+            # Decode base64 to bytes (raw payloads are sent as-is)
+            if isinstance(base64_data, str):
+                packet = base64.b64decode(base64_data)
+            else:
+                packet = base64_data
 
             logger.info(f"Sending test command ({len(packet)} bytes)")
             self.device.send_data(packet)
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Code Similarity for Broadlink Manager Add-on
+Finds learned codes that are the same button captured more than once
+"""
+
+import logging
+import math
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import pulse_decoder
+
+logger = logging.getLogger(__name__)
+
+# Pulses are grouped into levels by the code's own timing clusters: sorted
+# by length, a new level starts wherever the next pulse is more than this
+# many octaves longer. Protocol timings are an octave or more apart (e.g.
+# 560/1690 us), while jitter and mark/space asymmetry only spread pulses
+# within a cluster, so two captures of a button get the same level sequence
+# where a fixed grid would split pulses lying near its boundaries. Codes
+# with the same type and level sequence share a bucket.
+CLUSTER_GAP_OCTAVES = 0.5
+# Mean relative timing difference under which two codes in a bucket are
+# the same code
+DUPLICATE_DISTANCE = 0.15
+# Shorter codes have too little structure to call them duplicates
+MIN_PULSES = 8
+# No IR or RF protocol times pulses this short; they are receiver glitches
+GLITCH_US = 100
+# A later frame that disagrees with the first in at most this share of its
+# pulses (or by one or two pulses in length) is a corrupted copy of it. The
+# different frames of multi-part codes differ in far more.
+CORRUPT_FRAME_SHARE = 0.1
+
+# Signs of a noisy or cut-off capture reported by capture_issues
+CAPTURE_ISSUES = {
+    "too_short": "it is too short to be a whole button press",
+    "glitch_pulses": "it has pulses too short to be real timings",
+    "inconsistent_frames": "its repeated frames do not match each other",
+}
+
+CommandKey = Tuple[str, str]  # (device_id, command name)
+Fingerprint = Tuple[Hashable, Any]  # (bucket key, canonical pulses)
+
+# One index per device storage file, shared by all DeviceManager instances
+_indexes: Dict[str, "SimilarityIndex"] = {}
+_indexes_lock = threading.Lock()
+
+
+def fingerprint_packets(packets: List[Any]) -> List[Optional[Fingerprint]]:
+    """
+    Bucket key and canonical pulse train of raw packets, in one pass
+
+    Returns None for packets that do not decode or are shorter than
+    MIN_PULSES.
+    """
+    batch = pulse_decoder.decode_packets(packets).canonical_batch()
+    np = pulse_decoder.np
+    fingerprints: List[Optional[Fingerprint]] = []
+
+    if np is None:
+        for index in range(len(batch)):
+            pulses = batch.pulses_of(index)
+            if len(pulses) < MIN_PULSES:
+                fingerprints.append(None)
+                continue
+            levels = [0] * len(pulses)
+            level, previous = 0, None
+            for position in sorted(range(len(pulses)), key=pulses.__getitem__):
+                value = math.log2(max(1, pulses[position]))
+                if previous is not None and value - previous > CLUSTER_GAP_OCTAVES:
+                    level += 1
+                levels[position] = level
+                previous = value
+            fingerprints.append(((batch.command_type(index), tuple(levels)), pulses))
+        return fingerprints
+
+    offsets = batch.offsets
+    counts = np.diff(offsets)
+    owners = np.repeat(np.arange(len(batch), dtype=np.int64), counts)
+    pulses = np.maximum(batch.pulses, 1).astype(np.int64)
+    # Sort each packet's pulses in one go; owners stay in packet order
+    order = np.argsort((owners << 32) | pulses, kind="stable")
+    logs = np.log2(pulses[order])
+    breaks = np.zeros(len(pulses), dtype=np.int64)
+    breaks[1:] = (np.diff(logs) > CLUSTER_GAP_OCTAVES) & (owners[1:] == owners[:-1])
+    clusters = np.cumsum(breaks)
+    # Number levels from 0 within each packet
+    bases = np.zeros(len(batch), dtype=np.int64)
+    has_pulses = counts > 0
+    bases[has_pulses] = clusters[offsets[:-1][has_pulses]]
+    levels = np.empty(len(pulses), dtype=np.int8)
+    levels[order] = clusters - np.repeat(bases, counts)
+
+    types: Dict[Tuple[int, int], Optional[str]] = {}
+
+    for index, (start, end) in enumerate(
+        zip(offsets[:-1].tolist(), offsets[1:].tolist())
+    ):
+        if end - start < MIN_PULSES:
+            fingerprints.append(None)
+            continue
+        header = (int(batch.kinds[index]), int(batch.repeats[index]))
+        if header not in types:
+            types[header] = batch.command_type(index)
+        key = (types[header], levels[start:end].tobytes())
+        fingerprints.append((key, batch.pulses[start:end]))
+    return fingerprints
+
+
+def capture_issues(raw: Any) -> List[str]:
+    """
+    Signs that a learned packet is a noisy or cut-off capture
+
+    The whole packet is checked, repeated frames included, since a repeat
+    that disagrees with the first copy shows the capture picked up noise.
+
+    Returns:
+        Keys of CAPTURE_ISSUES found, empty for clean captures and for
+        anything that is not a Broadlink packet
+    """
+    batch = pulse_decoder.decode_packets([raw])
+    if batch.command_type(0) is None:
+        return []
+
+    frames = [_without_gap(frame) for frame in batch.frames_of(0)]
+    pulses = [pulse for frame in frames for pulse in frame]
+    issues = []
+    if len(pulses) < MIN_PULSES:
+        issues.append("too_short")
+    if any(pulse < GLITCH_US for pulse in pulses):
+        issues.append("glitch_pulses")
+    if frames and any(_corrupted_copy(frames[0], frame) for frame in frames[1:]):
+        issues.append("inconsistent_frames")
+    return issues
+
+
+def _without_gap(frame: List[int]) -> List[int]:
+    if frame and frame[-1] >= pulse_decoder.FRAME_GAP_US:
+        return frame[:-1]
+    return frame
+
+
+def _corrupted_copy(first: List[int], frame: List[int]) -> bool:
+    """Whether frame is almost, but not quite, a copy of first"""
+    if len(frame) <= pulse_decoder.REPEAT_CODE_PULSES:
+        return False  # Repeat code
+    if len(frame) != len(first):
+        return abs(len(frame) - len(first)) <= 2
+    tolerance = pulse_decoder.FRAME_TOLERANCE
+    different = sum(
+        1 for a, b in zip(first, frame) if abs(a - b) > tolerance * max(a, b)
+    )
+    return 0 < different <= max(1, CORRUPT_FRAME_SHARE * len(first))
+
+
+def timing_distance(first: Any, other: Any) -> float:
+    """
+    Mean relative difference of two canonical pulse trains
+
+    Frame gaps are left out; their length depends on how long the button
+    was held. Trains of different lengths are at distance 1.
+    """
+    if len(first) != len(other):
+        return 1.0
+    np = pulse_decoder.np
+    if np is not None:
+        first = np.asarray(first, dtype=np.float64)
+        other = np.asarray(other, dtype=np.float64)
+        longer = np.maximum(np.maximum(first, other), 1)
+        timed = longer < pulse_decoder.FRAME_GAP_US
+        if not timed.any():
+            return 0.0
+        return float((np.abs(first - other)[timed] / longer[timed]).mean())
+
+    differences = [
+        abs(a - b) / max(a, b, 1)
+        for a, b in zip(first, other)
+        if max(a, b) < pulse_decoder.FRAME_GAP_US
+    ]
+    return sum(differences) / len(differences) if differences else 0.0
+
+
+class SimilarityIndex:
+    """
+    Learned codes bucketed by timing level sequence
+
+    Lookups hash the new code's levels and only compare timings against
+    the codes in its bucket. Fingerprints are kept per payload hash, so a
+    refresh after storage changes decodes only codes not seen before.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._fingerprints: Dict[str, Optional[Fingerprint]] = {}
+        self._commands: Dict[CommandKey, str] = {}
+        self._buckets: Dict[Hashable, List[CommandKey]] = {}
+
+    @classmethod
+    def for_path(cls, storage_file: Path) -> "SimilarityIndex":
+        """Get the shared index for a device storage file"""
+        key = str(storage_file)
+        with _indexes_lock:
+            if key not in _indexes:
+                _indexes[key] = cls()
+            return _indexes[key]
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    def refresh(
+        self,
+        version: Hashable,
+        commands: Callable[[], Iterable[Tuple[str, str, str, Any]]],
+        load: Callable[[List[str]], Dict[str, Any]],
+    ):
+        """
+        Rebuild from (device_id, command name, payload hash, raw) tuples
+
+        raw may be None, in which case load(payload hashes) reads the codes
+        not fingerprinted yet in one go. Does nothing while version (the
+        storage backend's) is unchanged.
+        """
+        with self._lock:
+            if version is not None and version == self._version:
+                return
+
+            entries = list(commands())
+            fingerprints = {
+                digest: self._fingerprints[digest]
+                for _, _, digest, _ in entries
+                if digest in self._fingerprints
+            }
+            new = {}
+            for _, _, digest, raw in entries:
+                if digest not in fingerprints and new.get(digest) is None:
+                    new[digest] = raw
+            missing = [digest for digest, raw in new.items() if raw is None]
+            if missing:
+                loaded = load(missing)
+                new.update((digest, loaded.get(digest, b"")) for digest in missing)
+            if new:
+                fingerprints.update(zip(new, fingerprint_packets(list(new.values()))))
+
+            buckets: Dict[Hashable, List[CommandKey]] = {}
+            for device_id, name, digest, _ in entries:
+                fingerprint = fingerprints[digest]
+                if fingerprint is not None:
+                    buckets.setdefault(fingerprint[0], []).append((device_id, name))
+
+            self._fingerprints = fingerprints
+            self._commands = {
+                (device_id, name): digest for device_id, name, digest, _ in entries
+            }
+            self._buckets = buckets
+            self._version = version
+            logger.debug(
+                f"Similarity index refreshed: {len(entries)} codes, {len(new)} decoded"
+            )
+
+    def _fingerprint_of(self, command: CommandKey) -> Optional[Fingerprint]:
+        return self._fingerprints.get(self._commands.get(command, ""))
+
+    def matches(
+        self, raw: Any, exclude: Optional[CommandKey] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Indexed commands that are near-duplicates of a raw packet
+
+        Returns:
+            [{"device_id", "command", "distance"}], closest first
+        """
+        fingerprint = fingerprint_packets([raw])[0]
+        if fingerprint is None:
+            return []
+        key, pulses = fingerprint
+
+        with self._lock:
+            candidates = [
+                (command, self._fingerprint_of(command)[1])
+                for command in self._buckets.get(key, [])
+                if command != exclude
+            ]
+
+        found = []
+        for (device_id, name), other in candidates:
+            distance = timing_distance(pulses, other)
+            if distance <= DUPLICATE_DISTANCE:
+                found.append(
+                    {
+                        "device_id": device_id,
+                        "command": name,
+                        "distance": round(distance, 3),
+                    }
+                )
+        return sorted(found, key=lambda match: match["distance"])
+
+    def duplicates(self) -> List[List[Dict[str, Any]]]:
+        """
+        Groups of indexed commands that are near-duplicates of each other
+
+        Each group lists its first command, then the commands within
+        DUPLICATE_DISTANCE of it (with their distance to it).
+        """
+        with self._lock:
+            buckets = [
+                [(command, self._fingerprint_of(command)[1]) for command in commands]
+                for commands in self._buckets.values()
+                if len(commands) > 1
+            ]
+
+        groups = []
+        for members in buckets:
+            while len(members) > 1:
+                (device_id, name), pulses = members[0]
+                group = [{"device_id": device_id, "command": name, "distance": 0.0}]
+                rest = []
+                for command, other in members[1:]:
+                    distance = timing_distance(pulses, other)
+                    if distance <= DUPLICATE_DISTANCE:
+                        group.append(
+                            {
+                                "device_id": command[0],
+                                "command": command[1],
+                                "distance": round(distance, 3),
+                            }
+                        )
+                    else:
+                        rest.append((command, other))
+                if len(group) > 1:
+                    groups.append(group)
+                members = rest
+        return groups
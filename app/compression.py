@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Response Compression for Broadlink Manager Add-on
+gzip/brotli negotiation for API responses and precompressed static assets
+"""
+
+import gzip
+import logging
+import mimetypes
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+from flask import Flask, Response, request, send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # Optional - gzip only without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Responses smaller than this are not worth the CPU and headers
+MIN_COMPRESS_SIZE = 1024
+
+COMPRESSIBLE_TYPES = {"application/json", "text/html", "text/css", "text/plain"}
+
+# Preferred first; brotli is only offered when the module is installed
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# Vite output names carry a content hash (index-CVXaDSul.js), so they
+# never change and can be cached forever
+HASHED_ASSET = re.compile(r"-[A-Za-z0-9_-]{8}\.[a-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress data for a Content-Encoding"""
+    if encoding == "br":
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def negotiate(available=ENCODINGS) -> Optional[str]:
+    """Pick the best encoding the client accepts, or None for identity"""
+    accepted = request.accept_encodings
+    for encoding in available:
+        if accepted[encoding] > 0:
+            return encoding
+    return None
+
+
+class ResponseCompressor:
+    """
+    Compress JSON and HTML responses above MIN_COMPRESS_SIZE
+
+    Bodies with an ETag (see response_cache) are compressed once per
+    encoding and reused; the ETag is made weak since the bytes on the wire
+    differ from the uncompressed representation, which still lets
+    If-None-Match revalidation match.
+    """
+
+    def __init__(self, min_size: int = MIN_COMPRESS_SIZE, max_entries: int = 128):
+        self.min_size = min_size
+        self.max_entries = max_entries
+        self._compressed: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask):
+        app.after_request(self.after_request)
+
+    def after_request(self, response: Response) -> Response:
+        if (
+            response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = negotiate()
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        etag, _ = response.get_etag()
+        body = self._compress_cached(data, encoding, etag)
+        if len(body) >= len(data):
+            return response
+
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        if etag:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _compress_cached(self, data: bytes, encoding: str, etag: Optional[str]):
+        if not etag:
+            return compress(data, encoding)
+        key = (etag, encoding)
+        with self._lock:
+            body = self._compressed.get(key)
+            if body is not None:
+                self._compressed.move_to_end(key)
+                return body
+        body = compress(data, encoding)
+        with self._lock:
+            self._compressed[key] = body
+            while len(self._compressed) > self.max_entries:
+                self._compressed.popitem(last=False)
+        return body
+
+
+def send_asset(directory: Path, filename: str) -> Response:
+    """
+    Serve a static asset, preferring a precompressed .br/.gz variant
+
+    Variants are produced at build time by scripts/precompress_assets.py.
+    Hashed file names get long-lived immutable cache headers.
+    """
+    joined = safe_join(str(directory), filename)
+    if joined is None or not Path(joined).is_file():
+        raise NotFound()
+    path = Path(joined)
+
+    # Variants may exist for encodings this process cannot produce itself
+    for encoding, suffix in SUFFIXES.items():
+        variant = path.with_name(path.name + suffix)
+        if request.accept_encodings[encoding] > 0 and variant.is_file():
+            mimetype = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            response = send_file(variant, mimetype=mimetype, conditional=True)
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = send_file(path, conditional=True)
+    response.vary.add("Accept-Encoding")
+
+    if HASHED_ASSET.search(path.name):
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
@@ -122,6 +122,115 @@ class ConfigLoader:
             return None
         return Path(raw)
 
+    def get_storage_backend(self) -> str:
+        """
+        Get the device storage backend.
+
+        "json" (default) keeps devices in devices.json; "sqlite" keeps them in
+        devices.db, importing devices.json on first start.
+
+        Returns:
+            Storage backend name
+        """
+        options = self.load_options()
+        backend = options.get("storage_backend") or os.environ.get(
+            "STORAGE_BACKEND", ""
+        )
+        backend = backend.strip().lower() if backend else ""
+        if backend not in ("json", "sqlite"):
+            if backend:
+                logger.warning(f"Unknown storage_backend '{backend}', using json")
+            return "json"
+        return backend
+
+    def get_server_settings(self) -> Dict[str, Any]:
+        """
+        Get web server settings.
+
+        server_mode "waitress" (default) runs every request on one of
+        server_threads worker threads. "async" serves from an event loop
+        where direct learning does not occupy a worker while waiting.
+        server_connection_limit caps open connections (waitress) or requests
+        in progress (async); server_channel_timeout closes idle connections.
+
+        Returns:
+            {"mode": str, "threads": int, "connection_limit": int, "channel_timeout": int}
+        """
+        options = self.load_options()
+        mode = options.get("server_mode") or os.environ.get("SERVER_MODE", "")
+        mode = mode.strip().lower() if mode else ""
+        if mode not in ("waitress", "async"):
+            if mode:
+                logger.warning(f"Unknown server_mode '{mode}', using waitress")
+            mode = "waitress"
+        return {
+            "mode": mode,
+            "threads": self._int_option(options, "server_threads", 8, 1, 64),
+            "connection_limit": self._int_option(
+                options, "server_connection_limit", 100, 10, 1000
+            ),
+            "channel_timeout": self._int_option(
+                options, "server_channel_timeout", 120, 10, 3600
+            ),
+        }
+
+    def _int_option(
+        self, options: Dict[str, Any], key: str, default: int, low: int, high: int
+    ) -> int:
+        """Integer option with an upper-case environment fallback, clamped"""
+        raw = options.get(key) or os.environ.get(key.upper(), "")
+        if raw in ("", None):
+            return default
+        try:
+            return min(high, max(low, int(raw)))
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid {key} value: {raw}")
+            return default
+
+    def get_parallel_entity_build(self) -> bool:
+        """
+        Whether entity generation may build entities in a process pool.
+
+        Off by default: spawning workers only pays off with several CPUs
+        available to the add-on and thousands of entities to rebuild.
+
+        Returns:
+            True if parallel builds are enabled
+        """
+        options = self.load_options()
+        enabled = options.get("parallel_entity_build")
+        if enabled is None:
+            enabled = os.environ.get("PARALLEL_ENTITY_BUILD", "").lower() in (
+                "1",
+                "true",
+            )
+        return bool(enabled)
+
+    def get_profiling_settings(self) -> Dict[str, Any]:
+        """
+        Get request profiling settings.
+
+        With profile_requests every request is profiled. With only a
+        profiling_token, requests sending that token in the
+        X-Broadlink-Profile header are profiled. Neither set means profiling
+        is off and nothing is installed.
+
+        Returns:
+            {"enabled": bool, "token": str or None, "keep": int}
+        """
+        options = self.load_options()
+        enabled = options.get("profile_requests")
+        if enabled is None:
+            enabled = os.environ.get("PROFILE_REQUESTS", "").lower() in ("1", "true")
+        token = options.get("profiling_token") or os.environ.get("PROFILING_TOKEN", "")
+        keep = options.get("profiling_keep") or os.environ.get("PROFILING_KEEP", "")
+        try:
+            keep = max(1, int(keep)) if keep else 20
+        except ValueError:
+            logger.warning(f"Invalid profiling_keep value: {keep}")
+            keep = 20
+        return {"enabled": bool(enabled), "token": token.strip() or None, "keep": keep}
+
     def load_options(self) -> Dict[str, Any]:
         """
         Load application configuration options.
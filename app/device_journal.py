@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Device Journal for Broadlink Manager Add-on
+Append-only write-ahead journal of devices.json mutations
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_VERSION = 1
+
+
+def snapshot_hash(raw: bytes) -> str:
+    """Hash of a devices.json snapshot, used to tie a journal to its base"""
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _keeps_order(old: Dict[str, Any], new: Dict[str, Any]) -> bool:
+    """True if new's key order is old's surviving keys followed by added keys"""
+    kept = [key for key in old if key in new]
+    added = [key for key in new if key not in old]
+    return list(new) == kept + added
+
+
+def _diff_device(device_id: str, old: Any, new: Any) -> Dict[str, Any]:
+    """Build the smallest record turning one device into its new state"""
+    if not (isinstance(old, dict) and isinstance(new, dict)) or not _keeps_order(
+        old, new
+    ):
+        return {"op": "put", "id": device_id, "device": new}
+
+    record: Dict[str, Any] = {"op": "patch", "id": device_id}
+    old_commands = old.get("commands")
+    new_commands = new.get("commands")
+    patch_commands = (
+        isinstance(old_commands, dict)
+        and isinstance(new_commands, dict)
+        and _keeps_order(old_commands, new_commands)
+    )
+
+    fields = {
+        key: value
+        for key, value in new.items()
+        if (key != "commands" or not patch_commands)
+        and (key not in old or old[key] != value)
+    }
+    removed = [key for key in old if key not in new]
+    if fields:
+        record["set"] = fields
+    if removed:
+        record["unset"] = removed
+
+    if patch_commands and old_commands != new_commands:
+        changed = {
+            name: command
+            for name, command in new_commands.items()
+            if name not in old_commands or old_commands[name] != command
+        }
+        deleted = [name for name in old_commands if name not in new_commands]
+        if changed:
+            record["commands_set"] = changed
+        if deleted:
+            record["commands_unset"] = deleted
+
+    return record
+
+
+def diff_devices(
+    old: Dict[str, Any], new: Dict[str, Any]
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Describe the change from old to new device data as journal records
+
+    Args:
+        old: Committed device data
+        new: Device data being saved
+
+    Returns:
+        List of records (empty if nothing changed), or None if the change
+        cannot be expressed as records (e.g., devices were reordered)
+    """
+    if not _keeps_order(old, new):
+        return None
+
+    records: List[Dict[str, Any]] = [
+        {"op": "delete", "id": device_id} for device_id in old if device_id not in new
+    ]
+    for device_id, device in new.items():
+        if device_id not in old:
+            records.append({"op": "put", "id": device_id, "device": device})
+        elif old[device_id] != device:
+            records.append(_diff_device(device_id, old[device_id], device))
+    return records
+
+
+def apply_records(devices: Dict[str, Any], records: List[Dict[str, Any]]) -> None:
+    """
+    Replay journal records onto device data in place
+
+    Records hold absolute values, so replaying them again is harmless.
+
+    Args:
+        devices: Device data to update
+        records: Records in journal order
+    """
+    for record in records:
+        op = record.get("op")
+        device_id = record.get("id")
+
+        if op == "put":
+            devices[device_id] = record["device"]
+        elif op == "delete":
+            devices.pop(device_id, None)
+        elif op == "patch":
+            device = devices.get(device_id)
+            if not isinstance(device, dict):
+                continue
+            for key in record.get("unset", []):
+                device.pop(key, None)
+            for key, value in record.get("set", {}).items():
+                device[key] = value
+            if "commands_set" in record or "commands_unset" in record:
+                commands = device.setdefault("commands", {})
+                for name in record.get("commands_unset", []):
+                    commands.pop(name, None)
+                for name, command in record.get("commands_set", {}).items():
+                    commands[name] = command
+        else:
+            logger.warning(f"Skipping unknown journal record: {op}")
+
+
+class DeviceJournal:
+    """
+    Append-only journal of device mutations next to devices.json
+
+    The first line is a header naming the snapshot the records apply to (by
+    hash). Each following line is one JSON record, appended and fsynced. A
+    torn last line from a crash is ignored on read and cut off before the
+    next append.
+    """
+
+    def __init__(self, journal_file: Path):
+        """
+        Initialize device journal
+
+        Args:
+            journal_file: Path to the journal file
+        """
+        self.journal_file = Path(journal_file)
+
+    def size(self) -> int:
+        """Current journal size in bytes (0 if missing)"""
+        try:
+            return self.journal_file.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def read(self) -> Tuple[Optional[str], List[Dict[str, Any]], int]:
+        """
+        Read the journal
+
+        Returns:
+            Tuple of (base snapshot hash, records, bytes of valid content)
+        """
+        try:
+            with open(self.journal_file, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return None, [], 0
+
+        base_hash = None
+        records: List[Dict[str, Any]] = []
+        valid_bytes = 0
+        position = 0
+        while position < len(raw):
+            end = raw.find(b"\n", position)
+            if end == -1:
+                break  # Torn last line (no newline), written during a crash
+            try:
+                entry = json.loads(raw[position:end])
+            except ValueError:
+                break
+            if position == 0:
+                if entry.get("op") != "base":
+                    logger.warning("Device journal has no header - ignoring it")
+                    return None, [], 0
+                base_hash = entry.get("snapshot")
+            else:
+                records.append(entry)
+            position = end + 1
+            valid_bytes = position
+
+        return base_hash, records, valid_bytes
+
+    def append(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Append records and fsync them
+
+        Args:
+            records: Journal records
+
+        Returns:
+            Journal size after the append
+        """
+        payload = "".join(
+            json.dumps(record, separators=(",", ":")) + "\n" for record in records
+        )
+        with open(self.journal_file, "ab") as f:
+            f.write(payload.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+            return f.tell()
+
+    def truncate(self, valid_bytes: int):
+        """Cut off a torn tail so the next append starts on a clean line"""
+        with open(self.journal_file, "r+b") as f:
+            f.truncate(valid_bytes)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def reset(self, base_hash: str):
+        """
+        Start an empty journal on top of a new snapshot
+
+        Args:
+            base_hash: Hash of the snapshot the following records apply to
+        """
+        header = {"op": "base", "version": JOURNAL_VERSION, "snapshot": base_hash}
+        temp_file = self.journal_file.with_suffix(".journal.tmp")
+        with open(temp_file, "wb") as f:
+            f.write((json.dumps(header) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        temp_file.replace(self.journal_file)
+
+    def discard(self):
+        """Move a journal that no longer matches its snapshot out of the way"""
+        if self.journal_file.exists():
+            stale_file = self.journal_file.with_suffix(".journal.stale")
+            self.journal_file.replace(stale_file)
+            logger.warning(
+                f"devices.json changed outside Broadlink Manager - "
+                f"unapplied journal kept as {stale_file.name}"
+            )
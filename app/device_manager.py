@@ -4,89 +4,55 @@ Device Manager for Broadlink Manager Add-on
 Handles device metadata and command organization
 """
 
+import base64
+import binascii
 import json
 import logging
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from datetime import datetime
-import threading
 
-logger = logging.getLogger(__name__)
+from device_storage import DeviceStorageBackend, create_backend
+from payload_store import PayloadStore, payload_hash
 
-# Global lock for file writes (shared across all DeviceManager instances)
-_global_write_lock = threading.Lock()
+logger = logging.getLogger(__name__)
 
 
 class DeviceManager:
     """Manage device metadata and commands"""
 
-    def __init__(self, storage_path: str = "/config/broadlink_manager"):
+    def __init__(
+        self,
+        storage_path: str = "/config/broadlink_manager",
+        backend: Union[str, DeviceStorageBackend, None] = None,
+    ):
         """
         Initialize device manager
 
         Args:
             storage_path: Path to storage directory
+            backend: Storage backend instance or name ("json" or "sqlite");
+                defaults to devices.json
         """
         self.storage_path = Path(storage_path)
         self.storage_path.mkdir(parents=True, exist_ok=True)
         self.devices_file = self.storage_path / "devices.json"
-        self.backup_file = self.storage_path / "devices.json.backup"
 
-        # Ensure devices file exists
-        if not self.devices_file.exists():
-            # Check if backup exists
-            if self.backup_file.exists():
-                logger.warning(
-                    "devices.json missing but backup found - restoring from backup"
-                )
-                try:
-                    import shutil
-
-                    shutil.copy2(self.backup_file, self.devices_file)
-                    logger.info("Successfully restored devices.json from backup")
-                except Exception as e:
-                    logger.error(f"Failed to restore from backup: {e}")
-                    self._save_devices({})
-            else:
-                self._save_devices({})
+        if not isinstance(backend, DeviceStorageBackend):
+            backend = create_backend(backend or "json", self.storage_path)
+        self.backend = backend
+        self.payloads = PayloadStore.for_path(self.storage_path / "payloads.pack")
+        # Keep the backup self-contained: it must restore without payloads.pack
+        self.backend.backup_transform = self._resolve_all
+        self.verify_payloads()
 
     def _load_devices(self) -> Dict[str, Any]:
-        """Load devices from storage"""
-        # On Windows, editors often replace files atomically which can briefly
-        # lock the target or leave a partially-written file. Retry a few times
-        # on PermissionError or JSONDecodeError before giving up.
-        import time
-        from json import JSONDecodeError
-
-        max_retries = 5
-        for attempt in range(max_retries):
-            try:
-                with open(self.devices_file, "r") as f:
-                    return json.load(f)
-            except (PermissionError, JSONDecodeError) as e:
-                if attempt < max_retries - 1:
-                    backoff = 0.05 * (attempt + 1)
-                    logger.debug(
-                        f"Load devices retry due to {type(e).__name__}: "
-                        f"waiting {backoff:.2f}s (attempt {attempt+1}/{max_retries})"
-                    )
-                    time.sleep(backoff)
-                    continue
-                logger.error(f"Error loading devices after retries: {e}")
-                return {}
-            except FileNotFoundError:
-                # If file truly doesn't exist yet, return empty
-                logger.warning(
-                    "devices.json not found when loading; returning empty set"
-                )
-                return {}
-            except Exception as e:
-                logger.error(f"Unexpected error loading devices: {e}")
-                return {}
+        """Load devices from storage (payloads stay referenced by data_hash)"""
+        return self.backend.load_devices()
 
     def _save_devices(self, devices: Dict[str, Any]) -> bool:
         """
-        Save devices to storage with automatic backup and thread-safe locking
+        Save devices to storage
 
         Args:
             devices: Device data to save
@@ -94,72 +60,340 @@ class DeviceManager:
         Returns:
             True if successful, False otherwise
         """
-        import shutil
-
-        # Use global lock to prevent concurrent writes across all instances
-        with _global_write_lock:
-            try:
-                # Create backup of existing file before modifying
-                if self.devices_file.exists():
-                    try:
-                        shutil.copy2(self.devices_file, self.backup_file)
-                        logger.debug("Created backup of devices.json")
-                    except Exception as e:
-                        logger.warning(f"Failed to create backup: {e}")
-                        # Continue anyway - backup failure shouldn't stop the save
-
-                # Write to temporary file first, then rename (atomic operation)
-                temp_file = self.devices_file.with_suffix(".tmp")
-
-                # Write and explicitly close before rename
-                with open(temp_file, "w") as f:
-                    json.dump(devices, f, indent=2)
-                    f.flush()  # Ensure data is written
-                # File is now closed
-
-                # Small delay to ensure Windows releases the file handle
-                import time
-
-                time.sleep(0.01)
-
-                # Atomic rename with retry for Windows file locking issues
-                max_retries = 3
-                for attempt in range(max_retries):
-                    try:
-                        temp_file.replace(self.devices_file)
-                        break
-                    except PermissionError:
-                        if attempt < max_retries - 1:
-                            logger.warning(
-                                f"File locked, retrying... (attempt {attempt + 1}/{max_retries})"
-                            )
-                            time.sleep(0.1 * (attempt + 1))  # Exponential backoff
-                        else:
-                            raise
-                logger.debug(f"Successfully saved devices.json")
-                return True
-            except Exception as e:
-                logger.error(f"Error saving devices: {e}")
-                # Clean up temp file if it exists
-                temp_file = self.devices_file.with_suffix(".tmp")
-                if temp_file.exists():
-                    try:
-                        temp_file.unlink()
-                    except Exception:
-                        pass
-
-                # If save failed and we have a backup, restore it
-                if self.backup_file.exists() and not self.devices_file.exists():
-                    logger.warning("Save failed - restoring from backup")
-                    try:
-                        shutil.copy2(self.backup_file, self.devices_file)
-                        logger.info(
-                            "Restored devices.json from backup after failed save"
+        devices = {
+            device_id: self._store_payloads(device)
+            for device_id, device in devices.items()
+        }
+        self.payloads.sync()
+        return self.backend.save_devices(devices)
+
+    def _save_device(self, device_id: str, device: Optional[Dict[str, Any]]) -> bool:
+        """Save one device (None deletes it)"""
+        if device is not None:
+            device = self._store_payloads(device)
+            self.payloads.sync()
+        return self.backend.save_device(device_id, device)
+
+    def _store_payloads(self, device: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Move inline base64 command data into the payload store
+
+        Each command's "data" is replaced, in place in key order, by a
+        "data_hash" reference. Data that is not canonical base64 (e.g. the
+        "pending" marker) stays inline.
+
+        Returns:
+            Device with referenced payloads (the input is not modified)
+        """
+        commands = device.get("commands") if isinstance(device, dict) else None
+        if not isinstance(commands, dict):
+            return device
+
+        stored = {}
+        changed = False
+        for name, command in commands.items():
+            if isinstance(command, dict) and isinstance(command.get("data"), str):
+                digest = self.payloads.put_base64(command["data"])
+                if digest:
+                    command = {
+                        ("data_hash" if key == "data" else key): (
+                            digest if key == "data" else value
                         )
-                    except Exception as restore_error:
-                        logger.error(f"Failed to restore from backup: {restore_error}")
+                        for key, value in command.items()
+                    }
+                    changed = True
+            stored[name] = command
+        return {**device, "commands": stored} if changed else device
+
+    def _resolve_payloads(self, device: Optional[Dict[str, Any]]) -> Optional[Dict]:
+        """Replace data_hash references with base64 "data" (modifies device)"""
+        commands = device.get("commands") if isinstance(device, dict) else None
+        if not isinstance(commands, dict):
+            return device
+
+        for name, command in commands.items():
+            if isinstance(command, dict) and "data_hash" in command:
+                data = self.payloads.get_base64(command["data_hash"])
+                if data is None:
+                    logger.error(f"Missing payload for command {name}")
+                    continue
+                commands[name] = {
+                    ("data" if key == "data_hash" else key): (
+                        data if key == "data_hash" else value
+                    )
+                    for key, value in command.items()
+                }
+        return device
+
+    def _resolve_all(self, devices: Dict[str, Any]) -> Dict[str, Any]:
+        for device in devices.values():
+            self._resolve_payloads(device)
+        return devices
+
+    def compact_storage(self) -> bool:
+        """Fold pending writes into the storage files (call at shutdown)"""
+        success = self.backend.compact()
+        self.prune_payloads()
+        try:
+            self.payloads.checkpoint()
+        except Exception as e:
+            logger.error(f"Error writing payload offset table: {e}")
+        return success
+
+    @staticmethod
+    def _payload_refs(devices: Dict[str, Any]) -> Iterator[Tuple[str, str, str]]:
+        """(device_id, command name, payload hash) of referenced commands"""
+        for device_id, device in devices.items():
+            commands = device.get("commands") if isinstance(device, dict) else None
+            if not isinstance(commands, dict):
+                continue
+            for name, command in commands.items():
+                if isinstance(command, dict) and "data_hash" in command:
+                    yield device_id, name, command["data_hash"]
+
+    def verify_payloads(self) -> List[str]:
+        """
+        Check that every payload reference resolves
 
-                return False
+        References go missing when devices.json is restored without the
+        payloads.pack it was saved with. Missing codes are recovered from
+        the inline data in the storage backup where it has them.
+
+        Returns:
+            "device_id/command" of commands whose code is still missing
+        """
+        try:
+            devices = self._load_devices()
+            backup = None
+            missing = []
+            recovered = 0
+            for device_id, name, digest in self._payload_refs(devices):
+                if digest in self.payloads:
+                    continue
+                if backup is None:
+                    backup = self.backend.load_backup()
+                device = backup.get(device_id)
+                commands = device.get("commands") if isinstance(device, dict) else None
+                command = commands.get(name) if isinstance(commands, dict) else None
+                data = command.get("data") if isinstance(command, dict) else None
+                if isinstance(data, str) and self.payloads.put_base64(data) == digest:
+                    recovered += 1
+                    continue
+                missing.append(f"{device_id}/{name}")
+
+            if recovered:
+                self.payloads.sync()
+                logger.warning(
+                    f"Recovered {recovered} missing command code(s) from the storage backup"
+                )
+            if missing:
+                logger.error(
+                    f"{len(missing)} command code(s) missing from payloads.pack "
+                    f"(restore it together with devices.json): {', '.join(missing[:10])}"
+                )
+            return missing
+        except Exception as e:
+            logger.error(f"Error verifying payloads: {e}")
+            return []
+
+    def prune_payloads(self) -> int:
+        """
+        Drop payloads no longer referenced by any command
+
+        Commands in the storage backup count as references too, so a
+        restore from the backup does not bring back commands without codes.
+        Nothing is pruned while any reference is missing from the pack,
+        which then does not belong to these devices.
+
+        Returns:
+            Number of payloads removed
+        """
+        try:
+            mark = self.payloads.end
+            devices = self._load_devices()
+            if any(
+                digest not in self.payloads
+                for _, _, digest in self._payload_refs(devices)
+            ):
+                logger.warning("Not pruning payloads: some references are missing")
+                return 0
+            live = set()
+            for source in (devices, self.backend.load_backup()):
+                live.update(digest for _, _, digest in self._payload_refs(source))
+            return self.payloads.prune(live, keep_after=mark)
+        except Exception as e:
+            logger.error(f"Error pruning payloads: {e}")
+            return 0
+
+    def migrate_payloads(self) -> int:
+        """
+        Move inline command data of all devices into the payload store
+
+        Returns:
+            Number of devices migrated
+        """
+        try:
+            devices = self._load_devices()
+            migrated = {
+                device_id
+                for device_id, device in devices.items()
+                if self._store_payloads(device) is not device
+            }
+            if migrated and self._save_devices(devices):
+                logger.info(f"Moved command payloads of {len(migrated)} device(s)")
+                return len(migrated)
+            return 0
+        except Exception as e:
+            logger.error(f"Error during payload migration: {e}")
+            return 0
+
+    def export_devices_json(self, path: Optional[Path] = None) -> int:
+        """
+        Write all devices in devices.json format
+
+        Command data is written inline, except when exporting onto the
+        backend's own devices.json (which keeps payload references).
+
+        Args:
+            path: Target file (defaults to devices.json in the storage directory)
+
+        Returns:
+            Number of devices exported
+        """
+        path = Path(path or self.devices_file)
+        if path == self.backend.storage_file:
+            return self.backend.export_json(path)
+        return self.backend.export_json(path, self.get_all_devices())
+
+    def import_devices_json(self, path: Path) -> int:
+        """
+        Replace all devices with the contents of a devices.json file
+
+        Args:
+            path: File to import
+
+        Returns:
+            Number of devices imported
+        """
+        with open(path, "r") as f:
+            devices = json.load(f)
+        if not isinstance(devices, dict):
+            raise ValueError(f"{path} does not contain a device mapping")
+        if not self._save_devices(devices):
+            raise RuntimeError(f"Failed to import devices from {path}")
+        return len(devices)
+
+    def import_commands(
+        self,
+        entries: Iterable[Dict[str, Any]],
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Import exported devices and commands in one batched save
+
+        Commands are merged into existing devices; unknown devices are
+        created. Payloads go to the payload store as each entry is applied,
+        so entries can come from a streaming parser without holding the
+        whole import in memory.
+
+        Args:
+            entries: Export entries, either {"device": {...}, "commands": {...}}
+                or {"id": ..., "commands": {...}, ...}
+            progress: Called with the running results after each entry
+
+        Returns:
+            Results with imported/skipped counts, errors and per-device actions
+
+        Raises:
+            RuntimeError: If saving the imported devices fails
+        """
+        devices = self._load_devices()
+        results = {"imported": 0, "skipped": 0, "errors": [], "devices": []}
+        now = datetime.now().isoformat()
+
+        for entry in entries:
+            dev_info = entry.get("device", entry)
+            commands = entry.get("commands", {})
+            device_id = dev_info.get("id", "")
+
+            if not device_id:
+                results["errors"].append("Missing device ID in export entry")
+                results["skipped"] += 1
+            elif not commands:
+                results["errors"].append(
+                    f"Device '{device_id}' has no commands to import"
+                )
+                results["skipped"] += 1
+            else:
+                imported = {
+                    name: self._imported_command(name, command)
+                    for name, command in commands.items()
+                }
+                existing = devices.get(device_id)
+                if existing is not None:
+                    existing["commands"] = {
+                        **existing.get("commands", {}),
+                        **imported,
+                    }
+                    existing["updated_at"] = now
+                    action = "merged"
+                else:
+                    existing = {
+                        "name": dev_info.get("name", device_id),
+                        "entity_type": dev_info.get("entity_type", "switch"),
+                        "device_type": dev_info.get("device_type", "broadlink"),
+                        "broadlink_entity": dev_info.get("broadlink_entity", ""),
+                        "area": dev_info.get("area", ""),
+                        "icon": dev_info.get("icon", ""),
+                        "commands": imported,
+                        "device_id": device_id,
+                        "created_at": now,
+                    }
+                    action = "created"
+
+                if action == "created" and existing["device_type"] not in [
+                    "broadlink",
+                    "smartir",
+                ]:
+                    results["errors"].append(f"Failed to create device '{device_id}'")
+                    results["skipped"] += 1
+                else:
+                    devices[device_id] = self._store_payloads(existing)
+                    results["imported"] += len(imported)
+                    results["devices"].append(
+                        {
+                            "id": device_id,
+                            "name": existing.get("name", device_id),
+                            "commands_imported": len(imported),
+                            "action": action,
+                        }
+                    )
+
+            if progress:
+                progress(results)
+
+        if results["devices"] and not self._save_devices(devices):
+            raise RuntimeError("Failed to save imported commands")
+        logger.info(
+            f"Imported {results['imported']} command(s) into "
+            f"{len(results['devices'])} device(s)"
+        )
+        return results
+
+    @staticmethod
+    def _imported_command(name: str, command: Any) -> Dict[str, Any]:
+        """Stored form of one command from an export file"""
+        if not isinstance(command, dict):
+            command = {"data": command}
+        stored = {
+            "data": command.get("data", ""),
+            "type": command.get("type", "ir"),
+            "command_type": command.get("type", "ir"),
+            "name": name,
+        }
+        if command.get("frequency"):
+            stored["frequency"] = command["frequency"]
+        return stored
 
     def create_device(self, device_id: str, device_data: Dict[str, Any]) -> bool:
         """
@@ -188,9 +422,7 @@ class DeviceManager:
             True if successful, False otherwise
         """
         try:
-            devices = self._load_devices()
-
-            if device_id in devices:
+            if self.backend.load_device(device_id) is not None:
                 logger.warning(f"Device {device_id} already exists")
                 return False
 
@@ -209,9 +441,7 @@ class DeviceManager:
             if device_type == "broadlink" and "commands" not in device_data:
                 device_data["commands"] = {}
 
-            devices[device_id] = device_data
-
-            if self._save_devices(devices):
+            if self._save_device(device_id, device_data):
                 logger.info(f"Created {device_type} device: {device_id}")
                 return True
 
@@ -221,22 +451,49 @@ class DeviceManager:
             logger.error(f"Error creating device {device_id}: {e}")
             return False
 
-    def get_device(self, device_id: str) -> Optional[Dict[str, Any]]:
+    def get_device(
+        self, device_id: str, resolve_payloads: bool = True
+    ) -> Optional[Dict[str, Any]]:
         """
         Get device by ID
 
         Args:
             device_id: Device identifier
+            resolve_payloads: Replace data_hash references with base64 data
+                (skip when only names, types or markers are needed)
 
         Returns:
             Device data or None if not found
         """
+        device = self.backend.load_device(device_id)
+        return self._resolve_payloads(device) if resolve_payloads else device
+
+    def get_all_devices(self, resolve_payloads: bool = True) -> Dict[str, Any]:
+        """Get all devices (see get_device for resolve_payloads)"""
+        devices = self._load_devices()
+        return self._resolve_all(devices) if resolve_payloads else devices
+
+    def iter_devices(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Iterate over all devices, resolving payloads one device at a time
+
+        For walking large libraries (e.g. exports) with only one device's
+        codes in memory.
+        """
         devices = self._load_devices()
-        return devices.get(device_id)
+        for device_id in list(devices):
+            yield device_id, self._resolve_payloads(devices.pop(device_id))
 
-    def get_all_devices(self) -> Dict[str, Any]:
-        """Get all devices"""
-        return self._load_devices()
+    def get_pending_commands(self) -> List[Tuple[str, str, str]]:
+        """
+        Get commands still waiting for their learned code
+
+        Uses the backend's index instead of loading every device.
+
+        Returns:
+            (device_id, device name, command name) tuples
+        """
+        return self.backend.find_pending_commands()
 
     def get_devices_by_broadlink(self, broadlink_entity: str) -> Dict[str, Any]:
         """
@@ -248,12 +505,9 @@ class DeviceManager:
         Returns:
             Dict of devices
         """
-        all_devices = self._load_devices()
-        return {
-            device_id: device_data
-            for device_id, device_data in all_devices.items()
-            if device_data.get("broadlink_entity") == broadlink_entity
-        }
+        return self._resolve_all(
+            self.backend.find_devices("broadlink_entity", broadlink_entity)
+        )
 
     def update_device(self, device_id: str, updates: Dict[str, Any]) -> bool:
         """
@@ -267,23 +521,23 @@ class DeviceManager:
             True if successful, False otherwise
         """
         try:
-            devices = self._load_devices()
+            device = self.backend.load_device(device_id)
 
-            if device_id not in devices:
+            if device is None:
                 logger.warning(f"Device {device_id} not found")
                 return False
 
             # Update fields (preserve commands unless explicitly updated)
-            old_commands = devices[device_id].get("commands", {})
-            devices[device_id].update(updates)
+            old_commands = device.get("commands", {})
+            device.update(updates)
 
             # Only restore old commands if not explicitly updated
             if "commands" not in updates:
-                devices[device_id]["commands"] = old_commands
+                device["commands"] = old_commands
 
-            devices[device_id]["updated_at"] = datetime.now().isoformat()
+            device["updated_at"] = datetime.now().isoformat()
 
-            if self._save_devices(devices):
+            if self._save_device(device_id, device):
                 logger.info(f"Updated device: {device_id}")
                 return True
 
@@ -304,15 +558,11 @@ class DeviceManager:
             True if successful, False otherwise
         """
         try:
-            devices = self._load_devices()
-
-            if device_id not in devices:
+            if self.backend.load_device(device_id) is None:
                 logger.warning(f"Device {device_id} not found")
                 return False
 
-            del devices[device_id]
-
-            if self._save_devices(devices):
+            if self._save_device(device_id, None):
                 logger.info(f"Deleted device: {device_id}")
                 return True
 
@@ -337,20 +587,19 @@ class DeviceManager:
             True if successful, False otherwise
         """
         try:
-            devices = self._load_devices()
+            device = self.backend.load_device(device_id)
 
-            if device_id not in devices:
+            if device is None:
                 logger.warning(f"Device {device_id} not found")
-                logger.debug(f"Available devices: {list(devices.keys())}")
                 return False
 
-            if "commands" not in devices[device_id]:
-                devices[device_id]["commands"] = {}
+            if "commands" not in device:
+                device["commands"] = {}
 
-            devices[device_id]["commands"][command_name] = command_data
-            devices[device_id]["updated_at"] = datetime.now().isoformat()
+            device["commands"][command_name] = command_data
+            device["updated_at"] = datetime.now().isoformat()
 
-            if self._save_devices(devices):
+            if self._save_device(device_id, device):
                 logger.info(f"Added command {command_name} to device {device_id}")
                 return True
 
@@ -372,17 +621,17 @@ class DeviceManager:
             True if successful, False otherwise
         """
         try:
-            devices = self._load_devices()
+            device = self.backend.load_device(device_id)
 
-            if device_id not in devices:
+            if device is None:
                 logger.warning(f"Device {device_id} not found")
                 return False
 
-            if command_name in devices[device_id].get("commands", {}):
-                del devices[device_id]["commands"][command_name]
-                devices[device_id]["updated_at"] = datetime.now().isoformat()
+            if command_name in device.get("commands", {}):
+                del device["commands"][command_name]
+                device["updated_at"] = datetime.now().isoformat()
 
-                if self._save_devices(devices):
+                if self._save_device(device_id, device):
                     logger.info(
                         f"Deleted command {command_name} from device {device_id}"
                     )
@@ -443,12 +692,7 @@ class DeviceManager:
         Returns:
             Dict of devices matching the type
         """
-        all_devices = self._load_devices()
-        return {
-            device_id: device_data
-            for device_id, device_data in all_devices.items()
-            if device_data.get("device_type", "broadlink") == device_type
-        }
+        return self._resolve_all(self.backend.find_devices("device_type", device_type))
 
     def get_smartir_devices(self) -> Dict[str, Any]:
         """Get all SmartIR devices"""
@@ -546,6 +790,114 @@ class DeviceManager:
             logger.error(f"Error adding learned command: {e}")
             return False
 
+    def check_learned_command(
+        self, device_id: str, command_name: str, command_data: str
+    ) -> Dict[str, List]:
+        """
+        Warn when a learned code looks mislearned
+
+        Flags codes that closely match a different stored command (usually
+        the wrong button was pressed, or the button was learned before
+        under another name) and captures that look noisy or cut off. The
+        findings are logged and returned for the learn result, not stored:
+        matches go stale as soon as the other command changes. Never raises.
+
+        Args:
+            device_id: Device identifier of the learned command
+            command_name: Name of the learned command (left out of the matches)
+            command_data: Base64 encoded command data
+
+        Returns:
+            {"similar_to": [{"device_id", "command"}] of the matching
+            commands, closest first, "capture_issues": keys of
+            code_similarity.CAPTURE_ISSUES}
+        """
+        findings = {"similar_to": [], "capture_issues": []}
+        try:
+            raw = base64.b64decode(command_data, validate=True)
+        except (binascii.Error, ValueError, TypeError):
+            return findings  # "pending" and other placeholders
+
+        try:
+            from code_similarity import capture_issues
+
+            matches = self.find_similar_commands(raw, exclude=(device_id, command_name))
+            issues = capture_issues(raw)
+        except Exception as e:
+            logger.warning(f"Could not check learned code: {e}")
+            return findings
+
+        if matches:
+            names = ", ".join(f"{m['device_id']}/{m['command']}" for m in matches)
+            logger.warning(
+                f"Learned code for {device_id}/{command_name} closely matches {names}"
+            )
+        if issues:
+            logger.warning(
+                f"Learned code for {device_id}/{command_name} looks noisy: "
+                f"{', '.join(issues)}"
+            )
+        findings["similar_to"] = [
+            {"device_id": m["device_id"], "command": m["command"]} for m in matches
+        ]
+        findings["capture_issues"] = issues
+        return findings
+
+    def _iter_command_refs(
+        self,
+    ) -> Iterator[Tuple[str, str, str, Optional[Union[bytes, memoryview]]]]:
+        """
+        (device_id, command name, payload hash, raw bytes) of learned commands
+
+        Raw bytes are only read for inline data; stored payloads are
+        identified by their data_hash without touching the pack.
+        """
+        for device_id, device in self._load_devices().items():
+            commands = device.get("commands") if isinstance(device, dict) else None
+            for command_name, command in (commands or {}).items():
+                if isinstance(command, dict) and "data_hash" in command:
+                    yield device_id, command_name, command["data_hash"], None
+                    continue
+                raw = self._command_bytes(command)
+                if raw:
+                    yield device_id, command_name, payload_hash(raw), raw
+
+    def _similarity_index(self):
+        from code_similarity import SimilarityIndex  # Loads NumPy when available
+
+        index = SimilarityIndex.for_path(self.backend.storage_file)
+        index.refresh(
+            self.backend.version(), self._iter_command_refs, self.payloads.get_views
+        )
+        return index
+
+    def find_similar_commands(
+        self,
+        raw: Union[bytes, memoryview],
+        exclude: Optional[Tuple[str, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Find stored commands that are near-duplicates of a code
+
+        Args:
+            raw: Raw command bytes
+            exclude: (device_id, command name) to leave out, e.g. the
+                command being re-learned
+
+        Returns:
+            [{"device_id", "command", "distance"}], closest first
+        """
+        return self._similarity_index().matches(raw, exclude=exclude)
+
+    def find_duplicate_commands(self) -> List[List[Dict[str, Any]]]:
+        """
+        Find groups of stored commands that are the same code
+
+        Compares decoded pulse timings, so captures of one button that
+        differ in jitter, repeats or padding are grouped too.
+        """
+        return self._similarity_index().duplicates()
+
     def update_command_test_status(
         self, device_id: str, command_name: str, test_method: str
     ) -> bool:
@@ -561,13 +913,13 @@ class DeviceManager:
             True if successful, False otherwise
         """
         try:
-            devices = self._load_devices()
+            device = self.backend.load_device(device_id)
 
-            if device_id not in devices:
+            if device is None:
                 logger.warning(f"Device {device_id} not found")
                 return False
 
-            commands = devices[device_id].get("commands", {})
+            commands = device.get("commands", {})
             if command_name not in commands:
                 logger.warning(
                     f"Command {command_name} not found in device {device_id}"
@@ -578,9 +930,9 @@ class DeviceManager:
             commands[command_name]["test_method"] = test_method
             commands[command_name]["tested_at"] = datetime.now().isoformat()
 
-            devices[device_id]["updated_at"] = datetime.now().isoformat()
+            device["updated_at"] = datetime.now().isoformat()
 
-            if self._save_devices(devices):
+            if self._save_device(device_id, device):
                 logger.info(f"Updated test status for command {command_name}")
                 return True
 
@@ -590,6 +942,23 @@ class DeviceManager:
             logger.error(f"Error updating command test status: {e}")
             return False
 
+    def get_command(self, device_id: str, command_name: str) -> Optional[Dict]:
+        """
+        Get a single command with its base64 data
+
+        Args:
+            device_id: Device identifier
+            command_name: Command name
+
+        Returns:
+            Command dict, or None if not found
+        """
+        command = self.backend.get_command(device_id, command_name)
+        if not isinstance(command, dict):
+            return command
+        wrapper = self._resolve_payloads({"commands": {command_name: command}})
+        return wrapper["commands"][command_name]
+
     def get_command_data(self, device_id: str, command_name: str) -> Optional[str]:
         """
         Get base64 command data
@@ -601,18 +970,64 @@ class DeviceManager:
         Returns:
             Base64 command data, or None if not found
         """
-        device = self.get_device(device_id)
-        if not device:
-            return None
-
-        commands = device.get("commands", {})
-        command = commands.get(command_name)
+        command = self.backend.get_command(device_id, command_name)
 
         if command:
+            if "data_hash" in command:
+                return self.payloads.get_base64(command["data_hash"])
             return command.get("data")
 
         return None
 
+    def get_command_bytes(
+        self, device_id: str, command_name: str
+    ) -> Optional[Union[bytes, memoryview]]:
+        """
+        Get raw command bytes, without a base64 round trip for stored payloads
+
+        Args:
+            device_id: Device identifier
+            command_name: Command name
+
+        Returns:
+            Read-only view of the payload (or bytes for inline data), or None
+            if not found or not a learned code (e.g. "pending")
+        """
+        command = self.backend.get_command(device_id, command_name)
+        if not command:
+            return None
+        return self._command_bytes(command)
+
+    def _command_bytes(self, command: Any) -> Optional[Union[bytes, memoryview]]:
+        if not isinstance(command, dict):
+            return None
+        if "data_hash" in command:
+            return self.payloads.get_view(command["data_hash"])
+
+        try:
+            return base64.b64decode(command.get("data") or "", validate=True) or None
+        except (binascii.Error, ValueError):
+            return None
+
+    def iter_command_bytes(
+        self,
+    ) -> Iterator[Tuple[str, str, Union[bytes, memoryview]]]:
+        """
+        Iterate over the raw bytes of every learned command
+
+        Stored payloads are read from the pack without a base64 round
+        trip; commands without a learned code are skipped.
+
+        Yields:
+            (device_id, command name, raw bytes) tuples
+        """
+        for device_id, device in self._load_devices().items():
+            commands = device.get("commands") if isinstance(device, dict) else None
+            for command_name, command in (commands or {}).items():
+                raw = self._command_bytes(command)
+                if raw:
+                    yield device_id, command_name, raw
+
     def update_device_connection_info(
         self, device_id: str, connection_info: Dict[str, Any]
     ) -> bool:
@@ -627,16 +1042,16 @@ class DeviceManager:
             True if successful, False otherwise
         """
         try:
-            devices = self._load_devices()
+            device = self.backend.load_device(device_id)
 
-            if device_id not in devices:
+            if device is None:
                 logger.warning(f"Device {device_id} not found")
                 return False
 
-            devices[device_id]["connection"] = connection_info
-            devices[device_id]["updated_at"] = datetime.now().isoformat()
+            device["connection"] = connection_info
+            device["updated_at"] = datetime.now().isoformat()
 
-            if self._save_devices(devices):
+            if self._save_device(device_id, device):
                 logger.info(f"Updated connection info for device {device_id}")
                 return True
 
@@ -0,0 +1,987 @@
+#!/usr/bin/env python3
+"""
+Device Storage Backends for Broadlink Manager Add-on
+Pluggable persistence for DeviceManager (devices.json or SQLite)
+"""
+
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+from device_journal import DeviceJournal, apply_records, diff_devices, snapshot_hash
+from metrics import parse_storage
+
+logger = logging.getLogger(__name__)
+
+# Global lock for file writes (shared across all DeviceManager instances)
+_global_write_lock = threading.Lock()
+
+# Last committed device data per devices.json path, so saves can be diffed
+# into journal records without re-reading the snapshot. Guarded by
+# _global_write_lock and validated against the files' stat on every save.
+_committed_state: Dict[str, Dict[str, Any]] = {}
+
+# Pending idle-compaction timers and paths compacted at exit, per devices.json
+_compaction_timers: Dict[str, threading.Timer] = {}
+_exit_compaction_paths = set()
+
+# Save counter per storage file, part of DeviceStorageBackend.version() so
+# writes within the filesystem's timestamp granularity are still noticed
+_generations: Dict[str, int] = {}
+
+
+def _pending_of(device: Any) -> List[str]:
+    """Names of a device's commands whose data is still the "pending" marker"""
+    commands = device.get("commands") if isinstance(device, dict) else None
+    if not isinstance(commands, dict):
+        return []
+    return [
+        name
+        for name, command in commands.items()
+        if isinstance(command, dict) and command.get("data") == "pending"
+    ]
+
+
+def _device_name(device_id: str, device: Any) -> str:
+    return device.get("device_id", device_id) if isinstance(device, dict) else device_id
+
+
+class DeviceStorageBackend:
+    """
+    Interface for DeviceManager storage
+
+    Backends must implement load_devices and save_devices. The per-device
+    and query methods have whole-document defaults that backends with
+    indexed storage override.
+    """
+
+    name = "base"
+    storage_file: Path  # Main file the backend persists to
+    version_files: Tuple[Path, ...] = ()  # Files whose changes alter the data
+
+    # Applied to device data written to the backup (e.g. to inline payloads)
+    backup_transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+
+    # Fields backends may index for find_devices, with the value assumed
+    # when a device does not set them
+    INDEXED_FIELDS = {
+        "broadlink_entity": None,
+        "device_type": "broadlink",
+        "area": None,
+    }
+
+    def load_devices(self) -> Dict[str, Any]:
+        """Load all devices (device_id -> device data, in storage order)"""
+        raise NotImplementedError
+
+    def version(self) -> Tuple:
+        """
+        Cheap token that changes whenever the stored devices change
+
+        Combines the in-process save counter with the stat of the backing
+        files, so edits by other processes are noticed too.
+        """
+        stats = []
+        for path in self.version_files or (self.storage_file,):
+            try:
+                stat = path.stat()
+                stats.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+            except FileNotFoundError:
+                stats.append(None)
+        return (_generations.get(str(self.storage_file), 0), tuple(stats))
+
+    def _bump_generation(self):
+        key = str(self.storage_file)
+        _generations[key] = _generations.get(key, 0) + 1
+
+    def save_devices(self, devices: Dict[str, Any]) -> bool:
+        """
+        Replace all devices
+
+        Args:
+            devices: Device data to save
+
+        Returns:
+            True if successful, False otherwise
+        """
+        raise NotImplementedError
+
+    def load_device(self, device_id: str) -> Optional[Dict[str, Any]]:
+        """Load one device, or None if it does not exist"""
+        return self.load_devices().get(device_id)
+
+    def save_device(self, device_id: str, device: Optional[Dict[str, Any]]) -> bool:
+        """
+        Create, replace or (with device=None) delete one device
+
+        New devices are added after all existing ones.
+
+        Returns:
+            True if successful, False otherwise
+        """
+        devices = self.load_devices()
+        if device is None:
+            devices.pop(device_id, None)
+        else:
+            devices[device_id] = device
+        return self.save_devices(devices)
+
+    def find_devices(self, field: str, value: Any) -> Dict[str, Any]:
+        """
+        Find devices whose indexed field equals value
+
+        Args:
+            field: One of INDEXED_FIELDS
+            value: Value to match
+
+        Returns:
+            Dict of matching devices
+        """
+        default = self.INDEXED_FIELDS[field]
+        return {
+            device_id: device_data
+            for device_id, device_data in self.load_devices().items()
+            if device_data.get(field, default) == value
+        }
+
+    def get_command(self, device_id: str, command_name: str) -> Optional[Any]:
+        """Load one command of a device, or None if it does not exist"""
+        device = self.load_device(device_id)
+        if not device:
+            return None
+        return device.get("commands", {}).get(command_name)
+
+    def find_pending_commands(self) -> List[Tuple[str, str, str]]:
+        """
+        Find commands still waiting for their learned code ("pending" data)
+
+        Returns:
+            (device_id, device name, command name) tuples
+        """
+        return [
+            (device_id, _device_name(device_id, device), name)
+            for device_id, device in self.load_devices().items()
+            for name in _pending_of(device)
+        ]
+
+    def export_json(self, path: Path, devices: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Write all devices in devices.json format
+
+        Args:
+            path: File to write (replaced atomically)
+            devices: Device data to write instead of the stored data
+
+        Returns:
+            Number of devices exported
+        """
+        path = Path(path)
+        if devices is None:
+            devices = self.load_devices()
+        temp_file = path.with_suffix(path.suffix + ".tmp")
+        with open(temp_file, "w") as f:
+            json.dump(devices, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        temp_file.replace(path)
+        return len(devices)
+
+    def import_json(self, path: Path) -> int:
+        """
+        Replace all devices with the contents of a devices.json file
+
+        Args:
+            path: File to read
+
+        Returns:
+            Number of devices imported
+        """
+        with open(path, "r") as f:
+            devices = json.load(f)
+        if not isinstance(devices, dict):
+            raise ValueError(f"{path} does not contain a device mapping")
+        if not self.save_devices(devices):
+            raise RuntimeError(f"Failed to import devices from {path}")
+        return len(devices)
+
+    def compact(self) -> bool:
+        """Fold pending writes into their final form (e.g. at shutdown)"""
+        return True
+
+    def load_backup(self) -> Dict[str, Any]:
+        """Devices in the backup the backend may restore from (none by default)"""
+        return {}
+
+
+class JsonDeviceBackend(DeviceStorageBackend):
+    """
+    devices.json snapshot plus an append-only journal of changes
+
+    Saves are diffed against the committed state and appended to
+    devices.journal; the journal is folded into devices.json (with automatic
+    backup) once it grows large, after writes go idle, and at shutdown.
+    """
+
+    name = "json"
+
+    # Fold the journal into devices.json after this many records or bytes
+    # (whichever comes first), or once writes have been idle for COMPACT_DELAY
+    COMPACT_RECORDS = 500
+    COMPACT_MIN_BYTES = 1024 * 1024
+    COMPACT_DELAY = 30.0
+
+    def __init__(self, storage_path: Path):
+        """
+        Initialize JSON storage
+
+        Args:
+            storage_path: Path to storage directory
+        """
+        self.storage_path = Path(storage_path)
+        self.devices_file = self.storage_path / "devices.json"
+        self.backup_file = self.storage_path / "devices.json.backup"
+        self.journal = DeviceJournal(self.storage_path / "devices.journal")
+        self.storage_file = self.devices_file
+        self.version_files = (self.devices_file, self.journal.journal_file)
+
+        # Ensure devices file exists
+        if not self.devices_file.exists():
+            # Check if backup exists
+            if self.backup_file.exists():
+                logger.warning(
+                    "devices.json missing but backup found - restoring from backup"
+                )
+                try:
+                    import shutil
+
+                    shutil.copy2(self.backup_file, self.devices_file)
+                    logger.info("Successfully restored devices.json from backup")
+                except Exception as e:
+                    logger.error(f"Failed to restore from backup: {e}")
+                    self.save_devices({})
+            else:
+                self.save_devices({})
+
+        # Fold any journal left by an unclean shutdown into the snapshot
+        key = str(self.devices_file)
+        with _global_write_lock:
+            if key not in _exit_compaction_paths:
+                _exit_compaction_paths.add(key)
+                atexit.register(self.compact)
+                if self.journal.size():
+                    self._compact_locked()
+
+    def load_devices(self) -> Dict[str, Any]:
+        """Load devices from storage"""
+        # On Windows, editors often replace files atomically which can briefly
+        # lock the target or leave a partially-written file. Retry a few times
+        # on PermissionError or JSONDecodeError before giving up.
+        import time
+        from json import JSONDecodeError
+
+        max_retries = 5
+        for attempt in range(max_retries):
+            try:
+                return self._read_state()[0]
+            except (PermissionError, JSONDecodeError) as e:
+                if attempt < max_retries - 1:
+                    backoff = 0.05 * (attempt + 1)
+                    logger.debug(
+                        f"Load devices retry due to {type(e).__name__}: "
+                        f"waiting {backoff:.2f}s (attempt {attempt+1}/{max_retries})"
+                    )
+                    time.sleep(backoff)
+                    continue
+                logger.error(f"Error loading devices after retries: {e}")
+                return {}
+            except FileNotFoundError:
+                # If file truly doesn't exist yet, return empty
+                logger.warning(
+                    "devices.json not found when loading; returning empty set"
+                )
+                return {}
+            except Exception as e:
+                logger.error(f"Unexpected error loading devices: {e}")
+                return {}
+
+    def load_backup(self) -> Dict[str, Any]:
+        """Devices in devices.json.backup, restored when devices.json is missing"""
+        try:
+            with open(self.backup_file, "r") as f:
+                devices = json.load(f)
+        except FileNotFoundError:
+            return {}
+        return devices if isinstance(devices, dict) else {}
+
+    def _read_state(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Read the devices.json snapshot and replay the journal on top of it
+
+        The journal is read first: if a compaction lands in between, the
+        newer snapshot no longer matches the old journal's base and is
+        returned as-is, and it already contains those records.
+
+        Returns:
+            Tuple of (devices, journal info)
+        """
+        base_hash, records, valid_bytes = self.journal.read()
+        with open(self.devices_file, "rb") as f:
+            raw = f.read()
+        devices = parse_storage(raw, "devices")
+
+        info = {"records": 0, "valid_bytes": valid_bytes, "stale": False}
+        if base_hash is not None or records:
+            current_hash = snapshot_hash(raw)
+            if base_hash == current_hash:
+                apply_records(devices, records)
+                info["records"] = len(records)
+            else:
+                info["stale"] = True
+            info["snapshot_hash"] = current_hash
+        return devices, info
+
+    def _state_key(self) -> Tuple:
+        """Identify the on-disk state, to detect changes made by other processes"""
+        stat = self.devices_file.stat()
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino, self.journal.size())
+
+    def _committed_locked(self) -> Optional[Dict[str, Any]]:
+        """
+        Get the committed state to diff saves against (caller holds the lock)
+
+        Returns:
+            Committed state, or None if the snapshot cannot be read
+        """
+        key = str(self.devices_file)
+        state = _committed_state.get(key)
+        try:
+            if state is not None and state["key"] == self._state_key():
+                return state
+
+            devices, info = self._read_state()
+            if info["stale"]:
+                self.journal.discard()
+            elif info["valid_bytes"] < self.journal.size():
+                logger.warning("Discarding torn record at end of device journal")
+                self.journal.truncate(info["valid_bytes"])
+            if info["stale"] or "snapshot_hash" not in info:
+                with open(self.devices_file, "rb") as f:
+                    self.journal.reset(snapshot_hash(f.read()))
+
+            state = {"devices": devices, "records": info["records"]}
+            state["key"] = self._state_key()
+            _committed_state[key] = state
+            return state
+        except Exception as e:
+            logger.debug(f"No committed device state to journal against: {e}")
+            _committed_state.pop(key, None)
+            return None
+
+    def save_devices(self, devices: Dict[str, Any]) -> bool:
+        """
+        Save devices to storage with thread-safe locking
+
+        Args:
+            devices: Device data to save
+
+        Returns:
+            True if successful, False otherwise
+        """
+        # Use global lock to prevent concurrent writes across all instances
+        with _global_write_lock:
+            state = self._committed_locked()
+            records = None if state is None else diff_devices(state["devices"], devices)
+            if records is None:
+                return self._write_snapshot_locked(devices)
+            return self._append_locked(state, records)
+
+    def save_device(self, device_id: str, device: Optional[Dict[str, Any]]) -> bool:
+        """Save one device, diffed against the committed state only"""
+        with _global_write_lock:
+            state = self._committed_locked()
+            if state is None:
+                devices = self.load_devices()
+                if device is None:
+                    devices.pop(device_id, None)
+                else:
+                    devices[device_id] = device
+                return self._write_snapshot_locked(devices)
+
+            committed = state["devices"]
+            if device is None:
+                records = (
+                    [{"op": "delete", "id": device_id}]
+                    if device_id in committed
+                    else []
+                )
+            elif device_id not in committed:
+                records = [{"op": "put", "id": device_id, "device": device}]
+            else:
+                records = diff_devices(
+                    {device_id: committed[device_id]}, {device_id: device}
+                )
+            return self._append_locked(state, records)
+
+    def find_pending_commands(self) -> List[Tuple[str, str, str]]:
+        """
+        Find pending commands through an index kept with the committed state
+
+        The index (device_id -> pending command names) is built once per
+        committed state and updated per journaled device, so lookups do not
+        re-read or walk devices.json.
+        """
+        with _global_write_lock:
+            state = self._committed_locked()
+            if state is None:
+                return super().find_pending_commands()
+            pending = self._pending_index_locked(state)
+            devices = state["devices"]
+            return [
+                (device_id, _device_name(device_id, devices.get(device_id)), name)
+                for device_id, names in pending.items()
+                for name in names
+            ]
+
+    @staticmethod
+    def _pending_index_locked(state: Dict[str, Any]) -> Dict[str, List[str]]:
+        if "pending" not in state:
+            state["pending"] = {}
+            for device_id, device in state["devices"].items():
+                names = _pending_of(device)
+                if names:
+                    state["pending"][device_id] = names
+        return state["pending"]
+
+    def _append_locked(self, state: Dict[str, Any], records: List[Dict]) -> bool:
+        """Journal records on top of the committed state (caller holds the lock)"""
+        if not records:
+            return True
+
+        try:
+            journal_size = self.journal.append(records)
+        except Exception as e:
+            logger.error(f"Error journaling devices: {e}")
+            _committed_state.pop(str(self.devices_file), None)
+            return False
+
+        # Replay the serialized records so committed state never aliases
+        # the caller's objects
+        apply_records(state["devices"], json.loads(json.dumps(records)))
+        if "pending" in state:
+            for device_id in {record["id"] for record in records}:
+                names = _pending_of(state["devices"].get(device_id))
+                if names:
+                    state["pending"][device_id] = names
+                else:
+                    state["pending"].pop(device_id, None)
+        state["records"] += len(records)
+        state["key"] = self._state_key()
+        self._bump_generation()
+        logger.debug(f"Journaled {len(records)} device change(s)")
+
+        compact_bytes = max(
+            self.COMPACT_MIN_BYTES, self.devices_file.stat().st_size // 2
+        )
+        if state["records"] >= self.COMPACT_RECORDS or journal_size >= compact_bytes:
+            self._compact_locked()
+        else:
+            self._schedule_compaction()
+        return True
+
+    def export_json(self, path: Path, devices: Optional[Dict[str, Any]] = None) -> int:
+        """Write all devices in devices.json format (compacts if path is devices.json)"""
+        if Path(path) == self.devices_file:
+            if devices is not None:
+                raise ValueError("Use save_devices to replace devices.json")
+            if not self.compact():
+                raise RuntimeError("Failed to compact device journal")
+            return len(self.load_devices())
+        return super().export_json(path, devices)
+
+    def _schedule_compaction(self):
+        """(Re)start the idle timer that folds the journal into devices.json"""
+        key = str(self.devices_file)
+        timer = _compaction_timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        timer = threading.Timer(self.COMPACT_DELAY, self.compact)
+        timer.daemon = True
+        _compaction_timers[key] = timer
+        timer.start()
+
+    def compact(self) -> bool:
+        """
+        Fold journaled changes into devices.json and start a new journal
+
+        Returns:
+            True if successful (or nothing to compact), False otherwise
+        """
+        with _global_write_lock:
+            return self._compact_locked()
+
+    def _compact_locked(self) -> bool:
+        """Compact the journal (caller holds the lock)"""
+        timer = _compaction_timers.pop(str(self.devices_file), None)
+        if timer is not None:
+            timer.cancel()
+
+        state = self._committed_locked()
+        if state is None or not state["records"]:
+            return True
+        logger.info(f"Compacting {state['records']} journaled device change(s)")
+        return self._write_snapshot_locked(state["devices"])
+
+    def _write_backup_locked(self):
+        """Copy devices.json to the backup, through backup_transform if set"""
+        import shutil
+
+        if self.backup_transform is None:
+            shutil.copy2(self.devices_file, self.backup_file)
+            return
+
+        with open(self.devices_file, "r") as f:
+            devices = json.load(f)
+        temp_file = self.backup_file.with_name(self.backup_file.name + ".tmp")
+        with open(temp_file, "w") as f:
+            json.dump(self.backup_transform(devices), f, indent=2)
+        temp_file.replace(self.backup_file)
+
+    def _write_snapshot_locked(self, devices: Dict[str, Any]) -> bool:
+        """
+        Write devices.json with automatic backup and reset the journal
+
+        Caller holds _global_write_lock.
+
+        Args:
+            devices: Device data to save
+
+        Returns:
+            True if successful, False otherwise
+        """
+        import shutil
+
+        try:
+            # Create backup of existing file before modifying
+            if self.devices_file.exists():
+                try:
+                    self._write_backup_locked()
+                    logger.debug("Created backup of devices.json")
+                except Exception as e:
+                    logger.warning(f"Failed to create backup: {e}")
+                    # Continue anyway - backup failure shouldn't stop the save
+
+            # Write to temporary file first, then rename (atomic operation)
+            temp_file = self.devices_file.with_suffix(".tmp")
+            raw = json.dumps(devices, indent=2).encode("utf-8")
+
+            # Write and explicitly close before rename
+            with open(temp_file, "wb") as f:
+                f.write(raw)
+                f.flush()  # Ensure data is written
+                os.fsync(f.fileno())  # The journal is reset against this file
+            # File is now closed
+
+            # Small delay to ensure Windows releases the file handle
+            import time
+
+            time.sleep(0.01)
+
+            # Atomic rename with retry for Windows file locking issues
+            max_retries = 3
+            for attempt in range(max_retries):
+                try:
+                    temp_file.replace(self.devices_file)
+                    break
+                except PermissionError:
+                    if attempt < max_retries - 1:
+                        logger.warning(
+                            f"File locked, retrying... (attempt {attempt + 1}/{max_retries})"
+                        )
+                        time.sleep(0.1 * (attempt + 1))  # Exponential backoff
+                    else:
+                        raise
+
+            # A crash before this point leaves a journal whose base no longer
+            # matches devices.json, which is then ignored - its records are
+            # already part of the new snapshot
+            self.journal.reset(snapshot_hash(raw))
+            _committed_state[str(self.devices_file)] = {
+                "devices": json.loads(raw),
+                "records": 0,
+                "key": self._state_key(),
+            }
+            self._bump_generation()
+            logger.debug(f"Successfully saved devices.json")
+            return True
+        except Exception as e:
+            logger.error(f"Error saving devices: {e}")
+            _committed_state.pop(str(self.devices_file), None)
+            # Clean up temp file if it exists
+            temp_file = self.devices_file.with_suffix(".tmp")
+            if temp_file.exists():
+                try:
+                    temp_file.unlink()
+                except Exception:
+                    pass
+
+            # If save failed and we have a backup, restore it
+            if self.backup_file.exists() and not self.devices_file.exists():
+                logger.warning("Save failed - restoring from backup")
+                try:
+                    shutil.copy2(self.backup_file, self.devices_file)
+                    logger.info("Restored devices.json from backup after failed save")
+                except Exception as restore_error:
+                    logger.error(f"Failed to restore from backup: {restore_error}")
+
+            return False
+
+
+class SqliteDeviceBackend(DeviceStorageBackend):
+    """
+    SQLite storage with one row per device and per command
+
+    Device rows keep their JSON (with an empty "commands" placeholder so key
+    order survives) plus indexed copies of the INDEXED_FIELDS; command rows
+    are keyed by (device_id, name). Writes run in IMMEDIATE transactions and
+    the database uses WAL, so readers never block on a writer.
+    devices.json is imported on first start and can be exported on demand.
+    """
+
+    name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS devices (
+            device_id TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            broadlink_entity TEXT,
+            device_type TEXT,
+            area TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS commands (
+            device_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (device_id, name)
+        );
+        CREATE INDEX IF NOT EXISTS idx_devices_broadlink_entity
+            ON devices (broadlink_entity);
+        CREATE INDEX IF NOT EXISTS idx_devices_device_type ON devices (device_type);
+        CREATE INDEX IF NOT EXISTS idx_devices_area ON devices (area);
+        CREATE INDEX IF NOT EXISTS idx_commands_pending ON commands (device_id)
+            WHERE json_extract(data, '$.data') = 'pending';
+    """
+
+    def __init__(self, storage_path: Path):
+        """
+        Initialize SQLite storage
+
+        Args:
+            storage_path: Path to storage directory
+        """
+        self.storage_path = Path(storage_path)
+        self.db_file = self.storage_path / "devices.db"
+        self.devices_file = self.storage_path / "devices.json"
+        self.storage_file = self.db_file
+        self.version_files = (self.db_file, self.db_file.with_name("devices.db-wal"))
+        self._local = threading.local()
+
+        is_new = not self.db_file.exists()
+        self._connect().executescript(self.SCHEMA)
+        if is_new and self.devices_file.exists():
+            count = self.import_json(self.devices_file)
+            logger.info(f"Imported {count} device(s) from devices.json into SQLite")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection (sqlite3 connections are per-thread)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_file), timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self, write: bool = False):
+        """Run statements in one transaction (a consistent snapshot for reads)"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _assemble(device_rows, command_rows) -> Dict[str, Any]:
+        """Build device dicts from device and (position-ordered) command rows"""
+        devices = {device_id: json.loads(data) for device_id, data in device_rows}
+        for device_id, name, data in command_rows:
+            devices[device_id]["commands"][name] = json.loads(data)
+        return devices
+
+    def _load_all(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+        return self._assemble(
+            conn.execute("SELECT device_id, data FROM devices ORDER BY position"),
+            conn.execute(
+                "SELECT device_id, name, data FROM commands "
+                "ORDER BY device_id, position"
+            ),
+        )
+
+    def _load_one(
+        self, conn: sqlite3.Connection, device_id: str
+    ) -> Optional[Dict[str, Any]]:
+        devices = self._assemble(
+            conn.execute(
+                "SELECT device_id, data FROM devices WHERE device_id = ?", (device_id,)
+            ),
+            conn.execute(
+                "SELECT device_id, name, data FROM commands "
+                "WHERE device_id = ? ORDER BY position",
+                (device_id,),
+            ),
+        )
+        return devices.get(device_id)
+
+    def load_devices(self) -> Dict[str, Any]:
+        """Load all devices"""
+        with self._transaction() as conn:
+            return self._load_all(conn)
+
+    def load_device(self, device_id: str) -> Optional[Dict[str, Any]]:
+        """Load one device"""
+        with self._transaction() as conn:
+            return self._load_one(conn, device_id)
+
+    def find_devices(self, field: str, value: Any) -> Dict[str, Any]:
+        """Find devices through the index on field"""
+        if field not in self.INDEXED_FIELDS:
+            raise ValueError(f"Field is not indexed: {field}")
+        with self._transaction() as conn:
+            return self._assemble(
+                conn.execute(
+                    f"SELECT device_id, data FROM devices WHERE {field} = ? "
+                    "ORDER BY position",
+                    (value,),
+                ),
+                conn.execute(
+                    "SELECT c.device_id, c.name, c.data FROM commands c "
+                    f"JOIN devices d ON d.device_id = c.device_id WHERE d.{field} = ? "
+                    "ORDER BY c.device_id, c.position",
+                    (value,),
+                ),
+            )
+
+    def get_command(self, device_id: str, command_name: str) -> Optional[Any]:
+        """Load one command"""
+        row = (
+            self._connect()
+            .execute(
+                "SELECT data FROM commands WHERE device_id = ? AND name = ?",
+                (device_id, command_name),
+            )
+            .fetchone()
+        )
+        return json.loads(row[0]) if row else None
+
+    def find_pending_commands(self) -> List[Tuple[str, str, str]]:
+        """Find pending commands through the partial index on command rows"""
+        with self._transaction() as conn:
+            return [
+                (device_id, name if name is not None else device_id, command)
+                for device_id, name, command in conn.execute(
+                    "SELECT c.device_id, json_extract(d.data, '$.device_id'), c.name "
+                    "FROM commands c JOIN devices d ON d.device_id = c.device_id "
+                    "WHERE json_extract(c.data, '$.data') = 'pending' "
+                    "ORDER BY d.position, c.position"
+                )
+            ]
+
+    def save_devices(self, devices: Dict[str, Any]) -> bool:
+        """Replace all devices in one transaction, touching only changed rows"""
+        try:
+            with self._transaction(write=True) as conn:
+                records = diff_devices(self._load_all(conn), devices)
+                if records is None:
+                    # Devices were reordered - rewrite everything
+                    conn.execute("DELETE FROM commands")
+                    conn.execute("DELETE FROM devices")
+                    records = [
+                        {"op": "put", "id": device_id, "device": device}
+                        for device_id, device in devices.items()
+                    ]
+                for record in records:
+                    self._apply_record(conn, record)
+            self._bump_generation()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving devices: {e}")
+            return False
+
+    def save_device(self, device_id: str, device: Optional[Dict[str, Any]]) -> bool:
+        """Save one device in one transaction"""
+        try:
+            with self._transaction(write=True) as conn:
+                old = self._load_one(conn, device_id)
+                if device is None:
+                    records = [] if old is None else [{"op": "delete", "id": device_id}]
+                elif old is None:
+                    records = [{"op": "put", "id": device_id, "device": device}]
+                else:
+                    records = diff_devices({device_id: old}, {device_id: device})
+                for record in records:
+                    self._apply_record(conn, record)
+            if records:
+                self._bump_generation()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving device {device_id}: {e}")
+            return False
+
+    def _apply_record(self, conn: sqlite3.Connection, record: Dict[str, Any]):
+        """Apply one device_journal record as row changes"""
+        op = record["op"]
+        device_id = record["id"]
+
+        if op == "delete":
+            conn.execute("DELETE FROM commands WHERE device_id = ?", (device_id,))
+            conn.execute("DELETE FROM devices WHERE device_id = ?", (device_id,))
+            return
+
+        row = conn.execute(
+            "SELECT position, data FROM devices WHERE device_id = ?", (device_id,)
+        ).fetchone()
+
+        if op == "put":
+            device = record["device"]
+            if row is not None:
+                conn.execute("DELETE FROM commands WHERE device_id = ?", (device_id,))
+            self._write_device(conn, device_id, device, row[0] if row else None)
+            if isinstance(device, dict) and isinstance(device.get("commands"), dict):
+                self._insert_commands(conn, device_id, device["commands"])
+            return
+
+        # patch: the device row keeps its position and command placeholder
+        device = json.loads(row[1])
+        for key in record.get("unset", []):
+            device.pop(key, None)
+            if key == "commands":
+                conn.execute("DELETE FROM commands WHERE device_id = ?", (device_id,))
+        for key, value in record.get("set", {}).items():
+            device[key] = value
+            if key == "commands":
+                conn.execute("DELETE FROM commands WHERE device_id = ?", (device_id,))
+                if isinstance(value, dict):
+                    self._insert_commands(conn, device_id, value)
+        for name in record.get("commands_unset", []):
+            conn.execute(
+                "DELETE FROM commands WHERE device_id = ? AND name = ?",
+                (device_id, name),
+            )
+        for name, command in record.get("commands_set", {}).items():
+            updated = conn.execute(
+                "UPDATE commands SET data = ? WHERE device_id = ? AND name = ?",
+                (json.dumps(command), device_id, name),
+            )
+            if not updated.rowcount:
+                self._insert_commands(conn, device_id, {name: command})
+        self._write_device(conn, device_id, device, row[0])
+
+    def _write_device(
+        self,
+        conn: sqlite3.Connection,
+        device_id: str,
+        device: Any,
+        position: Optional[int],
+    ):
+        """Insert or update a device row (without its command rows)"""
+        if position is None:
+            position = conn.execute(
+                "SELECT COALESCE(MAX(position), -1) + 1 FROM devices"
+            ).fetchone()[0]
+
+        fields = {}
+        if isinstance(device, dict):
+            fields = {
+                field: device.get(field, default)
+                for field, default in self.INDEXED_FIELDS.items()
+            }
+            if isinstance(device.get("commands"), dict):
+                device = {**device, "commands": {}}
+
+        conn.execute(
+            "INSERT INTO devices "
+            "(device_id, position, broadlink_entity, device_type, area, data) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (device_id) DO UPDATE SET "
+            "broadlink_entity = excluded.broadlink_entity, "
+            "device_type = excluded.device_type, area = excluded.area, "
+            "data = excluded.data",
+            (
+                device_id,
+                position,
+                fields.get("broadlink_entity"),
+                fields.get("device_type"),
+                fields.get("area"),
+                json.dumps(device),
+            ),
+        )
+
+    @staticmethod
+    def _insert_commands(
+        conn: sqlite3.Connection, device_id: str, commands: Dict[str, Any]
+    ):
+        """Append command rows after the device's existing commands"""
+        start = conn.execute(
+            "SELECT COALESCE(MAX(position), -1) + 1 FROM commands WHERE device_id = ?",
+            (device_id,),
+        ).fetchone()[0]
+        conn.executemany(
+            "INSERT INTO commands (device_id, name, position, data) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (device_id, name, start + offset, json.dumps(command))
+                for offset, (name, command) in enumerate(commands.items())
+            ],
+        )
+
+    def compact(self) -> bool:
+        """Checkpoint the WAL into the database file"""
+        try:
+            self._connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error checkpointing device database: {e}")
+            return False
+
+
+STORAGE_BACKENDS = {
+    JsonDeviceBackend.name: JsonDeviceBackend,
+    SqliteDeviceBackend.name: SqliteDeviceBackend,
+}
+
+
+def create_backend(name: str, storage_path: Path) -> DeviceStorageBackend:
+    """
+    Create a storage backend by name
+
+    Args:
+        name: Backend name (see STORAGE_BACKENDS)
+        storage_path: Path to storage directory
+
+    Returns:
+        Storage backend instance
+    """
+    if name not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend: {name}")
+    return STORAGE_BACKENDS[name](storage_path)
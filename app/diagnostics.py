@@ -8,6 +8,9 @@ import logging
 import platform
 import sys
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
@@ -17,10 +20,41 @@ import yaml
 
 logger = logging.getLogger(__name__)
 
+# Sections that do not change while the add-on runs, cached across requests
+_static_sections: Dict[str, Any] = {}
+_static_sections_lock = threading.Lock()
+
 
 class DiagnosticsCollector:
     """Collect diagnostic information for troubleshooting"""
 
+    # (section, collector method, timeout in seconds) in report order
+    COLLECTORS = [
+        ("system", "_collect_system_info", 5),
+        ("dependencies", "_collect_dependencies", 5),
+        ("configuration", "_collect_configuration", 5),
+        ("environment", "_collect_environment", 5),
+        ("devices", "_collect_device_info", 10),
+        ("integrations", "_collect_integration_status", 5),
+        ("ha_connection", "_collect_ha_connection", 10),
+        ("broadlink_devices", "_collect_broadlink_devices", 10),
+        ("storage", "_collect_storage_info", 10),
+        ("backups", "_collect_backup_status", 5),
+        ("permissions", "_collect_permissions", 5),
+        ("command_structure", "_collect_command_structure", 10),
+        ("command_analysis", "_collect_command_analysis", 10),
+        ("smartir_profiles", "_collect_smartir_profiles", 10),
+        ("errors", "_collect_recent_errors", 5),
+        ("startup", "_collect_startup", 5),
+    ]
+
+    # Sections served from the static cache, and how long they stay cached
+    STATIC_SECTIONS = {"system", "dependencies", "environment", "integrations"}
+    STATIC_CACHE_TTL = 300
+
+    # Lines read from the end of the log file
+    LOG_TAIL_LINES = 100
+
     def __init__(
         self,
         storage_path: str,
@@ -50,26 +84,83 @@ class DiagnosticsCollector:
         """
         Collect all diagnostic information
 
+        Collectors run concurrently, each with its own timeout. A collector
+        that does not finish in time is reported as an error section and the
+        result is marked partial instead of stalling the whole report.
+
         Returns:
             Dictionary containing all diagnostic data
         """
-        return {
-            "timestamp": datetime.now().isoformat(),
-            "system": self._collect_system_info(),
-            "dependencies": self._collect_dependencies(),
-            "configuration": self._collect_configuration(),
-            "environment": self._collect_environment(),
-            "devices": self._collect_device_info(),
-            "integrations": self._collect_integration_status(),
-            "ha_connection": self._collect_ha_connection(),
-            "broadlink_devices": self._collect_broadlink_devices(),
-            "storage": self._collect_storage_info(),
-            "backups": self._collect_backup_status(),
-            "permissions": self._collect_permissions(),
-            "command_structure": self._collect_command_structure(),
-            "smartir_profiles": self._collect_smartir_profiles(),
-            "errors": self._collect_recent_errors(),
-        }
+        data: Dict[str, Any] = {"timestamp": datetime.now().isoformat()}
+        incomplete = []
+
+        executor = ThreadPoolExecutor(
+            max_workers=len(self.COLLECTORS), thread_name_prefix="diagnostics"
+        )
+        try:
+            started = time.monotonic()
+            futures = [
+                (
+                    section,
+                    timeout,
+                    executor.submit(self._collect_section, section, method_name),
+                )
+                for section, method_name, timeout in self.COLLECTORS
+            ]
+
+            for section, timeout, future in futures:
+                remaining = max(0.0, started + timeout - time.monotonic())
+                try:
+                    data[section] = future.result(timeout=remaining)
+                except FutureTimeoutError:
+                    logger.warning(
+                        f"Diagnostics collector '{section}' timed out after {timeout}s"
+                    )
+                    data[section] = {
+                        "error": f"Timed out after {timeout}s",
+                        "timed_out": True,
+                    }
+                    incomplete.append(section)
+                except Exception as e:
+                    logger.error(f"Diagnostics collector '{section}' failed: {e}")
+                    data[section] = {"error": str(e)}
+                    incomplete.append(section)
+        finally:
+            # Do not wait for collectors that are still stuck (e.g., HA calls)
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        data["partial"] = bool(incomplete)
+        if incomplete:
+            data["incomplete_sections"] = incomplete
+        return data
+
+    def _collect_section(self, section: str, method_name: str) -> Dict[str, Any]:
+        """
+        Run one collector, serving static sections from a short-lived cache
+
+        Args:
+            section: Section name in the report
+            method_name: Name of the collector method
+
+        Returns:
+            Section data
+        """
+        collector = getattr(self, method_name)
+        if section not in self.STATIC_SECTIONS:
+            return collector()
+
+        now = time.monotonic()
+        with _static_sections_lock:
+            cached = _static_sections.get(section)
+            if cached and cached[0] > now:
+                return cached[1]
+
+        result = collector()
+        # Failed collections are retried on the next request
+        if not result.get("error"):
+            with _static_sections_lock:
+                _static_sections[section] = (now + self.STATIC_CACHE_TTL, result)
+        return result
 
     def _get_app_version(self) -> str:
         """Get app version from config.yaml"""
@@ -118,6 +209,7 @@ class DiagnosticsCollector:
                 "colorlog",
                 "python-dateutil",
                 "python-dotenv",
+                "numpy",
             ]
 
             dependencies = {}
@@ -372,6 +464,9 @@ class DiagnosticsCollector:
                 files_to_check = [
                     "devices.json",
                     "devices.json.backup",
+                    "devices.journal",
+                    "payloads.pack",
+                    "payloads.idx",
                     "package.yaml",
                     "helpers.yaml",
                 ]
@@ -566,6 +661,19 @@ class DiagnosticsCollector:
             logger.error(f"Error collecting command structure: {e}")
             return {"error": str(e)}
 
+    def _collect_command_analysis(self) -> Dict[str, Any]:
+        """Decoded pulse figures over all learned codes (no actual codes)"""
+        from pulse_decoder import decode_packets, summarize
+
+        if not self.device_manager:
+            return {"note": "Device manager not available"}
+        packets = [raw for _, _, raw in self.device_manager.iter_command_bytes()]
+        analysis = summarize(decode_packets(packets))
+        analysis["duplicate_groups"] = len(
+            self.device_manager.find_duplicate_commands()
+        )
+        return analysis
+
     def _collect_smartir_profiles(self) -> Dict[str, Any]:
         """Collect SmartIR profile statistics"""
         try:
@@ -603,6 +711,19 @@ class DiagnosticsCollector:
             logger.error(f"Error collecting SmartIR profiles: {e}")
             return {"error": str(e)}
 
+    def _collect_startup(self) -> Dict[str, Any]:
+        """Startup time breakdown and which lazy subsystems are loaded"""
+        from startup import LazySubsystem, startup_timer
+
+        info = startup_timer.summary()
+        if self.web_server:
+            info["subsystems"] = {
+                name: value.lazy_loaded
+                for name, value in vars(self.web_server).items()
+                if isinstance(value, LazySubsystem)
+            }
+        return info
+
     def _collect_recent_errors(self) -> Dict[str, Any]:
         """Collect recent errors from logs"""
         try:
@@ -625,9 +746,7 @@ class DiagnosticsCollector:
 
             if log_file:
                 try:
-                    # Read last 100 lines
-                    with open(log_file, "r") as f:
-                        lines = f.readlines()[-100:]
+                    lines = self._tail_lines(log_file, self.LOG_TAIL_LINES)
 
                     # Extract errors and warnings
                     for line in lines:
@@ -650,6 +769,39 @@ class DiagnosticsCollector:
             logger.error(f"Error collecting recent errors: {e}")
             return {"error": str(e)}
 
+    @staticmethod
+    def _tail_lines(path: Path, count: int, block_size: int = 8192) -> List[str]:
+        """
+        Read the last lines of a file by seeking backwards from the end
+
+        Only the blocks holding the requested lines are read, so the cost does
+        not grow with the size of the log file.
+
+        Args:
+            path: File to read
+            count: Number of lines to return
+            block_size: Bytes read per backwards step
+
+        Returns:
+            Last `count` lines (without line endings)
+        """
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            data = b""
+            # One extra newline so the first kept line is complete
+            while position > 0 and data.count(b"\n") <= count:
+                step = min(block_size, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+
+        lines = data.decode("utf-8", errors="replace").splitlines()
+        if position > 0:
+            # Drop the partial line cut at the block boundary
+            lines = lines[1:]
+        return lines[-count:]
+
     def sanitize_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Sanitize diagnostic data to remove sensitive information
@@ -693,6 +845,17 @@ class DiagnosticsCollector:
             f"**Generated:** {data['timestamp']}",
             f"**App Version:** {data['system'].get('app_version', 'Unknown')}",
             "",
+        ]
+        if data.get("partial"):
+            lines.extend(
+                [
+                    "> ⚠️ **Partial report:** "
+                    f"{', '.join(data.get('incomplete_sections', []))} "
+                    "could not be collected",
+                    "",
+                ]
+            )
+        lines += [
             "## System Information",
             f"- **Platform:** {data['system'].get('platform', 'Unknown')}",
             f"- **Python Version:** {data['system'].get('python_version', 'Unknown')}",
@@ -852,6 +1015,8 @@ class DiagnosticsCollector:
         if data.get("backups"):
             lines.append("### Backups")
             for backup_name, backup_info in data["backups"].items():
+                if not isinstance(backup_info, dict):
+                    continue
                 if backup_info.get("exists"):
                     age = backup_info.get("age_hours", 0)
                     legacy_tag = " (legacy)" if backup_info.get("legacy") else ""
@@ -884,13 +1049,47 @@ class DiagnosticsCollector:
             lines.append("## Command Files")
             total_commands = 0
             for device_id, cmd_info in data["command_structure"].items():
-                if "error" not in cmd_info:
+                if isinstance(cmd_info, dict) and "error" not in cmd_info:
                     count = cmd_info.get("command_count", 0)
                     total_commands += count
                     lines.append(f"- **{device_id}:** {count} commands")
             lines.append(f"\n**Total Commands:** {total_commands}")
             lines.append("")
 
+        # Startup
+        startup = data.get("startup") or {}
+        if startup.get("ready_ms") is not None:
+            lines.append("## Startup")
+            lines.append(f"- **Ready after:** {startup['ready_ms']:.0f} ms")
+            if startup.get("warm_ms") is not None:
+                lines.append(f"- **Warm-up finished:** {startup['warm_ms']:.0f} ms")
+            for name, ms in startup.get("phases", {}).items():
+                lines.append(f"- {name}: {ms:.0f} ms")
+            for name, ms in startup.get("lazy", {}).items():
+                lines.append(f"- {name} (first use): {ms:.0f} ms")
+            lines.append("")
+
+        # Command analysis
+        analysis = data.get("command_analysis") or {}
+        if analysis.get("decoded"):
+            lines.append("## Command Analysis")
+            lines.append(f"- **Decoded Codes:** {analysis['decoded']}")
+            if analysis.get("undecodable"):
+                lines.append(f"- **Undecodable:** {analysis['undecodable']}")
+            for band, count in analysis.get("bands", {}).items():
+                lines.append(f"- {band}: {count}")
+            for key, label in (("pulses", "Pulses"), ("duration_ms", "Duration (ms)")):
+                spread = analysis.get(key)
+                if spread:
+                    lines.append(
+                        f"- **{label}:** {spread['min']} / {spread['median']} / {spread['max']} (min / median / max)"
+                    )
+            lines.append(f"- **With Repeat Count:** {analysis.get('with_repeat', 0)}")
+            lines.append(f"- **Multi-frame:** {analysis.get('multi_frame', 0)}")
+            if "duplicate_groups" in analysis:
+                lines.append(f"- **Duplicate Groups:** {analysis['duplicate_groups']}")
+            lines.append("")
+
         # Errors and Warnings
         if data.get("errors"):
             errors = data["errors"]
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Direct Learning for Broadlink Manager Add-on
+Learning flow shared by the direct learn endpoints and the async server
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LEARN_TIMEOUT = 30
+
+
+def sse(event: Dict[str, Any]) -> str:
+    """Server-sent event line for a learning event (without the HTTP code)"""
+    payload = {key: value for key, value in event.items() if key != "code"}
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def learn_direct_result(event: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """JSON body and HTTP status for the last learning event"""
+    if event["status"] != "complete":
+        return {"success": False, "error": event["message"]}, event["code"]
+    result = {"success": True}
+    for key in (
+        "command_name",
+        "command_type",
+        "data",
+        "data_length",
+        "frequency",
+        "similar_to",
+        "capture_issues",
+    ):
+        if key in event:
+            result[key] = event[key]
+    return result, 200
+
+
+def _error(message: str, code: int) -> Dict[str, Any]:
+    return {"status": "error", "message": message, "code": code}
+
+
+async def learn_direct_events(
+    web_server, data: Dict[str, Any]
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Learn a command directly from the Broadlink device, yielding progress
+
+    Events are {"status", "message", ...}. The last one has status
+    "complete" (with the learned data) or "error" with an HTTP "code".
+    Device and storage calls run in the default executor; waiting for the
+    button press does not hold a thread.
+    """
+    from broadlink_learner import BroadlinkLearner
+    from broadlink_device_manager import BroadlinkDeviceManager
+
+    loop = asyncio.get_running_loop()
+    device_id = data.get("device_id")
+    entity_id = data.get("entity_id")
+    command_name = data.get("command_name")
+    command_type = data.get("command_type", "ir")
+    rf_frequency = data.get("rf_frequency")  # Optional fixed RF frequency in MHz
+    if rf_frequency is not None:
+        try:
+            rf_frequency = float(rf_frequency)
+        except (ValueError, TypeError):
+            rf_frequency = None
+
+    try:
+        yield {"status": "starting", "message": "Initializing..."}
+
+        if not all([device_id, entity_id, command_name]):
+            yield _error(
+                "Missing required fields: device_id, entity_id, command_name", 400
+            )
+            return
+        if command_type not in ("ir", "rf"):
+            yield _error('Invalid command_type. Must be "ir" or "rf"', 400)
+            return
+
+        # Get device connection info (try cache first)
+        connection_info = web_server.get_cached_connection_info(entity_id)
+        if connection_info:
+            yield {"status": "connecting", "message": "Using cached connection..."}
+        else:
+            yield {"status": "connecting", "message": "Connecting to device..."}
+            device_manager_bl = BroadlinkDeviceManager(
+                web_server.ha_url,
+                web_server.ha_token,
+                str(web_server.config_loader.get_config_path()),
+            )
+            connection_info = await loop.run_in_executor(
+                None, device_manager_bl.get_device_connection_info, entity_id
+            )
+            if connection_info:
+                # Cache for future use
+                web_server.cache_connection_info(entity_id, connection_info)
+
+        if not connection_info:
+            yield _error(f"Could not get connection info for {entity_id}", 404)
+            return
+
+        learner = BroadlinkLearner(
+            host=connection_info["host"],
+            mac=connection_info["mac_bytes"],
+            device_type=connection_info["type"],
+        )
+        if not await loop.run_in_executor(None, learner.authenticate):
+            yield _error("Failed to authenticate with device", 500)
+            return
+
+        yield {
+            "status": "ready",
+            "message": f"Ready to learn {command_type.upper()} command",
+        }
+        logger.info(
+            f"Learning {command_type} command '{command_name}' for device {device_id}"
+        )
+
+        frequency: Optional[float] = None
+        if command_type == "rf":
+            progress = []
+
+            def progress_handler(message, step):
+                progress.append((message, step))
+
+            if rf_frequency is not None:
+                yield {
+                    "status": "learning",
+                    "message": f"Using fixed frequency {rf_frequency} MHz - press your remote button now...",
+                    "step": "capture",
+                }
+                learning = learner.learn_rf_command_fixed_frequency_async(
+                    frequency=rf_frequency,
+                    timeout=LEARN_TIMEOUT,
+                    progress_callback=progress_handler,
+                )
+            else:
+                learning = learner.learn_rf_command_async(
+                    timeout=LEARN_TIMEOUT, progress_callback=progress_handler
+                )
+
+            task = asyncio.ensure_future(learning)
+            try:
+                sent = 0
+                while not task.done() or sent < len(progress):
+                    for message, step in progress[sent:]:
+                        yield {"status": "learning", "message": message, "step": step}
+                    sent = len(progress)
+                    if not task.done():
+                        await asyncio.wait({task}, timeout=0.5)
+            finally:
+                # Client went away mid-learn
+                task.cancel()
+
+            result = task.result()
+            if not result:
+                yield _error(
+                    f"Timeout - no RF signal detected within {LEARN_TIMEOUT} seconds",
+                    408,
+                )
+                return
+            base64_data, frequency = result
+            yield {
+                "status": "captured",
+                "message": f"RF command captured at {frequency} MHz",
+                "frequency": frequency,
+            }
+        else:
+            yield {
+                "status": "learning",
+                "message": "Waiting for IR signal...",
+                "step": "capture",
+            }
+            base64_data = await learner.learn_ir_command_async(timeout=LEARN_TIMEOUT)
+            if not base64_data:
+                yield _error(
+                    f"Timeout - no IR signal detected within {LEARN_TIMEOUT} seconds",
+                    408,
+                )
+                return
+            yield {"status": "captured", "message": "IR command captured"}
+
+        yield {"status": "saving", "message": "Saving command..."}
+
+        device_manager = web_server.device_manager
+        success = await loop.run_in_executor(
+            None,
+            lambda: device_manager.add_learned_command(
+                device_id=device_id,
+                command_name=command_name,
+                command_data=base64_data,
+                command_type=command_type,
+                frequency=frequency,
+            ),
+        )
+        if not success:
+            yield _error("Failed to save command to storage", 500)
+            return
+
+        # Also update connection info in device
+        await loop.run_in_executor(
+            None,
+            device_manager.update_device_connection_info,
+            device_id,
+            {
+                "host": connection_info["host"],
+                "mac": connection_info["mac"],
+                "type": connection_info["type"],
+                "type_hex": connection_info["type_hex"],
+                "model": connection_info["model"],
+            },
+        )
+
+        logger.info(
+            f"Successfully learned command '{command_name}' ({len(base64_data)} chars)"
+        )
+        complete = {
+            "status": "complete",
+            "message": "Command learned successfully!",
+            "command_name": command_name,
+            "command_type": command_type,
+            "data": base64_data,
+            "data_length": len(base64_data),
+        }
+        if frequency:
+            complete["frequency"] = frequency
+        findings = await loop.run_in_executor(
+            None,
+            device_manager.check_learned_command,
+            device_id,
+            command_name,
+            base64_data,
+        )
+        similar = findings["similar_to"]
+        if similar:
+            # Likely the wrong button, or one learned before under another name
+            complete["similar_to"] = similar
+            names = ", ".join(
+                f"{match['device_id']}/{match['command']}" for match in similar
+            )
+            complete["message"] += f" It closely matches {names}."
+        issues = findings["capture_issues"]
+        if issues:
+            from code_similarity import CAPTURE_ISSUES
+
+            complete["capture_issues"] = issues
+            reasons = "; ".join(CAPTURE_ISSUES[issue] for issue in issues)
+            complete[
+                "message"
+            ] += f" The capture looks noisy ({reasons}); consider learning it again."
+        yield complete
+
+    except Exception as e:
+        logger.error(f"Error learning command: {e}", exc_info=True)
+        yield _error(str(e), 500)
+
+
+def iterate_blocking(events: AsyncIterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Drive an async event generator from a WSGI worker on a private loop"""
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(events.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(events.aclose())
+        loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
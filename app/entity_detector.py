@@ -11,6 +11,13 @@ from collections import defaultdict
 
 logger = logging.getLogger(__name__)
 
+# Roles whose pattern captures a number that becomes part of the role
+_NUMBERED_ROLES = ("speed", "temperature", "position")
+
+# Pattern bodies that are plain literals, or an alternation of literals
+_LITERAL_BODY = re.compile(r"^[a-z0-9_]+$")
+_LITERAL_ALTERNATION = re.compile(r"^\(([a-z0-9_]+(?:\|[a-z0-9_]+)+)\)$")
+
 
 class EntityDetector:
     """Detect entity types and command roles from command names"""
@@ -125,6 +132,62 @@ class EntityDetector:
         (r"^tilt_down$", "cover", "close_tilt"),
     ]
 
+    # Maximum number of memoized detection results
+    DETECT_CACHE_SIZE = 8192
+
+    def __init__(self):
+        """Initialize entity detector"""
+        self._compiled = self._compile_patterns(self.PATTERNS)
+        self._detect_cache: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+
+    @staticmethod
+    def _compile_patterns(patterns: List[Tuple[str, str, str]]) -> Dict[str, Any]:
+        """
+        Compile the pattern table for single-pass classification
+
+        Literal patterns go into an exact-match dict, the rest into one
+        alternation regex with a named group per pattern. Each entry keeps
+        its table index so the first matching pattern still wins.
+
+        Args:
+            patterns: List of (regex, entity_type, command_role)
+
+        Returns:
+            Dict with 'exact' ({name: index}), 'combined' (regex or None),
+            and 'regexes' ({index: compiled pattern})
+        """
+        exact: Dict[str, int] = {}
+        regexes: Dict[int, "re.Pattern[str]"] = {}
+        alternatives = []
+
+        for index, (pattern, _, _) in enumerate(patterns):
+            body = pattern
+            if body.startswith("^") and body.endswith("$"):
+                body = body[1:-1]
+
+            alternation = _LITERAL_ALTERNATION.match(body)
+            if _LITERAL_BODY.match(body):
+                exact.setdefault(body, index)
+            elif alternation:
+                for literal in alternation.group(1).split("|"):
+                    exact.setdefault(literal, index)
+            else:
+                regexes[index] = re.compile(pattern)
+                alternatives.append(f"(?P<p{index}>{body})")
+
+        # A literal shadowed by an earlier regex pattern resolves to that pattern
+        for name, index in exact.items():
+            for regex_index, regex in regexes.items():
+                if regex_index < index and regex.match(name):
+                    exact[name] = regex_index
+                    break
+
+        return {
+            "exact": exact,
+            "combined": re.compile("|".join(alternatives)) if alternatives else None,
+            "regexes": regexes,
+        }
+
     def detect(self, command_name: str) -> Tuple[Optional[str], Optional[str]]:
         """
         Detect entity type and command role from command name
@@ -137,31 +200,52 @@ class EntityDetector:
         """
         command_lower = command_name.lower().strip()
 
-        for pattern, entity_type, command_role in self.PATTERNS:
-            match = re.match(pattern, command_lower)
+        cached = self._detect_cache.get(command_lower)
+        if cached is not None:
+            return cached
+
+        result = self._classify(command_lower)
+        if result[0]:
+            logger.debug(f"Detected '{command_name}' as {result[0]}.{result[1]}")
+        else:
+            logger.debug(f"No pattern match for command: {command_name}")
+
+        if len(self._detect_cache) >= self.DETECT_CACHE_SIZE:
+            self._detect_cache.clear()
+        self._detect_cache[command_lower] = result
+        return result
+
+    def _classify(self, command_lower: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Classify a normalized command name against the compiled patterns
+
+        Args:
+            command_lower: Lowercased, stripped command name
+
+        Returns:
+            Tuple of (entity_type, command_role) or (None, None) if no match
+        """
+        compiled = self._compiled
+        index = compiled["exact"].get(command_lower)
+
+        if index is None and compiled["combined"] is not None:
+            match = compiled["combined"].fullmatch(command_lower)
             if match:
-                # Handle speed numbers for fans
-                if command_role == "speed" and match.groups():
-                    speed_num = match.group(1)
-                    return entity_type, f"speed_{speed_num}"
-
-                # Handle temperature numbers for climate
-                if command_role == "temperature" and match.groups():
-                    temp_num = match.group(1)
-                    return entity_type, f"temperature_{temp_num}"
-
-                # Handle position numbers for covers
-                if command_role == "position" and match.groups():
-                    position_num = match.group(1)
-                    return entity_type, f"position_{position_num}"
-
-                logger.debug(
-                    f"Detected '{command_name}' as {entity_type}.{command_role}"
-                )
-                return entity_type, command_role
+                index = int(match.lastgroup[1:])
+
+        if index is None:
+            return None, None
+
+        _, entity_type, command_role = self.PATTERNS[index]
+
+        # Numbered roles carry the captured value (speed_3, temperature_22, ...)
+        regex = compiled["regexes"].get(index)
+        if command_role in _NUMBERED_ROLES and regex is not None:
+            match = regex.match(command_lower)
+            if match and match.groups():
+                return entity_type, f"{command_role}_{match.group(1)}"
 
-        logger.debug(f"No pattern match for command: {command_name}")
-        return None, None
+        return entity_type, command_role
 
     def group_commands_by_entity(
         self,
@@ -4,15 +4,108 @@ Entity Generator for Broadlink Manager Add-on
 Generates Home Assistant YAML entity configurations
 """
 
+import hashlib
+import json
 import logging
+import math
+import multiprocessing
+import os
 import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 from datetime import datetime
-import yaml
+
+from yaml_serializer import content_hash, fragment_cache
 
 logger = logging.getLogger(__name__)
 
+# Built per-entity blocks keyed by the entity's content hash. Shared across
+# generator instances because a new generator is created for every request.
+_ENTITY_BLOCK_CACHE_SIZE = 4096
+_entity_block_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_entity_block_lock = threading.Lock()
+
+# Number of entities to (re)build from which blocks are built in a process
+# pool, when parallel builds are enabled (off by default)
+PARALLEL_BUILD_THRESHOLD = 500
+
+
+def available_cpus() -> int:
+    """
+    CPUs this process may actually use
+
+    os.cpu_count() reports the host's CPUs. In an add-on container the
+    CPU affinity mask and the cgroup CPU quota are what limit the process.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpus = os.cpu_count() or 1
+
+    quota = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        limit, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if limit != "max":
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: quota is -1 when unlimited
+            limit = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+            period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+            if limit > 0 and period > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    if quota is not None:
+        cpus = min(cpus, max(1, int(quota)))
+    return max(1, cpus)
+
+
+def _init_build_worker(log_level: int):
+    """Configure logging in a spawned build worker like the main process"""
+    logging.basicConfig(
+        level=log_level,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+
+def _build_blocks_chunk(
+    default_device_id: Optional[str], items: List[tuple]
+) -> List[tuple]:
+    """
+    Build entity and helper blocks for a chunk of entities (process pool worker)
+
+    Args:
+        default_device_id: Default Broadlink entity of the parent generator
+        items: List of (entity_hash, entity_id, entity_data, device_commands)
+
+    Returns:
+        List of (entity_hash, block) in input order
+    """
+    generator = EntityGenerator(None, default_device_id)
+    generator.validation_warnings = []
+    built = []
+    for entity_hash, entity_id, entity_data, device_commands in items:
+        # Builders only read the commands of the entity's own device
+        broadlink_commands = {entity_data.get("device"): device_commands}
+        built.append(
+            (
+                entity_hash,
+                {
+                    "entities": generator._build_entity_block(
+                        entity_id, entity_data, broadlink_commands
+                    ),
+                    "helpers": generator._build_entity_helpers(entity_id, entity_data),
+                },
+            )
+        )
+    return built
+
 
 def sanitize_slug(name: str) -> str:
     """
@@ -39,16 +132,29 @@ def sanitize_slug(name: str) -> str:
 class EntityGenerator:
     """Generate Home Assistant entity YAML configurations"""
 
-    def __init__(self, storage_manager, broadlink_device_id: str = None):
+    def __init__(
+        self,
+        storage_manager,
+        broadlink_device_id: str = None,
+        parallel_threshold: Optional[int] = None,
+        max_workers: Optional[int] = None,
+    ):
         """
         Initialize entity generator
 
         Args:
             storage_manager: StorageManager instance
             broadlink_device_id: Optional default HA device ID for the Broadlink device (for backward compatibility)
+            parallel_threshold: Entities to build from which a process pool is used
+                                (default None: always serial; see PARALLEL_BUILD_THRESHOLD)
+            max_workers: Process pool size (defaults to the CPUs available to the container)
         """
         self.storage = storage_manager
         self.default_device_id = broadlink_device_id
+        self.parallel_threshold = parallel_threshold
+        self.max_workers = max_workers
+        # Blocks built by the process pool for the current generation
+        self._prebuilt_blocks: Dict[str, Dict[str, Any]] = {}
 
     def _detect_color_temp_variants(
         self, commands: Dict[str, Any]
@@ -178,24 +284,51 @@ class EntityGenerator:
                     "entities_count": 0,
                 }
 
+            # Hash each entity's inputs; unchanged entities reuse their built blocks
+            entity_hashes = self._compute_entity_hashes(entities, broadlink_commands)
+            changed_entities = self._diff_generation_state(entity_hashes)
+
+            # Large rebuilds are built in parallel, then merged in entity order
+            self._prebuild_blocks(entities, broadlink_commands, entity_hashes)
+
             # Build YAML structures
-            entities_yaml = self._build_entities_yaml(entities, broadlink_commands)
-            helpers_yaml = self._build_helpers_yaml(entities)
+            try:
+                entities_yaml = self._build_entities_yaml(
+                    entities, broadlink_commands, entity_hashes
+                )
+                helpers_yaml = self._build_helpers_yaml(entities, entity_hashes)
+            finally:
+                self._prebuilt_blocks = {}
 
             # Merge entities and helpers for packages compatibility
             package_yaml = {**entities_yaml, **helpers_yaml}
 
-            # Write files
-            self._write_yaml_file(self.storage.helpers_file, helpers_yaml)
-            self._write_yaml_file(self.storage.package_file, package_yaml)
+            # Write files (skipped when the content is unchanged)
+            files_written = []
+            if self._write_yaml_file(self.storage.helpers_file, helpers_yaml):
+                files_written.append(str(self.storage.helpers_file))
+            if self._write_yaml_file(self.storage.package_file, package_yaml):
+                files_written.append(str(self.storage.package_file))
 
             # If an alternate output path is configured, write package.yaml there too
             package_output_path = getattr(self.storage, "package_output_path", None)
             if package_output_path:
-                self._write_yaml_file(package_output_path, package_yaml)
+                if self._write_yaml_file(package_output_path, package_yaml):
+                    files_written.append(str(package_output_path))
+                    logger.info(
+                        f"Written package.yaml to alternate path: {package_output_path}"
+                    )
+
+            self._save_generation_state(entity_hashes)
+
+            if files_written:
                 logger.info(
-                    f"Written package.yaml to alternate path: {package_output_path}"
+                    f"Entity changes: {len(changed_entities['added'])} added, "
+                    f"{len(changed_entities['modified'])} modified, "
+                    f"{len(changed_entities['removed'])} removed"
                 )
+            else:
+                logger.info("Generated entity files are unchanged - nothing written")
 
             # Update last generated timestamp
             timestamp = datetime.now().isoformat()
@@ -221,6 +354,9 @@ class EntityGenerator:
                 "timestamp": timestamp,
                 "instructions": self._get_setup_instructions(),
                 "validation_warnings": getattr(self, "validation_warnings", []),
+                "changed": bool(files_written),
+                "files_written": files_written,
+                "changed_entities": changed_entities,
             }
 
         except Exception as e:
@@ -231,10 +367,205 @@ class EntityGenerator:
                 "entities_count": 0,
             }
 
+    def _compute_entity_hashes(
+        self,
+        entities: Dict[str, Dict[str, Any]],
+        broadlink_commands: Dict[str, Dict[str, str]],
+    ) -> Dict[str, str]:
+        """
+        Hash the inputs of every enabled entity
+
+        The hash covers the entity metadata (type, commands, settings), the
+        command payloads of its device and the default Broadlink device, which
+        is everything the builders read.
+
+        Args:
+            entities: Entity metadata
+            broadlink_commands: Dict of {device_name: {command_name: command_code}}
+
+        Returns:
+            Dict of {entity_id: content hash}
+        """
+        hashes = {}
+        for entity_id, entity_data in entities.items():
+            if not entity_data.get("enabled", True):
+                continue
+            hashes[entity_id] = content_hash(
+                entity_id,
+                entity_data,
+                broadlink_commands.get(entity_data.get("device"), {}),
+                self.default_device_id,
+            )
+        return hashes
+
+    def _get_generation_state_file(self) -> Path:
+        """Get path of the per-entity hash record kept next to package.yaml"""
+        return Path(self.storage.package_file).parent / "generation_state.json"
+
+    def _diff_generation_state(self, entity_hashes: Dict[str, str]) -> Dict[str, List]:
+        """
+        Compare entity hashes with the last generation
+
+        Args:
+            entity_hashes: Current {entity_id: hash}
+
+        Returns:
+            Dict with sorted 'added', 'modified' and 'removed' entity IDs
+        """
+        previous = {}
+        state_file = self._get_generation_state_file()
+        if state_file.exists():
+            try:
+                with open(state_file, "r") as f:
+                    previous = json.load(f).get("entities", {})
+            except Exception as e:
+                logger.warning(f"Could not read generation state: {e}")
+
+        return {
+            "added": sorted(k for k in entity_hashes if k not in previous),
+            "modified": sorted(
+                k
+                for k, h in entity_hashes.items()
+                if k in previous and previous[k] != h
+            ),
+            "removed": sorted(k for k in previous if k not in entity_hashes),
+        }
+
+    def _save_generation_state(self, entity_hashes: Dict[str, str]):
+        """Record entity hashes of this generation"""
+        state_file = self._get_generation_state_file()
+        try:
+            state_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(state_file, "w") as f:
+                json.dump(
+                    {
+                        "version": 1,
+                        "generated_at": datetime.now().isoformat(),
+                        "entities": entity_hashes,
+                    },
+                    f,
+                    indent=2,
+                )
+        except Exception as e:
+            logger.warning(f"Could not save generation state: {e}")
+
+    def _get_cached_block(self, entity_hash: Optional[str], part: str, build) -> Any:
+        """
+        Get one part ('entities' or 'helpers') of an entity's built block
+
+        Args:
+            entity_hash: Content hash of the entity (None disables caching)
+            part: Block part name
+            build: Callable building the part on a cache miss
+
+        Returns:
+            Built block part (treat as read-only, it is shared between runs)
+        """
+        if entity_hash is None:
+            return build()
+
+        prebuilt = self._prebuilt_blocks.get(entity_hash)
+        if prebuilt is not None:
+            return prebuilt[part]
+
+        with _entity_block_lock:
+            block = _entity_block_cache.get(entity_hash)
+            if block is not None and part in block:
+                _entity_block_cache.move_to_end(entity_hash)
+                return block[part]
+
+        built = build()
+
+        with _entity_block_lock:
+            block = _entity_block_cache.setdefault(entity_hash, {})
+            block[part] = built
+            _entity_block_cache.move_to_end(entity_hash)
+            while len(_entity_block_cache) > _ENTITY_BLOCK_CACHE_SIZE:
+                _entity_block_cache.popitem(last=False)
+        return built
+
+    def _prebuild_blocks(
+        self,
+        entities: Dict[str, Dict[str, Any]],
+        broadlink_commands: Dict[str, Dict[str, str]],
+        entity_hashes: Dict[str, str],
+    ) -> int:
+        """
+        Build the blocks of uncached entities in a process pool
+
+        Only used when at least parallel_threshold entities need building and
+        more than one worker is available. The merge in _build_entities_yaml
+        stays serial and in entity order, so output matches the serial path.
+
+        Args:
+            entities: Entity metadata
+            broadlink_commands: Dict of {device_name: {command_name: command_code}}
+            entity_hashes: Current {entity_id: hash}
+
+        Returns:
+            Number of entities built in parallel (0 if the serial path is used)
+        """
+        if self.parallel_threshold is None:
+            return 0
+
+        with _entity_block_lock:
+            pending = [
+                entity_id
+                for entity_id, entity_hash in entity_hashes.items()
+                if len(_entity_block_cache.get(entity_hash, {})) < 2
+            ]
+        workers = self.max_workers or available_cpus()
+        if len(pending) < self.parallel_threshold or workers < 2:
+            return 0
+
+        items = [
+            (
+                entity_hashes[entity_id],
+                entity_id,
+                entities[entity_id],
+                broadlink_commands.get(entities[entity_id].get("device"), {}),
+            )
+            for entity_id in pending
+        ]
+        # A few chunks per worker balances uneven entity sizes
+        chunk_size = math.ceil(len(items) / (workers * 4))
+        chunks = [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+        try:
+            # spawn: forking the threaded web server is not safe
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_build_worker,
+                initargs=(logging.getLogger().getEffectiveLevel(),),
+            ) as pool:
+                for built in pool.map(
+                    _build_blocks_chunk, [self.default_device_id] * len(chunks), chunks
+                ):
+                    self._prebuilt_blocks.update(built)
+        except Exception as e:
+            logger.warning(f"Parallel entity build failed, building serially: {e}")
+            self._prebuilt_blocks = {}
+            return 0
+
+        with _entity_block_lock:
+            for entity_hash, block in self._prebuilt_blocks.items():
+                _entity_block_cache[entity_hash] = block
+                _entity_block_cache.move_to_end(entity_hash)
+            while len(_entity_block_cache) > _ENTITY_BLOCK_CACHE_SIZE:
+                _entity_block_cache.popitem(last=False)
+
+        logger.info(
+            f"Built {len(items)} entities in parallel ({workers} workers, "
+            f"{len(chunks)} chunks)"
+        )
+        return len(items)
+
     def _build_entities_yaml(
         self,
         entities: Dict[str, Dict[str, Any]],
         broadlink_commands: Dict[str, Dict[str, str]],
+        entity_hashes: Optional[Dict[str, str]] = None,
     ) -> Dict[str, Any]:
         """
         Build the entities YAML structure using modern template syntax (HA 2021.4+).
@@ -265,102 +596,21 @@ class EntityGenerator:
             if not entity_data.get("enabled", True):
                 continue
 
-            entity_type = entity_data["entity_type"]
-            is_stateless = entity_data.get("stateless", False)
-
-            # For stateless devices, generate buttons instead of stateful entities
-            if is_stateless:
-                button_configs = self._generate_stateless_buttons(
+            block = self._get_cached_block(
+                (entity_hashes or {}).get(entity_id),
+                "entities",
+                lambda: self._build_entity_block(
                     entity_id, entity_data, broadlink_commands
-                )
-                if button_configs:
-                    template_entities["button"].extend(button_configs)
-                continue
-
-            if entity_type == "light":
-                # Check for color temperature variants
-                commands = entity_data.get("commands", {})
-                variant_info = self._detect_color_temp_variants(commands)
+                ),
+            )
 
-                if variant_info:
-                    # Generate master light + variant lights
-                    light_configs = self._generate_light_with_variants(
-                        entity_id, entity_data, broadlink_commands, variant_info
-                    )
-                    if light_configs:
-                        template_entities["light"].extend(light_configs)
-                    config = None  # Already added
-                else:
-                    # Standard light generation
-                    config = self._generate_light(
-                        entity_id, entity_data, broadlink_commands
-                    )
-            elif entity_type == "fan":
-                config = self._generate_fan(entity_id, entity_data, broadlink_commands)
-            elif entity_type == "switch":
-                config = self._generate_switch(
-                    entity_id, entity_data, broadlink_commands
-                )
-            elif entity_type == "media_player":
-                config = self._generate_media_player(
-                    entity_id, entity_data, broadlink_commands
-                )
-            elif entity_type == "climate":
-                # Climate entities are not supported - template.climate platform removed from HA
-                # Users should use SmartIR custom integration for AC control
-                logger.warning(
-                    f"Climate entity type not supported for {entity_id}. "
-                    "Use SmartIR custom integration for AC control: "
-                    "https://github.com/smartHomeHub/SmartIR"
-                )
-                self.validation_warnings.append(
-                    {
-                        "device": entity_id,
-                        "device_name": entity_data.get("friendly_name", entity_id),
-                        "entity_type": "climate",
-                        "missing_commands": [],
-                        "message": (
-                            "Climate entities are not supported via Broadlink native generation. "
-                            "Use the SmartIR Profile Builder for AC/heater devices."
-                        ),
-                    }
+            self.validation_warnings.extend(block["warnings"])
+            if block["media_player"]:
+                yaml_structure.setdefault("media_player", []).extend(
+                    block["media_player"]
                 )
-                continue
-            elif entity_type == "cover":
-                config = self._generate_cover(
-                    entity_id, entity_data, broadlink_commands
-                )
-            else:
-                logger.warning(f"Unknown entity type: {entity_type} for {entity_id}")
-                continue
-
-            if config:
-                # Media players use universal platform (not template), so handle differently
-                if entity_type == "media_player":
-                    # Universal media players are separate entries (not grouped under template:)
-                    if "media_player" not in yaml_structure:
-                        yaml_structure["media_player"] = []
-                    yaml_structure["media_player"].append(config)
-
-                    # Also generate companion switch for power control
-                    switch_config = self._generate_media_player_switch(
-                        entity_id, entity_data, broadlink_commands
-                    )
-                    if switch_config:
-                        # Add to template switches list
-                        template_entities["switch"].append(switch_config)
-                else:
-                    # Template platforms: add entity config directly to list
-                    # Generators now return entity configs directly (not wrapped)
-                    if entity_type in template_entities:
-                        template_entities[entity_type].append(config)
-
-            # Generate button entities for custom commands
-            custom_buttons = self._generate_custom_command_buttons(
-                entity_id, entity_data, broadlink_commands
-            )
-            if custom_buttons:
-                template_entities["button"].extend(custom_buttons)
+            for entity_type, configs in block["template"].items():
+                template_entities[entity_type].extend(configs)
 
         # Build the modern template: structure
         # Only include entity types that have entities
@@ -375,6 +625,148 @@ class EntityGenerator:
 
         return yaml_structure
 
+    def _build_entity_block(
+        self,
+        entity_id: str,
+        entity_data: Dict[str, Any],
+        broadlink_commands: Dict[str, Dict[str, str]],
+    ) -> Dict[str, Any]:
+        """
+        Build the YAML entries contributed by a single entity
+
+        Args:
+            entity_id: Entity identifier
+            entity_data: Entity metadata
+            broadlink_commands: Command data
+
+        Returns:
+            Dict with 'template' ({type: [configs]}), 'media_player' ([configs])
+            and 'warnings' (validation warnings raised while building)
+        """
+        block = {
+            "template": {
+                "light": [],
+                "fan": [],
+                "switch": [],
+                "cover": [],
+                "button": [],
+            },
+            "media_player": [],
+            "warnings": [],
+        }
+
+        # Builders append to self.validation_warnings; move this entity's share
+        warnings_start = len(self.validation_warnings)
+        try:
+            self._fill_entity_block(block, entity_id, entity_data, broadlink_commands)
+        finally:
+            block["warnings"] = self.validation_warnings[warnings_start:]
+            del self.validation_warnings[warnings_start:]
+        return block
+
+    def _fill_entity_block(
+        self,
+        block: Dict[str, Any],
+        entity_id: str,
+        entity_data: Dict[str, Any],
+        broadlink_commands: Dict[str, Dict[str, str]],
+    ) -> Dict[str, Any]:
+        """Populate an entity block (see _build_entity_block)"""
+        template_entities = block["template"]
+
+        entity_type = entity_data["entity_type"]
+        is_stateless = entity_data.get("stateless", False)
+
+        # For stateless devices, generate buttons instead of stateful entities
+        if is_stateless:
+            button_configs = self._generate_stateless_buttons(
+                entity_id, entity_data, broadlink_commands
+            )
+            if button_configs:
+                template_entities["button"].extend(button_configs)
+            return block
+
+        if entity_type == "light":
+            # Check for color temperature variants
+            commands = entity_data.get("commands", {})
+            variant_info = self._detect_color_temp_variants(commands)
+
+            if variant_info:
+                # Generate master light + variant lights
+                light_configs = self._generate_light_with_variants(
+                    entity_id, entity_data, broadlink_commands, variant_info
+                )
+                if light_configs:
+                    template_entities["light"].extend(light_configs)
+                config = None  # Already added
+            else:
+                # Standard light generation
+                config = self._generate_light(
+                    entity_id, entity_data, broadlink_commands
+                )
+        elif entity_type == "fan":
+            config = self._generate_fan(entity_id, entity_data, broadlink_commands)
+        elif entity_type == "switch":
+            config = self._generate_switch(entity_id, entity_data, broadlink_commands)
+        elif entity_type == "media_player":
+            config = self._generate_media_player(
+                entity_id, entity_data, broadlink_commands
+            )
+        elif entity_type == "climate":
+            # Climate entities are not supported - template.climate platform removed from HA
+            # Users should use SmartIR custom integration for AC control
+            logger.warning(
+                f"Climate entity type not supported for {entity_id}. "
+                "Use SmartIR custom integration for AC control: "
+                "https://github.com/smartHomeHub/SmartIR"
+            )
+            self.validation_warnings.append(
+                {
+                    "device": entity_id,
+                    "device_name": entity_data.get("friendly_name", entity_id),
+                    "entity_type": "climate",
+                    "missing_commands": [],
+                    "message": (
+                        "Climate entities are not supported via Broadlink native generation. "
+                        "Use the SmartIR Profile Builder for AC/heater devices."
+                    ),
+                }
+            )
+            return block
+        elif entity_type == "cover":
+            config = self._generate_cover(entity_id, entity_data, broadlink_commands)
+        else:
+            logger.warning(f"Unknown entity type: {entity_type} for {entity_id}")
+            return block
+
+        if config:
+            # Media players use universal platform (not template), so handle differently
+            if entity_type == "media_player":
+                # Universal media players are separate entries (not grouped under template:)
+                block["media_player"].append(config)
+
+                # Also generate companion switch for power control
+                switch_config = self._generate_media_player_switch(
+                    entity_id, entity_data, broadlink_commands
+                )
+                if switch_config:
+                    # Add to template switches list
+                    template_entities["switch"].append(switch_config)
+            else:
+                # Template platforms: add entity config directly to list
+                # Generators now return entity configs directly (not wrapped)
+                if entity_type in template_entities:
+                    template_entities[entity_type].append(config)
+
+        # Generate button entities for custom commands
+        custom_buttons = self._generate_custom_command_buttons(
+            entity_id, entity_data, broadlink_commands
+        )
+        if custom_buttons:
+            template_entities["button"].extend(custom_buttons)
+
+        return block
+
     def _generate_light_with_variants(
         self,
         entity_id: str,
@@ -1947,7 +2339,9 @@ class EntityGenerator:
         return buttons
 
     def _build_helpers_yaml(
-        self, entities: Dict[str, Dict[str, Any]]
+        self,
+        entities: Dict[str, Dict[str, Any]],
+        entity_hashes: Optional[Dict[str, str]] = None,
     ) -> Dict[str, Any]:
         """Build helper entities (input_boolean, input_select)"""
         helpers = {"input_boolean": {}, "input_select": {}}
@@ -1956,203 +2350,238 @@ class EntityGenerator:
             if not entity_data.get("enabled", True):
                 continue
 
-            # Skip helpers for stateless devices (they use buttons, no state tracking)
-            if entity_data.get("stateless", False):
-                continue
+            entity_helpers = self._get_cached_block(
+                (entity_hashes or {}).get(entity_id),
+                "helpers",
+                lambda: self._build_entity_helpers(entity_id, entity_data),
+            )
+            for section, section_helpers in entity_helpers.items():
+                helpers.setdefault(section, {}).update(section_helpers)
 
-            entity_type = entity_data["entity_type"]
+        return helpers
 
-            # Get display name (prefer 'name' over 'friendly_name')
-            display_name = entity_data.get("name") or entity_data.get(
-                "friendly_name", entity_id
-            )
+    def _build_entity_helpers(
+        self, entity_id: str, entity_data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Build the helper entities needed by a single entity"""
+        helpers = {"input_boolean": {}, "input_select": {}}
 
-            # All entities need a state tracker
-            # Sanitize entity_id to ensure valid slug
-            sanitized_id = sanitize_slug(entity_id)
-            helpers["input_boolean"][f"{sanitized_id}_state"] = {
-                "name": f"{display_name} State",
-                "initial": False,
-            }
+        # Skip helpers for stateless devices (they use buttons, no state tracking)
+        if entity_data.get("stateless", False):
+            return helpers
 
-            # Lights need brightness and color temperature helpers
-            if entity_type == "light":
-                commands = entity_data.get("commands", {})
+        entity_type = entity_data["entity_type"]
 
-                # Get configurable brightness steps (default 100)
-                brightness_steps = entity_data.get("brightness_steps", 100)
+        # Get display name (prefer 'name' over 'friendly_name')
+        display_name = entity_data.get("name") or entity_data.get(
+            "friendly_name", entity_id
+        )
 
-                # Add brightness helper if brightness commands exist
-                has_brightness = any(
-                    k in commands
-                    for k in ["brightness_up", "brightness_down", "bright", "dim"]
-                )
-                if has_brightness:
-                    if "input_number" not in helpers:
-                        helpers["input_number"] = {}
-                    helpers["input_number"][f"{sanitized_id}_brightness"] = {
-                        "name": f"{display_name} Brightness",
-                        "min": 0,
-                        "max": brightness_steps,
-                        "step": 1,
-                        "initial": brightness_steps // 2,
-                        "unit_of_measurement": (
-                            "%" if brightness_steps == 100 else "steps"
-                        ),
-                    }
+        # All entities need a state tracker
+        # Sanitize entity_id to ensure valid slug
+        sanitized_id = sanitize_slug(entity_id)
+        helpers["input_boolean"][f"{sanitized_id}_state"] = {
+            "name": f"{display_name} State",
+            "initial": False,
+        }
 
-                # Add color temperature helper if color temp commands exist
-                has_color_temp = any(k in commands for k in ["cooler", "warmer"])
-                if has_color_temp:
-                    if "input_number" not in helpers:
-                        helpers["input_number"] = {}
-                    helpers["input_number"][f"{sanitized_id}_color_temp"] = {
-                        "name": f"{display_name} Color Temperature",
-                        "min": 153,  # Warm white (6500K)
-                        "max": 500,  # Cool white (2000K)
-                        "step": 1,
-                        "initial": 326,  # Mid-range (~3000K)
-                        "unit_of_measurement": "mireds",
-                    }
+        # Lights need brightness and color temperature helpers
+        if entity_type == "light":
+            commands = entity_data.get("commands", {})
 
-            # Fans need speed selector
-            elif entity_type == "fan":
-                # Count speed commands - support both 'speed_N' and 'fan_speed_N' patterns
-                # Also support named speeds like 'speed_low', 'speed_medium', 'speed_high'
-                # This must match the logic in _generate_fan()
-                named_speed_map = {
-                    "off": 0,
-                    "low": 1,
-                    "lowmedium": 2,
-                    "medium": 3,
-                    "mediumhigh": 4,
-                    "high": 5,
-                    "med": 3,
-                    "quiet": 1,
-                    "auto": 3,
+            # Get configurable brightness steps (default 100)
+            brightness_steps = entity_data.get("brightness_steps", 100)
+
+            # Add brightness helper if brightness commands exist
+            has_brightness = any(
+                k in commands
+                for k in ["brightness_up", "brightness_down", "bright", "dim"]
+            )
+            if has_brightness:
+                if "input_number" not in helpers:
+                    helpers["input_number"] = {}
+                helpers["input_number"][f"{sanitized_id}_brightness"] = {
+                    "name": f"{display_name} Brightness",
+                    "min": 0,
+                    "max": brightness_steps,
+                    "step": 1,
+                    "initial": brightness_steps // 2,
+                    "unit_of_measurement": (
+                        "%" if brightness_steps == 100 else "steps"
+                    ),
                 }
 
-                speed_commands = {}
-                for k in entity_data["commands"].keys():
-                    if k.startswith("speed_") or k.startswith("fan_speed_"):
-                        # Extract speed identifier from command name
-                        if k.startswith("fan_speed_"):
-                            speed_id = k.replace("fan_speed_", "")
-                        else:
-                            speed_id = k.replace("speed_", "")
-
-                        # Convert to numeric if it's a digit, or map named speeds
-                        if speed_id.isdigit():
-                            speed_num = speed_id
-                        elif speed_id.lower() in named_speed_map:
-                            speed_num = str(named_speed_map[speed_id.lower()])
-                        else:
-                            # Unknown speed name, skip it
-                            continue
-
-                        # Store with normalized key 'speed_N' (skip speed_0/off)
-                        if speed_num != "0":
-                            speed_commands[f"speed_{speed_num}"] = k
-
-                speed_count = len(speed_commands)
-                options = ["off"] + [str(i) for i in range(1, speed_count + 1)]
-
-                helpers["input_select"][f"{sanitized_id}_speed"] = {
-                    "name": f"{display_name} Speed",
-                    "options": options,
-                    "initial": "off",
+            # Add color temperature helper if color temp commands exist
+            has_color_temp = any(k in commands for k in ["cooler", "warmer"])
+            if has_color_temp:
+                if "input_number" not in helpers:
+                    helpers["input_number"] = {}
+                helpers["input_number"][f"{sanitized_id}_color_temp"] = {
+                    "name": f"{display_name} Color Temperature",
+                    "min": 153,  # Warm white (6500K)
+                    "max": 500,  # Cool white (2000K)
+                    "step": 1,
+                    "initial": 326,  # Mid-range (~3000K)
+                    "unit_of_measurement": "mireds",
                 }
 
-                # Only add direction selector if direction commands exist
-                entity_commands = entity_data.get("commands", {})
-                has_direction_commands = (
-                    "reverse" in entity_commands
-                    or "direction" in entity_commands
-                    or "fan_reverse" in entity_commands
-                    or "fan_direction_forward" in entity_commands
-                    or "fan_direction_reverse" in entity_commands
-                )
-                if has_direction_commands:
-                    helpers["input_select"][f"{sanitized_id}_direction"] = {
-                        "name": f"{display_name} Direction",
-                        "options": ["forward", "reverse"],
-                        "initial": "forward",
-                    }
+        # Fans need speed selector
+        elif entity_type == "fan":
+            # Count speed commands - support both 'speed_N' and 'fan_speed_N' patterns
+            # Also support named speeds like 'speed_low', 'speed_medium', 'speed_high'
+            # This must match the logic in _generate_fan()
+            named_speed_map = {
+                "off": 0,
+                "low": 1,
+                "lowmedium": 2,
+                "medium": 3,
+                "mediumhigh": 4,
+                "high": 5,
+                "med": 3,
+                "quiet": 1,
+                "auto": 3,
+            }
 
-            # Climate entities are not supported (template.climate removed from HA)
-            # Users should use SmartIR custom integration for AC control
-            elif entity_type == "climate":
-                # Skip - no helpers needed for unsupported entity type
-                pass
+            speed_commands = {}
+            for k in entity_data["commands"].keys():
+                if k.startswith("speed_") or k.startswith("fan_speed_"):
+                    # Extract speed identifier from command name
+                    if k.startswith("fan_speed_"):
+                        speed_id = k.replace("fan_speed_", "")
+                    else:
+                        speed_id = k.replace("speed_", "")
+
+                    # Convert to numeric if it's a digit, or map named speeds
+                    if speed_id.isdigit():
+                        speed_num = speed_id
+                    elif speed_id.lower() in named_speed_map:
+                        speed_num = str(named_speed_map[speed_id.lower()])
+                    else:
+                        # Unknown speed name, skip it
+                        continue
 
-            # Media player entities need source selection
-            elif entity_type == "media_player":
-                commands = entity_data.get("commands", {})
+                    # Store with normalized key 'speed_N' (skip speed_0/off)
+                    if speed_num != "0":
+                        speed_commands[f"speed_{speed_num}"] = k
 
-                # Add source selector if source commands exist
-                source_commands = {
-                    k: v for k, v in commands.items() if k.startswith("source_")
+            speed_count = len(speed_commands)
+            options = ["off"] + [str(i) for i in range(1, speed_count + 1)]
+
+            helpers["input_select"][f"{sanitized_id}_speed"] = {
+                "name": f"{display_name} Speed",
+                "options": options,
+                "initial": "off",
+            }
+
+            # Only add direction selector if direction commands exist
+            entity_commands = entity_data.get("commands", {})
+            has_direction_commands = (
+                "reverse" in entity_commands
+                or "direction" in entity_commands
+                or "fan_reverse" in entity_commands
+                or "fan_direction_forward" in entity_commands
+                or "fan_direction_reverse" in entity_commands
+            )
+            if has_direction_commands:
+                helpers["input_select"][f"{sanitized_id}_direction"] = {
+                    "name": f"{display_name} Direction",
+                    "options": ["forward", "reverse"],
+                    "initial": "forward",
                 }
-                if source_commands:
-                    # Extract source names from command keys (e.g., "source_hdmi1" -> "HDMI1")
-                    sources = [
-                        k.replace("source_", "").upper() for k in source_commands.keys()
-                    ]
-
-                    helpers["input_select"][f"{sanitized_id}_source"] = {
-                        "name": f"{display_name} Source",
-                        "options": sources,
-                        "initial": sources[0] if sources else "HDMI1",
-                    }
 
-            # Cover entities need position tracking
-            elif entity_type == "cover":
-                commands = entity_data.get("commands", {})
+        # Climate entities are not supported (template.climate removed from HA)
+        # Users should use SmartIR custom integration for AC control
+        elif entity_type == "climate":
+            # Skip - no helpers needed for unsupported entity type
+            pass
 
-                # Add position selector
-                helpers["input_select"][f"{sanitized_id}_position"] = {
-                    "name": f"{display_name} Position",
-                    "options": ["open", "closed", "partial"],
-                    "initial": "closed",
+        # Media player entities need source selection
+        elif entity_type == "media_player":
+            commands = entity_data.get("commands", {})
+
+            # Add source selector if source commands exist
+            source_commands = {
+                k: v for k, v in commands.items() if k.startswith("source_")
+            }
+            if source_commands:
+                # Extract source names from command keys (e.g., "source_hdmi1" -> "HDMI1")
+                sources = [
+                    k.replace("source_", "").upper() for k in source_commands.keys()
+                ]
+
+                helpers["input_select"][f"{sanitized_id}_source"] = {
+                    "name": f"{display_name} Source",
+                    "options": sources,
+                    "initial": sources[0] if sources else "HDMI1",
                 }
 
-                # Add position slider if position commands exist
-                position_commands = {
-                    k: v for k, v in commands.items() if k.startswith("position_")
+        # Cover entities need position tracking
+        elif entity_type == "cover":
+            commands = entity_data.get("commands", {})
+
+            # Add position selector
+            helpers["input_select"][f"{sanitized_id}_position"] = {
+                "name": f"{display_name} Position",
+                "options": ["open", "closed", "partial"],
+                "initial": "closed",
+            }
+
+            # Add position slider if position commands exist
+            position_commands = {
+                k: v for k, v in commands.items() if k.startswith("position_")
+            }
+            if position_commands:
+                helpers["input_number"] = helpers.get("input_number", {})
+                helpers["input_number"][f"{sanitized_id}_position"] = {
+                    "name": f"{display_name} Position",
+                    "min": 0,
+                    "max": 100,
+                    "step": 1,
+                    "initial": 0,
+                    "unit_of_measurement": "%",
                 }
-                if position_commands:
-                    helpers["input_number"] = helpers.get("input_number", {})
-                    helpers["input_number"][f"{sanitized_id}_position"] = {
-                        "name": f"{display_name} Position",
-                        "min": 0,
-                        "max": 100,
-                        "step": 1,
-                        "initial": 0,
-                        "unit_of_measurement": "%",
-                    }
 
         return helpers
 
-    def _write_yaml_file(self, file_path: Path, data: Dict[str, Any]):
-        """Write YAML file with proper formatting"""
+    def _write_yaml_file(self, file_path: Path, data: Dict[str, Any]) -> bool:
+        """
+        Write YAML file with proper formatting
+
+        The file is left untouched when only the generation timestamp would
+        change, so Home Assistant does not see a modified configuration.
+
+        Returns:
+            True if the file was written, False if its content was unchanged
+        """
         try:
+            # Unchanged entities reuse their cached serialized fragment
+            body = fragment_cache.dump_document(data)
+            header = "# Auto-generated by Broadlink Manager\n"
+            notice = (
+                "# DO NOT EDIT THIS FILE MANUALLY - Changes will be overwritten\n\n"
+            )
+
+            file_path = Path(file_path)
+            if file_path.exists():
+                with open(file_path, "r") as f:
+                    existing = f.read()
+                # Line 2 holds the generation timestamp, compare everything else
+                first, _, rest = existing.partition("\n")
+                _, _, rest = rest.partition("\n")
+                if first + "\n" == header and rest == notice + body:
+                    logger.debug(f"YAML file unchanged, not rewritten: {file_path}")
+                    return False
+
             with open(file_path, "w") as f:
-                f.write("# Auto-generated by Broadlink Manager\n")
+                f.write(header)
                 f.write(
                     f"# Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
                 )
-                f.write(
-                    "# DO NOT EDIT THIS FILE MANUALLY - Changes will be overwritten\n\n"
-                )
-                yaml.dump(
-                    data,
-                    f,
-                    default_flow_style=False,
-                    sort_keys=False,
-                    allow_unicode=True,
-                )
+                f.write(notice)
+                f.write(body)
 
             logger.info(f"Written YAML file: {file_path}")
+            return True
         except Exception as e:
             logger.error(f"Failed to write YAML file {file_path}: {e}")
             raise
@@ -13,9 +13,9 @@ from datetime import datetime
 
 # Handle both package and script imports
 try:
-    from .entity_generator import EntityGenerator
+    from .entity_generator import PARALLEL_BUILD_THRESHOLD, EntityGenerator
 except ImportError:
-    from entity_generator import EntityGenerator
+    from entity_generator import PARALLEL_BUILD_THRESHOLD, EntityGenerator
 
 logger = logging.getLogger(__name__)
 
@@ -180,7 +180,11 @@ class EntityGeneratorV2:
     """Generate Home Assistant entity YAML configurations from devices.json using v1 logic"""
 
     def __init__(
-        self, device_manager, config_path: str, package_output_path: Path = None
+        self,
+        device_manager,
+        config_path: str,
+        package_output_path: Path = None,
+        parallel_build: bool = False,
     ):
         """
         Initialize the entity generator
@@ -190,6 +194,7 @@ class EntityGeneratorV2:
             config_path: Path to Home Assistant config directory
             package_output_path: Optional alternate path to also write package.yaml to.
                                  The file will be overwritten if it already exists.
+            parallel_build: Build large rebuilds in a process pool
         """
         self.device_manager = device_manager
         self.config_path = Path(config_path)
@@ -199,7 +204,10 @@ class EntityGeneratorV2:
         self.adapter = DeviceManagerAdapter(
             device_manager, config_path, package_output_path
         )
-        self.v1_generator = EntityGenerator(self.adapter)
+        self.v1_generator = EntityGenerator(
+            self.adapter,
+            parallel_threshold=PARALLEL_BUILD_THRESHOLD if parallel_build else None,
+        )
 
     def generate_all_devices(self, devices: Dict[str, Any]) -> Dict[str, Any]:
         """
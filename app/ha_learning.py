@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+HA Learning for Broadlink Manager Add-on
+Learning through Home Assistant's remote.learn_command, shared by the
+/api/commands/learn endpoint and the async server
+"""
+
+import asyncio
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+async def learn_via_ha(web_server, data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """
+    Start learning a command through Home Assistant
+
+    The service call waits on Home Assistant (up to 30 s) without holding a
+    thread. Recording the pending command (SmartIR profile scan, background
+    poll, devices.json update) runs in the default executor.
+
+    Args:
+        web_server: BroadlinkWebServer instance
+        data: Request body (entity_id, device or device_id, command, ...)
+
+    Returns:
+        JSON body and HTTP status
+    """
+    try:
+        logger.info(f"Learn command request data: {data}")
+
+        entity_id = data.get("entity_id")
+        device = data.get("device")
+        command = data.get("command")
+        command_type = data.get("command_type", "ir")
+        device_id = data.get("device_id")  # For managed devices
+        save_destination = data.get(
+            "save_destination", "manager_only"
+        )  # manager_only, integration_only, both
+
+        logger.info(
+            f"Parsed: entity_id={entity_id}, device={device}, "
+            f"command={command}, type={command_type}, "
+            f"device_id={device_id}, save_destination={save_destination}"
+        )
+
+        # If device is not provided, try to derive it from device_id
+        if not device and device_id:
+            # For managed devices, use the device_id as the device name
+            # Remove entity_type prefix if present (e.g., "switch.office_lamp" -> "office_lamp")
+            device = device_id.split(".")[-1] if "." in device_id else device_id
+            logger.info(f"Derived device name from device_id: {device}")
+
+        if not all([entity_id, device, command]):
+            missing = []
+            if not entity_id:
+                missing.append("entity_id")
+            if not device:
+                missing.append("device (or device_id)")
+            if not command:
+                missing.append("command")
+
+            error_msg = f'Missing required fields: {", ".join(missing)}'
+            logger.error(error_msg)
+            return {"success": False, "error": error_msg}, 400
+
+        # Update data with derived device name if it was derived
+        if device and not data.get("device"):
+            data["device"] = device
+            logger.info(f"Updated data with derived device: {device}")
+
+        result = await web_server._learn_command(data)
+        if not result.get("success"):
+            return result, 400
+
+        logger.info(
+            f"✅ Learn command API call succeeded for '{command}' on device '{device}'"
+        )
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, _record_learned, web_server, data, result)
+        return result, 200
+
+    except Exception as e:
+        logger.error(f"Error learning command: {e}")
+        return {"success": False, "error": str(e)}, 500
+
+
+def _record_learned(web_server, data: Dict[str, Any], result: Dict[str, Any]):
+    """Record a started learn according to its save destination (blocking)"""
+    entity_id = data.get("entity_id")
+    device = data.get("device")
+    command = data.get("command")
+    command_type = data.get("command_type", "ir")
+    device_id = data.get("device_id")
+    save_destination = data.get("save_destination", "manager_only")
+    device_manager = web_server.device_manager
+
+    # Initialize learned_code variable
+    learned_code = None
+
+    # For RF commands, keep the original notification message
+    if command_type == "rf":
+        # Use the message from _learn_command which tells user to check HA notifications
+        logger.info(f"RF command - using notification message from _learn_command")
+        # RF commands are always "pending" since they require multi-step process
+        learned_code = "pending"
+        # Add to cache only for integration_only (not both, since HA will save to storage)
+        if save_destination == "integration_only":
+            web_server._add_to_storage_cache(device, command, "pending")
+            logger.info(f"✅ Added {device}/{command} to storage cache")
+    # For IR commands with integration_only: Add to cache immediately and trust it
+    elif save_destination == "integration_only":
+        web_server._add_to_storage_cache(device, command, "pending")
+        logger.info(
+            f"✅ Added {device}/{command} to storage cache - will appear as untracked immediately"
+        )
+        learned_code = "pending"
+        result["code"] = "pending"
+        result["message"] = f"✅ Command '{command}' learned and added to storage!"
+    else:
+        # For manager_only: Save as pending and schedule background update
+        # Don't block the user waiting for storage file to be written
+        learned_code = "pending"
+        result["code"] = "pending"
+        result["message"] = (
+            f"✅ Command '{command}' learned! Code will be updated automatically in background."
+        )
+
+        # Schedule background task to poll for the actual code
+        # Pass entity_id so it can delete after fetching
+        # For SmartIR devices, also pass profile metadata
+        config_path = Path(web_server.app.config.get("config_path", "/config"))
+        smartir_metadata = _smartir_metadata(
+            config_path, device_manager, device_id, device
+        )
+
+        logger.info(
+            f"Scheduling background poll for command '{command}' on device '{device}'"
+        )
+        web_server.schedule_command_poll(
+            device_id,
+            device,
+            command,
+            entity_id if save_destination == "manager_only" else None,
+            smartir_metadata,
+        )
+
+        # NOTE: We DON'T add to storage cache for manager_only commands
+        # because we want to fetch the actual code from storage files
+
+    # Handle save destination logic
+    if device_id:
+        # Save to devices.json if destination allows it
+        if save_destination in ["manager_only", "both"]:
+            try:
+                if device_manager:
+                    managed_device = device_manager.get_device(device_id)
+                    if managed_device:
+                        # Add the new command to the device's commands
+                        if "commands" not in managed_device:
+                            managed_device["commands"] = {}
+
+                        # Store the learned code so we don't depend on .storage files
+                        managed_device["commands"][command] = {
+                            "data": learned_code if learned_code else "pending",
+                            "type": command_type,
+                            "name": command,
+                        }
+
+                        # Save updated device
+                        device_manager.update_device(device_id, managed_device)
+                        logger.info(
+                            f"✅ Updated devices.json for {device_id} "
+                            f"with new command '{command}' "
+                            f"(save_destination={save_destination})"
+                        )
+                    else:
+                        logger.warning(
+                            f"⚠️ Device {device_id} not found in device manager"
+                        )
+                else:
+                    logger.warning("⚠️ Device manager not available")
+            except Exception as save_error:
+                logger.error(f"❌ Error updating devices.json: {save_error}")
+                # Don't fail the request if devices.json update fails
+
+        # For manager_only, deletion will happen in background AFTER fetching the code
+        # This is handled by the polling thread (see schedule_command_poll above)
+        if save_destination == "manager_only":
+            logger.info(
+                f"ℹ️ Deletion of '{command}' from integration storage will happen after code is fetched"
+            )
+
+        # Log if integration_only (no devices.json update)
+        if save_destination == "integration_only":
+            logger.info(
+                f"ℹ️ Skipping devices.json update for '{command}' - save_destination=integration_only"
+            )
+
+
+def _smartir_metadata(
+    config_path: Path, device_manager, device_id: Optional[str], device: str
+) -> Optional[Dict[str, Any]]:
+    """SmartIR profile to update once the learned code arrives, if any"""
+    # Try to detect SmartIR device from devices.json first
+    if device_manager and device_id:
+        managed_device = device_manager.get_device(device_id)
+        if managed_device and managed_device.get("device_type") == "smartir":
+            # This is a SmartIR device - add metadata for profile update
+            device_code = managed_device.get("device_code")
+            entity_type = managed_device.get("entity_type", "climate")
+            if device_code:
+                profile_path = (
+                    config_path
+                    / "custom_components"
+                    / "smartir"
+                    / "custom_codes"
+                    / entity_type
+                    / f"{device_code}.json"
+                )
+                logger.info(
+                    f"📋 SmartIR device detected from devices.json - will update profile {device_code}.json"
+                )
+                return {
+                    "smartir_profile": str(profile_path),
+                    "device_code": device_code,
+                    "platform": entity_type,
+                }
+
+    # If not found in devices.json, scan SmartIR profiles by device name
+    try:
+        custom_codes_path = (
+            config_path / "custom_components" / "smartir" / "custom_codes"
+        )
+        if not custom_codes_path.exists():
+            return None
+
+        # Scan all platforms for matching profile
+        for platform_dir in custom_codes_path.iterdir():
+            if not platform_dir.is_dir():
+                continue
+            platform = platform_dir.name
+            for profile_file in platform_dir.glob("*.json"):
+                try:
+                    with open(profile_file, "r", encoding="utf-8") as f:
+                        profile_data = json.load(f)
+
+                    # Generate device name from manufacturer/model
+                    manufacturer = profile_data.get("manufacturer", "")
+                    model = profile_data.get("supportedModels", [""])[0]
+                    profile_device_name = f"{manufacturer.lower()}_{model.lower()}"
+                    profile_device_name = re.sub(
+                        r"[^a-z0-9]+", "_", profile_device_name
+                    )
+
+                    # Check if this profile matches the device being learned
+                    if profile_device_name == device.lower():
+                        device_code = profile_file.stem
+                        logger.info(
+                            f"📋 SmartIR device detected by profile scan - "
+                            f"will update profile {device_code}.json"
+                        )
+                        return {
+                            "smartir_profile": str(profile_file),
+                            "device_code": device_code,
+                            "platform": platform,
+                        }
+                except Exception as e:
+                    logger.debug(f"Error checking profile {profile_file}: {e}")
+    except Exception as e:
+        logger.debug(f"Error scanning SmartIR profiles: {e}")
+    return None
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Hot Path Logging for Broadlink Manager Add-on
+Structured, lazily formatted and rate-limited logging for per-request code
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Parent of every hot path logger, so the category is switched on as a whole
+HOT_PATH_LOGGER = "broadlink_manager.hot_path"
+
+
+def configure_hot_path_logging(log_level: str, enabled: bool = False):
+    """
+    Set the hot path category level
+
+    Per-request debug events are only emitted with log_level trace or when
+    explicitly enabled (LOG_HOT_PATHS); plain debug keeps them quiet.
+    Warnings and errors follow the configured level as usual.
+    """
+    if enabled or log_level.lower() == "trace":
+        level = logging.DEBUG
+    else:
+        level = max(logging.INFO, logging.getLogger().getEffectiveLevel())
+    logging.getLogger(HOT_PATH_LOGGER).setLevel(level)
+
+
+def _format_value(value: Any) -> str:
+    if callable(value):
+        value = value()
+    text = value if isinstance(value, str) else str(value)
+    if not text or any(c in text for c in ' ="\n'):
+        return json.dumps(text, ensure_ascii=False)
+    return text
+
+
+class _Event:
+    """logfmt message built only when a handler actually formats the record"""
+
+    __slots__ = ("event", "fields")
+
+    def __init__(self, event: str, fields: Dict[str, Any]):
+        self.event = event
+        self.fields = fields
+
+    def __str__(self) -> str:
+        parts = [self.event]
+        parts.extend(f"{k}={_format_value(v)}" for k, v in self.fields.items())
+        return " ".join(parts)
+
+
+class _Window:
+    __slots__ = ("start", "count", "suppressed")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.count = 1
+        self.suppressed = 0
+
+
+class HotPathLogger:
+    """
+    Logger for code that runs on every request or command send
+
+    Events are a key plus fields (rendered as logfmt: key a=1 b="x y").
+    Field values may be callables, evaluated only if the record is
+    formatted. Each event key is limited to burst records per period; the
+    number suppressed is reported on the next record for that key. Pass
+    sample=N to keep one record in N before rate limiting.
+
+    Records carry the event key and fields as record.event and
+    record.fields for structured handlers.
+    """
+
+    def __init__(self, name: str, burst: int = 10, period: float = 60.0):
+        self.logger = logging.getLogger(f"{HOT_PATH_LOGGER}.{name}")
+        self.burst = burst
+        self.period = period
+        self._windows: Dict[str, _Window] = {}
+        self._samples: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def debug(self, event: str, sample: int = 1, **fields):
+        self._log(logging.DEBUG, event, sample, fields)
+
+    def info(self, event: str, sample: int = 1, **fields):
+        self._log(logging.INFO, event, sample, fields)
+
+    def warning(self, event: str, sample: int = 1, **fields):
+        self._log(logging.WARNING, event, sample, fields)
+
+    def error(self, event: str, sample: int = 1, **fields):
+        self._log(logging.ERROR, event, sample, fields)
+
+    def _admit(self, event: str, sample: int) -> Optional[int]:
+        """None to drop the record, else the count suppressed before it"""
+        with self._lock:
+            if sample > 1:
+                seen = self._samples.get(event, 0)
+                self._samples[event] = seen + 1
+                if seen % sample:
+                    return None
+
+            now = time.monotonic()
+            window = self._windows.get(event)
+            if window is None or now - window.start >= self.period:
+                self._windows[event] = _Window(now)
+                return window.suppressed if window else 0
+            if window.count < self.burst:
+                window.count += 1
+                return 0
+            window.suppressed += 1
+            return None
+
+    def _log(self, level: int, event: str, sample: int, fields: Dict[str, Any]):
+        if not self.logger.isEnabledFor(level):
+            return
+        suppressed = self._admit(event, sample)
+        if suppressed is None:
+            return
+        if sample > 1:
+            fields["sampled"] = f"1/{sample}"
+        if suppressed:
+            fields["suppressed"] = suppressed
+        self.logger.log(
+            level,
+            _Event(event, fields),
+            extra={"event": event, "fields": fields},
+            stacklevel=3,
+        )
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+JSON Streaming for Broadlink Manager Add-on
+Incremental parsing of large JSON uploads without loading them whole
+"""
+
+import codecs
+import json
+from typing import Any, BinaryIO, Iterable, Iterator, Tuple
+
+_WHITESPACE = " \t\r\n"
+
+
+class _Reader:
+    """Buffered character reader over a binary stream of UTF-8 JSON"""
+
+    def __init__(self, stream: BinaryIO, chunk_size: int):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """Read more input, at least doubling the unconsumed buffer"""
+        size = max(self._chunk_size, len(self._buffer) - self._pos)
+        chunk = self._stream.read(size)
+        if not chunk:
+            self._eof = True
+        text = self._decoder.decode(chunk or b"", final=self._eof)
+        self._buffer = self._buffer[self._pos :] + text
+        self._pos = 0
+
+    def peek(self) -> str:
+        """Next non-whitespace character (not consumed)"""
+        while True:
+            while (
+                self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE
+            ):
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if self._eof:
+                raise ValueError("Unexpected end of JSON input")
+            self._fill()
+
+    def expect(self, *chars: str) -> str:
+        """Consume one of chars (after whitespace) and return it"""
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"Expected {' or '.join(chars)} in JSON, got {char!r}")
+        self._pos += 1
+        return char
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._pos)
+                # A number at the end of the buffer may continue in the next
+                # chunk, so only accept values followed by something
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+
+def iter_members(
+    stream: BinaryIO, stream_keys: Iterable[str] = (), chunk_size: int = 65536
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Incrementally parse a top-level JSON object from a binary stream
+
+    Yields (key, value) for each member in document order. Members named in
+    stream_keys that hold an array are yielded one element at a time as
+    (key, element), so only one element is in memory at once.
+
+    Raises:
+        ValueError: Input is not a JSON object (json.JSONDecodeError for
+            malformed values)
+    """
+    stream_keys = set(stream_keys)
+    reader = _Reader(stream, chunk_size)
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.value()
+        if not isinstance(key, str):
+            raise ValueError("Expected a string key in JSON object")
+        reader.expect(":")
+        if key in stream_keys and reader.peek() == "[":
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.expect("]")
+            else:
+                while True:
+                    yield key, reader.value()
+                    if reader.expect(",", "]") == "]":
+                        break
+        else:
+            yield key, reader.value()
+        if reader.expect(",", "}") == "}":
+            return
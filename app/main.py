@@ -14,20 +14,28 @@ import time
 from typing import Dict, Any
 from pathlib import Path
 
+# First, so the startup breakdown covers the imports below
+from startup import startup_timer
+
 # Load .env file if it exists (for development)
 from dotenv import load_dotenv
 
 load_dotenv(Path(__file__).parent.parent / ".env")
 
-from web_server import BroadlinkWebServer  # noqa: E402
-from config_loader import ConfigLoader  # noqa: E402
+with startup_timer.phase("imports"):
+    from web_server import BroadlinkWebServer  # noqa: E402
+    from config_loader import ConfigLoader  # noqa: E402
+    from hot_path_log import configure_hot_path_logging  # noqa: E402
 
-# Configure logging
+# Configure logging (trace is debug plus the per-request hot path events)
 LOG_LEVEL = os.getenv("LOG_LEVEL", "info").upper()
 logging.basicConfig(
-    level=getattr(logging, LOG_LEVEL),
+    level=getattr(logging, LOG_LEVEL, logging.DEBUG),
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
 )
+configure_hot_path_logging(
+    LOG_LEVEL, os.getenv("LOG_HOT_PATHS", "").lower() in ("1", "true")
+)
 
 logger = logging.getLogger(__name__)
 
@@ -108,6 +116,10 @@ class BroadlinkManager:
             logger.error(f"Application error: {e}")
             sys.exit(1)
 
+        # Fold pending device writes into storage before exiting
+        if self.web_server:
+            self.web_server.device_manager.compact_storage()
+
         logger.info("Broadlink Manager stopped")
 
     def stop(self):
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Metrics for Broadlink Manager Add-on
+Prometheus text-format counters, gauges and latency histograms
+"""
+
+import asyncio
+import functools
+import json
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Union
+
+from flask import Flask, Response, g, request
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds - from a cached API response up to a full learning timeout
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    """Base for a named metric family with fixed label names"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, Any] = {}
+        self._sources: Dict[str, Callable[[], Dict[LabelValues, float]]] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def collect_from(self, key: str, source: Callable[[], Dict[LabelValues, float]]):
+        """
+        Read values from a callback at scrape time
+
+        Args:
+            key: Replaces an earlier source registered under the same key
+            source: Returns {label values: value} (use () without labels)
+        """
+        with self._lock:
+            self._sources[key] = source
+
+    def _collected(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            values = dict(self._values)
+            sources = list(self._sources.values())
+        for source in sources:
+            try:
+                collected = source()
+            except Exception:
+                continue
+            for key, value in collected.items():
+                values[key] = values.get(key, 0) + value
+        return values
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for key, value in sorted(self._collected().items()):
+            lines.append(
+                f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            )
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down"""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self, size: int):
+        self.buckets = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    """Distribution of observations (latencies) in cumulative buckets"""
+
+    type = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = _HistogramValue(len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry.buckets[i] += 1
+                    break
+            entry.sum += value
+            entry.count += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the duration of the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        with self._lock:
+            snapshot = {
+                key: (list(v.buckets), v.sum, v.count)
+                for key, v in self._values.items()
+            }
+        names = self.labelnames + ("le",)
+        for key, (buckets, total, count) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, buckets):
+                cumulative += bucket
+                labels = _format_labels(names, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.counter(
+    "broadlink_manager_http_requests_total",
+    "HTTP requests by route template, method and status",
+    ("method", "route", "status"),
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    "broadlink_manager_http_request_duration_seconds",
+    "Time to build the HTTP response by route template",
+    ("method", "route"),
+)
+HA_REQUEST_DURATION = registry.histogram(
+    "broadlink_manager_ha_request_duration_seconds",
+    "Home Assistant REST and websocket call latency by endpoint",
+    ("transport", "endpoint"),
+)
+HA_REQUEST_ERRORS = registry.counter(
+    "broadlink_manager_ha_request_errors_total",
+    "Home Assistant calls that failed, by HTTP status, error or no_result",
+    ("transport", "endpoint", "status"),
+)
+STORAGE_PARSE_DURATION = registry.histogram(
+    "broadlink_manager_storage_parse_duration_seconds",
+    "Time to parse storage files by kind (count is the number of parses)",
+    ("file",),
+)
+CACHE_LOOKUPS = registry.counter(
+    "broadlink_manager_cache_lookups_total",
+    "Cache lookups by cache and result (hit or miss)",
+    ("cache", "result"),
+)
+PENDING_COMMAND_POLLS = registry.gauge(
+    "broadlink_manager_pending_command_polls",
+    "Learned commands waiting for Home Assistant to write them to storage",
+)
+LEARNING_DURATION = registry.histogram(
+    "broadlink_manager_learning_session_duration_seconds",
+    "Command learning sessions by method and outcome",
+    ("method", "outcome"),
+    buckets=(1.0, 2.5, 5.0, 10.0, 15.0, 20.0, 30.0, 45.0, 60.0, 120.0),
+)
+
+# Entity IDs and config entry IDs would make one series per device
+_HA_ENDPOINT_IDS = [
+    (re.compile(r"^states/.+"), "states/{entity_id}"),
+    (
+        re.compile(r"^config/config_entries/entry/[^/]+/(\w+)$"),
+        r"config/config_entries/entry/{entry_id}/\1",
+    ),
+]
+
+
+def ha_endpoint(endpoint: str) -> str:
+    """Endpoint label for a Home Assistant REST path (IDs replaced)"""
+    for pattern, replacement in _HA_ENDPOINT_IDS:
+        if pattern.match(endpoint):
+            return pattern.sub(replacement, endpoint)
+    return endpoint
+
+
+def cache_counts(hits: int, misses: int, cache: str) -> Dict[LabelValues, float]:
+    """CACHE_LOOKUPS source values from a cache's hit/miss counters"""
+    return {(cache, "hit"): hits, (cache, "miss"): misses}
+
+
+def parse_storage(content: Union[str, bytes], file: str) -> Any:
+    """Parse a JSON storage file, recording the parse under its kind"""
+    with STORAGE_PARSE_DURATION.time(file=file):
+        return json.loads(content)
+
+
+async def timed_ha_call(transport: str, endpoint: str, call) -> Any:
+    """
+    Await a Home Assistant call, recording its latency
+
+    Exceptions (re-raised) are counted as errors with status "error" and
+    None results with status "no_result".
+    """
+    start = time.perf_counter()
+    status = "error"
+    try:
+        result = await call
+        status = "no_result" if result is None else None
+        return result
+    finally:
+        HA_REQUEST_DURATION.observe(
+            time.perf_counter() - start, transport=transport, endpoint=endpoint
+        )
+        if status is not None:
+            HA_REQUEST_ERRORS.inc(transport=transport, endpoint=endpoint, status=status)
+
+
+async def timed_ha_request(endpoint: str, call) -> Any:
+    """
+    Await a Home Assistant REST call returning (HTTP status, result)
+
+    Records latency like timed_ha_call. Non-2xx responses are counted as
+    errors under their status code and exceptions (re-raised) as "error".
+
+    Returns:
+        The call's result without the status
+    """
+    start = time.perf_counter()
+    status: Union[int, str] = "error"
+    try:
+        status, result = await call
+        return result
+    finally:
+        HA_REQUEST_DURATION.observe(
+            time.perf_counter() - start, transport="rest", endpoint=endpoint
+        )
+        if not (isinstance(status, int) and 200 <= status < 300):
+            HA_REQUEST_ERRORS.inc(
+                transport="rest", endpoint=endpoint, status=str(status)
+            )
+
+
+def _learning_outcome(result: Any) -> str:
+    if isinstance(result, dict):
+        return "learned" if result.get("success") else "failed"
+    return "learned" if result else "no_signal"
+
+
+def timed_learning(method: str):
+    """
+    Decorator recording a learning session's duration and outcome
+
+    Outcome is "learned" for a code (or a result dict with success),
+    "no_signal"/"failed" otherwise and "error" when the call raises.
+    """
+
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                outcome = "error"
+                try:
+                    result = await func(*args, **kwargs)
+                    outcome = _learning_outcome(result)
+                    return result
+                finally:
+                    LEARNING_DURATION.observe(
+                        time.perf_counter() - start, method=method, outcome=outcome
+                    )
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = func(*args, **kwargs)
+                outcome = _learning_outcome(result)
+                return result
+            finally:
+                LEARNING_DURATION.observe(
+                    time.perf_counter() - start, method=method, outcome=outcome
+                )
+
+        return wrapper
+
+    return decorator
+
+
+class RequestMetrics:
+    """
+    Count and time every Flask request by its route template
+
+    Route templates (/api/commands/<device_id>) rather than paths keep the
+    number of series bounded. Streamed responses are timed until the
+    response object is returned, not until the stream ends.
+    """
+
+    def init_app(self, app: Flask):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    @staticmethod
+    def _start():
+        g._metrics_start = time.perf_counter()
+
+    @staticmethod
+    def _finish(response: Response) -> Response:
+        start = g.pop("_metrics_start", None)
+        if start is None:
+            return response
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start, method=request.method, route=route
+        )
+        HTTP_REQUESTS.inc(
+            method=request.method, route=route, status=response.status_code
+        )
+        return response
+
+
+def render_metrics() -> Response:
+    """Response with the registry in Prometheus text format"""
+    return Response(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Payload Store for Broadlink Manager Add-on
+Content-addressed binary storage for learned command payloads
+"""
+
+import base64
+import binascii
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 16
+
+# Pack record header: raw digest, payload length
+_RECORD_HEADER = struct.Struct(f"<{HASH_SIZE}sI")
+
+# Offset table sidecar: header (magic, version, pack bytes covered, entry
+# count) followed by entries (raw digest, payload offset, length) sorted by
+# digest, so lookups binary-search the mapped file without loading it
+_TABLE_MAGIC = b"BLPT"
+_TABLE_VERSION = 1
+_TABLE_HEADER = struct.Struct("<4sHQI")
+_TABLE_ENTRY = struct.Struct(f"<{HASH_SIZE}sQI")
+
+# One store per pack file, shared by all DeviceManager instances
+_stores: Dict[str, "PayloadStore"] = {}
+_stores_lock = threading.Lock()
+
+
+def payload_hash(raw: bytes) -> str:
+    """Content hash used to reference a payload"""
+    return hashlib.blake2b(raw, digest_size=HASH_SIZE).hexdigest()
+
+
+class PayloadStore:
+    """
+    Append-only pack file of raw command payloads keyed by content hash
+
+    Each record is a header (digest, length) followed by the raw bytes, so
+    identical codes learned on several devices are stored once and never as
+    base64 text. Reads slice a memory map of the pack without copying; the
+    offset table (payloads.idx) is memory-mapped as well, and only records
+    appended since it was written are indexed in memory. A record torn by a
+    crash is cut off when the pack is opened.
+    """
+
+    # Rewrite the offset table once this many payloads were appended after it
+    TABLE_FLUSH_THRESHOLD = 1024
+
+    def __init__(self, pack_file: Path):
+        """
+        Initialize payload store
+
+        Args:
+            pack_file: Path to the pack file
+        """
+        self.pack_file = Path(pack_file)
+        self.table_file = self.pack_file.with_suffix(".idx")
+        self._lock = threading.Lock()
+        self._map: Optional[mmap.mmap] = None
+        self._table: Optional[mmap.mmap] = None
+        self._table_count = 0
+        self._table_end = 0
+        self._tail: Dict[str, Tuple[int, int]] = {}
+        self._end = 0
+        self._unsynced = False
+        with self._lock:
+            self._open()
+
+    @classmethod
+    def for_path(cls, pack_file: Path) -> "PayloadStore":
+        """Get the shared store for a pack file"""
+        key = str(pack_file)
+        with _stores_lock:
+            if key not in _stores:
+                _stores[key] = cls(pack_file)
+            return _stores[key]
+
+    def _open(self, use_table: bool = True):
+        """Map the pack and offset table, indexing records after the table"""
+        if not self.pack_file.exists():
+            self.pack_file.touch()
+        self._release(self._table)
+        self._table, self._table_count, self._table_end = None, 0, 0
+        self._tail = {}
+        if use_table:
+            self._load_table()
+        self._scan(self._table_end)
+        self._map_pack()
+
+    @staticmethod
+    def _release(mapping: Optional[mmap.mmap]):
+        """Close a mapping unless slices of it are still in use"""
+        if mapping is not None:
+            try:
+                mapping.close()
+            except BufferError:
+                pass  # Closed when the last exported view is released
+
+    def _map_pack(self):
+        self._release(self._map)
+        self._map = None
+        with open(self.pack_file, "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _load_table(self):
+        """Map the offset table if it matches the pack"""
+        try:
+            with open(self.table_file, "rb") as f:
+                table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return  # Missing or empty
+
+        try:
+            magic, version, covered, count = _TABLE_HEADER.unpack_from(table)
+            valid = (
+                magic == _TABLE_MAGIC
+                and version == _TABLE_VERSION
+                and covered <= self.pack_file.stat().st_size
+                and len(table) == _TABLE_HEADER.size + count * _TABLE_ENTRY.size
+            )
+        except struct.error:
+            valid = False
+        if not valid:
+            logger.warning("Ignoring payload offset table that does not match pack")
+            table.close()
+            return
+        self._table, self._table_count, self._table_end = table, count, covered
+
+    def _scan(self, start: int):
+        """Index records from start to the end of the pack"""
+        with open(self.pack_file, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            f.seek(start)
+            offset = start
+            while True:
+                header = f.read(_RECORD_HEADER.size)
+                if len(header) < _RECORD_HEADER.size:
+                    break
+                digest, length = _RECORD_HEADER.unpack(header)
+                data_offset = offset + _RECORD_HEADER.size
+                if data_offset + length > size:
+                    break
+                f.seek(length, os.SEEK_CUR)
+                if self._lookup(digest.hex()) is None:
+                    self._tail[digest.hex()] = (data_offset, length)
+                offset = data_offset + length
+
+        if offset < size:
+            logger.warning("Discarding torn record at end of payload store")
+            with open(self.pack_file, "r+b") as f:
+                f.truncate(offset)
+        self._end = offset
+
+    def _lookup(self, digest: str) -> Optional[Tuple[int, int]]:
+        """Find (offset, length) of a payload"""
+        location = self._tail.get(digest)
+        if location is not None or self._table is None:
+            return location
+
+        key = bytes.fromhex(digest)
+        low, high = 0, self._table_count
+        while low < high:
+            middle = (low + high) // 2
+            position = _TABLE_HEADER.size + middle * _TABLE_ENTRY.size
+            current = self._table[position : position + HASH_SIZE]
+            if current < key:
+                low = middle + 1
+            elif current > key:
+                high = middle
+            else:
+                _, offset, length = _TABLE_ENTRY.unpack_from(self._table, position)
+                return offset, length
+        return None
+
+    def _entries(self) -> Iterator[Tuple[str, int, int]]:
+        """All (digest, offset, length) entries"""
+        if self._table is not None:
+            for index in range(self._table_count):
+                digest, offset, length = _TABLE_ENTRY.unpack_from(
+                    self._table, _TABLE_HEADER.size + index * _TABLE_ENTRY.size
+                )
+                yield digest.hex(), offset, length
+        for digest, (offset, length) in self._tail.items():
+            yield digest, offset, length
+
+    def _write_table(self):
+        """Persist the offset table for everything indexed so far"""
+        entries = sorted(
+            (bytes.fromhex(digest), offset, length)
+            for digest, offset, length in self._entries()
+        )
+        temp_file = self.table_file.with_suffix(".idx.tmp")
+        with open(temp_file, "wb") as f:
+            f.write(
+                _TABLE_HEADER.pack(
+                    _TABLE_MAGIC, _TABLE_VERSION, self._end, len(entries)
+                )
+            )
+            f.write(b"".join(_TABLE_ENTRY.pack(*entry) for entry in entries))
+            f.flush()
+            os.fsync(f.fileno())
+        self._release(self._table)
+        self._table = None
+        temp_file.replace(self.table_file)
+        self._tail = {}
+        self._load_table()
+
+    def __len__(self) -> int:
+        return self._table_count + len(self._tail)
+
+    def __contains__(self, digest: str) -> bool:
+        with self._lock:
+            return self._lookup(digest) is not None
+
+    def put(self, raw: bytes) -> str:
+        """
+        Store a payload (no-op if already present)
+
+        Call sync() before persisting anything that references it.
+
+        Returns:
+            Payload hash
+        """
+        digest = payload_hash(raw)
+        with self._lock:
+            if self._lookup(digest) is not None:
+                return digest
+            with open(self.pack_file, "ab") as f:
+                start = f.seek(0, os.SEEK_END)
+                f.write(_RECORD_HEADER.pack(bytes.fromhex(digest), len(raw)))
+                f.write(raw)
+            self._tail[digest] = (start + _RECORD_HEADER.size, len(raw))
+            self._end = start + _RECORD_HEADER.size + len(raw)
+            self._unsynced = True
+        return digest
+
+    def put_base64(self, data: str) -> Optional[str]:
+        """
+        Store a base64 payload if it round-trips exactly
+
+        Returns:
+            Payload hash, or None if data is not canonical base64
+        """
+        if not data:
+            return None
+        try:
+            raw = base64.b64decode(data, validate=True)
+        except (binascii.Error, ValueError):
+            return None
+        if base64.b64encode(raw).decode("ascii") != data:
+            return None
+        return self.put(raw)
+
+    def sync(self):
+        """Make stored payloads durable"""
+        with self._lock:
+            if not self._unsynced:
+                return
+            with open(self.pack_file, "rb+") as f:
+                os.fsync(f.fileno())
+            self._unsynced = False
+            if len(self._tail) >= self.TABLE_FLUSH_THRESHOLD:
+                self._write_table()
+
+    def checkpoint(self):
+        """Sync the pack and write the offset table (e.g. at shutdown)"""
+        self.sync()
+        with self._lock:
+            if self._tail or not self.table_file.exists():
+                self._write_table()
+
+    def get_view(self, digest: str) -> Optional[memoryview]:
+        """
+        Get a payload by hash without copying it
+
+        Returns:
+            Read-only view into the mapped pack, or None if unknown
+        """
+        with self._lock:
+            for attempt in range(2):
+                location = self._lookup(digest)
+                if location is not None:
+                    offset, length = location
+                    if self._map is None or offset + length > len(self._map):
+                        self._map_pack()
+                    header = offset - _RECORD_HEADER.size
+                    if self._map[header : header + HASH_SIZE] == bytes.fromhex(digest):
+                        return memoryview(self._map)[offset : offset + length]
+                if attempt == 0:
+                    # Pack was appended to or rewritten by another process;
+                    # rebuild from the pack itself if the table is wrong
+                    self._open(use_table=location is None)
+        return None
+
+    def get_views(self, digests: Iterable[str]) -> Dict[str, memoryview]:
+        """
+        Get many payloads by hash without copying them
+
+        Walks the offset table once instead of searching it per payload, for
+        reads that cover much of the library. Unknown hashes are left out.
+        """
+        wanted = set(digests)
+        views: Dict[str, memoryview] = {}
+        with self._lock:
+            if self._map is not None:
+                mapped = memoryview(self._map)
+                for digest, offset, length in self._entries():
+                    if digest not in wanted or offset + length > len(mapped):
+                        continue
+                    header = offset - _RECORD_HEADER.size
+                    if mapped[header : header + HASH_SIZE] == bytes.fromhex(digest):
+                        views[digest] = mapped[offset : offset + length]
+
+        # Records the map does not cover yet go through the checked lookup
+        for digest in wanted.difference(views):
+            view = self.get_view(digest)
+            if view is not None:
+                views[digest] = view
+        return views
+
+    def get(self, digest: str) -> Optional[bytes]:
+        """Get a payload by hash as a bytes copy"""
+        view = self.get_view(digest)
+        return None if view is None else bytes(view)
+
+    def get_base64(self, digest: str) -> Optional[str]:
+        """Get a payload by hash as base64 (encoded straight from the map)"""
+        view = self.get_view(digest)
+        return None if view is None else base64.b64encode(view).decode("ascii")
+
+    @property
+    def end(self) -> int:
+        """Current end of the pack (marks payloads stored after this point)"""
+        return self._end
+
+    def stats(self) -> Dict[str, int]:
+        """Payload count and file sizes"""
+        return {
+            "payloads": len(self),
+            "bytes": self._end,
+            "unindexed": len(self._tail),
+        }
+
+    def prune(self, live: Iterable[str], keep_after: int = 0) -> int:
+        """
+        Rewrite the pack without payloads that are no longer referenced
+
+        Args:
+            live: Hashes still referenced
+            keep_after: Also keep payloads stored at or after this offset
+                (stored after the live set was collected)
+
+        Returns:
+            Number of payloads removed
+        """
+        live = set(live)
+        with self._lock:
+            entries = list(self._entries())
+            keep = [
+                (digest, offset, length)
+                for digest, offset, length in entries
+                if digest in live or offset >= keep_after
+            ]
+            removed = len(entries) - len(keep)
+            if not removed:
+                return 0
+
+            temp_file = self.pack_file.with_suffix(".tmp")
+            with open(self.pack_file, "rb") as src, open(temp_file, "wb") as dst:
+                for digest, offset, length in sorted(keep, key=lambda k: k[1]):
+                    src.seek(offset)
+                    dst.write(_RECORD_HEADER.pack(bytes.fromhex(digest), length))
+                    dst.write(src.read(length))
+                dst.flush()
+                os.fsync(dst.fileno())
+            self._release(self._map)
+            self._map = None
+            temp_file.replace(self.pack_file)
+            self._unsynced = False
+            self._open(use_table=False)
+            self._write_table()
+
+        logger.info(f"Pruned {removed} unreferenced payload(s)")
+        return removed
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Pulse Decoder for Broadlink Manager Add-on
+Decodes Broadlink IR/RF packets into pulse timings, many packets at a time
+"""
+
+import base64
+import binascii
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+try:
+    import numpy as np
+except ImportError:  # Optional - decoded in pure Python without it
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Packet layout: type byte, repeat count, little-endian length of the pulse
+# section, then one byte per pulse in ticks (0x00 escapes a big-endian
+# two-byte value). Learned packets end the pulses with 0x0d 0x05 and are
+# padded to 16 bytes.
+HEADER_SIZE = 4
+TICK_US = 269 / 8192 * 1000  # Same unit as python-broadlink
+TRAILER = (0x0D, 0x05)
+
+IR_PACKET = 0x26
+RF315_PACKET = 0xD7
+
+# A space at least this long ends a frame; captures often hold the frame
+# (or a short repeat code) several times
+FRAME_GAP_US = 20000
+# Frames of at most this many pulses after the first are repeat codes
+REPEAT_CODE_PULSES = 4
+# Relative timing difference under which two frames are the same frame
+FRAME_TOLERANCE = 0.25
+
+Packet = Union[bytes, bytearray, memoryview]
+
+
+def packet_type(header: Packet) -> Optional[str]:
+    """
+    "ir" or "rf" from the first two bytes of a packet
+
+    0x26 is IR, 0xb0-0xbf (433 MHz) and 0xd7 (315 MHz) are RF. A 0x26
+    packet with a non-zero second byte is classed as RF, as sync has always
+    done. Returns None for anything that is not a Broadlink packet.
+    """
+    if len(header) < 2:
+        return None
+    first = header[0]
+    if first == IR_PACKET:
+        return "ir" if header[1] == 0 else "rf"
+    if 0xB0 <= first <= 0xBF or first == RF315_PACKET:
+        return "rf"
+    return None
+
+
+def packet_band(header: Packet) -> Optional[str]:
+    """Band of a packet: ir, rf433, rf315 or rf (unknown), None if not a packet"""
+    kind = packet_type(header)
+    if kind != "rf":
+        return kind
+    if 0xB0 <= header[0] <= 0xBF:
+        return "rf433"
+    if header[0] == RF315_PACKET:
+        return "rf315"
+    return "rf"
+
+
+def base64_header(data: str) -> bytes:
+    """First bytes of a base64 payload, decoding only what the header needs"""
+    try:
+        return base64.b64decode(data[:4], validate=True)
+    except (binascii.Error, ValueError):
+        return b""
+
+
+def _from_base64(data: Any) -> bytes:
+    if not isinstance(data, str):
+        return b""
+    try:
+        return base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError):
+        return b""
+
+
+def _split(packet: Packet):
+    """(kind, repeat, pulse section) of a packet; kind 0 if it is not one"""
+    if len(packet) < HEADER_SIZE or packet_type(packet[:2]) is None:
+        return 0, 0, b""
+    length = packet[2] | packet[3] << 8
+    return packet[0], packet[1], bytes(packet[HEADER_SIZE : HEADER_SIZE + length])
+
+
+def _ticks_python(section: bytes) -> List[int]:
+    ticks = []
+    index = 0
+    end = len(section)
+    while index < end:
+        value = section[index]
+        index += 1
+        if value == 0:
+            if index + 2 > end:
+                break  # Truncated escape
+            value = section[index] << 8 | section[index + 1]
+            index += 2
+        ticks.append(value)
+    if tuple(ticks[-2:]) == TRAILER:
+        del ticks[-2:]
+    return ticks
+
+
+def _ticks_numpy(sections: List[bytes]):
+    """Flat tick array and per-section offsets for all pulse sections"""
+    lengths = np.fromiter(map(len, sections), dtype=np.int64, count=len(sections))
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    raw = np.frombuffer(b"".join(sections), dtype=np.uint8)
+    ticks = raw.astype(np.int32)
+    keep = np.ones(len(raw), dtype=bool)
+
+    # A zero starts an escape unless an earlier escape in its section
+    # consumed it. That only depends on the previous zero when it is at
+    # most two bytes back, so only those zeros are resolved in a loop.
+    zeros = np.flatnonzero(raw == 0)
+    zero_ends = ends[np.searchsorted(ends, zeros, side="right")]
+    chained = np.zeros(len(zeros), dtype=bool)
+    chained[1:] = (np.diff(zeros) <= 2) & (zero_ends[1:] == zero_ends[:-1])
+    escapes = ~chained
+    for index in np.flatnonzero(chained).tolist():
+        previous = index - 1
+        while previous >= 0 and not escapes[previous]:
+            previous -= 1
+        escapes[index] = previous < 0 or zeros[index] >= zeros[previous] + 3
+    escapes, escape_ends = zeros[escapes], zero_ends[escapes]
+
+    truncated = escapes + 3 > escape_ends
+    for position, end in zip(
+        escapes[truncated].tolist(), escape_ends[truncated].tolist()
+    ):
+        keep[position:end] = False
+    escapes = escapes[~truncated]
+    ticks[escapes] = raw[escapes + 1].astype(np.int32) << 8 | raw[escapes + 2]
+    keep[escapes + 1] = False
+    keep[escapes + 2] = False
+
+    kept = np.concatenate(([0], np.cumsum(keep)))
+    counts = kept[ends] - kept[starts]
+    ticks = ticks[keep]
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    # Drop the 0x0d 0x05 trailer
+    last = offsets[1:] - 1
+    has_trailer = counts >= 2
+    has_trailer[has_trailer] &= (ticks[last[has_trailer]] == TRAILER[1]) & (
+        ticks[last[has_trailer] - 1] == TRAILER[0]
+    )
+    if has_trailer.any():
+        keep = np.ones(len(ticks), dtype=bool)
+        keep[last[has_trailer]] = False
+        keep[last[has_trailer] - 1] = False
+        ticks = ticks[keep]
+        offsets = np.concatenate(([0], np.cumsum(counts - 2 * has_trailer)))
+    return ticks, offsets
+
+
+class PulseBatch:
+    """
+    Decoded packets
+
+    Per-packet header fields (kinds, repeats) and one flat array of pulse
+    lengths in microseconds; packet i owns pulses[offsets[i]:offsets[i + 1]].
+    Pulses alternate mark and space, starting with a mark. The arrays are
+    NumPy arrays when NumPy is installed and lists otherwise. Packets that
+    could not be decoded have kind 0 and no pulses.
+    """
+
+    def __init__(self, kinds, repeats, offsets, pulses):
+        self.kinds = kinds
+        self.repeats = repeats
+        self.offsets = offsets
+        self.pulses = pulses
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def pulses_of(self, index: int):
+        return self.pulses[self.offsets[index] : self.offsets[index + 1]]
+
+    def command_type(self, index: int) -> Optional[str]:
+        return packet_type(bytes([self.kinds[index], self.repeats[index]]))
+
+    def band(self, index: int) -> Optional[str]:
+        return packet_band(bytes([self.kinds[index], self.repeats[index]]))
+
+    def pulse_counts(self):
+        if np is not None:
+            return np.diff(self.offsets)
+        return [end - start for start, end in zip(self.offsets, self.offsets[1:])]
+
+    def durations_us(self):
+        """Total length of each packet's pulse train"""
+        if np is not None:
+            totals = np.concatenate(([0], np.cumsum(self.pulses, dtype=np.int64)))
+            return totals[self.offsets[1:]] - totals[self.offsets[:-1]]
+        return [sum(self.pulses_of(index)) for index in range(len(self))]
+
+    def frame_counts(self):
+        """Frames per packet: spaces of at least FRAME_GAP_US end a frame"""
+        counts = self.pulse_counts()
+        if np is None:
+            return [
+                _frame_count(self.pulses_of(index)) if counts[index] else 0
+                for index in range(len(self))
+            ]
+        gaps = np.flatnonzero(self.pulses >= FRAME_GAP_US)
+        owners = np.searchsorted(self.offsets, gaps, side="right") - 1
+        # A gap that ends the packet does not start another frame
+        inner = gaps != self.offsets[owners + 1] - 1
+        frames = np.bincount(owners[inner], minlength=len(self)) + 1
+        return np.where(counts > 0, frames, 0)
+
+    def frames_of(self, index: int) -> List[List[int]]:
+        """Pulse lists of a packet's frames, each ending with its gap"""
+        frames, current = [], []
+        for pulse in _as_list(self.pulses_of(index)):
+            current.append(pulse)
+            if pulse >= FRAME_GAP_US:
+                frames.append(current)
+                current = []
+        if current:
+            frames.append(current)
+        return frames
+
+    def canonical(self, index: int) -> List[int]:
+        """
+        Repeat-stripped pulse train of a packet
+
+        Frames from the first copy of frame one or repeat code onward are
+        dropped, along with the trailing gap, so captures of one button
+        held for different lengths of time line up. Multi-part codes (e.g.
+        air conditioners sending two different frames) are kept whole.
+        """
+        frames = self.frames_of(index)
+        kept = frames[:1]
+        for frame in frames[1:]:
+            if len(frame) <= REPEAT_CODE_PULSES or _same_frame(frames[0], frame):
+                break
+            kept.append(frame)
+        pulses = [pulse for frame in kept for pulse in frame]
+        if pulses and pulses[-1] >= FRAME_GAP_US:
+            pulses.pop()
+        return pulses
+
+    def canonical_lengths(self):
+        """
+        Length of each packet's canonical pulse train
+
+        The canonical train is always a prefix of the packet. With NumPy the
+        common shapes (one frame, or a frame followed by a copy of itself or
+        a repeat code) are resolved for all packets at once; multi-part
+        codes go through canonical().
+        """
+        counts = self.pulse_counts()
+        if np is None:
+            return [len(self.canonical(index)) for index in range(len(self))]
+
+        starts, ends = self.offsets[:-1], self.offsets[1:]
+        ends_with_gap = (counts > 0) & (self.pulses[ends - 1] >= FRAME_GAP_US)
+        lengths = counts - ends_with_gap
+
+        # First and second frame-ending gap of every packet that has one
+        gaps = np.flatnonzero(self.pulses >= FRAME_GAP_US)
+        owners = np.searchsorted(self.offsets, gaps, side="right") - 1
+        packets, first = np.unique(owners, return_index=True)
+        first_gap = gaps[first]
+        multi = first_gap < ends[packets] - 1
+        packets, first, first_gap = packets[multi], first[multi], first_gap[multi]
+        if not len(packets):
+            return lengths
+
+        has_second = first + 1 < len(gaps)
+        has_second[has_second] &= owners[first[has_second] + 1] == packets[has_second]
+        second_end = ends[packets].copy()
+        second_end[has_second] = gaps[first[has_second] + 1] + 1
+        first_length = first_gap - starts[packets] + 1
+        second_length = second_end - first_gap - 1
+
+        # Compare the first frame with the second where their lengths match
+        # (gaps are not compared; the last frame may have none)
+        stripped = second_length <= REPEAT_CODE_PULSES
+        same = np.flatnonzero(second_length - has_second == first_length - 1)
+        if len(same):
+            compared = first_length[same] - 1
+            owner = np.repeat(np.arange(len(same)), compared)
+            within = np.arange(compared.sum()) - np.repeat(
+                np.cumsum(compared) - compared, compared
+            )
+            a = self.pulses[np.repeat(starts[packets[same]], compared) + within]
+            b = self.pulses[np.repeat(first_gap[same] + 1, compared) + within]
+            differs = np.abs(a - b) > FRAME_TOLERANCE * np.maximum(a, b)
+            stripped[same] |= np.bincount(owner, differs, len(same)) == 0
+
+        lengths[packets[stripped]] = first_length[stripped] - 1
+        for index in packets[~stripped].tolist():
+            lengths[index] = len(self.canonical(index))
+        return lengths
+
+    def canonical_batch(self) -> "PulseBatch":
+        """Canonical pulse trains of all packets, as a new batch"""
+        lengths = self.canonical_lengths()
+        if np is None:
+            offsets, pulses = [0], []
+            for index, length in enumerate(lengths):
+                pulses.extend(self.pulses_of(index)[:length])
+                offsets.append(len(pulses))
+            return PulseBatch(self.kinds, self.repeats, offsets, pulses)
+
+        within = np.arange(len(self.pulses)) - np.repeat(
+            self.offsets[:-1], self.pulse_counts()
+        )
+        keep = within < np.repeat(lengths, self.pulse_counts())
+        return PulseBatch(
+            self.kinds,
+            self.repeats,
+            np.concatenate(([0], np.cumsum(lengths))),
+            self.pulses[keep],
+        )
+
+    def summary(self, index: int) -> Dict[str, Any]:
+        pulses = _as_list(self.pulses_of(index))
+        return {
+            "type": self.command_type(index),
+            "band": self.band(index),
+            "repeat": int(self.repeats[index]),
+            "pulses": len(pulses),
+            "duration_ms": round(sum(pulses) / 1000, 1),
+            "frames": _frame_count(pulses) if pulses else 0,
+        }
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        """Type, band, repeat count, pulse count, duration and frames per packet"""
+        counts = _as_list(self.pulse_counts())
+        durations = _as_list(self.durations_us())
+        frames = _as_list(self.frame_counts())
+        return [
+            {
+                "type": self.command_type(index),
+                "band": self.band(index),
+                "repeat": int(self.repeats[index]),
+                "pulses": counts[index],
+                "duration_ms": round(durations[index] / 1000, 1),
+                "frames": frames[index],
+            }
+            for index in range(len(self))
+        ]
+
+
+def _as_list(values) -> list:
+    return values.tolist() if np is not None and hasattr(values, "tolist") else values
+
+
+def _frame_count(pulses: Sequence[int]) -> int:
+    return 1 + sum(1 for pulse in pulses[:-1] if pulse >= FRAME_GAP_US)
+
+
+def _same_frame(first: Sequence[int], other: Sequence[int]) -> bool:
+    """Same pulse count and every pulse within FRAME_TOLERANCE (gaps ignored)"""
+    first, other = _without_gap(first), _without_gap(other)
+    if len(first) != len(other):
+        return False
+    return all(abs(a - b) <= FRAME_TOLERANCE * max(a, b) for a, b in zip(first, other))
+
+
+def _without_gap(frame: Sequence[int]) -> Sequence[int]:
+    if frame and frame[-1] >= FRAME_GAP_US:
+        return frame[:-1]
+    return frame
+
+
+def decode_packets(packets: Iterable[Packet]) -> PulseBatch:
+    """Decode raw Broadlink packets in one pass"""
+    split = [_split(packet) for packet in packets]
+    kinds = [kind for kind, _, _ in split]
+    repeats = [repeat for _, repeat, _ in split]
+    sections = [section for _, _, section in split]
+
+    if np is not None:
+        ticks, offsets = _ticks_numpy(sections)
+        pulses = (ticks * TICK_US).astype(np.int32)
+        return PulseBatch(
+            np.array(kinds, dtype=np.uint8),
+            np.array(repeats, dtype=np.uint8),
+            offsets,
+            pulses,
+        )
+
+    offsets, pulses = [0], []
+    for section in sections:
+        pulses.extend(int(tick * TICK_US) for tick in _ticks_python(section))
+        offsets.append(len(pulses))
+    return PulseBatch(kinds, repeats, offsets, pulses)
+
+
+def decode_base64(payloads: Iterable[Any]) -> PulseBatch:
+    """Decode base64 payloads; anything else ("pending", bad base64) decodes empty"""
+    return decode_packets([_from_base64(payload) for payload in payloads])
+
+
+def encode_packet(kind: int, pulses: Iterable[int], repeat: int = 0) -> bytes:
+    """Broadlink packet for a pulse train in microseconds, with the trailer"""
+    section = bytearray()
+    for pulse in pulses:
+        ticks = max(1, round(pulse / TICK_US))
+        if ticks < 256:
+            section.append(ticks)
+        else:
+            section += b"\x00" + min(ticks, 0xFFFF).to_bytes(2, "big")
+    section += bytes(TRAILER)
+    packet = bytes([kind, repeat]) + len(section).to_bytes(2, "little") + section
+    # Broadlink pads packets to 16 bytes
+    return packet + b"\x00" * (-len(packet) % 16)
+
+
+def summarize(batch: PulseBatch) -> Dict[str, Any]:
+    """Library-wide figures for a batch (diagnostics)"""
+    summaries = [item for item in batch.summaries() if item["type"]]
+    bands: Dict[str, int] = {}
+    for item in summaries:
+        bands[item["band"]] = bands.get(item["band"], 0) + 1
+
+    def spread(key: str) -> Optional[Dict[str, float]]:
+        values = sorted(item[key] for item in summaries)
+        if not values:
+            return None
+        return {
+            "min": values[0],
+            "median": values[len(values) // 2],
+            "max": values[-1],
+        }
+
+    return {
+        "decoded": len(summaries),
+        "undecodable": len(batch) - len(summaries),
+        "bands": bands,
+        "with_repeat": sum(1 for item in summaries if item["repeat"]),
+        "multi_frame": sum(1 for item in summaries if item["frames"] > 1),
+        "pulses": spread("pulses"),
+        "duration_ms": spread("duration_ms"),
+        "vectorized": np is not None,
+    }
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Request Profiler for Broadlink Manager Add-on
+Opt-in cProfile capture of individual requests for diagnostics downloads
+"""
+
+import cProfile
+import hmac
+import itertools
+import logging
+import marshal
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Requests carrying this header (with the configured token) are profiled
+HEADER = "X-Broadlink-Profile"
+_ENVIRON_HEADER = "HTTP_" + HEADER.upper().replace("-", "_")
+
+# Downloading profiles must not evict the profiles being downloaded
+_EXCLUDED_PATH = "/api/diagnostics/profiles"
+
+FuncKey = Tuple[str, int, str]
+
+
+def _label(func: FuncKey) -> str:
+    filename, lineno, name = func
+    if filename == "~":
+        return name.replace(";", ",")
+    return f"{name} ({os.path.basename(filename)}:{lineno})".replace(";", ",")
+
+
+def collapsed_stacks(stats: Dict[FuncKey, tuple], min_seconds: float = 1e-5) -> str:
+    """
+    Collapsed-stack text (flamegraph.pl / speedscope) from cProfile stats
+
+    cProfile keeps caller/callee edges rather than full stacks, so stacks
+    are rebuilt from the roots down and a function's time is split between
+    its callers in proportion to each edge's cumulative time. Values are
+    microseconds of own time.
+    """
+    callees: Dict[FuncKey, List[Tuple[FuncKey, float]]] = defaultdict(list)
+    roots = []
+    for func, (_, _, _, _, callers) in stats.items():
+        if not callers:
+            roots.append(func)
+        for caller, edge in callers.items():
+            callees[caller].append((func, edge[3]))
+
+    totals: Dict[str, float] = defaultdict(float)
+
+    def walk(func, labels, path, fraction):
+        _, _, own, cumulative, _ = stats[func]
+        labels = labels + (_label(func),)
+        if own * fraction > 0:
+            totals[";".join(labels)] += own * fraction
+        for callee, edge_cumulative in callees.get(func, ()):
+            callee_cumulative = stats[callee][3]
+            share = edge_cumulative * fraction
+            if callee in path or not callee_cumulative or share < min_seconds:
+                continue
+            walk(callee, labels, path | {callee}, share / callee_cumulative)
+
+    for root in roots:
+        walk(root, (), {root}, 1.0)
+
+    return "".join(
+        f"{stack} {round(seconds * 1_000_000)}\n"
+        for stack, seconds in sorted(totals.items())
+        if round(seconds * 1_000_000) > 0
+    )
+
+
+class ProfileRecord:
+    """One profiled request"""
+
+    __slots__ = ("id", "method", "path", "status", "started_at", "duration", "stats")
+
+    def __init__(self, profile_id: int, method: str, path: str, started_at: float):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.status: Optional[str] = None
+        self.started_at = started_at
+        self.duration = 0.0
+        self.stats: Dict[FuncKey, tuple] = {}
+
+    def summary(self, top: int = 5) -> Dict[str, Any]:
+        """JSON-friendly description with the functions using most own time"""
+        hottest = sorted(self.stats.items(), key=lambda item: item[1][2], reverse=True)
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(),
+            "duration_ms": round(self.duration * 1000, 3),
+            "top": [
+                {
+                    "function": _label(func),
+                    "calls": calls,
+                    "own_ms": round(own * 1000, 3),
+                    "cumulative_ms": round(cumulative * 1000, 3),
+                }
+                for func, (_, calls, own, cumulative, _) in hottest[:top]
+            ],
+        }
+
+    def pstats_bytes(self) -> bytes:
+        """Same format as pstats.Stats.dump_stats (load with pstats/snakeviz)"""
+        return marshal.dumps(self.stats)
+
+    def collapsed(self) -> str:
+        return collapsed_stacks(self.stats)
+
+
+class _ProfiledBody:
+    """Response iterable that keeps profiling while the body is produced"""
+
+    def __init__(self, body, profiler: cProfile.Profile, finish):
+        self._body = body
+        self._profiler = profiler
+        self._finish = finish
+
+    def __iter__(self):
+        iterator = iter(self._body)
+        while True:
+            self._profiler.enable()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._profiler.disable()
+            yield chunk
+
+    def close(self):
+        try:
+            if hasattr(self._body, "close"):
+                self._body.close()
+        finally:
+            self._finish()
+
+
+class RequestProfiler:
+    """
+    WSGI middleware profiling requests with cProfile
+
+    Every request is profiled when enabled; otherwise only requests with
+    the X-Broadlink-Profile header set to the configured token. Only one
+    request is profiled at a time (cProfile is per thread and newer Pythons
+    allow a single active profiler); concurrent requests run unprofiled.
+    The last keep profiles are held in memory.
+    """
+
+    def __init__(
+        self,
+        app=None,
+        enabled: bool = False,
+        token: Optional[str] = None,
+        keep: int = 20,
+    ):
+        self.app = app
+        self.enabled = enabled
+        self.token = token or None
+        self._records: "deque[ProfileRecord]" = deque(maxlen=max(1, keep))
+        self._ids = itertools.count(1)
+        self._active = threading.Lock()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> Optional["RequestProfiler"]:
+        """Profiler for the configured settings, or None when fully disabled"""
+        if not settings.get("enabled") and not settings.get("token"):
+            return None
+        return cls(
+            enabled=bool(settings.get("enabled")),
+            token=settings.get("token"),
+            keep=int(settings.get("keep") or 20),
+        )
+
+    def wrap(self, app):
+        """Install around a WSGI app and return the middleware"""
+        self.app = app
+        logger.info(
+            "Request profiling "
+            + ("enabled for all requests" if self.enabled else f"via {HEADER} header")
+        )
+        return self
+
+    def _wanted(self, environ) -> bool:
+        if _EXCLUDED_PATH in environ.get("PATH_INFO", ""):
+            return False
+        if self.enabled:
+            return True
+        header = environ.get(_ENVIRON_HEADER)
+        return bool(self.token and header) and hmac.compare_digest(
+            header.encode(), self.token.encode()
+        )
+
+    def __call__(self, environ, start_response):
+        if not self._wanted(environ) or not self._active.acquire(blocking=False):
+            return self.app(environ, start_response)
+
+        record = ProfileRecord(
+            next(self._ids),
+            environ.get("REQUEST_METHOD", ""),
+            environ.get("PATH_INFO", ""),
+            time.time(),
+        )
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+
+        def profiled_start_response(status, headers, exc_info=None):
+            record.status = status.split(" ", 1)[0]
+            return start_response(status, headers, exc_info)
+
+        def finish():
+            try:
+                record.duration = time.perf_counter() - start
+                profiler.create_stats()
+                record.stats = profiler.stats
+                with self._lock:
+                    self._records.append(record)
+            finally:
+                self._active.release()
+
+        profiler.enable()
+        try:
+            body = self.app(environ, profiled_start_response)
+        except BaseException:
+            profiler.disable()
+            finish()
+            raise
+        profiler.disable()
+        # Ingress has stripped its prefix from PATH_INFO by now
+        record.path = environ.get("PATH_INFO", record.path)
+        return _ProfiledBody(body, profiler, finish)
+
+    def profiles(self) -> List[ProfileRecord]:
+        """Stored profiles, newest first"""
+        with self._lock:
+            return list(reversed(self._records))
+
+    def get(self, profile_id: int) -> Optional[ProfileRecord]:
+        with self._lock:
+            for record in self._records:
+                if record.id == profile_id:
+                    return record
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+def load_pstats(data: bytes) -> pstats.Stats:
+    """pstats.Stats from downloaded .pstats bytes (for scripts and tests)"""
+    stats = pstats.Stats()
+    stats.stats = marshal.loads(data)
+    stats.get_top_level_stats()
+    return stats
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Response Cache for Broadlink Manager Add-on
+Versioned memoization of JSON API responses with ETag support
+"""
+
+import functools
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple
+
+from flask import current_app, make_response, request
+
+logger = logging.getLogger(__name__)
+
+
+def path_version(*paths: Path) -> Tuple:
+    """
+    Version token for files and directories
+
+    Files contribute their stat; directories contribute their own stat plus
+    that of every entry, so files edited in place are noticed as well.
+    Missing paths contribute None.
+    """
+    token = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            token.append(None)
+            continue
+        token.append((str(path), stat.st_mtime_ns, stat.st_size))
+        if os.path.isdir(path):
+            with os.scandir(path) as entries:
+                stats = sorted((entry.name, entry.stat()) for entry in entries)
+            token.extend((name, s.st_mtime_ns, s.st_size) for name, s in stats)
+    return tuple(token)
+
+
+def glob_version(directory: Path, pattern: str) -> Tuple:
+    """Version token for the files in a directory matching a glob pattern"""
+    return path_version(*sorted(Path(directory).glob(pattern)))
+
+
+class _Entry:
+    __slots__ = ("version", "body", "etag")
+
+    def __init__(self, version: Any, body: bytes, etag: str):
+        self.version = version
+        self.body = body
+        self.etag = etag
+
+
+class ResponseCache:
+    """
+    Memoize serialized JSON responses until their sources change
+
+    Each cached view declares a version function returning a cheap token
+    (file stats, a storage generation, ...). While the token is unchanged
+    the serialized body is served from memory; every response carries an
+    ETag and If-None-Match requests get a 304. A version function returning
+    None disables caching for that request.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        """
+        Initialize response cache
+
+        Args:
+            max_entries: Responses kept (least recently used are dropped)
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, version: Callable[..., Optional[Any]]):
+        """
+        Decorator caching a view's JSON response
+
+        Args:
+            version: Called with the view's arguments; returns the version
+                token of the data the response is built from, or None
+        """
+
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                try:
+                    token = version(*args, **kwargs)
+                except Exception as e:
+                    logger.debug(f"No cache version for {request.path}: {e}")
+                    token = None
+                if token is None:
+                    return view(*args, **kwargs)
+
+                # "_t" is a cache buster some clients append to every request
+                key = (
+                    id(current_app._get_current_object()),
+                    request.path,
+                    tuple(
+                        sorted(
+                            item
+                            for item in request.args.items(multi=True)
+                            if item[0] != "_t"
+                        )
+                    ),
+                )
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None and entry.version == token:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                    else:
+                        entry = None
+                        self.misses += 1
+
+                if entry is None:
+                    # The token is taken before building, so a change made
+                    # meanwhile only causes one extra rebuild
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or not response.is_json:
+                        return response
+                    body = response.get_data()
+                    etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+                    entry = _Entry(token, body, etag)
+                    with self._lock:
+                        self._entries[key] = entry
+                        self._entries.move_to_end(key)
+                        while len(self._entries) > self.max_entries:
+                            self._entries.popitem(last=False)
+
+                response = current_app.response_class(
+                    entry.body, mimetype="application/json"
+                )
+                response.set_etag(entry.etag)
+                # Let browsers keep the body but revalidate on every use
+                response.headers["Cache-Control"] = "no-cache"
+                return response.make_conditional(request)
+
+            return wrapper
+
+        return decorator
+
+    def clear(self):
+        """Drop all cached responses"""
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by the API blueprints
+response_cache = ResponseCache()
@@ -12,6 +12,8 @@ from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 from collections import defaultdict
 
+from smartir_code_store import SmartIRCodeStore, open_tarball_from_url
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,6 +28,7 @@ class SmartIRCodeService:
         "https://raw.githubusercontent.com/tonyperkins/smartir-code-aggregator/main"
     )
     DEVICE_INDEX_URL = "https://raw.githubusercontent.com/tonyperkins/smartir-code-aggregator/main/smartir_device_index.json"
+    MIRROR_TARBALL_URL = "https://codeload.github.com/tonyperkins/smartir-code-aggregator/tar.gz/refs/heads/main"
     CACHE_TTL_HOURS = 24
 
     def __init__(
@@ -42,6 +45,9 @@ class SmartIRCodeService:
         self.cache_path.mkdir(parents=True, exist_ok=True)
         self.cache_file = self.cache_path / "smartir_codes_cache.json"
 
+        # Content-addressed store of full code files (fetched or mirrored)
+        self.code_store = SmartIRCodeStore(str(self.cache_path / "code_store"))
+
         # Index is bundled with the app, not cached
         # Look in the app directory first, then parent directory (for dev mode)
         app_index = Path(__file__).parent / "smartir_device_index.json"
@@ -147,7 +153,9 @@ class SmartIRCodeService:
         try:
             response = requests.get(url, timeout=10)
             response.raise_for_status()
-            return response.json()
+            code_data = response.json()
+            self.code_store.put(entity_type, code_id, response.content)
+            return code_data
         except requests.RequestException as e:
             logger.warning(f"Network error fetching code {code_id}: {e}")
             return None
@@ -179,6 +187,10 @@ class SmartIRCodeService:
 
         logger.info(f"Refreshing SmartIR codes for {entity_type}")
 
+        if force:
+            # Stored code files are refetched on next use (or below, if GitHub answers)
+            self.code_store.invalidate(entity_type)
+
         # Track errors for this refresh
         errors = {"network_errors": 0, "parse_errors": 0, "skipped_codes": []}
 
@@ -477,8 +489,56 @@ class SmartIRCodeService:
         except (ValueError, TypeError):
             pass  # Not a numeric code, continue to GitHub fetch
 
-        # Fetch from GitHub for repository codes (< 10000)
-        return self._fetch_code_file(entity_type, code_id)
+        # Repository codes (< 10000): serve from the local store while fresh
+        max_age = self.CACHE_TTL_HOURS * 3600
+        stored = self.code_store.get(entity_type, code_id, max_age=max_age)
+        if stored is not None:
+            logger.debug(f"Loaded code {code_id} from local code store")
+            return stored
+
+        # Fetch from GitHub (the response is added to the store)
+        fetched = self._fetch_code_file(entity_type, code_id)
+        if fetched is not None:
+            return fetched
+
+        # GitHub unreachable: a stale copy beats no preview
+        return self.code_store.get(entity_type, code_id)
+
+    def mirror_codes(
+        self,
+        source: Optional[str] = None,
+        platforms: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Mirror whole platforms of aggregator codes into the local code store
+
+        Mirrored codes are pinned (never evicted), so profile previews work
+        offline and without network latency.
+
+        Args:
+            source: Local aggregator directory, local tarball path, or tarball URL
+                    (default: the aggregator's GitHub archive). Only for local
+                    callers; the API endpoint always uses the default
+            platforms: Platforms to mirror (default: all)
+
+        Returns:
+            Mirror summary dict
+        """
+        source = source or self.MIRROR_TARBALL_URL
+        logger.info(f"Mirroring SmartIR codes from {source}")
+
+        try:
+            if source.startswith(("http://", "https://")):
+                with open_tarball_from_url(source) as tarball:
+                    return self.code_store.mirror_from_tarball(tarball, platforms)
+            if Path(source).is_dir():
+                return self.code_store.mirror_from_directory(source, platforms)
+            if Path(source).is_file():
+                return self.code_store.mirror_from_tarball(source, platforms)
+            return {"success": False, "error": f"Mirror source not found: {source}"}
+        except Exception as e:
+            logger.error(f"Error mirroring SmartIR codes: {e}")
+            return {"success": False, "error": str(e)}
 
     def search_codes(self, entity_type: str, query: str) -> List[Dict[str, Any]]:
         """
@@ -542,6 +602,7 @@ class SmartIRCodeService:
             "cached_entity_types": list(self._cache.get("manufacturers", {}).keys()),
             "cache_file": str(self.cache_file),
             "cache_ttl_hours": self.CACHE_TTL_HOURS,
+            "code_store": self.code_store.get_status(),
         }
 
         # Add error information if available
@@ -591,7 +652,13 @@ class SmartIRCodeService:
             logger.error(f"Error loading custom profiles for {entity_type}: {e}")
             return []
 
-    def clear_cache(self) -> bool:
-        """Clear the cache"""
+    def clear_cache(self, include_mirror: bool = False) -> bool:
+        """
+        Clear the cache
+
+        Args:
+            include_mirror: Also remove mirrored codes from the code store
+        """
         self._cache = {"last_updated": None, "manufacturers": {}, "codes": {}}
+        self.code_store.clear(include_pinned=include_mirror)
         return self._save_cache()
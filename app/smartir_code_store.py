@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+SmartIR Code Store for Broadlink Manager Add-on
+Content-addressed on-disk store for SmartIR code files fetched from the aggregator
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tarfile
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, BinaryIO, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PLATFORMS = ["climate", "fan", "media_player", "light"]
+
+
+class SmartIRCodeStore:
+    """
+    Content-addressed store for SmartIR code files
+
+    Code files are stored once under objects/<hash[:2]>/<hash>.json, keyed by the
+    SHA-256 of their raw bytes. A small refs index maps "<entity_type>/<code_id>"
+    to the object hash. Fetched entries are evicted least-recently-used once the
+    store grows past max_bytes; mirrored entries are pinned and never evicted.
+
+    Fetched entries also go stale: lookups with max_age treat them as misses
+    once they are older than that, and invalidate() expires them on demand.
+    Stale content is kept so callers can still fall back to it offline.
+    Mirrored entries are revalidated by mirroring again.
+    """
+
+    DEFAULT_MAX_BYTES = 50 * 1024 * 1024  # 50 MB of fetched (non-mirrored) codes
+
+    def __init__(self, store_path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initialize the code store
+
+        Args:
+            store_path: Directory holding the refs index and object files
+            max_bytes: Size limit for unpinned (fetched) entries
+        """
+        self.store_path = Path(store_path)
+        self.objects_path = self.store_path / "objects"
+        self.objects_path.mkdir(parents=True, exist_ok=True)
+        self.refs_file = self.store_path / "refs.json"
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._refs = self._load_refs()
+        self._hits = 0
+        self._misses = 0
+
+    # ------------------------------------------------------------------
+    # Index persistence
+    # ------------------------------------------------------------------
+
+    def _load_refs(self) -> Dict[str, Dict[str, Any]]:
+        """Load refs index from disk"""
+        if not self.refs_file.exists():
+            return {}
+
+        try:
+            with open(self.refs_file, "r") as f:
+                return json.load(f).get("refs", {})
+        except Exception as e:
+            logger.error(f"Error loading SmartIR code store index: {e}")
+            return {}
+
+    def _save_refs(self) -> bool:
+        """Atomically save refs index to disk (caller holds the lock)"""
+        temp_file = self.refs_file.with_suffix(".tmp")
+        try:
+            with open(temp_file, "w") as f:
+                json.dump({"version": 1, "refs": self._refs}, f)
+            temp_file.replace(self.refs_file)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving SmartIR code store index: {e}")
+            return False
+
+    @staticmethod
+    def _key(entity_type: str, code_id: str) -> str:
+        return f"{entity_type}/{code_id}"
+
+    def _object_file(self, digest: str) -> Path:
+        return self.objects_path / digest[:2] / f"{digest}.json"
+
+    # ------------------------------------------------------------------
+    # Read / write
+    # ------------------------------------------------------------------
+
+    def get(
+        self, entity_type: str, code_id: str, max_age: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get a stored code file
+
+        Args:
+            entity_type: Entity type (climate, fan, media_player, light)
+            code_id: Code ID (e.g., "1000")
+            max_age: Treat fetched entries stored longer ago than this many
+                     seconds as missing (mirrored entries never go stale)
+
+        Returns:
+            Parsed code data or None if not stored (or stale)
+        """
+        key = self._key(entity_type, code_id)
+        with self._lock:
+            ref = self._refs.get(key)
+            if not ref or (max_age is not None and self._is_stale(ref, max_age)):
+                self._misses += 1
+                return None
+            object_file = self._object_file(ref["hash"])
+
+        try:
+            with open(object_file, "rb") as f:
+                data = json.loads(f.read())
+        except FileNotFoundError:
+            logger.warning(f"SmartIR code store object missing for {key}, dropping ref")
+            with self._lock:
+                self._refs.pop(key, None)
+                self._misses += 1
+                self._save_refs()
+            return None
+        except Exception as e:
+            logger.error(f"Error reading SmartIR code store object for {key}: {e}")
+            with self._lock:
+                self._misses += 1
+            return None
+
+        with self._lock:
+            self._hits += 1
+            if key in self._refs:
+                # Access time is persisted with the next mutation of the index
+                self._refs[key]["last_access"] = time.time()
+        return data
+
+    @staticmethod
+    def _is_stale(ref: Dict[str, Any], max_age: float) -> bool:
+        if ref.get("pinned"):
+            return False
+        # Refs written before stored_at existed count as stale
+        return time.time() - ref.get("stored_at", 0) > max_age
+
+    def contains(self, entity_type: str, code_id: str) -> bool:
+        """Check whether a code file is stored"""
+        with self._lock:
+            return self._key(entity_type, code_id) in self._refs
+
+    def put(
+        self,
+        entity_type: str,
+        code_id: str,
+        raw: bytes,
+        pinned: bool = False,
+        source: str = "fetch",
+    ) -> Optional[str]:
+        """
+        Store a raw code file
+
+        Args:
+            entity_type: Entity type (climate, fan, media_player, light)
+            code_id: Code ID
+            raw: Raw JSON bytes as served by the aggregator
+            pinned: Exempt the entry from LRU eviction (mirrored entries)
+            source: Where the entry came from (fetch, mirror)
+
+        Returns:
+            Content hash of the stored object, or None on error
+        """
+        with self._lock:
+            digest = self._put_locked(entity_type, code_id, raw, pinned, source)
+            if digest is None:
+                return None
+            self._evict_locked()
+            self._save_refs()
+            return digest
+
+    def _put_locked(
+        self, entity_type: str, code_id: str, raw: bytes, pinned: bool, source: str
+    ) -> Optional[str]:
+        """Write object file and ref without saving the index (caller holds the lock)"""
+        digest = hashlib.sha256(raw).hexdigest()
+        object_file = self._object_file(digest)
+
+        try:
+            if not object_file.exists():
+                object_file.parent.mkdir(parents=True, exist_ok=True)
+                temp_file = object_file.with_suffix(".tmp")
+                with open(temp_file, "wb") as f:
+                    f.write(raw)
+                temp_file.replace(object_file)
+        except Exception as e:
+            logger.error(f"Error writing SmartIR code store object {digest}: {e}")
+            return None
+
+        key = self._key(entity_type, code_id)
+        previous = self._refs.get(key)
+        now = time.time()
+        self._refs[key] = {
+            "hash": digest,
+            "size": len(raw),
+            "last_access": now,
+            "stored_at": now,
+            # Never unpin a mirrored entry just because it was re-fetched
+            "pinned": pinned or bool(previous and previous.get("pinned")),
+            "source": source,
+        }
+        if previous and previous["hash"] != digest:
+            self._remove_object_if_unreferenced(previous["hash"])
+        return digest
+
+    def _remove_object_if_unreferenced(self, digest: str):
+        """Delete an object file once no ref points at it (caller holds the lock)"""
+        if any(ref["hash"] == digest for ref in self._refs.values()):
+            return
+        try:
+            self._object_file(digest).unlink()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to remove SmartIR code store object {digest}: {e}")
+
+    def _evict_locked(self):
+        """Evict least-recently-used unpinned entries above max_bytes"""
+        unpinned = [
+            (key, ref) for key, ref in self._refs.items() if not ref.get("pinned")
+        ]
+        total = sum(ref["size"] for _, ref in unpinned)
+        if total <= self.max_bytes:
+            return
+
+        evicted = 0
+        for key, ref in sorted(unpinned, key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            del self._refs[key]
+            self._remove_object_if_unreferenced(ref["hash"])
+            total -= ref["size"]
+            evicted += 1
+
+        logger.debug(f"Evicted {evicted} SmartIR code(s) from store")
+
+    def clear(self, include_pinned: bool = False) -> int:
+        """
+        Remove stored code files
+
+        Args:
+            include_pinned: Also remove mirrored entries
+
+        Returns:
+            Number of refs removed
+        """
+        with self._lock:
+            keys = [
+                key
+                for key, ref in self._refs.items()
+                if include_pinned or not ref.get("pinned")
+            ]
+            for key in keys:
+                ref = self._refs.pop(key)
+                self._remove_object_if_unreferenced(ref["hash"])
+            self._save_refs()
+            return len(keys)
+
+    def invalidate(self, entity_type: Optional[str] = None) -> int:
+        """
+        Expire fetched entries so the next lookup with max_age refetches them
+
+        The stored content is kept as an offline fallback; mirrored entries
+        are left alone.
+
+        Args:
+            entity_type: Only expire entries of this entity type (default: all)
+
+        Returns:
+            Number of refs expired
+        """
+        prefix = f"{entity_type}/" if entity_type else ""
+        with self._lock:
+            expired = 0
+            for key, ref in self._refs.items():
+                if ref.get("pinned") or not key.startswith(prefix):
+                    continue
+                ref["stored_at"] = 0
+                expired += 1
+            self._save_refs()
+            return expired
+
+    def flush(self) -> bool:
+        """Persist pending access-time updates"""
+        with self._lock:
+            return self._save_refs()
+
+    # ------------------------------------------------------------------
+    # Mirroring
+    # ------------------------------------------------------------------
+
+    def mirror_from_directory(
+        self, source_path: str, platforms: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Mirror code files from a local aggregator checkout
+
+        Accepts the same layout as generate_device_index.py --local: either the
+        aggregator root (containing codes/<platform>/*.json) or the codes directory.
+
+        Args:
+            source_path: Path to aggregator root or its codes directory
+            platforms: Platforms to mirror (default: all)
+
+        Returns:
+            Mirror summary dict
+        """
+        root = Path(source_path)
+        codes_root = root / "codes" if (root / "codes").is_dir() else root
+        if not codes_root.is_dir():
+            return {"success": False, "error": f"Directory not found: {source_path}"}
+
+        def iter_files() -> Iterator[Tuple[str, str, bytes]]:
+            for platform in platforms or PLATFORMS:
+                platform_path = codes_root / platform
+                if not platform_path.is_dir():
+                    continue
+                for file_path in sorted(platform_path.glob("*.json")):
+                    yield platform, file_path.stem, file_path.read_bytes()
+
+        return self._mirror(iter_files(), str(codes_root))
+
+    def mirror_from_tarball(
+        self, tarball: Any, platforms: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Mirror code files from an aggregator tarball
+
+        Members are read in memory and never extracted to disk. Any member path
+        ending in codes/<platform>/<code_id>.json is accepted, so GitHub archive
+        tarballs with a top-level "<repo>-<branch>/" prefix work unchanged.
+
+        Args:
+            tarball: Path to a .tar/.tar.gz file, or a binary file object
+            platforms: Platforms to mirror (default: all)
+
+        Returns:
+            Mirror summary dict
+        """
+        wanted = set(platforms or PLATFORMS)
+
+        try:
+            if isinstance(tarball, (str, os.PathLike)):
+                archive = tarfile.open(tarball, mode="r:*")
+                label = str(tarball)
+            else:
+                archive = tarfile.open(fileobj=tarball, mode="r:*")
+                label = "<stream>"
+        except (tarfile.TarError, OSError) as e:
+            return {"success": False, "error": f"Cannot open tarball: {e}"}
+
+        def iter_members() -> Iterator[Tuple[str, str, bytes]]:
+            with archive:
+                for member in archive:
+                    if not member.isfile() or not member.name.endswith(".json"):
+                        continue
+                    parts = member.name.split("/")
+                    if len(parts) < 3 or parts[-3] != "codes":
+                        continue
+                    platform, code_id = parts[-2], parts[-1][: -len(".json")]
+                    if platform not in wanted:
+                        continue
+                    extracted = archive.extractfile(member)
+                    if extracted is None:
+                        continue
+                    yield platform, code_id, extracted.read()
+
+        return self._mirror(iter_members(), label)
+
+    def _mirror(
+        self, files: Iterable[Tuple[str, str, bytes]], label: str
+    ) -> Dict[str, Any]:
+        """
+        Store (platform, code_id, raw) triples as pinned entries in one pass
+
+        Files are read and parsed outside the lock, which is taken per entry,
+        so lookups are not blocked for the whole mirror.
+        """
+        counts: Dict[str, int] = {}
+        skipped: List[str] = []
+
+        for platform, code_id, raw in files:
+            try:
+                json.loads(raw)
+            except (ValueError, UnicodeDecodeError):
+                # Same known issue as the live fetch: some upstream files are malformed
+                skipped.append(f"{platform}/{code_id}")
+                continue
+            with self._lock:
+                stored = self._put_locked(platform, code_id, raw, True, "mirror")
+            if stored:
+                counts[platform] = counts.get(platform, 0) + 1
+            else:
+                skipped.append(f"{platform}/{code_id}")
+
+        with self._lock:
+            self._save_refs()
+
+        total = sum(counts.values())
+        logger.info(
+            f"✅ Mirrored {total} SmartIR codes from {label} "
+            f"({len(skipped)} skipped)"
+        )
+        return {
+            "success": True,
+            "source": label,
+            "mirrored": counts,
+            "total": total,
+            "skipped_count": len(skipped),
+            "skipped": skipped[:20],
+        }
+
+    # ------------------------------------------------------------------
+    # Status
+    # ------------------------------------------------------------------
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get store statistics"""
+        with self._lock:
+            refs = list(self._refs.values())
+            hashes = {ref["hash"] for ref in refs}
+            pinned = [ref for ref in refs if ref.get("pinned")]
+            return {
+                "store_path": str(self.store_path),
+                "entries": len(refs),
+                "pinned_entries": len(pinned),
+                "unique_objects": len(hashes),
+                "fetched_bytes": sum(r["size"] for r in refs if not r.get("pinned")),
+                "mirrored_bytes": sum(r["size"] for r in pinned),
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+MAX_TARBALL_BYTES = 512 * 1024 * 1024
+
+
+def open_tarball_from_url(
+    url: str, timeout: int = 60, max_bytes: int = MAX_TARBALL_BYTES
+) -> BinaryIO:
+    """
+    Download a tarball to a temporary file for mirror_from_tarball
+
+    The response is streamed to disk in chunks, so the archive is never held
+    in memory. The temporary file is deleted when closed.
+
+    Args:
+        url: Tarball URL (e.g., GitHub codeload archive)
+        timeout: Request timeout in seconds
+        max_bytes: Abort downloads larger than this
+
+    Returns:
+        Temporary file positioned at the start of the archive
+    """
+    import requests
+
+    spool = tempfile.TemporaryFile()
+    try:
+        with requests.get(url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            size = 0
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"Tarball larger than {max_bytes} bytes: {url}")
+                spool.write(chunk)
+        spool.seek(0)
+        return spool
+    except Exception:
+        spool.close()
+        raise
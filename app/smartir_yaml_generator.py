@@ -5,9 +5,10 @@ Generates Home Assistant SmartIR device configurations
 """
 
 import logging
+import shutil
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-import yaml
+from typing import Dict, List, Any, Optional, Tuple
+import yaml_serializer
 from yaml_validator import YAMLValidator
 
 logger = logging.getLogger(__name__)
@@ -16,6 +17,8 @@ logger = logging.getLogger(__name__)
 class SmartIRYAMLGenerator:
     """Generate SmartIR device YAML configurations"""
 
+    SUPPORTED_ENTITY_TYPES = ["climate", "fan", "media_player", "light"]
+
     def __init__(self, config_path: str = "/config"):
         """
         Initialize SmartIR YAML generator
@@ -44,61 +47,302 @@ class SmartIRYAMLGenerator:
         Returns:
             Dict with generation result
         """
-        try:
-            entity_type = device_data.get("entity_type")
+        result = self.apply_batch(
+            [{"action": "upsert", "device_id": device_id, "device_data": device_data}]
+        )
+        return result["results"][device_id]
 
-            if entity_type not in ["climate", "fan", "media_player", "light"]:
-                return {
-                    "success": False,
-                    "error": f"Unsupported entity type for SmartIR: {entity_type}",
-                }
+    def generate_device_configs(
+        self, devices: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Generate SmartIR configurations for many devices in one pass
+
+        Args:
+            devices: Dict of device_id -> device metadata from device manager
 
-            # Get controller entity ID - SmartIR supports any remote entity, not just Broadlink
-            controller_entity = device_data.get("controller_device")
+        Returns:
+            Batch result (see apply_batch)
+        """
+        return self.apply_batch(
+            [
+                {"action": "upsert", "device_id": device_id, "device_data": data}
+                for device_id, data in devices.items()
+            ]
+        )
 
-            if not controller_entity:
-                return {
+    def apply_batch(self, operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Apply many add/update/remove operations with one write per platform file
+
+        Each affected platform file is parsed once, indexed by unique_id,
+        validated once, backed up once and written atomically.
+
+        Args:
+            operations: List of operation dicts:
+                - action: "upsert" (add or update) or "remove"
+                - device_id: Device identifier (unique_id)
+                - device_data: Device metadata (upsert only)
+                - entity_type: Entity type (remove only, upsert uses device_data)
+
+        Returns:
+            Dict with overall success, per-device results and written files
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        by_platform: Dict[str, List[Tuple[str, str, Optional[Dict[str, Any]]]]] = {}
+
+        for operation in operations:
+            action = operation.get("action", "upsert")
+            device_id = operation.get("device_id")
+
+            if action == "upsert":
+                device_data = operation.get("device_data") or {}
+                entity_type = device_data.get("entity_type")
+                if entity_type not in self.SUPPORTED_ENTITY_TYPES:
+                    results[device_id] = {
+                        "success": False,
+                        "error": f"Unsupported entity type for SmartIR: {entity_type}",
+                    }
+                    continue
+
+                controller_entity = device_data.get("controller_device")
+                if not controller_entity:
+                    results[device_id] = {
+                        "success": False,
+                        "error": "No controller_device specified. Please select a remote entity.",
+                    }
+                    continue
+
+                try:
+                    config = self._build_device_config(
+                        device_id, device_data, controller_entity
+                    )
+                except Exception as e:
+                    results[device_id] = {"success": False, "error": str(e)}
+                    continue
+
+                is_valid, errors = YAMLValidator.validate_device_config(
+                    config, entity_type
+                )
+                if not is_valid:
+                    results[device_id] = self._validation_failure(errors)
+                    continue
+
+                by_platform.setdefault(entity_type, []).append(
+                    ("upsert", device_id, config)
+                )
+
+            elif action == "remove":
+                entity_type = operation.get("entity_type")
+                if entity_type not in self.SUPPORTED_ENTITY_TYPES:
+                    results[device_id] = {
+                        "success": False,
+                        "error": f"Unsupported entity type for SmartIR: {entity_type}",
+                    }
+                    continue
+                by_platform.setdefault(entity_type, []).append(
+                    ("remove", device_id, None)
+                )
+
+            else:
+                results[device_id] = {
                     "success": False,
-                    "error": "No controller_device specified. Please select a remote entity.",
+                    "error": f"Unknown batch action: {action}",
                 }
 
-            # Build device configuration
-            config = self._build_device_config(
-                device_id, device_data, controller_entity
+        files = {}
+        for entity_type, platform_ops in by_platform.items():
+            platform_file = self.smartir_dir / f"{entity_type}.yaml"
+            platform_results, written = self._apply_platform_batch(
+                platform_file, entity_type, platform_ops
             )
+            results.update(platform_results)
+            if written:
+                files[entity_type] = str(platform_file)
+
+        success_count = sum(1 for r in results.values() if r.get("success"))
+        logger.info(
+            f"SmartIR batch applied: {success_count}/{len(results)} operation(s) succeeded, "
+            f"{len(files)} file(s) written"
+        )
 
-            # Debug: Log the config being generated
-            logger.info(
-                f"Generated config for {device_id}: platform={config.get('platform')}, "
-                f"name={config.get('name')}, device_code={config.get('device_code')}"
-            )
+        return {
+            "success": success_count == len(results),
+            "success_count": success_count,
+            "results": results,
+            "files": files,
+        }
 
-            # Write to platform-specific file
-            platform_file = self.smartir_dir / f"{entity_type}.yaml"
-            success, validation_errors = self._append_device_to_file(
-                platform_file, config, entity_type
-            )
+    def _apply_platform_batch(
+        self,
+        file_path: Path,
+        entity_type: str,
+        operations: List[Tuple[str, str, Optional[Dict[str, Any]]]],
+    ) -> Tuple[Dict[str, Dict[str, Any]], bool]:
+        """
+        Apply validated operations to one platform file
 
-            if success:
-                return {
+        Args:
+            file_path: Path to platform YAML file
+            entity_type: Entity type of the file
+            operations: List of (action, device_id, config) tuples
+
+        Returns:
+            Tuple of (per-device results, whether the file was written)
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+
+        try:
+            devices: List[Optional[Dict[str, Any]]] = list(
+                self._read_platform_devices(file_path, entity_type)
+            )
+        except Exception as e:
+            logger.error(f"Error reading {file_path}: {e}")
+            for _, device_id, _ in operations:
+                results[device_id] = {"success": False, "error": str(e)}
+            return results, False
+
+        # unique_id -> list positions; updates replace the first entry in place
+        # and removals drop every entry with that unique_id
+        index: Dict[str, List[int]] = {}
+        for i, device in enumerate(devices):
+            if isinstance(device, dict) and device.get("unique_id") is not None:
+                index.setdefault(device["unique_id"], []).append(i)
+
+        for action, device_id, config in operations:
+            positions = index.get(device_id)
+
+            if action == "upsert":
+                if positions is None:
+                    index[device_id] = [len(devices)]
+                    devices.append(config)
+                    logger.info(f"Added new SmartIR device: {device_id}")
+                else:
+                    devices[positions[0]] = config
+                    logger.info(f"Updated existing SmartIR device: {device_id}")
+                results[device_id] = {
                     "success": True,
-                    "message": f"SmartIR device configuration generated",
-                    "file": str(platform_file),
+                    "message": "SmartIR device configuration generated",
+                    "file": str(file_path),
                     "config": config,
                 }
             else:
-                error_msg = "Device configuration validation failed:\n" + "\n".join(
-                    f"  - {e}" for e in (validation_errors or ["Unknown error"])
-                )
-                return {
-                    "success": False,
-                    "error": error_msg,
-                    "validation_errors": validation_errors,
+                if positions is None:
+                    results[device_id] = {
+                        "success": False,
+                        "error": f"Device {device_id} not found in {file_path}",
+                    }
+                    continue
+                # Tombstone the slots; positions of other entries stay valid
+                for position in positions:
+                    devices[position] = None
+                del index[device_id]
+                logger.info(f"Removed SmartIR device {device_id} from {file_path}")
+                results[device_id] = {
+                    "success": True,
+                    "message": f"Device removed from {entity_type}.yaml",
+                    "removed_count": len(positions),
                 }
 
+        if not any(r["success"] for r in results.values()):
+            return results, False
+
+        final_devices = [device for device in devices if device is not None]
+
+        # Single validation pass over the merged file content
+        is_valid, yaml_string, errors = YAMLValidator.validate_and_format_yaml(
+            final_devices, entity_type
+        )
+        if not is_valid:
+            logger.error(f"YAML file validation failed for {file_path}:")
+            for error in errors:
+                logger.error(f"  - {error}")
+            for device_id, result in results.items():
+                if result["success"]:
+                    results[device_id] = self._validation_failure(errors)
+            return results, False
+
+        try:
+            written = self._write_platform_file(file_path, yaml_string)
         except Exception as e:
-            logger.error(f"Error generating SmartIR config for {device_id}: {e}")
-            return {"success": False, "error": str(e)}
+            logger.error(f"Error writing to {file_path}: {e}")
+            for device_id, result in results.items():
+                if result["success"]:
+                    results[device_id] = {"success": False, "error": str(e)}
+            return results, False
+
+        if written:
+            logger.info(f"✅ Successfully wrote validated YAML to {file_path}")
+        else:
+            logger.info(f"SmartIR platform file unchanged, not rewritten: {file_path}")
+        return results, written
+
+    def _read_platform_devices(
+        self, file_path: Path, entity_type: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Read the device list from a platform file
+
+        Args:
+            file_path: Path to platform YAML file
+            entity_type: Entity type (for dict-format files)
+
+        Returns:
+            List of device configs (empty if the file is missing or empty)
+        """
+        if not file_path.exists():
+            return []
+
+        with open(file_path, "r", encoding="utf-8") as f:
+            content = yaml_serializer.safe_load(f)
+
+        # Handle both list format and dict format
+        if isinstance(content, list):
+            return content
+        if isinstance(content, dict) and entity_type in content:
+            return content[entity_type] or []
+        return []
+
+    def _write_platform_file(self, file_path: Path, yaml_string: str) -> bool:
+        """
+        Back up and atomically replace a platform file
+
+        Args:
+            file_path: Path to platform YAML file
+            yaml_string: Validated YAML content
+
+        Returns:
+            True if the file was written, False if it already had this content
+        """
+        if file_path.exists():
+            with open(file_path, "r", encoding="utf-8") as f:
+                if f.read() == yaml_string:
+                    return False
+
+            backup_path = file_path.with_suffix(file_path.suffix + ".backup")
+            try:
+                shutil.copy2(file_path, backup_path)
+                logger.info(f"Created backup: {backup_path}")
+            except Exception as e:
+                logger.warning(f"Could not create backup: {e}")
+
+        temp_file = file_path.with_suffix(file_path.suffix + ".tmp")
+        try:
+            with open(temp_file, "w", encoding="utf-8") as f:
+                f.write(yaml_string)
+            temp_file.replace(file_path)
+        finally:
+            if temp_file.exists():
+                temp_file.unlink()
+        return True
+
+    @staticmethod
+    def _validation_failure(errors: List[str]) -> Dict[str, Any]:
+        """Build the failed result for a device that did not pass validation"""
+        error_msg = "Device configuration validation failed:\n" + "\n".join(
+            f"  - {e}" for e in (errors or ["Unknown error"])
+        )
+        return {"success": False, "error": error_msg, "validation_errors": errors}
 
     # Deprecated: SmartIR uses entity IDs directly, not IP addresses
     # Kept for backward compatibility but no longer used
@@ -184,101 +428,6 @@ class SmartIRYAMLGenerator:
 
         return config
 
-    def _append_device_to_file(
-        self, file_path: Path, config: Dict[str, Any], entity_type: str
-    ) -> tuple[bool, Optional[List[str]]]:
-        """
-        Append device configuration to platform file with validation
-
-        Args:
-            file_path: Path to platform YAML file
-            config: Device configuration
-            entity_type: Entity type (climate, fan, media_player)
-
-        Returns:
-            Tuple of (success, validation_errors)
-        """
-        try:
-            # Validate the device config before proceeding
-            is_valid, errors = YAMLValidator.validate_device_config(config, entity_type)
-            if not is_valid:
-                logger.error(
-                    f"Device configuration validation failed for {config.get('unique_id', 'unknown')}:"
-                )
-                for error in errors:
-                    logger.error(f"  - {error}")
-                return False, errors
-
-            # Read existing content
-            existing_devices = []
-            if file_path.exists():
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = yaml.safe_load(f)
-                    if content:
-                        # Handle both list format and dict format
-                        if isinstance(content, list):
-                            existing_devices = content
-                        elif isinstance(content, dict) and entity_type in content:
-                            existing_devices = content[entity_type]
-
-            # Check if device already exists (by unique_id)
-            unique_id = config.get("unique_id")
-            device_exists = False
-            for i, device in enumerate(existing_devices):
-                if device.get("unique_id") == unique_id:
-                    # Update existing device
-                    existing_devices[i] = config
-                    device_exists = True
-                    logger.info(f"Updated existing SmartIR device: {unique_id}")
-                    break
-
-            if not device_exists:
-                # Add new device
-                existing_devices.append(config)
-                logger.info(f"Added new SmartIR device: {unique_id}")
-
-            # Validate the entire file content before writing
-            is_valid, errors = YAMLValidator.validate_yaml_file_content(
-                existing_devices, entity_type
-            )
-            if not is_valid:
-                logger.error(f"YAML file validation failed for {file_path}:")
-                for error in errors:
-                    logger.error(f"  - {error}")
-                return False, errors
-
-            # Generate and validate YAML string
-            is_valid, yaml_string, errors = YAMLValidator.validate_and_format_yaml(
-                existing_devices, entity_type
-            )
-            if not is_valid:
-                logger.error(f"YAML generation failed for {file_path}:")
-                for error in errors:
-                    logger.error(f"  - {error}")
-                return False, errors
-
-            # Create backup before writing
-            if file_path.exists():
-                backup_path = file_path.with_suffix(file_path.suffix + ".backup")
-                try:
-                    import shutil
-
-                    shutil.copy2(file_path, backup_path)
-                    logger.info(f"Created backup: {backup_path}")
-                except Exception as e:
-                    logger.warning(f"Could not create backup: {e}")
-
-            # Write validated YAML to file
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(yaml_string)
-
-            logger.info(f"✅ Successfully wrote validated YAML to {file_path}")
-            return True, None
-
-        except Exception as e:
-            logger.error(f"Error writing to {file_path}: {e}")
-            return False, [str(e)]
-
     def remove_device_from_file(
         self, device_id: str, entity_type: str
     ) -> Dict[str, Any]:
@@ -292,59 +441,10 @@ class SmartIRYAMLGenerator:
         Returns:
             Dict with operation result
         """
-        try:
-            platform_file = self.smartir_dir / f"{entity_type}.yaml"
-
-            if not platform_file.exists():
-                return {
-                    "success": False,
-                    "error": f"Platform file does not exist: {platform_file}",
-                }
-
-            # Read existing content
-            with open(platform_file, "r", encoding="utf-8") as f:
-                content = yaml.safe_load(f)
-
-            if not content:
-                return {"success": False, "error": "Platform file is empty"}
-
-            # Handle both list and dict formats
-            devices = (
-                content if isinstance(content, list) else content.get(entity_type, [])
-            )
-
-            # Filter out the device
-            original_count = len(devices)
-            devices = [d for d in devices if d.get("unique_id") != device_id]
-            removed_count = original_count - len(devices)
-
-            if removed_count == 0:
-                return {
-                    "success": False,
-                    "error": f"Device {device_id} not found in {platform_file}",
-                }
-
-            # Write back
-            with open(platform_file, "w", encoding="utf-8") as f:
-                yaml.dump(
-                    devices,
-                    f,
-                    default_flow_style=False,
-                    allow_unicode=True,
-                    sort_keys=False,
-                )
-
-            logger.info(f"Removed SmartIR device {device_id} from {platform_file}")
-
-            return {
-                "success": True,
-                "message": f"Device removed from {entity_type}.yaml",
-                "removed_count": removed_count,
-            }
-
-        except Exception as e:
-            logger.error(f"Error removing device from file: {e}")
-            return {"success": False, "error": str(e)}
+        result = self.apply_batch(
+            [{"action": "remove", "device_id": device_id, "entity_type": entity_type}]
+        )
+        return result["results"][device_id]
 
     def ensure_configuration_yaml_includes(self) -> Dict[str, Any]:
         """
@@ -418,7 +518,7 @@ class SmartIRYAMLGenerator:
                 return None
 
             with open(platform_file, "r", encoding="utf-8") as f:
-                content = yaml.safe_load(f)
+                content = yaml_serializer.safe_load(f)
 
             if not content:
                 return None
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Startup Timing for Broadlink Manager Add-on
+Records where startup time goes and builds optional subsystems on first use
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """
+    Startup breakdown for the log and the diagnostics report
+
+    Phases are timed in milliseconds and kept in the order they ran.
+    ready_ms is measured from the creation of the timer (first import of
+    this module, which main.py does before anything heavy) to the moment
+    the port accepts connections; warm_ms to the end of background warm-up.
+    Subsystems built on first use report how long that took under "lazy".
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.lazy: Dict[str, float] = {}
+        self.ready_ms: Optional[float] = None
+        self.warm_ms: Optional[float] = None
+
+    def _since_start(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 1)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    def mark_ready(self):
+        """The server is bound and answering requests"""
+        self.ready_ms = self._since_start()
+        logger.info(f"Ready in {self.ready_ms:.0f} ms ({self._describe(False)})")
+
+    def mark_warm(self):
+        """Background warm-up finished"""
+        self.warm_ms = self._since_start()
+        logger.info(
+            f"Warm-up finished at {self.warm_ms:.0f} ms ({self._describe(True)})"
+        )
+
+    def _describe(self, warmup: bool) -> str:
+        return ", ".join(
+            f"{name} {ms:.0f} ms"
+            for name, ms in self.phases.items()
+            if name.startswith("warmup.") == warmup
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "ready_ms": self.ready_ms,
+            "warm_ms": self.warm_ms,
+            "phases": dict(self.phases),
+            "lazy": dict(self.lazy),
+        }
+
+
+startup_timer = StartupTimer()
+
+
+class LazySubsystem:
+    """
+    Stand-in for a subsystem that is built on first attribute access
+
+    Constructing (and importing) the real object is deferred until a
+    request uses it or warm-up calls lazy_instance(), so callers keep using
+    the stand-in like the object itself. Building is done once, under a
+    lock, and its duration is recorded in startup_timer.lazy.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self._lazy_name = name
+        self._lazy_factory = factory
+        self._lazy_object = None
+        self._lazy_lock = threading.Lock()
+
+    @property
+    def lazy_loaded(self) -> bool:
+        return self._lazy_object is not None
+
+    def lazy_instance(self) -> Any:
+        """The real object, building it if needed"""
+        if self._lazy_object is None:
+            with self._lazy_lock:
+                if self._lazy_object is None:
+                    start = time.perf_counter()
+                    self._lazy_object = self._lazy_factory()
+                    ms = round((time.perf_counter() - start) * 1000, 1)
+                    startup_timer.lazy[self._lazy_name] = ms
+                    logger.info(f"Initialized {self._lazy_name} in {ms:.0f} ms")
+        return self._lazy_object
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes the stand-in itself does not have
+        if name.startswith("_lazy_"):
+            raise AttributeError(name)
+        return getattr(self.lazy_instance(), name)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.lazy_loaded else "not loaded"
+        return f"<LazySubsystem {self._lazy_name} ({state})>"
@@ -9,31 +9,43 @@ import json
 import logging
 import asyncio
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import threading
 import time
-from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
 from flask import Flask, render_template, request, jsonify, send_from_directory
 from flask_cors import CORS
-import aiohttp
 import aiofiles  # type: ignore
-import websockets
 
 from entity_detector import EntityDetector
 from entity_generator import EntityGenerator
-from area_manager import AreaManager
 from config_loader import ConfigLoader
 from device_manager import DeviceManager
 from smartir_detector import SmartIRDetector
-from smartir_code_service import SmartIRCodeService
+from startup import LazySubsystem, startup_timer
 
 # Import API blueprint for v2
 from api import api_bp
+from compression import ResponseCompressor, send_asset
+from hot_path_log import HotPathLogger
+from request_profiler import RequestProfiler
+from metrics import (
+    CACHE_LOOKUPS,
+    PENDING_COMMAND_POLLS,
+    RequestMetrics,
+    cache_counts,
+    ha_endpoint,
+    parse_storage,
+    render_metrics,
+    timed_ha_request,
+    timed_learning,
+)
+from response_cache import glob_version, path_version, response_cache
 from api.smartir import init_smartir_routes
 
 logger = logging.getLogger(__name__)
+hot_log = HotPathLogger("web_server")
 
 
 class DevicesJsonWatcher(FileSystemEventHandler):
@@ -44,11 +56,12 @@ class DevicesJsonWatcher(FileSystemEventHandler):
         self.last_modified = 0
 
     def _is_devices_file(self, event) -> bool:
-        """Return True if the event refers to devices.json (src or dest path)."""
+        """Return True if the event refers to device storage (src or dest path)."""
         try:
             src = getattr(event, "src_path", "") or ""
             dest = getattr(event, "dest_path", "") or ""
-            return src.endswith("devices.json") or dest.endswith("devices.json")
+            names = ("devices.json", "devices.journal", "devices.db", "devices.db-wal")
+            return src.endswith(names) or dest.endswith(names)
         except Exception:
             return False
 
@@ -111,6 +124,17 @@ class BroadlinkWebServer:
     """Web server for Broadlink device management"""
 
     def __init__(self, port: int = 8099, config_loader: Optional[ConfigLoader] = None):
+        with startup_timer.phase("init"):
+            self._init(port, config_loader)
+
+    def _init(self, port: int, config_loader: Optional[ConfigLoader]):
+        """
+        Build the app without touching anything slow
+
+        Subsystems that load files or import large libraries are built on
+        first use (LazySubsystem), and the rest of the startup work runs in
+        _warm_up once the port is bound.
+        """
         self.port = port
         # Use relative static path to work with Home Assistant ingress
         self.app = Flask(__name__, template_folder="templates", static_folder="static")
@@ -120,9 +144,22 @@ class BroadlinkWebServer:
 
         CORS(self.app)
 
+        # gzip/brotli for JSON and HTML responses above a size threshold
+        ResponseCompressor().init_app(self.app)
+
+        # Request counts and latency per route for /api/metrics
+        RequestMetrics().init_app(self.app)
+
         # Load configuration using ConfigLoader
         self.config_loader = config_loader or ConfigLoader()
 
+        # Opt-in cProfile of requests; not installed at all when disabled
+        self.request_profiler = RequestProfiler.from_settings(
+            self.config_loader.get_profiling_settings()
+        )
+        if self.request_profiler:
+            self.app.wsgi_app = self.request_profiler.wrap(self.app.wsgi_app)
+
         # Home Assistant configuration (from ConfigLoader)
         self.ha_url = self.config_loader.get_ha_url()
         self.ha_token = self.config_loader.get_ha_token()
@@ -154,12 +191,13 @@ class BroadlinkWebServer:
         # Reads return cached data until file is actually written
         self.storage_command_cache: dict[str, dict[str, str]] = {}
         self.storage_cache_timestamp: float = 0
-        self.STORAGE_CACHE_TTL = 60  # Refresh cache every 60 seconds
 
         # Device connection info cache to speed up learning/testing
         # Format: {entity_id: {host, mac, type, type_hex, model, mac_bytes, cached_at}}
         self.device_connection_cache: dict[str, dict] = {}
         self.CONNECTION_CACHE_TTL = 300  # Cache for 5 minutes
+        self.connection_cache_hits = 0
+        self.connection_cache_misses = 0
 
         # Call tracking for logging context
         self._call_counter = 0
@@ -175,19 +213,38 @@ class BroadlinkWebServer:
         self.poll_thread = None
         self.poll_thread_running = False
         self.POLL_TIMEOUT = 60  # Mark as error after 60 seconds
+        self.POLL_BATCH_SIZE = 50  # Commands polled per cycle
+
+        # Values read by /api/metrics at scrape time
+        CACHE_LOOKUPS.collect_from(
+            "connection",
+            lambda: cache_counts(
+                self.connection_cache_hits, self.connection_cache_misses, "connection"
+            ),
+        )
+        CACHE_LOOKUPS.collect_from(
+            "response",
+            lambda: cache_counts(
+                response_cache.hits, response_cache.misses, "response"
+            ),
+        )
+        PENDING_COMMAND_POLLS.collect_from(
+            "web_server", lambda: {(): len(self.pending_command_polls)}
+        )
 
         # Initialize entity management components
         self.entity_detector = EntityDetector()
-        self.area_manager = AreaManager(self.ha_url or "", self.ha_token or "")
-        self.device_manager = DeviceManager(
-            str(self.config_loader.get_broadlink_manager_path())
-        )
+        with startup_timer.phase("init.device_manager"):
+            self.device_manager = DeviceManager(
+                str(self.config_loader.get_broadlink_manager_path()),
+                backend=self.config_loader.get_storage_backend(),
+            )
         self.smartir_detector = SmartIRDetector(
             str(self.config_loader.get_config_path())
         )
-        self.smartir_code_service = SmartIRCodeService(
-            str(self.config_loader.get_broadlink_manager_path() / "cache"),
-            smartir_detector=self.smartir_detector,
+        self.area_manager = LazySubsystem("area_manager", self._create_area_manager)
+        self.smartir_code_service = LazySubsystem(
+            "smartir_code_service", self._create_smartir_code_service
         )
 
         # Make managers available to API endpoints
@@ -195,21 +252,23 @@ class BroadlinkWebServer:
         self.app.config["area_manager"] = self.area_manager
         self.app.config["web_server"] = self  # For command learning
         self.app.config["smartir_detector"] = self.smartir_detector
+        self.app.config["request_profiler"] = self.request_profiler
         self.app.config["smartir_code_service"] = self.smartir_code_service
         self.app.config["config_path"] = str(self.config_loader.get_config_path())
 
-        # Register API blueprint for v2
-        self.app.register_blueprint(api_bp)
-        logger.info("Registered API blueprint at /api")
+        with startup_timer.phase("init.routes"):
+            # Register API blueprint for v2
+            self.app.register_blueprint(api_bp)
+            logger.info("Registered API blueprint at /api")
 
-        # Register SmartIR API blueprint with code service
-        smartir_bp = init_smartir_routes(
-            self.smartir_detector, self.smartir_code_service
-        )
-        self.app.register_blueprint(smartir_bp)
-        logger.info("Registered SmartIR API blueprint at /api/smartir")
+            # Register SmartIR API blueprint with code service
+            smartir_bp = init_smartir_routes(
+                self.smartir_detector, self.smartir_code_service
+            )
+            self.app.register_blueprint(smartir_bp)
+            logger.info("Registered SmartIR API blueprint at /api/smartir")
 
-        self._setup_routes()
+            self._setup_routes()
         # Initialize WebSocket variables
         self.ws_connection = None
         self.ws_message_id = 0
@@ -218,14 +277,49 @@ class BroadlinkWebServer:
         # Automatic migration disabled - user preference
         # self._schedule_migration_check()
 
-        # Check for pending commands on startup and start polling if needed
-        self._check_and_start_polling_on_startup()
+    def _create_area_manager(self):
+        from area_manager import AreaManager
+
+        return AreaManager(self.ha_url or "", self.ha_token or "")
 
-        # Start file watcher for devices.json
-        self._start_file_watcher()
+    def _create_smartir_code_service(self):
+        from smartir_code_service import SmartIRCodeService
 
-        # Initialize entity files to prevent configuration errors
-        self._initialize_entity_files()
+        return SmartIRCodeService(
+            str(self.config_loader.get_broadlink_manager_path() / "cache"),
+            smartir_detector=self.smartir_detector,
+        )
+
+    def _warm_up(self):
+        """
+        Startup work deferred until the port is bound (background thread)
+
+        Requests are already being served; a request that needs the SmartIR
+        index before warm-up reaches it simply builds it itself.
+        """
+        try:
+            # Check for pending commands on startup and start polling if needed
+            with startup_timer.phase("warmup.pending_commands"):
+                self._check_and_start_polling_on_startup()
+
+            # Start file watcher for devices.json
+            with startup_timer.phase("warmup.file_watcher"):
+                self._start_file_watcher()
+
+            # Initialize entity files to prevent configuration errors
+            with startup_timer.phase("warmup.entity_files"):
+                self._initialize_entity_files()
+
+            with startup_timer.phase("warmup.smartir_code_service"):
+                self.smartir_code_service.lazy_instance()
+        except Exception as e:
+            logger.error(f"Error during startup warm-up: {e}")
+        startup_timer.mark_warm()
+
+    def _on_ready(self):
+        """Called once the server socket is listening"""
+        startup_timer.mark_ready()
+        threading.Thread(target=self._warm_up, name="warm-up", daemon=True).start()
 
     def _initialize_entity_files(self):
         """
@@ -273,13 +367,18 @@ class BroadlinkWebServer:
         @self.app.route("/static/<path:filename>")
         def serve_static(filename):
             """Explicitly serve static files to work with ingress"""
-            return send_from_directory(self.app.static_folder, filename)
+            return send_asset(Path(self.app.static_folder), filename)
 
         @self.app.route("/assets/<path:filename>")
         def serve_assets(filename):
-            """Serve Vue app assets (CSS, JS) with correct MIME types"""
+            """Serve Vue app assets (CSS, JS), precompressed and cached forever"""
             assets_path = Path(self.app.static_folder) / "assets"
-            return send_from_directory(assets_path, filename)
+            return send_asset(assets_path, filename)
+
+        @self.app.route("/api/metrics")
+        def get_metrics():
+            """Prometheus metrics (text exposition format)"""
+            return render_metrics()
 
         @self.app.route("/api/areas")
         def get_areas():
@@ -316,7 +415,11 @@ class BroadlinkWebServer:
                 loop = asyncio.new_event_loop()
                 asyncio.set_event_loop(loop)
                 commands = loop.run_until_complete(
-                    self._get_learned_commands(device_id)
+                    self._get_learned_commands(
+                        device_id,
+                        include_data=request.args.get("summary", "").lower()
+                        not in ("1", "true", "yes"),
+                    )
                 )
                 loop.close()
                 return jsonify(commands)
@@ -382,12 +485,15 @@ class BroadlinkWebServer:
                 return jsonify({"error": str(e)}), 500
 
         @self.app.route("/api/learned-devices")
+        @response_cache.cached(self._learned_commands_version)
         def get_learned_devices():
             """Get all learned devices with area and command information for filtering"""
             try:
                 loop = asyncio.new_event_loop()
                 asyncio.set_event_loop(loop)
-                commands_data = loop.run_until_complete(self._get_learned_commands())
+                commands_data = loop.run_until_complete(
+                    self._get_learned_commands(include_data=False)
+                )
                 loop.close()
 
                 # Transform data for filtering UI
@@ -412,34 +518,14 @@ class BroadlinkWebServer:
                         }
 
                     # Add commands
-                    command_data = device_info.get("command_data", {})
+                    command_types = device_info.get("command_types", {})
                     for command in device_info.get("commands", []):
-                        command_code = command_data.get(command, "")
-                        # Handle both string and list command codes
-                        if isinstance(command_code, list):
-                            # If it's a list, check the first element
-                            command_type = (
-                                "rf"
-                                if (
-                                    command_code
-                                    and isinstance(command_code[0], str)
-                                    and command_code[0].startswith("sc")
-                                )
-                                else "ir"
-                            )
-                        elif isinstance(command_code, str):
-                            command_type = (
-                                "rf" if command_code.startswith("sc") else "ir"
-                            )
-                        else:
-                            command_type = "ir"  # Default to IR if unknown type
-
                         result["commands"].append(
                             {
                                 "device_name": device_name,
                                 "device_part": device_part,
                                 "command": command,
-                                "command_type": command_type,
+                                "command_type": command_types.get(command, "ir"),
                                 "area_id": area_id,
                                 "area_name": area_name,
                                 "full_command_name": f"{device_name}_{command}",
@@ -733,6 +819,8 @@ class BroadlinkWebServer:
                     "package_output_path": (
                         str(package_output_path) if package_output_path else None
                     ),
+                    "config_changed": False,
+                    "changed_entities": {"added": [], "modified": [], "removed": []},
                 }
 
                 # Generate Broadlink native entities
@@ -770,6 +858,7 @@ class BroadlinkWebServer:
                             device_manager=self.device_manager,
                             config_path=str(self.config_loader.get_config_path()),
                             package_output_path=self.config_loader.get_package_output_path(),
+                            parallel_build=self.config_loader.get_parallel_entity_build(),
                         )
                         broadlink_result = generator.generate_all_devices(
                             broadlink_devices
@@ -779,6 +868,12 @@ class BroadlinkWebServer:
                             results["broadlink_count"] = broadlink_result.get(
                                 "entities_count", 0
                             )
+                            # Unchanged output is not rewritten (no reload needed)
+                            if broadlink_result.get("changed", True):
+                                results["config_changed"] = True
+                            results["changed_entities"] = broadlink_result.get(
+                                "changed_entities", results["changed_entities"]
+                            )
                             # Include validation warnings from entity generator
                             validation_warnings = broadlink_result.get(
                                 "validation_warnings", []
@@ -809,20 +904,17 @@ class BroadlinkWebServer:
                         str(self.config_loader.get_config_path())
                     )
 
-                    # Get Broadlink device list for IP lookup
-                    broadlink_device_list = loop.run_until_complete(
-                        self._get_broadlink_devices()
+                    # One parse/validate/write per platform file for all devices
+                    # (controller_data uses entity IDs, so no Broadlink IP lookup)
+                    batch_result = smartir_generator.generate_device_configs(
+                        smartir_devices
                     )
 
-                    smartir_success_count = 0
-                    for device_id, device_data in smartir_devices.items():
-                        smartir_result = smartir_generator.generate_device_config(
-                            device_id, device_data, broadlink_device_list
-                        )
-
-                        if smartir_result.get("success"):
-                            smartir_success_count += 1
-                        else:
+                    smartir_success_count = batch_result["success_count"]
+                    if batch_result["files"]:
+                        results["config_changed"] = True
+                    for device_id, smartir_result in batch_result["results"].items():
+                        if not smartir_result.get("success"):
                             error_msg = smartir_result.get("error", "Unknown error")
                             results["errors"].append(
                                 f"SmartIR {device_id}: {error_msg}"
@@ -863,24 +955,8 @@ class BroadlinkWebServer:
                     results["success"] = False
                     results["message"] = "No entities configured"
 
-                # Reload configurations if we generated anything
                 if results["total_count"] > 0:
-                    logger.info("🔄 Reloading Broadlink configuration...")
-                    reload_success = loop.run_until_complete(
-                        self._reload_broadlink_config()
-                    )
-
-                    logger.info("🔄 Reloading Home Assistant YAML configuration...")
-                    yaml_reload_success = loop.run_until_complete(
-                        self.area_manager.reload_config()
-                    )
-
-                    if reload_success and yaml_reload_success:
-                        results["config_reloaded"] = True
-                        results["message"] += " Configuration reloaded successfully."
-                    else:
-                        results["config_reloaded"] = False
-                        results["message"] += " Warning: Configuration reload failed."
+                    loop.run_until_complete(self._reload_generated_config(results))
 
                 loop.close()
 
@@ -1268,72 +1344,88 @@ class BroadlinkWebServer:
     async def _make_ha_request(
         self, method: str, endpoint: str, data: Optional[Dict] = None
     ) -> Dict:
-        """Make a request to Home Assistant API"""
+        """Make a request to Home Assistant API (latency recorded in metrics)"""
+        return await timed_ha_request(
+            ha_endpoint(endpoint), self._send_ha_request(method, endpoint, data)
+        )
+
+    async def _send_ha_request(
+        self, method: str, endpoint: str, data: Optional[Dict] = None
+    ) -> Tuple[int, Optional[Dict]]:
+        """
+        Send a request to Home Assistant API
+
+        Returns:
+            Tuple of (HTTP status, result). A failed GET returns an empty dict
+            and a failed POST returns None as the result.
+        """
         url = f"{self.ha_url}/api/{endpoint}"
         headers = {
             "Authorization": f"Bearer {self.ha_token}",
             "Content-Type": "application/json",
         }
 
-        logger.info(f"Making {method} request to: {url}")
+        hot_log.debug("ha.request", method=method, endpoint=endpoint)
+
+        import aiohttp
 
         async with aiohttp.ClientSession() as session:
             if method.upper() == "GET":
                 async with session.get(url, headers=headers) as response:
-                    # Color-coded status logging
                     status = response.status
                     if status == 200:
-                        logger.info(f"✅ Response status: {status}")
-                    elif 400 <= status < 500:
-                        logger.warning(f"⚠️  Response status: {status} (Client Error)")
-                    elif status >= 500:
-                        logger.error(f"❌ Response status: {status} (Server Error)")
-                    else:
-                        logger.info(f"ℹ️  Response status: {status}")
-
-                    if response.status == 200:
                         result = await response.json()
-                        logger.info(
-                            f"Response data type: {type(result)}, length: {len(result) if isinstance(result, (list, dict)) else 'N/A'}"
+                        hot_log.debug(
+                            "ha.response",
+                            method=method,
+                            endpoint=endpoint,
+                            status=status,
+                            items=lambda: (
+                                len(result)
+                                if isinstance(result, (list, dict))
+                                else None
+                            ),
                         )
-                        return result
+                        return status, result
                     else:
-                        logger.error(
-                            f"API request failed with status {response.status}: {await response.text()}"
+                        body = await response.text()
+                        hot_log.error(
+                            "ha.request_failed",
+                            method=method,
+                            endpoint=ha_endpoint(endpoint),
+                            status=status,
+                            body=body[:200],
                         )
-                        return {}
+                        return status, {}
             elif method.upper() == "POST":
                 async with session.post(url, headers=headers, json=data) as response:
-                    # Color-coded status logging
                     status = response.status
+                    response_text = await response.text()
                     if status == 200:
-                        logger.info(f"✅ POST Response status: {status}")
-                    elif 400 <= status < 500:
-                        logger.warning(
-                            f"⚠️  POST Response status: {status} (Client Error)"
-                        )
-                    elif status >= 500:
-                        logger.error(
-                            f"❌ POST Response status: {status} (Server Error)"
+                        hot_log.debug(
+                            "ha.response",
+                            method=method,
+                            endpoint=endpoint,
+                            status=status,
+                            body=lambda: response_text[:200],
                         )
-                    else:
-                        logger.info(f"ℹ️  POST Response status: {status}")
-
-                    response_text = await response.text()
-                    logger.info(f"POST Response body: {response_text}")
-                    if response.status == 200:
                         try:
-                            return await response.json() if response_text else {}
-                        except:
-                            logger.info(
-                                "POST response was successful but not JSON, returning empty dict"
+                            return status, (
+                                await response.json() if response_text else {}
                             )
-                            return {}
+                        except:
+                            hot_log.debug("ha.response_not_json", endpoint=endpoint)
+                            return status, {}
                     else:
-                        logger.error(
-                            f"POST API request failed with status {response.status}: {response_text}"
+                        hot_log.error(
+                            "ha.request_failed",
+                            method=method,
+                            endpoint=ha_endpoint(endpoint),
+                            status=status,
+                            body=response_text[:200],
                         )
-                        return None
+                        return status, None
+            raise ValueError(f"Unsupported Home Assistant request method: {method}")
 
     def _get_call_id(self) -> str:
         """Generate a unique call ID for tracking concurrent requests"""
@@ -1351,14 +1443,11 @@ class BroadlinkWebServer:
             areas_file = self.storage_path / "core.area_registry"
 
             if areas_file.exists():
-                logger.info(f"[{call_context}] Reading areas from storage file...")
                 async with aiofiles.open(areas_file, "r") as f:
                     content = await f.read()
-                    data = json.loads(content)
+                    data = parse_storage(content, "area_registry")
                     areas = data.get("data", {}).get("areas", [])
-                    logger.info(
-                        f"[{call_context}] Found {len(areas)} areas from storage"
-                    )
+                    hot_log.debug("areas.read", context=call_context, areas=len(areas))
                     return areas
             else:
                 logger.warning(f"[{call_context}] Areas storage file not found")
@@ -1376,10 +1465,6 @@ class BroadlinkWebServer:
         """
         try:
             # Read from storage files (primary method for add-on)
-            logger.info(
-                f"[{call_context}] Reading Broadlink devices from storage files..."
-            )
-
             # Get area information first
             areas_data = await self._get_ha_areas(call_context)
             area_lookup = {area["id"]: area["name"] for area in areas_data}
@@ -1394,13 +1479,13 @@ class BroadlinkWebServer:
                 # Read device registry
                 async with aiofiles.open(device_registry_file, "r") as f:
                     device_content = await f.read()
-                    device_data = json.loads(device_content)
+                    device_data = parse_storage(device_content, "device_registry")
                     devices = device_data.get("data", {}).get("devices", [])
 
                 # Read entity registry
                 async with aiofiles.open(entity_registry_file, "r") as f:
                     entity_content = await f.read()
-                    entity_data = json.loads(entity_content)
+                    entity_data = parse_storage(entity_content, "entity_registry")
                     entities = entity_data.get("data", {}).get("entities", [])
 
                 # Find Broadlink devices
@@ -1424,8 +1509,12 @@ class BroadlinkWebServer:
                             area_id = device.get("area_id")
                             area_name = area_lookup.get(area_id, "Unknown Area")
 
-                            logger.info(
-                                f"[{call_context}] Found Broadlink device: {name} (ID: {device_id}, Area: {area_name})"
+                            hot_log.debug(
+                                "broadlink_devices.found",
+                                context=call_context,
+                                name=name,
+                                device_id=device_id,
+                                area=area_name,
                             )
 
                             # Find corresponding entities
@@ -1464,13 +1553,19 @@ class BroadlinkWebServer:
                                         }
                                     )
                     except Exception as e:
-                        logger.warning(
-                            f"Error processing device entry: {e}, device: {device}"
+                        hot_log.warning(
+                            "broadlink_devices.bad_entry",
+                            error=e,
+                            device_id=(
+                                device.get("id") if isinstance(device, dict) else None
+                            ),
                         )
                         continue
 
-                logger.info(
-                    f"[{call_context}] Found {len(broadlink_devices)} Broadlink devices from storage"
+                hot_log.debug(
+                    "broadlink_devices.read",
+                    context=call_context,
+                    devices=len(broadlink_devices),
                 )
                 return broadlink_devices
             else:
@@ -1548,6 +1643,8 @@ class BroadlinkWebServer:
                     "Content-Type": "application/json",
                 }
 
+                import aiohttp
+
                 async with aiohttp.ClientSession() as session:
                     async with session.get(url, headers=headers) as response:
                         if response.status == 200:
@@ -1850,8 +1947,38 @@ class BroadlinkWebServer:
             "is_dark": True,
         }
 
-    async def _get_learned_commands(self, device_id: Optional[str] = None) -> Dict:
-        """Get learned commands from storage files with filtering and area information"""
+    def _learned_commands_version(self) -> tuple:
+        """Response cache version of _get_learned_commands (codes and registries)"""
+        return (
+            glob_version(self.storage_path, "broadlink_remote_*_codes"),
+            path_version(
+                self.storage_path / "core.area_registry",
+                self.storage_path / "core.device_registry",
+                self.storage_path / "core.entity_registry",
+            ),
+        )
+
+    @staticmethod
+    def _command_code_type(command_code: Any) -> str:
+        """Classify a stored code as "rf" or "ir" (RF codes start with "sc")"""
+        if isinstance(command_code, list):
+            # If it's a list, check the first element
+            command_code = command_code[0] if command_code else None
+        if isinstance(command_code, str) and command_code.startswith("sc"):
+            return "rf"
+        return "ir"  # Default to IR if unknown type
+
+    async def _get_learned_commands(
+        self, device_id: Optional[str] = None, include_data: bool = True
+    ) -> Dict:
+        """
+        Get learned commands from storage files with filtering and area information
+
+        Args:
+            device_id: Unused, kept for the /api/commands/<device_id> route
+            include_data: Include every code as "command_data"; when False only
+                "command_types" (name -> "ir"/"rf") is returned
+        """
         try:
             # Find the storage files for Broadlink commands
             storage_files = list(self.storage_path.glob("broadlink_remote_*_codes"))
@@ -1885,7 +2012,7 @@ class BroadlinkWebServer:
                 try:
                     async with aiofiles.open(storage_file, "r") as f:
                         content = await f.read()
-                        data = json.loads(content)
+                        data = parse_storage(content, "broadlink_codes")
 
                         # Get the device info for this storage file
                         storage_filename = storage_file.name
@@ -1900,13 +2027,20 @@ class BroadlinkWebServer:
                                 # This ensures commands are always associated with the current device area
                                 all_commands[device_name] = {
                                     "commands": list(commands.keys()),
-                                    "command_data": commands,  # Include actual command codes
                                     "area_id": file_area_id,
                                     "area_name": file_area_name,
                                     "device_part": device_name,
                                     "full_name": device_name,
                                     "storage_file": storage_filename,
                                 }
+                                if include_data:
+                                    # Include actual command codes
+                                    all_commands[device_name]["command_data"] = commands
+                                else:
+                                    all_commands[device_name]["command_types"] = {
+                                        name: self._command_code_type(code)
+                                        for name, code in commands.items()
+                                    }
 
                 except Exception as e:
                     logger.warning(f"Error reading storage file {storage_file}: {e}")
@@ -1925,7 +2059,6 @@ class BroadlinkWebServer:
 
         This method sits behind a cache that handles async file writes:
         - On read: Returns cached data merged with file data
-        - Cache is refreshed periodically (STORAGE_CACHE_TTL)
         - Recently deleted commands are filtered out
         """
         try:
@@ -1939,7 +2072,7 @@ class BroadlinkWebServer:
                 try:
                     async with aiofiles.open(storage_file, "r") as f:
                         content = await f.read()
-                        data = json.loads(content)
+                        data = parse_storage(content, "broadlink_codes")
 
                         # Extract device commands
                         for device_name, commands in data.get("data", {}).items():
@@ -2128,6 +2261,11 @@ class BroadlinkWebServer:
         Background thread that continuously polls for pending commands.
         Runs as long as there are ANY pending commands in devices.json.
         Marks commands as 'error' after 60 seconds.
+
+        Each cycle polls at most POLL_BATCH_SIZE commands, oldest first.
+        poll_lock is held only to pick the batch and merge the results; the
+        storage and SmartIR profile scan runs outside it, so neither a large
+        backlog nor the scan blocks requests that queue new commands.
         """
         logger.info("🔄 Background polling thread started")
 
@@ -2140,438 +2278,432 @@ class BroadlinkWebServer:
                     logger.debug(
                         f"🔄 Polling cycle - current poll list size: {len(self.pending_command_polls)}"
                     )
+                    scan = not self.pending_command_polls
 
-                    if not self.pending_command_polls:
-                        # Check if there are any pending commands in devices.json and SmartIR profiles
-                        logger.debug(
-                            "📋 Poll list empty, scanning for pending commands..."
-                        )
-                        found_pending = False
+                found = []
+                if scan:
+                    # Check if there are any pending commands in devices.json and
+                    # SmartIR profiles (outside the lock: reads every profile)
+                    logger.debug("📋 Poll list empty, scanning for pending commands...")
+                    found = self._find_untracked_pending_commands()
 
-                        # 1. Scan Broadlink native devices from devices.json
-                        devices = self.device_manager.get_all_devices()
-                        for device_id, device in devices.items():
-                            device_type = device.get("device_type", "broadlink")
-
-                            if device_type == "broadlink":
-                                # Broadlink native device - check devices.json
-                                device_name = device.get("device_id", device_id)
-                                commands = device.get("commands", {})
-
-                                for cmd_name, cmd_data in commands.items():
-                                    if (
-                                        isinstance(cmd_data, dict)
-                                        and cmd_data.get("data") == "pending"
-                                    ):
-                                        found_pending = True
-                                        logger.info(
-                                            f"📋 Found untracked pending command: {device_name}/{cmd_name}, adding to poll list"
-                                        )
-                                        self.pending_command_polls.append(
-                                            (
-                                                device_id,
-                                                device_name,
-                                                cmd_name,
-                                                time.time(),
-                                                None,
-                                            )
-                                        )
-
-                        # 2. Scan SmartIR profile directories directly (independent of devices.json)
-                        try:
-                            smartir_path = (
-                                self.config_path / "custom_components" / "smartir"
-                            )
-                            custom_codes_path = smartir_path / "custom_codes"
-
-                            if custom_codes_path.exists():
-                                # Scan each platform directory (climate, fan, media_player, light)
-                                for platform_dir in custom_codes_path.iterdir():
-                                    if platform_dir.is_dir():
-                                        platform = platform_dir.name
-
-                                        # Scan all profile JSON files in this platform
-                                        for profile_file in platform_dir.glob("*.json"):
-                                            try:
-                                                with open(
-                                                    profile_file, "r", encoding="utf-8"
-                                                ) as f:
-                                                    profile_data = json.load(f)
-
-                                                device_code = profile_file.stem
-                                                manufacturer = profile_data.get(
-                                                    "manufacturer", ""
-                                                )
-                                                model = profile_data.get(
-                                                    "supportedModels", [""]
-                                                )[0]
-                                                commands = profile_data.get(
-                                                    "commands", {}
-                                                )
-
-                                                # Check for pending commands
-                                                for (
-                                                    cmd_name,
-                                                    cmd_code,
-                                                ) in commands.items():
-                                                    if cmd_code == "pending":
-                                                        found_pending = True
-
-                                                        # Generate device name from manufacturer/model for storage lookup
-                                                        import re
-
-                                                        device_name = f"{manufacturer.lower()}_{model.lower()}"
-                                                        device_name = re.sub(
-                                                            r"[^a-z0-9]+",
-                                                            "_",
-                                                            device_name,
-                                                        )
-
-                                                        logger.info(
-                                                            f"📋 Found pending SmartIR command in profile {device_code} ({platform}): {cmd_name}"
-                                                        )
-
-                                                        # Use profile path as device_id for SmartIR profiles
-                                                        profile_id = f"smartir_{platform}_{device_code}"
-
-                                                        self.pending_command_polls.append(
-                                                            (
-                                                                profile_id,
-                                                                device_name,
-                                                                cmd_name,
-                                                                time.time(),
-                                                                None,
-                                                                {
-                                                                    "smartir_profile": str(
-                                                                        profile_file
-                                                                    ),
-                                                                    "device_code": device_code,
-                                                                    "platform": platform,
-                                                                },
-                                                            )
-                                                        )
-                                            except Exception as e:
-                                                logger.debug(
-                                                    f"Error scanning SmartIR profile {profile_file}: {e}"
-                                                )
-                        except Exception as e:
-                            logger.debug(f"Error scanning SmartIR profiles: {e}")
-
-                        if not found_pending:
+                with self.poll_lock:
+                    if scan:
+                        if not found and not self.pending_command_polls:
                             # No more pending commands anywhere, stop thread
                             self.poll_thread_running = False
                             logger.info(
                                 "✅ No more pending commands, stopping poll thread"
                             )
                             break
-                        else:
+                        # Requests may have queued some of them during the scan
+                        queued = {
+                            (item[0], item[2]) for item in self.pending_command_polls
+                        }
+                        found = [
+                            item for item in found if (item[0], item[2]) not in queued
+                        ]
+                        self.pending_command_polls.extend(found)
+                        if found:
                             logger.info(
-                                f"📋 Added {len(self.pending_command_polls)} pending commands to poll list"
+                                f"📋 Added {len(found)} pending commands to poll list"
                             )
 
-                    # Process each pending command
-                    still_pending = []
-                    for poll_item in self.pending_command_polls:
-                        # Handle both old format (5 items) and new format (6 items with metadata)
-                        if len(poll_item) == 6:
-                            (
-                                device_id,
-                                device_name,
-                                command_name,
-                                start_time,
-                                entity_id_for_deletion,
-                                metadata,
-                            ) = poll_item
-                        else:
+                    batch = self.pending_command_polls[: self.POLL_BATCH_SIZE]
+
+                still_pending = self._poll_batch(batch, current_time)
+
+                with self.poll_lock:
+                    # Keep commands queued meanwhile; polled ones that are
+                    # still pending go to the back of the queue
+                    polled = {id(item) for item in batch}
+                    self.pending_command_polls = [
+                        item
+                        for item in self.pending_command_polls
+                        if id(item) not in polled
+                    ] + still_pending
+
+            except Exception as e:
+                logger.error(f"Error in polling thread: {e}")
+                time.sleep(5)  # Wait a bit before retrying on error
+
+    def _find_untracked_pending_commands(self) -> list:
+        """Poll items for every pending command in devices.json and SmartIR profiles"""
+        found = []
+
+        # 1. Broadlink native devices, from the device storage index
+        for (
+            device_id,
+            device_name,
+            cmd_name,
+        ) in self.device_manager.get_pending_commands():
+            logger.info(
+                f"📋 Found untracked pending command: {device_name}/{cmd_name}, adding to poll list"
+            )
+            found.append((device_id, device_name, cmd_name, time.time(), None))
+
+        # 2. Scan SmartIR profile directories directly (independent of devices.json)
+        try:
+            found.extend(self._find_pending_smartir_commands())
+        except Exception as e:
+            logger.debug(f"Error scanning SmartIR profiles: {e}")
+        return found
+
+    def _find_pending_smartir_commands(self) -> list:
+        """
+        Poll items for "pending" commands in SmartIR custom code profiles
+
+        Profiles whose text does not contain the marker are not parsed.
+        """
+        import re
+
+        found = []
+        custom_codes_path = (
+            self.config_loader.get_config_path()
+            / "custom_components"
+            / "smartir"
+            / "custom_codes"
+        )
+        if not custom_codes_path.exists():
+            return found
+
+        # Scan each platform directory (climate, fan, media_player, light)
+        for platform_dir in custom_codes_path.iterdir():
+            if not platform_dir.is_dir():
+                continue
+            platform = platform_dir.name
+
+            for profile_file in platform_dir.glob("*.json"):
+                try:
+                    text = profile_file.read_text(encoding="utf-8")
+                    if '"pending"' not in text:
+                        continue
+                    profile_data = json.loads(text)
+
+                    device_code = profile_file.stem
+                    manufacturer = profile_data.get("manufacturer", "")
+                    model = profile_data.get("supportedModels", [""])[0]
+
+                    for cmd_name, cmd_code in profile_data.get("commands", {}).items():
+                        if cmd_code != "pending":
+                            continue
+
+                        # Generate device name from manufacturer/model for storage lookup
+                        device_name = f"{manufacturer.lower()}_{model.lower()}"
+                        device_name = re.sub(r"[^a-z0-9]+", "_", device_name)
+
+                        logger.info(
+                            f"📋 Found pending SmartIR command in profile {device_code} ({platform}): {cmd_name}"
+                        )
+
+                        # Use profile path as device_id for SmartIR profiles
+                        found.append(
                             (
-                                device_id,
+                                f"smartir_{platform}_{device_code}",
                                 device_name,
-                                command_name,
-                                start_time,
-                                entity_id_for_deletion,
-                            ) = poll_item
-                            metadata = None
+                                cmd_name,
+                                time.time(),
+                                None,
+                                {
+                                    "smartir_profile": str(profile_file),
+                                    "device_code": device_code,
+                                    "platform": platform,
+                                },
+                            )
+                        )
+                except Exception as e:
+                    logger.debug(f"Error scanning SmartIR profile {profile_file}: {e}")
+        return found
 
-                        elapsed = current_time - start_time
+    def _poll_batch(self, batch: list, current_time: float) -> list:
+        """
+        Look for the learned code of each command in a batch of poll items
 
-                        # Try to fetch the code
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        try:
-                            all_commands = loop.run_until_complete(
-                                self._get_all_broadlink_commands()
+        Broadlink storage is read once per batch. Codes found are written to
+        devices.json (or the SmartIR profile); commands past POLL_TIMEOUT get
+        a fallback search under other device names and are otherwise marked
+        as error.
+
+        Returns:
+            Poll items that are still pending
+        """
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            try:
+                all_commands = loop.run_until_complete(
+                    self._get_all_broadlink_commands()
+                )
+            except Exception as e:
+                logger.error(f"❌ Error reading Broadlink storage while polling: {e}")
+                all_commands = {}
+
+            # Process each pending command
+            still_pending = []
+            for poll_item in batch:
+                # Handle both old format (5 items) and new format (6 items with metadata)
+                if len(poll_item) == 6:
+                    (
+                        device_id,
+                        device_name,
+                        command_name,
+                        start_time,
+                        entity_id_for_deletion,
+                        metadata,
+                    ) = poll_item
+                else:
+                    (
+                        device_id,
+                        device_name,
+                        command_name,
+                        start_time,
+                        entity_id_for_deletion,
+                    ) = poll_item
+                    metadata = None
+
+                elapsed = current_time - start_time
+
+                try:
+                    device_commands = all_commands.get(device_name, {})
+                    learned_code = device_commands.get(command_name)
+
+                    # Debug logging for first few attempts
+                    if elapsed < 10:
+                        logger.debug(
+                            f"🔍 Looking for {device_name}/{command_name} in storage"
+                        )
+                        logger.debug(
+                            f"📋 Available devices in storage: {list(all_commands.keys())}"
+                        )
+                        if device_name in all_commands:
+                            logger.debug(
+                                f"📋 Commands for {device_name}: {list(device_commands.keys())}"
                             )
-                            device_commands = all_commands.get(device_name, {})
-                            learned_code = device_commands.get(command_name)
 
-                            # Debug logging for first few attempts
-                            if elapsed < 10:
-                                logger.debug(
-                                    f"🔍 Looking for {device_name}/{command_name} in storage"
-                                )
-                                logger.debug(
-                                    f"📋 Available devices in storage: {list(all_commands.keys())}"
-                                )
-                                if device_name in all_commands:
-                                    logger.debug(
-                                        f"📋 Commands for {device_name}: {list(device_commands.keys())}"
-                                    )
+                    if learned_code and learned_code not in [
+                        "pending",
+                        "error",
+                    ]:
+                        # Got the code!
+                        logger.info(
+                            f"✅ Found code for {device_name}/{command_name} after {elapsed:.1f}s (length: {len(learned_code)} chars)"
+                        )
 
-                            if learned_code and learned_code not in [
-                                "pending",
-                                "error",
-                            ]:
-                                # Got the code!
-                                logger.info(
-                                    f"✅ Found code for {device_name}/{command_name} after {elapsed:.1f}s (length: {len(learned_code)} chars)"
+                        # Check if this is a SmartIR profile (has metadata)
+                        if metadata and "smartir_profile" in metadata:
+                            # SmartIR profile - update profile JSON file directly
+                            try:
+                                profile_path = Path(metadata["smartir_profile"])
+
+                                if profile_path.exists():
+                                    # Read profile
+                                    with open(profile_path, "r", encoding="utf-8") as f:
+                                        profile_data = json.load(f)
+
+                                    # Update command
+                                    if "commands" not in profile_data:
+                                        profile_data["commands"] = {}
+
+                                    profile_data["commands"][
+                                        command_name
+                                    ] = learned_code
+
+                                    # Write back
+                                    with open(profile_path, "w", encoding="utf-8") as f:
+                                        json.dump(
+                                            profile_data,
+                                            f,
+                                            indent=2,
+                                            ensure_ascii=False,
+                                        )
+
+                                    logger.info(
+                                        f"✅ Updated SmartIR profile {metadata['device_code']}.json with code for {command_name}"
+                                    )
+                                else:
+                                    logger.warning(
+                                        f"⚠️ SmartIR profile {profile_path} not found"
+                                    )
+                            except Exception as e:
+                                logger.error(f"❌ Error updating SmartIR profile: {e}")
+                        else:
+                            # Broadlink native device - update devices.json
+                            device = self.device_manager.get_device(device_id)
+                            if device:
+                                if "commands" not in device:
+                                    device["commands"] = {}
+
+                                # Update with actual code
+                                if command_name in device["commands"]:
+                                    device["commands"][command_name][
+                                        "data"
+                                    ] = learned_code
+                                    self.device_manager.update_device(device_id, device)
+                                    logger.info(
+                                        f"✅ Updated devices.json with actual code for {device_name}/{command_name}"
+                                    )
+                                else:
+                                    logger.warning(
+                                        f"⚠️ Command {command_name} not found in devices.json"
+                                    )
+                            else:
+                                logger.warning(
+                                    f"⚠️ Device {device_id} not found in device_manager"
                                 )
 
-                                # Check if this is a SmartIR profile (has metadata)
-                                if metadata and "smartir_profile" in metadata:
-                                    # SmartIR profile - update profile JSON file directly
-                                    try:
-                                        profile_path = Path(metadata["smartir_profile"])
-
-                                        if profile_path.exists():
-                                            # Read profile
-                                            with open(
-                                                profile_path, "r", encoding="utf-8"
-                                            ) as f:
-                                                profile_data = json.load(f)
-
-                                            # Update command
-                                            if "commands" not in profile_data:
-                                                profile_data["commands"] = {}
-
-                                            profile_data["commands"][
-                                                command_name
-                                            ] = learned_code
-
-                                            # Write back
-                                            with open(
-                                                profile_path, "w", encoding="utf-8"
-                                            ) as f:
-                                                json.dump(
-                                                    profile_data,
-                                                    f,
-                                                    indent=2,
-                                                    ensure_ascii=False,
-                                                )
+                        # Nobody waits for this result: findings are only logged
+                        self.device_manager.check_learned_command(
+                            device_id, command_name, learned_code
+                        )
 
-                                            logger.info(
-                                                f"✅ Updated SmartIR profile {metadata['device_code']}.json with code for {command_name}"
-                                            )
-                                        else:
-                                            logger.warning(
-                                                f"⚠️ SmartIR profile {profile_path} not found"
-                                            )
-                                    except Exception as e:
-                                        logger.error(
-                                            f"❌ Error updating SmartIR profile: {e}"
-                                        )
+                        # If this was a manager_only command, delete from integration storage now
+                        if entity_id_for_deletion:
+                            logger.info(
+                                f"🗑️ Now deleting {device_name}/{command_name} from integration storage (entity: {entity_id_for_deletion})"
+                            )
+                            try:
+                                # Add to deletion cache first
+                                self._add_to_deletion_cache(device_name, command_name)
+
+                                # Delete from integration storage
+                                delete_result = loop.run_until_complete(
+                                    self._delete_command(
+                                        {
+                                            "entity_id": entity_id_for_deletion,
+                                            "device": device_name,
+                                            "command": command_name,
+                                        }
+                                    )
+                                )
+                                if delete_result:
+                                    logger.info(
+                                        f"✅ Deleted {device_name}/{command_name} from integration storage"
+                                    )
                                 else:
-                                    # Broadlink native device - update devices.json
-                                    device = self.device_manager.get_device(device_id)
-                                    if device:
-                                        if "commands" not in device:
-                                            device["commands"] = {}
-
-                                        # Update with actual code
-                                        if command_name in device["commands"]:
-                                            device["commands"][command_name][
-                                                "data"
-                                            ] = learned_code
-                                            self.device_manager.update_device(
-                                                device_id, device
-                                            )
-                                            logger.info(
-                                                f"✅ Updated devices.json with actual code for {device_name}/{command_name}"
-                                            )
-                                        else:
-                                            logger.warning(
-                                                f"⚠️ Command {command_name} not found in devices.json"
-                                            )
-                                    else:
-                                        logger.warning(
-                                            f"⚠️ Device {device_id} not found in device_manager"
-                                        )
+                                    logger.warning(
+                                        f"⚠️ Failed to delete {device_name}/{command_name} from integration storage"
+                                    )
+                            except Exception as del_error:
+                                logger.error(
+                                    f"❌ Error deleting {device_name}/{command_name}: {del_error}"
+                                )
 
-                                # If this was a manager_only command, delete from integration storage now
-                                if entity_id_for_deletion:
+                        # Don't re-add to pending list (success!)
+                    elif elapsed >= self.POLL_TIMEOUT:
+                        # Timeout reached - try fallback search before marking as error
+                        logger.warning(
+                            f"⚠️ Timeout approaching for {device_name}/{command_name}, trying fallback search..."
+                        )
+                        found_fallback = False
+                        for (
+                            storage_device,
+                            storage_commands,
+                        ) in all_commands.items():
+                            if command_name in storage_commands:
+                                fallback_code = storage_commands[command_name]
+                                if fallback_code and fallback_code not in [
+                                    "pending",
+                                    "error",
+                                ]:
                                     logger.info(
-                                        f"🗑️ Now deleting {device_name}/{command_name} from integration storage (entity: {entity_id_for_deletion})"
+                                        f"✅ Found code for {command_name} under different device name '{storage_device}' after {elapsed:.1f}s"
                                     )
-                                    try:
-                                        # Add to deletion cache first
-                                        self._add_to_deletion_cache(
-                                            device_name, command_name
-                                        )
 
-                                        # Delete from integration storage
-                                        delete_result = loop.run_until_complete(
-                                            self._delete_command(
-                                                {
-                                                    "entity_id": entity_id_for_deletion,
-                                                    "device": device_name,
-                                                    "command": command_name,
-                                                }
-                                            )
+                                    # Update devices.json with fallback code
+                                    device = self.device_manager.get_device(device_id)
+                                    if (
+                                        device
+                                        and "commands" in device
+                                        and command_name in device["commands"]
+                                    ):
+                                        device["commands"][command_name][
+                                            "data"
+                                        ] = fallback_code
+                                        device["commands"][command_name][
+                                            "storage_device"
+                                        ] = storage_device  # Track where we found it
+                                        self.device_manager.update_device(
+                                            device_id, device
                                         )
-                                        if delete_result:
-                                            logger.info(
-                                                f"✅ Deleted {device_name}/{command_name} from integration storage"
-                                            )
-                                        else:
-                                            logger.warning(
-                                                f"⚠️ Failed to delete {device_name}/{command_name} from integration storage"
-                                            )
-                                    except Exception as del_error:
-                                        logger.error(
-                                            f"❌ Error deleting {device_name}/{command_name}: {del_error}"
+                                        logger.info(
+                                            f"✅ Updated devices.json with fallback code (found in {storage_device})"
+                                        )
+                                        self.device_manager.check_learned_command(
+                                            device_id, command_name, fallback_code
                                         )
 
-                                # Don't re-add to pending list (success!)
-                            elif elapsed >= self.POLL_TIMEOUT:
-                                # Timeout reached - try fallback search before marking as error
-                                logger.warning(
-                                    f"⚠️ Timeout approaching for {device_name}/{command_name}, trying fallback search..."
-                                )
-                                found_fallback = False
-                                for (
-                                    storage_device,
-                                    storage_commands,
-                                ) in all_commands.items():
-                                    if command_name in storage_commands:
-                                        fallback_code = storage_commands[command_name]
-                                        if fallback_code and fallback_code not in [
-                                            "pending",
-                                            "error",
-                                        ]:
-                                            logger.info(
-                                                f"✅ Found code for {command_name} under different device name '{storage_device}' after {elapsed:.1f}s"
-                                            )
-
-                                            # Update devices.json with fallback code
-                                            device = self.device_manager.get_device(
-                                                device_id
-                                            )
-                                            if (
-                                                device
-                                                and "commands" in device
-                                                and command_name in device["commands"]
-                                            ):
-                                                device["commands"][command_name][
-                                                    "data"
-                                                ] = fallback_code
-                                                device["commands"][command_name][
-                                                    "storage_device"
-                                                ] = storage_device  # Track where we found it
-                                                self.device_manager.update_device(
-                                                    device_id, device
+                                        # Delete from integration storage if manager_only
+                                        if entity_id_for_deletion:
+                                            try:
+                                                self._add_to_deletion_cache(
+                                                    storage_device, command_name
                                                 )
-                                                logger.info(
-                                                    f"✅ Updated devices.json with fallback code (found in {storage_device})"
+                                                delete_result = loop.run_until_complete(
+                                                    self._delete_command(
+                                                        {
+                                                            "entity_id": entity_id_for_deletion,
+                                                            "device": storage_device,
+                                                            "command": command_name,
+                                                        }
+                                                    )
+                                                )
+                                                if delete_result:
+                                                    logger.info(
+                                                        f"✅ Deleted {storage_device}/{command_name} from integration storage"
+                                                    )
+                                            except Exception as del_error:
+                                                logger.error(
+                                                    f"❌ Error deleting {storage_device}/{command_name}: {del_error}"
                                                 )
 
-                                                # Delete from integration storage if manager_only
-                                                if entity_id_for_deletion:
-                                                    try:
-                                                        self._add_to_deletion_cache(
-                                                            storage_device, command_name
-                                                        )
-                                                        delete_result = loop.run_until_complete(
-                                                            self._delete_command(
-                                                                {
-                                                                    "entity_id": entity_id_for_deletion,
-                                                                    "device": storage_device,
-                                                                    "command": command_name,
-                                                                }
-                                                            )
-                                                        )
-                                                        if delete_result:
-                                                            logger.info(
-                                                                f"✅ Deleted {storage_device}/{command_name} from integration storage"
-                                                            )
-                                                    except Exception as del_error:
-                                                        logger.error(
-                                                            f"❌ Error deleting {storage_device}/{command_name}: {del_error}"
-                                                        )
-
-                                                found_fallback = True
-                                                break
-
-                                if found_fallback:
-                                    # Don't re-add to pending list (success with fallback!)
-                                    continue
-
-                                # Mark as error if not found even with fallback
-                                logger.error(
-                                    f"❌ Timeout polling for {device_name}/{command_name} after {elapsed:.1f}s - marking as error"
-                                )
+                                        found_fallback = True
+                                        break
 
-                                # Update devices.json with error status
-                                device = self.device_manager.get_device(device_id)
-                                if (
-                                    device
-                                    and "commands" in device
-                                    and command_name in device["commands"]
-                                ):
-                                    device["commands"][command_name]["data"] = "error"
-                                    self.device_manager.update_device(device_id, device)
-                                    logger.error(
-                                        f"❌ Marked {device_name}/{command_name} as error in devices.json"
-                                    )
+                        if found_fallback:
+                            # Don't re-add to pending list (success with fallback!)
+                            continue
 
-                                # Don't re-add to pending list (failed)
-                            else:
-                                # Still pending, try again
-                                logger.debug(
-                                    f"⏳ Code still pending for {device_name}/{command_name} ({elapsed:.1f}s elapsed)"
-                                )
-                                still_pending.append(
-                                    (
-                                        device_id,
-                                        device_name,
-                                        command_name,
-                                        start_time,
-                                        entity_id_for_deletion,
-                                    )
-                                )
-                        except Exception as e:
+                        # Mark as error if not found even with fallback
+                        logger.error(
+                            f"❌ Timeout polling for {device_name}/{command_name} after {elapsed:.1f}s - marking as error"
+                        )
+
+                        # Update devices.json with error status
+                        device = self.device_manager.get_device(device_id)
+                        if (
+                            device
+                            and "commands" in device
+                            and command_name in device["commands"]
+                        ):
+                            device["commands"][command_name]["data"] = "error"
+                            self.device_manager.update_device(device_id, device)
                             logger.error(
-                                f"❌ Error polling for {device_name}/{command_name}: {e}"
+                                f"❌ Marked {device_name}/{command_name} as error in devices.json"
                             )
-                            # Still try again on error unless timed out
-                            if elapsed < self.POLL_TIMEOUT:
-                                still_pending.append(
-                                    (
-                                        device_id,
-                                        device_name,
-                                        command_name,
-                                        start_time,
-                                        entity_id_for_deletion,
-                                    )
-                                )
-                        finally:
-                            loop.close()
 
-                    # Update pending list
-                    self.pending_command_polls = still_pending
+                        # Don't re-add to pending list (failed)
+                    else:
+                        # Still pending, try again
+                        logger.debug(
+                            f"⏳ Code still pending for {device_name}/{command_name} ({elapsed:.1f}s elapsed)"
+                        )
+                        still_pending.append(poll_item)
+                except Exception as e:
+                    logger.error(
+                        f"❌ Error polling for {device_name}/{command_name}: {e}"
+                    )
+                    # Still try again on error unless timed out
+                    if elapsed < self.POLL_TIMEOUT:
+                        still_pending.append(poll_item)
 
-            except Exception as e:
-                logger.error(f"Error in polling thread: {e}")
-                time.sleep(5)  # Wait a bit before retrying on error
+            return still_pending
+        finally:
+            loop.close()
 
     def _check_for_pending_commands(self) -> bool:
         """Check if there are any pending commands in devices.json"""
         try:
-            devices = self.device_manager.get_all_devices()
-            for device in devices.values():
-                commands = device.get("commands", {})
-                for cmd_data in commands.values():
-                    if isinstance(cmd_data, dict) and cmd_data.get("data") == "pending":
-                        return True
-            return False
+            return bool(self.device_manager.get_pending_commands())
         except Exception as e:
             logger.error(f"Error checking for pending commands: {e}")
             return False
@@ -2582,6 +2714,8 @@ class BroadlinkWebServer:
             devices_json_path = self.device_manager.devices_file
             watch_dir = str(Path(devices_json_path).parent)
 
+            from watchdog.observers import Observer
+
             event_handler = DevicesJsonWatcher(self)
             self.file_observer = Observer()
             self.file_observer.schedule(event_handler, watch_dir, recursive=False)
@@ -2592,75 +2726,66 @@ class BroadlinkWebServer:
 
     def _check_and_start_polling_for_pending(self):
         """Check for pending commands and start polling if needed (called by file watcher)"""
-        with self.poll_lock:
-            devices = self.device_manager.get_all_devices()
-            found_pending = False
-
-            for device_id, device in devices.items():
-                commands = device.get("commands", {})
-                device_name = device.get("device_id", device_id)
-
-                for cmd_name, cmd_data in commands.items():
-                    if isinstance(cmd_data, dict) and cmd_data.get("data") == "pending":
-                        # Check if already in poll list
-                        already_polling = any(
-                            poll[0] == device_id and poll[2] == cmd_name
-                            for poll in self.pending_command_polls
-                        )
+        pending = self.device_manager.get_pending_commands()
+        if not pending:
+            return
 
-                        if not already_polling:
-                            found_pending = True
-                            logger.info(
-                                f"📋 File watcher found new pending command: {device_name}/{cmd_name}"
-                            )
-                            self.pending_command_polls.append(
-                                (device_id, device_name, cmd_name, time.time(), None)
-                            )
+        found_pending = False
+        with self.poll_lock:
+            polling = {(poll[0], poll[2]) for poll in self.pending_command_polls}
+            for device_id, device_name, cmd_name in pending:
+                if (device_id, cmd_name) not in polling:
+                    found_pending = True
+                    logger.info(
+                        f"📋 File watcher found new pending command: {device_name}/{cmd_name}"
+                    )
+                    self.pending_command_polls.append(
+                        (device_id, device_name, cmd_name, time.time(), None)
+                    )
 
-            if found_pending and not self.poll_thread_running:
-                self.poll_thread_running = True
-                self.poll_thread = threading.Thread(
-                    target=self._poll_pending_commands, daemon=True
-                )
-                self.poll_thread.start()
-                logger.info("🔄 File watcher started background polling thread")
+        if found_pending:
+            self._ensure_poll_thread()
 
     def _check_and_start_polling_on_startup(self):
-        """Check for pending commands on startup and start polling thread if needed"""
-        try:
-            devices = self.device_manager.get_all_devices()
-            pending_found = False
-
-            for device_id, device in devices.items():
-                commands = device.get("commands", {})
-                device_name = device.get("device_id", device_id)
-                entity_id = device.get("broadlink_entity")
-
-                for cmd_name, cmd_data in commands.items():
-                    if isinstance(cmd_data, dict) and cmd_data.get("data") == "pending":
-                        pending_found = True
-                        # Schedule polling for this command
-                        # We don't know if it needs deletion, so pass None for entity_id_for_deletion
-                        logger.info(
-                            f"📋 Found pending command on startup: {device_name}/{cmd_name}"
-                        )
-                        with self.poll_lock:
-                            self.pending_command_polls.append(
-                                (device_id, device_name, cmd_name, time.time(), None)
-                            )
+        """
+        Resume polling for commands left pending (runs in warm-up, not at init)
 
-            if pending_found and not self.poll_thread_running:
-                self.poll_thread_running = True
-                self.poll_thread = threading.Thread(
-                    target=self._poll_pending_commands, daemon=True
-                )
-                self.poll_thread.start()
-                logger.info(
-                    "🔄 Started background polling thread for existing pending commands"
-                )
+        Reads the storage index of pending commands instead of walking every
+        device; a large stale backlog is then worked off in batches by the
+        poll thread.
+        """
+        try:
+            pending = self.device_manager.get_pending_commands()
+            if not pending:
+                return
+
+            now = time.time()
+            with self.poll_lock:
+                for device_id, device_name, cmd_name in pending:
+                    # We don't know if it needs deletion, so pass None for entity_id_for_deletion
+                    logger.debug(
+                        f"📋 Found pending command on startup: {device_name}/{cmd_name}"
+                    )
+                    self.pending_command_polls.append(
+                        (device_id, device_name, cmd_name, now, None)
+                    )
+            logger.info(f"📋 Found {len(pending)} pending command(s) on startup")
+            self._ensure_poll_thread()
         except Exception as e:
             logger.error(f"Error checking for pending commands on startup: {e}")
 
+    def _ensure_poll_thread(self):
+        """Start the background polling thread unless it is running"""
+        with self.poll_lock:
+            if self.poll_thread_running:
+                return
+            self.poll_thread_running = True
+            self.poll_thread = threading.Thread(
+                target=self._poll_pending_commands, daemon=True
+            )
+            self.poll_thread.start()
+        logger.info("🔄 Started background polling thread for pending commands")
+
     async def _find_broadlink_entity_for_device(self, device_name: str) -> str:
         """Find which Broadlink entity owns the commands for a given device name"""
         try:
@@ -2682,7 +2807,7 @@ class BroadlinkWebServer:
                 try:
                     async with aiofiles.open(storage_file, "r") as f:
                         content = await f.read()
-                        data = json.loads(content)
+                        data = parse_storage(content, "broadlink_codes")
 
                         # Check if this device exists in this storage file
                         if device_name in data.get("data", {}):
@@ -2707,6 +2832,7 @@ class BroadlinkWebServer:
             logger.error(f"Error finding Broadlink entity: {e}")
             return None
 
+    @timed_learning("ha")
     async def _learn_command(self, data: Dict) -> Dict:
         """Learn a new command with 2-step process monitoring"""
         try:
@@ -2865,9 +2991,11 @@ class BroadlinkWebServer:
                     title = attributes.get("title", "")
                     message = attributes.get("message", "")
 
-                    # Log ALL persistent notifications for debugging
-                    logger.info(
-                        f"HTTP: Found notification - Title: '{title}', Message: '{message[:50]}...'"
+                    hot_log.debug(
+                        "notifications.seen",
+                        source="states",
+                        title=title,
+                        message=lambda: message[:50],
                     )
 
                     # Look for Broadlink learning notifications
@@ -2893,12 +3021,19 @@ class BroadlinkWebServer:
                                 "created_at": entity.get("last_changed", ""),
                             }
                         )
-                        logger.info(
-                            f"★ HTTP MATCHED Broadlink notification: '{title}' - '{message[:100]}'"
+                        hot_log.debug(
+                            "notifications.matched", source="states", title=title
                         )
 
-            logger.info(
-                f"HTTP notifications: Found {len([e for e in states if e.get('entity_id', '').startswith('persistent_notification.')])} total, {len(notifications)} Broadlink"
+            hot_log.debug(
+                "notifications.read",
+                source="states",
+                total=lambda: sum(
+                    1
+                    for e in states
+                    if e.get("entity_id", "").startswith("persistent_notification.")
+                ),
+                matched=len(notifications),
             )
             return notifications
 
@@ -2912,25 +3047,23 @@ class BroadlinkWebServer:
             current_time = time.time()
 
             # Try the direct persistent notification API endpoint first
-            logger.info("Trying direct persistent notification API endpoint...")
             pn_notifications = await self._make_ha_request(
                 "GET", "persistent_notification"
             )
 
             if isinstance(pn_notifications, list) and len(pn_notifications) > 0:
-                logger.info(
-                    f"Found {len(pn_notifications)} notifications via persistent_notification API"
-                )
-
                 notifications = []
                 for notification in pn_notifications:
                     title = notification.get("title", "")
                     message = notification.get("message", "")
                     notification_id = notification.get("notification_id", "")
 
-                    # Debug: Log ALL persistent notifications
-                    logger.info(
-                        f"DEBUG: Persistent notification - ID: '{notification_id}', Title: '{title}', Message: '{message[:100]}...'"
+                    hot_log.debug(
+                        "notifications.seen",
+                        source="persistent_notification",
+                        id=notification_id,
+                        title=title,
+                        message=lambda: message[:100],
                     )
 
                     # Look for Broadlink learning notifications
@@ -2960,26 +3093,26 @@ class BroadlinkWebServer:
                                 "notification": notification,
                             }
                         )
-                        logger.info(
-                            f"★ MATCHED Broadlink notification: '{title}' - '{message[:100]}'"
+                        hot_log.debug(
+                            "notifications.matched",
+                            source="persistent_notification",
+                            title=title,
                         )
 
                 # Cache the results
                 self.cached_notifications = notifications
                 self.last_notification_check = current_time
 
-                logger.info(
-                    f"Total persistent notifications found: {len(pn_notifications)}"
-                )
-                logger.info(
-                    f"Matched Broadlink learning notifications: {len(notifications)}"
+                hot_log.debug(
+                    "notifications.read",
+                    source="persistent_notification",
+                    total=len(pn_notifications),
+                    matched=len(notifications),
                 )
                 return notifications
 
             # Fallback to states API if persistent_notification endpoint doesn't work
-            logger.info(
-                "Persistent notification API returned empty, trying states API..."
-            )
+            hot_log.debug("notifications.fallback", source="states")
             states = await self._make_ha_request("GET", "states")
             if not isinstance(states, list):
                 logger.warning("States API returned non-list response")
@@ -2993,9 +3126,12 @@ class BroadlinkWebServer:
                     title = attributes.get("title", "")
                     message = attributes.get("message", "")
 
-                    # Debug: Log ALL persistent notifications to see what we have
-                    logger.info(
-                        f"DEBUG: Found persistent notification via states - ID: '{entity_id}', Title: '{title}', Message: '{message[:100]}...', State: '{entity.get('state', 'N/A')}'"
+                    hot_log.debug(
+                        "notifications.seen",
+                        source="states",
+                        id=entity_id,
+                        title=title,
+                        message=lambda: message[:100],
                     )
 
                     # Look for Broadlink learning notifications - much broader search
@@ -3028,26 +3164,23 @@ class BroadlinkWebServer:
                                 "attributes": entity_attrs,
                             }
                         )
-                        logger.info(
-                            f"★ MATCHED Broadlink notification: '{title}' - '{message[:100]}'"
+                        hot_log.debug(
+                            "notifications.matched", source="states", title=title
                         )
 
             # Cache the results
             self.cached_notifications = notifications
             self.last_notification_check = current_time
 
-            persistent_count = len(
-                [
-                    e
+            hot_log.debug(
+                "notifications.read",
+                source="states",
+                total=lambda: sum(
+                    1
                     for e in states
                     if e.get("entity_id", "").startswith("persistent_notification.")
-                ]
-            )
-            logger.info(
-                f"Total persistent notifications found via states: {persistent_count}"
-            )
-            logger.info(
-                f"Matched Broadlink learning notifications: {len(notifications)}"
+                ),
+                matched=len(notifications),
             )
             return notifications
 
@@ -3074,6 +3207,8 @@ class BroadlinkWebServer:
 
     async def _websocket_client(self):
         """WebSocket client to connect to Home Assistant"""
+        import websockets
+
         ws_url = "ws://supervisor/core/api/websocket"
 
         while True:
@@ -3160,16 +3295,9 @@ class BroadlinkWebServer:
             device = data.get("device")
             command = data.get("command")
 
-            logger.info(f"SEND REQUEST DEBUG:")
-            logger.info(f"  Raw data received: {data}")
-            logger.info(f"  entity_id: '{entity_id}'")
-            logger.info(
-                f"  device: '{device}' (length: {len(device) if device else 'None'})"
+            hot_log.debug(
+                "command.send", entity_id=entity_id, device=device, command=command
             )
-            logger.info(
-                f"  command: '{command}' (length: {len(command) if command else 'None'})"
-            )
-            logger.info(f"Sending command: {device}_{command} to entity {entity_id}")
 
             # Broadlink integration expects command as an array
             command_list = [command] if isinstance(command, str) else command
@@ -3182,20 +3310,19 @@ class BroadlinkWebServer:
                 "command": command_list,
             }
 
-            logger.info(f"Sending command with payload: {payload}")
             result = await self._make_ha_request(
                 "POST", "services/remote/send_command", payload
             )
 
             if result is not None:
-                logger.info(f"✅ Command sent successfully: {device}_{command}")
+                hot_log.debug("command.sent", device=device, command=command)
                 return {
                     "success": True,
                     "message": f"Command {command} sent successfully",
                 }
 
             # Fallback: Try modern format with target/data structure (for newer HA versions)
-            logger.info("Trying modern format with target/data structure...")
+            hot_log.debug("command.retry", device=device, format="target")
             modern_payload = {
                 "target": {"entity_id": entity_id},
                 "data": {"device": device, "command": command_list},
@@ -3205,8 +3332,8 @@ class BroadlinkWebServer:
             )
 
             if result is not None:
-                logger.info(
-                    f"✅ Command sent successfully with modern format: {device}_{command}"
+                hot_log.debug(
+                    "command.sent", device=device, command=command, format="target"
                 )
                 return {
                     "success": True,
@@ -3214,7 +3341,7 @@ class BroadlinkWebServer:
                 }
 
             # Last resort: Try with command as string (very old format)
-            logger.info("Trying string command format...")
+            hot_log.debug("command.retry", device=device, format="string")
             string_payload = {
                 "entity_id": entity_id,
                 "device": device,
@@ -3225,17 +3352,15 @@ class BroadlinkWebServer:
             )
 
             if result is not None:
-                logger.info(
-                    f"✅ Command sent successfully with string format: {device}_{command}"
+                hot_log.debug(
+                    "command.sent", device=device, command=command, format="string"
                 )
                 return {
                     "success": True,
                     "message": f"Command {command} sent successfully",
                 }
             else:
-                logger.error(
-                    f"❌ FAILED: All formats failed for command: {device}_{command}"
-                )
+                hot_log.error("command.failed", device=device, command=command)
                 return {
                     "success": False,
                     "error": "Failed to send command - all formats rejected by Home Assistant",
@@ -3338,6 +3463,47 @@ class BroadlinkWebServer:
 
         return entity_commands
 
+    def _reload_pending_file(self) -> Path:
+        """Marker for generated configuration that HA has not reloaded yet"""
+        return self.broadlink_manager_path / "reload_pending"
+
+    async def _reload_generated_config(self, results: Dict[str, Any]):
+        """
+        Reload HA after entity generation, updating the generation results
+
+        Skipped when the generated files did not change, unless an earlier
+        reload failed (e.g. HA was restarting): the pending marker keeps
+        forcing the reload until one succeeds.
+        """
+        pending_file = self._reload_pending_file()
+        if not results["config_changed"] and not pending_file.exists():
+            logger.info("Generated configuration unchanged - skipping reload")
+            results["config_reloaded"] = False
+            results["message"] += " No configuration changes, reload skipped."
+            return
+
+        if not results["config_changed"]:
+            logger.info("Retrying configuration reload that failed earlier")
+        try:
+            pending_file.parent.mkdir(parents=True, exist_ok=True)
+            pending_file.touch()
+        except OSError as e:
+            logger.warning(f"Could not record pending configuration reload: {e}")
+
+        logger.info("🔄 Reloading Broadlink configuration...")
+        reload_success = await self._reload_broadlink_config()
+
+        logger.info("🔄 Reloading Home Assistant YAML configuration...")
+        yaml_reload_success = await self.area_manager.reload_config()
+
+        if reload_success and yaml_reload_success:
+            pending_file.unlink(missing_ok=True)
+            results["config_reloaded"] = True
+            results["message"] += " Configuration reloaded successfully."
+        else:
+            results["config_reloaded"] = False
+            results["message"] += " Warning: Configuration reload failed."
+
     async def _reload_broadlink_config(self) -> bool:
         """Reload Broadlink integration configuration without restarting HA"""
         try:
@@ -3520,6 +3686,7 @@ class BroadlinkWebServer:
         import time
 
         if entity_id not in self.device_connection_cache:
+            self.connection_cache_misses += 1
             return None
 
         cached = self.device_connection_cache[entity_id]
@@ -3529,9 +3696,11 @@ class BroadlinkWebServer:
         if time.time() - cached_at > self.CONNECTION_CACHE_TTL:
             logger.debug(f"Cache expired for {entity_id}")
             del self.device_connection_cache[entity_id]
+            self.connection_cache_misses += 1
             return None
 
         logger.debug(f"Using cached connection info for {entity_id}")
+        self.connection_cache_hits += 1
         return cached
 
     def cache_connection_info(self, entity_id: str, connection_info: dict):
@@ -3564,14 +3733,48 @@ class BroadlinkWebServer:
             f"(supervisor_mode={self.supervisor_mode})"
         )
 
+        settings = self.config_loader.get_server_settings()
+        if settings["mode"] == "async":
+            from async_server import serve_async
+
+            logger.info(
+                f"Using async server ({settings['threads']} worker threads, "
+                f"{settings['connection_limit']} concurrent requests)"
+            )
+            serve_async(
+                self,
+                host,
+                self.port,
+                threads=settings["threads"],
+                connection_limit=settings["connection_limit"],
+                channel_timeout=settings["channel_timeout"],
+                on_ready=self._on_ready,
+            )
+            return
+
         # Try to use Waitress production server, fall back to Flask if not available
         try:
-            from waitress import serve
+            from waitress.server import create_server
 
-            logger.info("Using Waitress WSGI server")
-            serve(self.app, host=host, port=self.port, threads=4)
+            logger.info(
+                f"Using Waitress WSGI server ({settings['threads']} threads, "
+                f"{settings['connection_limit']} connections)"
+            )
+            # What waitress.serve does, with warm-up started once bound
+            server = create_server(
+                self.app,
+                host=host,
+                port=self.port,
+                threads=settings["threads"],
+                connection_limit=settings["connection_limit"],
+                channel_timeout=settings["channel_timeout"],
+            )
+            server.print_listen("Serving on http://{}:{}")
+            self._on_ready()
+            server.run()
         except ImportError:
             logger.warning("Waitress not available, using Flask development server")
+            self._on_ready()
             self.app.run(host=host, port=self.port, debug=False)
 
 
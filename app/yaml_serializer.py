@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+YAML Serializer for Broadlink Manager Add-on
+Fast YAML load/dump using libyaml when available, with cached per-entity fragments
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+try:
+    from yaml import CSafeDumper as _BaseDumper, CSafeLoader as SafeLoader
+
+    LIBYAML_AVAILABLE = True
+except ImportError:  # pragma: no cover - depends on how PyYAML was built
+    from yaml import SafeDumper as _BaseDumper, SafeLoader  # type: ignore
+
+    LIBYAML_AVAILABLE = False
+
+
+class Dumper(_BaseDumper):  # type: ignore[misc, valid-type]
+    """Safe dumper that never emits anchors/aliases, so fragments are self-contained"""
+
+    def ignore_aliases(self, data):
+        return True
+
+
+# Formatting shared by every generated file (matches the previous yaml.dump calls)
+DUMP_OPTIONS = {"default_flow_style": False, "sort_keys": False, "allow_unicode": True}
+
+# Keys that are emitted as a single plain "key:" line (no quoting, no complex key)
+_SIMPLE_KEY = re.compile(r"^[a-z_][a-z0-9_]*$")
+_RESERVED_KEYS = {"y", "n", "yes", "no", "on", "off", "true", "false", "null"}
+
+
+def dump(data: Any, stream=None) -> Optional[str]:
+    """
+    Serialize data to YAML using the C emitter when available
+
+    Args:
+        data: Data to serialize
+        stream: Optional file object to write to
+
+    Returns:
+        YAML string when no stream is given, otherwise None
+    """
+    return yaml.dump(data, stream, Dumper=Dumper, **DUMP_OPTIONS)
+
+
+def safe_load(stream: Any) -> Any:
+    """
+    Parse YAML using the C parser when available
+
+    Args:
+        stream: YAML string or file object
+
+    Returns:
+        Parsed data
+    """
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def _tagged(value: Any) -> Any:
+    """Encode value for JSON so that keys and values keep their types"""
+    kind = type(value)
+    if kind is str:
+        return value
+    if kind is dict:
+        return ["d", [[_tagged(k), _tagged(v)] for k, v in value.items()]]
+    if kind is list or kind is tuple:
+        return [kind.__name__[0], [_tagged(v) for v in value]]
+    if kind is bool:
+        return ["b", value]
+    if kind is int:
+        return ["i", value]
+    if kind is float:
+        return ["f", repr(value)]
+    if value is None:
+        return ["n"]
+    return ["r", kind.__qualname__, repr(value)]
+
+
+def content_hash(*parts: Any) -> str:
+    """
+    Hash data by content, distinguishing 1 from '1' and True from 'true'
+
+    Plain json.dumps turns non-string dict keys into strings, so {1: 'a'} and
+    {'1': 'a'} would share a hash. Insertion order is kept (sort_keys=False).
+
+    Args:
+        parts: Values to hash together
+
+    Returns:
+        Hex digest
+    """
+    payload = json.dumps(_tagged(list(parts)), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _is_simple_key(key: Any) -> bool:
+    return (
+        isinstance(key, str)
+        and bool(_SIMPLE_KEY.match(key))
+        and (key not in _RESERVED_KEYS)
+    )
+
+
+class FragmentCache:
+    """
+    LRU cache of serialized YAML fragments keyed by content hash
+
+    A document such as package.yaml is split into per-entity fragments (list
+    items and mapping entries under each top-level key). Each fragment is
+    rendered inside a minimal wrapper that reproduces its nesting, so line
+    wrapping and indentation match a whole-document dump byte for byte.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        """
+        Initialize fragment cache
+
+        Args:
+            max_entries: Maximum number of cached fragments
+        """
+        self.max_entries = max_entries
+        self._fragments: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _render(
+        self, path: Tuple[str, ...], wrapper: Any, header_lines: int, item: Any
+    ) -> str:
+        """Render one fragment, reusing the cached text when its content is unchanged"""
+        key = content_hash(path, item)
+        with self._lock:
+            cached = self._fragments.get(key)
+            if cached is not None:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+                return cached
+
+        text = dump(wrapper)
+        fragment = "".join(text.splitlines(keepends=True)[header_lines:])
+
+        with self._lock:
+            self.misses += 1
+            self._fragments[key] = fragment
+            while len(self._fragments) > self.max_entries:
+                self._fragments.popitem(last=False)
+        return fragment
+
+    def dump_document(self, document: Dict[str, Any]) -> str:
+        """
+        Serialize a mapping document from cached fragments
+
+        Produces the same text as dump(document). Sections that cannot be split
+        safely (non-simple keys, scalars, empty containers) are dumped whole.
+
+        Args:
+            document: Top-level mapping (e.g., package.yaml structure)
+
+        Returns:
+            YAML string
+        """
+        parts: List[str] = []
+
+        for key, value in document.items():
+            if (
+                not _is_simple_key(key)
+                or not value
+                or not isinstance(value, (list, dict))
+            ):
+                parts.append(dump({key: value}))
+                continue
+
+            parts.append(f"{key}:\n")
+
+            if isinstance(value, dict):
+                for item_key, item_value in value.items():
+                    if not _is_simple_key(item_key):
+                        parts.append(
+                            self._render(
+                                (key, "?"),
+                                {key: {item_key: item_value}},
+                                1,
+                                [item_key, item_value],
+                            )
+                        )
+                        continue
+                    parts.append(
+                        self._render(
+                            (key, item_key),
+                            {key: {item_key: item_value}},
+                            1,
+                            item_value,
+                        )
+                    )
+                continue
+
+            for element in value:
+                # template: [{light: [...]}, {fan: [...]}] - split one level deeper
+                nested_key = None
+                if isinstance(element, dict) and len(element) == 1:
+                    nested_key = next(iter(element))
+                nested = element.get(nested_key) if nested_key is not None else None
+                if (
+                    nested_key is not None
+                    and _is_simple_key(nested_key)
+                    and isinstance(nested, list)
+                    and nested
+                ):
+                    parts.append(f"- {nested_key}:\n")
+                    for item in nested:
+                        parts.append(
+                            self._render(
+                                (key, nested_key),
+                                {key: [{nested_key: [item]}]},
+                                2,
+                                item,
+                            )
+                        )
+                    continue
+
+                parts.append(self._render((key,), {key: [element]}, 1, element))
+
+        return "".join(parts)
+
+    def clear(self):
+        """Drop all cached fragments"""
+        with self._lock:
+            self._fragments.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            return {
+                "entries": len(self._fragments),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "libyaml": LIBYAML_AVAILABLE,
+            }
+
+
+# Shared across generator instances (a new generator is built per request)
+fragment_cache = FragmentCache()
@@ -9,6 +9,8 @@ from typing import Dict, Any, List, Optional, Tuple
 import yaml
 import re
 
+import yaml_serializer
+
 logger = logging.getLogger(__name__)
 
 
@@ -165,7 +167,7 @@ class YAMLValidator:
             Tuple of (is_valid, error_message)
         """
         try:
-            yaml.safe_load(content)
+            yaml_serializer.safe_load(content)
             return True, None
         except yaml.YAMLError as e:
             return False, str(e)
@@ -240,9 +242,7 @@ class YAMLValidator:
 
         # Generate YAML string
         try:
-            yaml_string = yaml.dump(
-                devices, default_flow_style=False, allow_unicode=True, sort_keys=False
-            )
+            yaml_string = yaml_serializer.dump(devices)
 
             # Validate the generated YAML syntax
             syntax_valid, syntax_error = YAMLValidator.validate_yaml_syntax(yaml_string)
@@ -272,13 +272,12 @@ class YAMLValidator:
             with open(file_path, "r", encoding="utf-8") as f:
                 content = f.read()
 
-            # Check syntax first
-            syntax_valid, syntax_error = YAMLValidator.validate_yaml_syntax(content)
-            if not syntax_valid:
-                return False, [f"YAML syntax error: {syntax_error}"]
+            # Parse once - a syntax error fails validation
+            try:
+                devices = yaml_serializer.safe_load(content)
+            except yaml.YAMLError as e:
+                return False, [f"YAML syntax error: {e}"]
 
-            # Parse and validate content
-            devices = yaml.safe_load(content)
             if devices is None:
                 return True, []  # Empty file is valid
 
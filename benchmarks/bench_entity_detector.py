@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for EntityDetector command classification
+Usage: python benchmarks/bench_entity_detector.py --commands 10000
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+# Add app directory to path
+app_dir = Path(__file__).parent.parent / "app"
+sys.path.insert(0, str(app_dir))
+
+from entity_detector import EntityDetector  # noqa: E402
+
+# Names users actually learn that match no pattern (custom buttons, typos, sources)
+UNMATCHED_NAMES = [
+    "input_hdmi1",
+    "input_hdmi2",
+    "netflix",
+    "youtube",
+    "menu",
+    "back",
+    "home",
+    "ok",
+    "up",
+    "down",
+    "left",
+    "right",
+    "sleep_timer",
+    "brightness_up",
+    "brightness_down",
+    "warm",
+    "cool_white",
+    "oscillate",
+    "turbo_mode",
+    "eco",
+]
+
+
+def build_corpus(count: int, seed: int = 42):
+    """Build a realistic mix of learned command names"""
+    rng = random.Random(seed)
+    known = []
+    for pattern, _, _ in EntityDetector.PATTERNS:
+        body = pattern.strip("^$")
+        known.extend(body.strip("()").split("|") if "|" in body else [body])
+    known = [name for name in known if "\\d" not in name]
+
+    corpus = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.5:
+            name = rng.choice(known)
+        elif roll < 0.7:
+            name = rng.choice(["fan_speed_", "temp_", "position_", "preset_"])
+            name += str(rng.randint(0, 30))
+        else:
+            name = rng.choice(UNMATCHED_NAMES)
+        # Device prefixes are stripped before detection, casing/spacing is not
+        if rng.random() < 0.1:
+            name = name.upper()
+        corpus.append(name)
+    return corpus
+
+
+def sequential_detect(command_name: str):
+    """Previous implementation: one re.match per pattern"""
+    command_lower = command_name.lower().strip()
+    for pattern, entity_type, command_role in EntityDetector.PATTERNS:
+        match = re.match(pattern, command_lower)
+        if match:
+            if command_role in ("speed", "temperature", "position") and match.groups():
+                return entity_type, f"{command_role}_{match.group(1)}"
+            return entity_type, command_role
+    return None, None
+
+
+def timed(label: str, func, corpus):
+    start = time.perf_counter()
+    results = [func(name) for name in corpus]
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {elapsed * 1000:8.1f} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--commands", type=int, default=10000)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.commands)
+    print(f"Corpus: {len(corpus)} command names ({len(set(corpus))} unique)")
+
+    expected = timed("sequential re.match", sequential_detect, corpus)
+
+    detector = EntityDetector()
+    uncached = timed(
+        "compiled (no memo)",
+        lambda name: detector._classify(name.lower().strip()),
+        corpus,
+    )
+    cold = timed("compiled + memo", detector.detect, corpus)
+    warm = timed("compiled + warm memo", detector.detect, corpus)
+
+    identical = expected == uncached == cold == warm
+    print(f"Identical: {identical}")
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
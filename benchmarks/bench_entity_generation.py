@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark serial vs parallel entity generation
+Usage: python benchmarks/bench_entity_generation.py --entities 1000 --workers 4
+"""
+
+import argparse
+import logging
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import Mock
+
+# Add app directory to path
+app_dir = Path(__file__).parent.parent / "app"
+sys.path.insert(0, str(app_dir))
+
+import entity_generator  # noqa: E402
+from entity_generator import EntityGenerator  # noqa: E402
+
+ENTITY_COMMANDS = {
+    "light": ["turn_on", "turn_off", "brightness_up", "brightness_down", "warmer"],
+    "fan": ["turn_off", "speed_1", "speed_2", "speed_3", "reverse", "oscillate"],
+    "switch": ["turn_on", "turn_off"],
+    "media_player": [
+        "turn_on",
+        "turn_off",
+        "volume_up",
+        "volume_down",
+        "mute",
+        "source_hdmi1",
+    ],
+    "cover": ["open", "close", "stop"],
+}
+
+
+def build_installation(count: int, seed: int = 42):
+    """Build synthetic entity metadata and command payloads"""
+    rng = random.Random(seed)
+    entities = {}
+    broadlink_commands = {}
+    for i in range(count):
+        entity_type = rng.choice(list(ENTITY_COMMANDS))
+        device = f"device_{i}"
+        commands = {name: name for name in ENTITY_COMMANDS[entity_type]}
+        entities[f"{entity_type}_{i}"] = {
+            "entity_type": entity_type,
+            "device": device,
+            "broadlink_entity": "remote.rm4_pro",
+            "friendly_name": f"{entity_type.title()} {i}",
+            "commands": commands,
+        }
+        broadlink_commands[device] = {
+            name: "JgBQAAAB" + "".join(rng.choice("ABCDEF0123") for _ in range(160))
+            for name in commands
+        }
+    return entities, broadlink_commands
+
+
+def run(entities, broadlink_commands, output_dir: Path, **kwargs):
+    """Generate from a cold block cache and return (seconds, package text)"""
+    storage = Mock()
+    storage.get_all_entities.return_value = entities
+    storage.package_file = output_dir / "package.yaml"
+    storage.helpers_file = output_dir / "helpers.yaml"
+    storage.package_output_path = None
+
+    entity_generator._entity_block_cache.clear()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    EntityGenerator(storage, **kwargs).generate_all(broadlink_commands)
+    elapsed = time.perf_counter() - start
+
+    lines = storage.package_file.read_text().splitlines(keepends=True)
+    return elapsed, lines[0] + "".join(lines[2:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entities", type=int, default=1000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Process pool size (default: CPUs available to this process)",
+    )
+    args = parser.parse_args()
+
+    # Keep builder logging out of the timings (workers inherit the root level)
+    logging.getLogger().setLevel(logging.ERROR)
+
+    workers = args.workers or entity_generator.available_cpus()
+    entities, broadlink_commands = build_installation(args.entities)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        serial_time, serial_text = run(
+            entities,
+            broadlink_commands,
+            Path(tmpdir) / "serial",
+            parallel_threshold=None,
+        )
+        parallel_time, parallel_text = run(
+            entities,
+            broadlink_commands,
+            Path(tmpdir) / "parallel",
+            parallel_threshold=1,
+            max_workers=workers,
+        )
+
+    print(f"Entities:  {args.entities}")
+    print(f"Serial:    {serial_time:.3f}s")
+    print(f"Parallel:  {parallel_time:.3f}s ({workers} workers)")
+    print(f"Identical: {serial_text == parallel_text}")
+    return 0 if serial_text == parallel_text else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark result files
+Prints the median time of every scenario side by side with the change.
+
+Usage:
+  python benchmarks/compare.py benchmarks/results/main.json results.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+# Changes smaller than this are reported as noise
+NOISE_PERCENT = 5.0
+
+
+def _label(results: Dict[str, Any]) -> str:
+    revision = results.get("revision") or {}
+    commit = revision.get("commit") or "unknown"
+    return commit + ("+" if revision.get("dirty") else "")
+
+
+def _ms(value) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def _installation(results: Dict[str, Any]):
+    installation = results.get("installation") or {}
+    return tuple(installation.get(key) for key in ("scale", "seed", "backend"))
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any]) -> str:
+    """Table of median timings (ms) for scenarios in either result set"""
+    old = baseline.get("scenarios", {})
+    new = current.get("scenarios", {})
+    lines = [
+        f"{'scenario':<26} {_label(baseline):>12} {_label(current):>12}  change",
+    ]
+    for name in list(old) + [name for name in new if name not in old]:
+        before = old.get(name, {}).get("median_ms")
+        after = new.get(name, {}).get("median_ms")
+        if before is None or after is None:
+            change = "only in " + ("baseline" if after is None else "current")
+        else:
+            percent = (after - before) / before * 100 if before else 0.0
+            if abs(percent) < NOISE_PERCENT:
+                change = f"{percent:+.1f}% (noise)"
+            else:
+                change = f"{percent:+.1f}% " + ("slower" if percent > 0 else "faster")
+        lines.append(f"{name:<26} {_ms(before):>12} {_ms(after):>12}  {change}")
+
+    if _installation(baseline) != _installation(current):
+        lines.append("⚠️  Installations differ - timings are not comparable")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("current", type=Path)
+    args = parser.parse_args()
+
+    print(
+        compare_results(
+            json.loads(args.baseline.read_text()), json.loads(args.current.read_text())
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Home Assistant REST and WebSocket APIs
+Serves the calls the add-on makes (states, remote services, persistent
+notifications, config entries and the websocket registry commands) over
+real HTTP, with configurable latency and failure injection.
+
+Usage:
+  # Registries from a generated installation (see generate_storage.py)
+  python benchmarks/fake_ha.py --config-path /tmp/bench-config --port 8123
+
+  # 50 ms +/- 20 ms per call, 2% failures, slow service calls
+  python benchmarks/fake_ha.py --latency 50 --jitter 20 --failure-rate 0.02 \\
+      --route services/remote=500:0.1
+
+Point the add-on at it with HA_URL=http://127.0.0.1:8123 (standalone mode).
+Call counts are available at GET /fake/stats.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import WSMsgType, web
+
+logger = logging.getLogger(__name__)
+
+HA_VERSION = "2024.10.0"
+
+
+@dataclass
+class Faults:
+    """Latency and failure injection, optionally per call prefix"""
+
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    failure_rate: float = 0.0
+    # call prefix (e.g. "services/remote" or "ws:config/") -> (latency_ms, failure_rate)
+    routes: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+
+    def for_call(self, call: str) -> Tuple[float, bool]:
+        """Delay in seconds and whether this call should fail"""
+        latency, failure_rate = self.latency_ms, self.failure_rate
+        # Longest matching prefix wins
+        for prefix in sorted(self.routes, key=len, reverse=True):
+            if call.startswith(prefix):
+                latency, failure_rate = self.routes[prefix]
+                break
+        jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, latency + jitter) / 1000, self._rng.random() < failure_rate
+
+
+def parse_route(value: str) -> Tuple[str, Tuple[float, float]]:
+    """PREFIX=LATENCY_MS[:FAILURE_RATE] from the command line"""
+    prefix, _, spec = value.partition("=")
+    latency, _, failure_rate = spec.partition(":")
+    if not prefix or not latency:
+        raise argparse.ArgumentTypeError(f"Expected PREFIX=MS[:RATE], got {value!r}")
+    return prefix, (float(latency), float(failure_rate or 0))
+
+
+def _load_registry(storage_path: Optional[Path], name: str, key: str) -> List[dict]:
+    if storage_path is None or not (storage_path / name).exists():
+        return []
+    data = json.loads((storage_path / name).read_text())
+    return data.get("data", {}).get(key, [])
+
+
+def _state(entity_id: str, state: str, attributes: Dict[str, Any]) -> Dict[str, Any]:
+    now = time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime())
+    return {
+        "entity_id": entity_id,
+        "state": state,
+        "attributes": attributes,
+        "last_changed": now,
+        "last_reported": now,
+        "last_updated": now,
+        "context": {"id": "%026x" % random.getrandbits(104), "parent_id": None},
+    }
+
+
+class FakeHomeAssistant:
+    """
+    In-memory Home Assistant with the registries of a config directory
+
+    Without a config path a single remote.fake_rm4_pro is provided.
+    """
+
+    def __init__(
+        self,
+        config_path: Optional[Path] = None,
+        token: Optional[str] = None,
+        faults: Optional[Faults] = None,
+    ):
+        storage_path = config_path / ".storage" if config_path else None
+        self.token = token
+        self.faults = faults or Faults()
+        self.calls: Counter = Counter()
+        self.failures: Counter = Counter()
+
+        self.areas = _load_registry(storage_path, "core.area_registry", "areas")
+        self.devices = _load_registry(storage_path, "core.device_registry", "devices")
+        self.entities = {
+            entity["entity_id"]: entity
+            for entity in _load_registry(
+                storage_path, "core.entity_registry", "entities"
+            )
+        }
+        if not self.entities:
+            self.entities["remote.fake_rm4_pro"] = {
+                "entity_id": "remote.fake_rm4_pro",
+                "platform": "broadlink",
+                "area_id": None,
+                "device_id": None,
+                "original_name": None,
+            }
+
+        self.states = {
+            entity_id: _state(
+                entity_id,
+                "on" if entity_id.startswith("remote.") else "unknown",
+                {"friendly_name": entity_id.split(".", 1)[1].replace("_", " ")},
+            )
+            for entity_id in self.entities
+        }
+        self.notifications: Dict[str, Dict[str, Any]] = {}
+
+    # ------------------------------------------------------------------
+    # Application
+    # ------------------------------------------------------------------
+
+    def create_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/fake/stats", self.stats)
+        app.router.add_get("/api/websocket", self.websocket)
+        app.router.add_get("/api/", self.api_root)
+        app.router.add_get("/api/config", self.config)
+        app.router.add_get("/api/states", self.get_states)
+        app.router.add_get("/api/states/{entity_id}", self.get_state)
+        app.router.add_get("/api/services", self.get_services)
+        app.router.add_post("/api/services/{domain}/{service}", self.call_service)
+        app.router.add_get("/api/persistent_notification", self.get_notifications)
+        app.router.add_get("/api/config/config_entries/entry", self.config_entries)
+        app.router.add_post(
+            "/api/config/config_entries/entry/{entry_id}/reload", self.reload_entry
+        )
+        return app
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        if not request.path.startswith("/api/") or request.path == "/api/websocket":
+            return await handler(request)
+
+        call = request.path[len("/api/") :]
+        self.calls[call.split("/")[0] if call.startswith("states/") else call] += 1
+        if (
+            self.token
+            and request.headers.get("Authorization") != f"Bearer {self.token}"
+        ):
+            return web.json_response({"message": "Unauthorized"}, status=401)
+
+        delay, fail = self.faults.for_call(call)
+        if delay:
+            await asyncio.sleep(delay)
+        if fail:
+            self.failures[call] += 1
+            return web.json_response({"message": "Injected failure"}, status=500)
+        return await handler(request)
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {"calls": dict(self.calls), "failures": dict(self.failures)}
+        )
+
+    # ------------------------------------------------------------------
+    # REST API
+    # ------------------------------------------------------------------
+
+    async def api_root(self, request: web.Request) -> web.Response:
+        return web.json_response({"message": "API running."})
+
+    async def config(self, request: web.Request) -> web.Response:
+        return web.json_response(self._config())
+
+    def _config(self) -> Dict[str, Any]:
+        return {
+            "location_name": "Fake Home",
+            "version": HA_VERSION,
+            "unit_system": {"temperature": "°C"},
+            "time_zone": "UTC",
+            "components": ["broadlink", "remote", "persistent_notification"],
+            "state": "RUNNING",
+        }
+
+    async def get_states(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            list(self.states.values()) + list(self.notifications.values())
+        )
+
+    async def get_state(self, request: web.Request) -> web.Response:
+        state = self.states.get(request.match_info["entity_id"])
+        if state is None:
+            return web.json_response({"message": "Entity not found."}, status=404)
+        return web.json_response(state)
+
+    async def get_services(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            [
+                {
+                    "domain": "remote",
+                    "services": {
+                        name: {"fields": {}}
+                        for name in ("learn_command", "send_command", "delete_command")
+                    },
+                },
+                {"domain": "persistent_notification", "services": {"create": {}}},
+            ]
+        )
+
+    async def call_service(self, request: web.Request) -> web.Response:
+        domain = request.match_info["domain"]
+        service = request.match_info["service"]
+        data = await request.json() if request.can_read_body else {}
+        self._apply_service(domain, service, data)
+        return web.json_response([])
+
+    def _apply_service(self, domain: str, service: str, data: Dict[str, Any]):
+        if domain == "persistent_notification" and service == "create":
+            notification_id = data.get("notification_id") or str(
+                len(self.notifications)
+            )
+            self.notifications[notification_id] = _state(
+                f"persistent_notification.{notification_id}",
+                "notifying",
+                {"title": data.get("title", ""), "message": data.get("message", "")},
+            )
+        elif domain == "remote" and service == "learn_command":
+            # Same notification the Broadlink integration shows while learning
+            command = data.get("command", "")
+            self.notifications["broadlink_learn"] = _state(
+                "persistent_notification.broadlink_learn",
+                "notifying",
+                {
+                    "title": "Learn command",
+                    "message": f"Press the '{command}' button.",
+                },
+            )
+
+    async def get_notifications(self, request: web.Request) -> web.Response:
+        return web.json_response(self._notification_list())
+
+    def _notification_list(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "notification_id": state["entity_id"].split(".", 1)[1],
+                "title": state["attributes"].get("title", ""),
+                "message": state["attributes"].get("message", ""),
+                "created_at": state["last_changed"],
+            }
+            for state in self.notifications.values()
+        ]
+
+    async def config_entries(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            [
+                {
+                    "entry_id": f"fake_broadlink_{i}",
+                    "domain": "broadlink",
+                    "title": entity_id,
+                    "state": "loaded",
+                }
+                for i, entity_id in enumerate(
+                    e for e in self.entities if e.startswith("remote.")
+                )
+            ]
+        )
+
+    async def reload_entry(self, request: web.Request) -> web.Response:
+        return web.json_response({"require_restart": False})
+
+    # ------------------------------------------------------------------
+    # WebSocket API
+    # ------------------------------------------------------------------
+
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.calls["websocket"] += 1
+
+        await ws.send_json({"type": "auth_required", "ha_version": HA_VERSION})
+        auth = await ws.receive_json()
+        if auth.get("type") != "auth" or (
+            self.token and auth.get("access_token") != self.token
+        ):
+            await ws.send_json({"type": "auth_invalid", "message": "Invalid access"})
+            await ws.close()
+            return ws
+        await ws.send_json({"type": "auth_ok", "ha_version": HA_VERSION})
+
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                break
+            command = json.loads(message.data)
+            await ws.send_json(await self._ws_result(command))
+        return ws
+
+    async def _ws_result(self, command: Dict[str, Any]) -> Dict[str, Any]:
+        command_type = command.get("type", "")
+        message_id = command.get("id")
+        self.calls[f"ws:{command_type}"] += 1
+
+        delay, fail = self.faults.for_call(f"ws:{command_type}")
+        if delay:
+            await asyncio.sleep(delay)
+        if fail:
+            self.failures[f"ws:{command_type}"] += 1
+            return self._ws_error(message_id, "unknown_error", "Injected failure")
+
+        handler = getattr(self, "_ws_" + command_type.replace("/", "_"), None)
+        if handler is None:
+            return self._ws_error(message_id, "unknown_command", "Unknown command.")
+        try:
+            result = handler(command)
+        except KeyError as e:
+            return self._ws_error(message_id, "not_found", f"Not found: {e}")
+        return {"id": message_id, "type": "result", "success": True, "result": result}
+
+    @staticmethod
+    def _ws_error(message_id, code: str, message: str) -> Dict[str, Any]:
+        return {
+            "id": message_id,
+            "type": "result",
+            "success": False,
+            "error": {"code": code, "message": message},
+        }
+
+    def _ws_get_config(self, command):
+        return self._config()
+
+    def _ws_get_states(self, command):
+        return list(self.states.values())
+
+    def _ws_persistent_notification_get(self, command):
+        return self._notification_list()
+
+    def _ws_call_service(self, command):
+        self._apply_service(
+            command.get("domain", ""),
+            command.get("service", ""),
+            command.get("service_data", {}),
+        )
+        return {"context": {"id": "fake"}}
+
+    def _ws_config_area_registry_list(self, command):
+        return [{**area, "area_id": area["id"]} for area in self.areas]
+
+    def _ws_config_area_registry_create(self, command):
+        area_id = command["name"].lower().replace(" ", "_")
+        area = {"id": area_id, "area_id": area_id, "name": command["name"]}
+        self.areas.append(area)
+        return area
+
+    def _ws_config_device_registry_list(self, command):
+        return self.devices
+
+    def _ws_config_entity_registry_list(self, command):
+        return list(self.entities.values())
+
+    def _ws_config_entity_registry_get(self, command):
+        return self.entities[command["entity_id"]]
+
+    def _ws_config_entity_registry_update(self, command):
+        entity = self.entities[command["entity_id"]]
+        for key, value in command.items():
+            if key not in ("id", "type", "entity_id"):
+                entity[key] = value
+        return {"entity_entry": entity}
+
+    # ------------------------------------------------------------------
+    # Running
+    # ------------------------------------------------------------------
+
+    def start_in_thread(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Serve from a daemon thread with its own event loop
+
+        Returns:
+            Base URL (http://host:port)
+        """
+        started = threading.Event()
+        address = {}
+
+        def serve():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            runner = web.AppRunner(self.create_app(), access_log=None)
+            loop.run_until_complete(runner.setup())
+            site = web.TCPSite(runner, host, port)
+            loop.run_until_complete(site.start())
+            address["port"] = site._server.sockets[0].getsockname()[1]
+            started.set()
+            loop.run_forever()
+
+        threading.Thread(target=serve, name="fake-ha", daemon=True).start()
+        started.wait()
+        return f"http://{host}:{address['port']}"
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser):
+    """Latency/failure options, shared with load_test.py"""
+    parser.add_argument("--latency", type=float, default=0.0, help="Per call (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- ms")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="0.0-1.0")
+    parser.add_argument(
+        "--route",
+        type=parse_route,
+        action="append",
+        default=[],
+        metavar="PREFIX=MS[:RATE]",
+        help="Override for calls starting with PREFIX (ws:... for websocket)",
+    )
+    parser.add_argument("--fault-seed", type=int, default=None)
+
+
+def faults_from_args(args) -> Faults:
+    return Faults(
+        latency_ms=args.latency,
+        jitter_ms=args.jitter,
+        failure_rate=args.failure_rate,
+        routes=dict(args.route),
+        seed=args.fault_seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config-path", type=Path, help="Installation to serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--token", help="Require this bearer/access token")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    fake = FakeHomeAssistant(args.config_path, args.token, faults_from_args(args))
+    print(
+        f"🏠 Fake Home Assistant with {len(fake.entities)} entities"
+        f" on http://{args.host}:{args.port}"
+    )
+    web.run_app(fake.create_app(), host=args.host, port=args.port, print=None)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
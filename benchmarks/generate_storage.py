@@ -0,0 +1,576 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic large Home Assistant installation for benchmarks
+Writes a config directory with .storage registries, Broadlink learned code
+files, a Broadlink Manager device store and SmartIR custom profiles.
+
+Usage:
+  python benchmarks/generate_storage.py /tmp/bench-config
+  python benchmarks/generate_storage.py /tmp/bench-config --scale small
+  python benchmarks/generate_storage.py /tmp/bench-config --commands 20000
+"""
+
+import argparse
+import base64
+import json
+import logging
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Any, Dict, List
+
+import yaml
+
+# Add app directory to path
+app_dir = Path(__file__).parent.parent / "app"
+sys.path.insert(0, str(app_dir))
+
+from device_manager import DeviceManager  # noqa: E402
+
+# Broadlink pulse unit (microseconds) and packet markers
+PULSE_UNIT = 269 / 8192 * 1000
+IR_PACKET = 0x26
+RF433_PACKET = 0xB2
+
+DEVICE_KINDS = {
+    "media_player": [
+        "turn_on",
+        "turn_off",
+        "volume_up",
+        "volume_down",
+        "mute",
+        "channel_up",
+        "channel_down",
+        "source_hdmi1",
+        "source_hdmi2",
+        "menu",
+        "back",
+        "ok",
+        "up",
+        "down",
+        "left",
+        "right",
+    ]
+    + [f"digit_{d}" for d in range(10)],
+    "fan": ["turn_off", "speed_1", "speed_2", "speed_3", "reverse", "oscillate"],
+    "light": ["turn_on", "turn_off", "brightness_up", "brightness_down", "warmer"],
+    "cover": ["open", "close", "stop"],
+    "switch": ["turn_on", "turn_off", "toggle"],
+}
+
+SMARTIR_PLATFORMS = ("climate", "fan", "media_player")
+MANUFACTURERS = ["Daikin", "LG", "Samsung", "Mitsubishi", "Panasonic", "Sony", "Dyson"]
+AREAS = [
+    "Living Room",
+    "Kitchen",
+    "Master Bedroom",
+    "Guest Bedroom",
+    "Office",
+    "Garage",
+    "Basement",
+    "Patio",
+    "Kids Room",
+    "Dining Room",
+]
+FILLER_PLATFORMS = ["hue", "zha", "mqtt", "esphome", "sonos", "shelly", "tplink"]
+FILLER_DOMAINS = ["sensor", "binary_sensor", "light", "switch", "number", "select"]
+
+
+@dataclass
+class Scale:
+    """Size of a synthetic installation"""
+
+    remotes: int
+    devices: int
+    commands: int
+    tracked_ratio: float
+    smartir_devices: int
+    profiles: int
+    builtin_profiles: int
+    entities: int
+
+
+SCALES = {
+    "small": Scale(
+        remotes=2,
+        devices=20,
+        commands=300,
+        tracked_ratio=0.9,
+        smartir_devices=5,
+        profiles=15,
+        builtin_profiles=5,
+        entities=500,
+    ),
+    "large": Scale(
+        remotes=12,
+        devices=400,
+        commands=6000,
+        tracked_ratio=0.9,
+        smartir_devices=60,
+        profiles=300,
+        builtin_profiles=50,
+        entities=15000,
+    ),
+}
+
+
+def _pulse_bytes(microseconds: float) -> bytes:
+    units = max(1, round(microseconds / PULSE_UNIT))
+    if units < 256:
+        return bytes([units])
+    return b"\x00" + units.to_bytes(2, "big")
+
+
+def broadlink_code(rng: random.Random, rf: bool = False) -> str:
+    """Base64 Broadlink packet with a jittered NEC-style pulse train"""
+    pulses = bytearray()
+    pulses += _pulse_bytes(9000 + rng.randint(-200, 200))
+    pulses += _pulse_bytes(4500 + rng.randint(-100, 100))
+    for _ in range(32 if not rf else 25):
+        pulses += _pulse_bytes(560 + rng.randint(-40, 40))
+        gap = 1690 if rng.random() < 0.5 else 560
+        pulses += _pulse_bytes(gap + rng.randint(-40, 40))
+    pulses += _pulse_bytes(560) + b"\x0d\x05"
+
+    packet_type = RF433_PACKET if rf else IR_PACKET
+    repeat = rng.choice([0, 0, 0, 1])
+    packet = bytes([packet_type, repeat]) + len(pulses).to_bytes(2, "little")
+    packet += bytes(pulses)
+    # Broadlink pads packets to 16 bytes
+    packet += b"\x00" * (-len(packet) % 16)
+    return base64.b64encode(packet).decode("ascii")
+
+
+def _mac(rng: random.Random) -> str:
+    return "".join(f"{rng.randint(0, 255):02x}" for _ in range(6))
+
+
+def _uid(rng: random.Random) -> str:
+    return "%032x" % rng.getrandbits(128)
+
+
+def _slug(text: str) -> str:
+    return text.lower().replace(" ", "_")
+
+
+def _write_json(path: Path, data: Any):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Home Assistant writes its storage files indented
+    path.write_text(json.dumps(data, indent=2))
+
+
+def _storage_file(key: str, data: Dict[str, Any], minor_version: int = 1):
+    return {"version": 1, "minor_version": minor_version, "key": key, "data": data}
+
+
+def build_remotes(rng: random.Random, scale: Scale) -> List[Dict[str, Any]]:
+    """Broadlink remotes with the devices and commands learned on each"""
+    remotes = [
+        {
+            "mac": _mac(rng),
+            "entity_id": f"remote.{_slug(AREAS[i % len(AREAS)])}_rm4_pro_{i}",
+            "area_id": _slug(AREAS[i % len(AREAS)]),
+            "devices": {},
+        }
+        for i in range(scale.remotes)
+    ]
+
+    per_device = max(1, scale.commands // max(1, scale.devices))
+    for i in range(scale.devices):
+        kind = rng.choice(list(DEVICE_KINDS))
+        remote = remotes[i % len(remotes)]
+        device_name = f"{remote['area_id']}_{kind}_{i}"
+        names = list(DEVICE_KINDS[kind])
+        while len(names) < per_device:
+            names.append(f"preset_{len(names)}")
+        rf = kind in ("cover", "light") and rng.random() < 0.5
+        remote["devices"][device_name] = {
+            "kind": kind,
+            "rf": rf,
+            "commands": {
+                name: broadlink_code(rng, rf=rf) for name in names[:per_device]
+            },
+        }
+    return remotes
+
+
+def write_broadlink_storage(storage_path: Path, remotes: List[Dict[str, Any]]):
+    """One broadlink_remote_<mac>_codes file per remote, as HA writes them"""
+    for remote in remotes:
+        key = f"broadlink_remote_{remote['mac']}_codes"
+        data = {name: device["commands"] for name, device in remote["devices"].items()}
+        _write_json(storage_path / key, _storage_file(key, data))
+
+
+def write_registries(rng: random.Random, storage_path: Path, scale: Scale, remotes):
+    """Area, device and entity registries padded with other integrations"""
+    areas = [
+        {
+            "aliases": [],
+            "floor_id": None,
+            "icon": None,
+            "id": _slug(name),
+            "labels": [],
+            "name": name,
+            "picture": None,
+        }
+        for name in AREAS
+    ]
+    _write_json(
+        storage_path / "core.area_registry",
+        _storage_file("core.area_registry", {"areas": areas}, minor_version=6),
+    )
+
+    devices = []
+    entities = []
+
+    def add_device(name, manufacturer, model, area_id, identifier):
+        device_id = _uid(rng)
+        devices.append(
+            {
+                "area_id": area_id,
+                "config_entries": [_uid(rng)],
+                "configuration_url": None,
+                "connections": [],
+                "disabled_by": None,
+                "entry_type": None,
+                "hw_version": None,
+                "id": device_id,
+                "identifiers": [identifier],
+                "labels": [],
+                "manufacturer": manufacturer,
+                "model": model,
+                "name_by_user": None,
+                "name": name,
+                "serial_number": None,
+                "sw_version": None,
+                "via_device_id": None,
+            }
+        )
+        return device_id
+
+    def add_entity(entity_id, platform, device_id, original_name):
+        entities.append(
+            {
+                "aliases": [],
+                "area_id": None,
+                "capabilities": None,
+                "config_entry_id": _uid(rng),
+                "device_class": None,
+                "device_id": device_id,
+                "disabled_by": None,
+                "entity_category": None,
+                "entity_id": entity_id,
+                "hidden_by": None,
+                "icon": None,
+                "id": _uid(rng),
+                "has_entity_name": True,
+                "labels": [],
+                "name": None,
+                "options": {"conversation": {"should_expose": False}},
+                "original_device_class": None,
+                "original_icon": None,
+                "original_name": original_name,
+                "platform": platform,
+                "supported_features": 0,
+                "translation_key": None,
+                "unique_id": _uid(rng),
+                "unit_of_measurement": None,
+            }
+        )
+
+    for remote in remotes:
+        device_id = add_device(
+            remote["entity_id"].split(".", 1)[1],
+            "Broadlink",
+            "RM4 pro",
+            remote["area_id"],
+            ["broadlink", remote["mac"]],
+        )
+        add_entity(remote["entity_id"], "broadlink", device_id, None)
+
+    # Pad with other integrations until the entity count is reached
+    per_device = 6
+    while len(entities) < scale.entities:
+        platform = rng.choice(FILLER_PLATFORMS)
+        area_id = _slug(rng.choice(AREAS))
+        index = len(devices)
+        device_id = add_device(
+            f"{platform} device {index}",
+            platform.title(),
+            f"Model {rng.randint(100, 999)}",
+            area_id,
+            [platform, _uid(rng)],
+        )
+        for n in range(per_device):
+            domain = rng.choice(FILLER_DOMAINS)
+            add_entity(
+                f"{domain}.{platform}_{index}_{n}", platform, device_id, f"Value {n}"
+            )
+
+    _write_json(
+        storage_path / "core.device_registry",
+        _storage_file(
+            "core.device_registry",
+            {"devices": devices, "deleted_devices": []},
+            minor_version=8,
+        ),
+    )
+    _write_json(
+        storage_path / "core.entity_registry",
+        _storage_file(
+            "core.entity_registry",
+            {"entities": entities[: scale.entities], "deleted_entities": []},
+            minor_version=15,
+        ),
+    )
+
+
+def smartir_profile(rng: random.Random, platform: str) -> Dict[str, Any]:
+    """A SmartIR device code file for a platform"""
+    profile = {
+        "manufacturer": rng.choice(MANUFACTURERS),
+        "supportedModels": [f"{rng.choice('ABCDEFGH')}{rng.randint(1000, 9999)}"],
+        "supportedController": "Broadlink",
+        "commandsEncoding": "Base64",
+    }
+    if platform == "climate":
+        operation_modes = ["cool", "heat", "dry"]
+        fan_modes = ["low", "mid", "high", "auto"]
+        profile.update(
+            {
+                "minTemperature": 16,
+                "maxTemperature": 30,
+                "precision": 1,
+                "operationModes": operation_modes,
+                "fanModes": fan_modes,
+                "commands": {
+                    "off": broadlink_code(rng),
+                    **{
+                        mode: {
+                            fan: {str(t): broadlink_code(rng) for t in range(16, 31)}
+                            for fan in fan_modes
+                        }
+                        for mode in operation_modes
+                    },
+                },
+            }
+        )
+    elif platform == "fan":
+        speeds = ["low", "medium", "high"]
+        profile.update(
+            {
+                "speed": speeds,
+                "commands": {
+                    "off": broadlink_code(rng),
+                    "default": {speed: broadlink_code(rng) for speed in speeds},
+                },
+            }
+        )
+    else:
+        profile["commands"] = {
+            name: broadlink_code(rng) for name in DEVICE_KINDS["media_player"]
+        }
+    return profile
+
+
+def write_smartir(
+    rng: random.Random, config_path: Path, scale: Scale, remotes
+) -> Dict[str, Dict[str, Any]]:
+    """
+    SmartIR install with builtin and custom profiles plus platform YAML
+
+    Returns:
+        Managed SmartIR devices keyed by device ID
+    """
+    smartir_path = config_path / "custom_components" / "smartir"
+    _write_json(
+        smartir_path / "manifest.json",
+        {"domain": "smartir", "name": "SmartIR", "version": "1.17.9"},
+    )
+
+    codes = {platform: [] for platform in SMARTIR_PLATFORMS}
+    for i in range(scale.builtin_profiles):
+        platform = SMARTIR_PLATFORMS[i % len(SMARTIR_PLATFORMS)]
+        code = 1000 + i
+        _write_json(
+            smartir_path / "codes" / platform / f"{code}.json",
+            smartir_profile(rng, platform),
+        )
+        codes[platform].append(code)
+    for i in range(scale.profiles):
+        platform = SMARTIR_PLATFORMS[i % len(SMARTIR_PLATFORMS)]
+        code = 10000 + i
+        profile = smartir_profile(rng, platform)
+        # Custom profiles are written to both directories by the add-on
+        for directory in ("codes", "custom_codes"):
+            _write_json(smartir_path / directory / platform / f"{code}.json", profile)
+        codes[platform].append(code)
+
+    devices = {}
+    platform_yaml = {platform: [] for platform in SMARTIR_PLATFORMS}
+    for i in range(scale.smartir_devices):
+        platform = SMARTIR_PLATFORMS[i % len(SMARTIR_PLATFORMS)]
+        remote = remotes[i % len(remotes)]
+        device_id = f"{remote['area_id']}_smartir_{platform}_{i}"
+        device_code = rng.choice(codes[platform])
+        devices[device_id] = {
+            "name": device_id.replace("_", " ").title(),
+            "entity_type": platform,
+            "device_type": "smartir",
+            "area": remote["area_id"],
+            "manufacturer": rng.choice(MANUFACTURERS),
+            "model": "Generic",
+            "device_code": str(device_code),
+            "controller_device": remote["entity_id"],
+        }
+        platform_yaml[platform].append(
+            {
+                "platform": "smartir",
+                "name": devices[device_id]["name"],
+                "unique_id": device_id,
+                "device_code": device_code,
+                "controller_data": remote["entity_id"],
+            }
+        )
+
+    for platform, entries in platform_yaml.items():
+        if entries:
+            path = config_path / "smartir" / f"{platform}.yaml"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(yaml.safe_dump(entries, sort_keys=False))
+    return devices
+
+
+def write_managed_devices(
+    rng: random.Random,
+    manager_path: Path,
+    scale: Scale,
+    remotes,
+    smartir_devices,
+    backend: str = "json",
+):
+    """
+    Store managed devices through DeviceManager (payload pack included)
+
+    Only tracked_ratio of the learned commands are tracked, so the rest show
+    up as untracked and get picked up by sync.
+    """
+    manager = DeviceManager(str(manager_path), backend=backend)
+    entries = []
+    for remote in remotes:
+        for device_name, device in remote["devices"].items():
+            tracked = {
+                name: {"data": code, "type": "rf" if device["rf"] else "ir"}
+                for name, code in device["commands"].items()
+                if rng.random() < scale.tracked_ratio
+            }
+            if not tracked:
+                continue
+            entries.append(
+                {
+                    "device": {
+                        "id": device_name,
+                        "name": device_name.replace("_", " ").title(),
+                        "entity_type": device["kind"],
+                        "device_type": "broadlink",
+                        "broadlink_entity": remote["entity_id"],
+                        "area": remote["area_id"],
+                    },
+                    "commands": tracked,
+                }
+            )
+    manager.import_commands(entries)
+    for device_id, device_data in smartir_devices.items():
+        manager.create_device(device_id, dict(device_data))
+    manager.compact_storage()
+
+
+def generate(
+    config_path: Path, scale: Scale, seed: int = 42, backend: str = "json"
+) -> Dict[str, Any]:
+    """
+    Write a complete installation under config_path
+
+    Layout matches standalone mode: config_path/.storage for HA files and
+    config_path/broadlink_manager for the add-on's own storage.
+
+    Returns:
+        Summary of what was written
+    """
+    rng = random.Random(seed)
+    storage_path = config_path / ".storage"
+    storage_path.mkdir(parents=True, exist_ok=True)
+
+    remotes = build_remotes(rng, scale)
+    write_broadlink_storage(storage_path, remotes)
+    write_registries(rng, storage_path, scale, remotes)
+    smartir_devices = write_smartir(rng, config_path, scale, remotes)
+    write_managed_devices(
+        rng,
+        config_path / "broadlink_manager",
+        scale,
+        remotes,
+        smartir_devices,
+        backend=backend,
+    )
+
+    return {
+        "scale": asdict(scale),
+        "seed": seed,
+        "backend": backend,
+        "storage_bytes": sum(
+            path.stat().st_size for path in config_path.rglob("*") if path.is_file()
+        ),
+    }
+
+
+def scale_from_args(args) -> Scale:
+    """Preset scale with any per-field overrides from argparse"""
+    overrides = {
+        field: getattr(args, field)
+        for field in asdict(SCALES[args.scale])
+        if getattr(args, field, None) is not None
+    }
+    return replace(SCALES[args.scale], **overrides)
+
+
+def add_scale_arguments(parser: argparse.ArgumentParser):
+    """Scale preset and overrides, shared with run_benchmarks.py"""
+    parser.add_argument("--scale", choices=sorted(SCALES), default="large")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    for field, value in asdict(SCALES["large"]).items():
+        parser.add_argument(
+            f"--{field.replace('_', '-')}",
+            dest=field,
+            type=type(value),
+            default=None,
+            help=f"Override the preset (large: {value})",
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("config_path", type=Path, help="Directory to write into")
+    add_scale_arguments(parser)
+    args = parser.parse_args()
+
+    if args.config_path.exists() and any(args.config_path.iterdir()):
+        print(f"❌ Not empty: {args.config_path}")
+        return 1
+
+    logging.getLogger().setLevel(logging.ERROR)
+    start = time.perf_counter()
+    summary = generate(args.config_path, scale_from_args(args), args.seed, args.backend)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps(summary, indent=2))
+    print(f"✅ Generated {summary['storage_bytes']:,} bytes in {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
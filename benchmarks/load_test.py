@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Load test the add-on's HTTP API under concurrent UI use
+Runs the real waitress server against a fake Home Assistant (fake_ha.py)
+and a generated installation, then reports throughput and p50/p90/p99
+latency per endpoint.
+
+Usage:
+  python benchmarks/load_test.py --concurrency 16 --duration 30
+  python benchmarks/load_test.py --scale small --latency 50 --failure-rate 0.02
+  python benchmarks/load_test.py --url http://127.0.0.1:8099 --duration 60
+
+With --url an already running add-on is targeted and nothing is generated.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+# Add app directory to path
+app_dir = Path(__file__).parent.parent / "app"
+sys.path.insert(0, str(app_dir))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import generate_storage  # noqa: E402
+from compare import compare_results  # noqa: E402
+import fake_ha  # noqa: E402
+from run_benchmarks import create_server, git_revision  # noqa: E402
+
+# (weight, name, method, path) - roughly what an open UI polls
+WORKLOAD: List[Tuple[int, str, str, str]] = [
+    (5, "devices_managed", "GET", "/api/devices/managed"),
+    (3, "devices_managed_summary", "GET", "/api/devices/managed?summary=1"),
+    (3, "notifications", "GET", "/api/notifications"),
+    (2, "learned_devices", "GET", "/api/learned-devices"),
+    (2, "commands_untracked", "GET", "/api/commands/untracked"),
+    (2, "areas", "GET", "/api/areas"),
+    (1, "remote_devices", "GET", "/api/remote/devices"),
+    (1, "smartir_profiles", "GET", "/api/smartir/platforms/climate/profiles"),
+    (1, "command_test", "POST", "/api/commands/test"),
+]
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted samples"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    """p50/p90/p99/max in milliseconds"""
+    ordered = sorted(samples)
+    return {
+        "median_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p90_ms": round(percentile(ordered, 0.90) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "max_ms": round((ordered[-1] if ordered else 0.0) * 1000, 3),
+    }
+
+
+async def _pick_test_command(session: aiohttp.ClientSession, url: str):
+    """Body for POST /api/commands/test from the first device with commands"""
+    async with session.get(f"{url}/api/devices/managed") as response:
+        devices = (await response.json()).get("devices", [])
+    for device in devices:
+        if device.get("broadlink_entity") and device.get("commands"):
+            return {
+                "entity_id": device["broadlink_entity"],
+                "device": device["id"],
+                "command": next(iter(device["commands"])),
+            }
+    return None
+
+
+async def generate_load(
+    url: str, concurrency: int, duration: float, seed: int = 42
+) -> Dict[str, Any]:
+    """Run concurrent virtual users for duration seconds"""
+    samples: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=120)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        test_body = await _pick_test_command(session, url)
+        workload = [item for item in WORKLOAD if item[1] != "command_test" or test_body]
+        weights = [item[0] for item in workload]
+        deadline = time.perf_counter() + duration
+
+        async def user(rng: random.Random):
+            while time.perf_counter() < deadline:
+                _, name, method, path = rng.choices(workload, weights)[0]
+                body = test_body if method == "POST" else None
+                start = time.perf_counter()
+                try:
+                    async with session.request(
+                        method, url + path, json=body
+                    ) as response:
+                        await response.read()
+                        ok = response.status < 400
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    ok = False
+                samples[name].append(time.perf_counter() - start)
+                if not ok:
+                    errors[name] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(user(random.Random(seed + i)) for i in range(concurrency))
+        )
+        elapsed = time.perf_counter() - start
+
+    total = sum(len(values) for values in samples.values())
+    return {
+        "requests": total,
+        "errors": sum(errors.values()),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "latency": latency_summary([s for values in samples.values() for s in values]),
+        "scenarios": {
+            name: {
+                "count": len(samples[name]),
+                "errors": errors[name],
+                **latency_summary(samples[name]),
+            }
+            for _, name, _, _ in WORKLOAD
+            if samples.get(name)
+        },
+    }
+
+
+def serve_addon(config_path: Path, backend: str, ha_url: str, threads: int):
+    """
+    Start the add-on under waitress on a free port
+
+    Returns:
+        (base URL, waitress server) - call server.close() when done
+    """
+    from waitress.server import create_server as create_wsgi_server
+
+    server = create_server(config_path, backend, ha_url)
+    wsgi = create_wsgi_server(server.app, host="127.0.0.1", port=0, threads=threads)
+    threading.Thread(target=wsgi.run, name="waitress", daemon=True).start()
+    return f"http://127.0.0.1:{wsgi.effective_port}", wsgi
+
+
+def run(args) -> Dict[str, Any]:
+    """Set up the target (unless --url) and generate load against it"""
+    results: Dict[str, Any] = {
+        "revision": git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+    }
+    if args.url:
+        results["target"] = args.url
+        results.update(
+            asyncio.run(generate_load(args.url, args.concurrency, args.duration))
+        )
+        return results
+
+    with tempfile.TemporaryDirectory(prefix="broadlink-load-") as tmpdir:
+        config_path = Path(tmpdir)
+        scale = generate_storage.scale_from_args(args)
+        results["installation"] = generate_storage.generate(
+            config_path, scale, args.seed, args.backend
+        )
+
+        faults = fake_ha.faults_from_args(args)
+        fake = fake_ha.FakeHomeAssistant(config_path, faults=faults)
+        ha_url = fake.start_in_thread()
+        url, wsgi = serve_addon(config_path, args.backend, ha_url, args.threads)
+        try:
+            results.update(
+                {
+                    "target": "waitress",
+                    "threads": args.threads,
+                    "faults": {
+                        "latency_ms": faults.latency_ms,
+                        "jitter_ms": faults.jitter_ms,
+                        "failure_rate": faults.failure_rate,
+                        "routes": faults.routes,
+                    },
+                }
+            )
+            results.update(
+                asyncio.run(generate_load(url, args.concurrency, args.duration))
+            )
+            results["ha_calls"] = dict(fake.calls)
+        finally:
+            wsgi.close()
+    return results
+
+
+def print_report(results: Dict[str, Any]):
+    print(f"{'endpoint':<26} {'count':>7} {'err':>5} {'p50':>9} {'p90':>9} {'p99':>9}")
+    for name, stats in results["scenarios"].items():
+        print(
+            f"{name:<26} {stats['count']:>7} {stats['errors']:>5}"
+            f" {stats['median_ms']:>9.1f} {stats['p90_ms']:>9.1f} {stats['p99_ms']:>9.1f}"
+        )
+    latency = results["latency"]
+    print(
+        f"\n{results['requests']} requests ({results['errors']} errors) in"
+        f" {results['elapsed_seconds']:.1f}s: {results['throughput_rps']:.1f} req/s,"
+        f" p50 {latency['median_ms']:.1f} ms, p99 {latency['p99_ms']:.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="Target a running add-on instead")
+    parser.add_argument("--concurrency", type=int, default=16, help="Virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds")
+    parser.add_argument("--threads", type=int, default=4, help="Waitress threads")
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    parser.add_argument("--baseline", type=Path, help="Compare with a results JSON")
+    generate_storage.add_scale_arguments(parser)
+    fake_ha.add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    # Request logging would dominate the timings
+    logging.disable(logging.ERROR)
+
+    results = run(args)
+    print_report(results)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"✅ Results written to {args.output}")
+
+    if args.baseline:
+        print()
+        print(compare_results(json.loads(args.baseline.read_text()), results))
+    return 0 if results["requests"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Measure what logging costs on the per-request hot paths
+Runs command sends, notification polls and device reads against a fake
+Home Assistant twice, once with logging disabled and once configured as in
+the add-on (INFO to a stream), and reports the per-request difference and
+how many log lines and bytes each request produced.
+
+Usage:
+  python benchmarks/log_overhead.py --output benchmarks/results/log-main.json
+  python benchmarks/log_overhead.py --baseline benchmarks/results/log-main.json
+"""
+
+import argparse
+import io
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add app directory to path
+app_dir = Path(__file__).parent.parent / "app"
+sys.path.insert(0, str(app_dir))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from compare import compare_results  # noqa: E402
+import fake_ha  # noqa: E402
+import generate_storage  # noqa: E402
+from response_cache import response_cache  # noqa: E402
+from run_benchmarks import create_server, git_revision, summarize  # noqa: E402
+
+try:
+    from hot_path_log import configure_hot_path_logging  # noqa: E402
+except ImportError:
+    # Revisions before hot path logging, so they can serve as the baseline
+    configure_hot_path_logging = None
+
+# (name, method, path) - bodies for the command sends are filled in at runtime
+SCENARIOS: List[Tuple[str, str, str]] = [
+    ("command_test", "POST", "/api/commands/test"),
+    ("send", "POST", "/api/send"),
+    ("notifications", "GET", "/api/notifications"),
+    ("learned_devices", "GET", "/api/learned-devices"),
+]
+
+
+class CountingStream(io.TextIOBase):
+    """Write target that discards text but counts lines and bytes"""
+
+    def __init__(self):
+        self.lines = 0
+        self.bytes = 0
+
+    def write(self, text: str) -> int:
+        self.lines += text.count("\n")
+        self.bytes += len(text.encode("utf-8"))
+        return len(text)
+
+
+def configure_logging(log_level: str) -> CountingStream:
+    """Root logging as main.py sets it up, written to a counting stream"""
+    stream = CountingStream()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(
+        logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    )
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(getattr(logging, log_level.upper(), logging.DEBUG))
+    if configure_hot_path_logging:
+        configure_hot_path_logging(log_level)
+    return stream
+
+
+def request_bodies(client) -> Dict[str, Optional[dict]]:
+    """Bodies for the command send scenarios from the first device with commands"""
+    devices = client.get("/api/devices/managed").get_json().get("devices", [])
+    for device in devices:
+        if device.get("broadlink_entity") and device.get("commands"):
+            command = next(iter(device["commands"]))
+            return {
+                "command_test": {
+                    "entity_id": device["broadlink_entity"],
+                    "device": device["id"],
+                    "device_id": device["id"],
+                    "command": command,
+                },
+                "send": {
+                    "entity_id": device["broadlink_entity"],
+                    "device": device["id"],
+                    "command": command,
+                },
+            }
+    return {}
+
+
+def time_requests(client, method, path, body, repeat) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        response_cache.clear()
+        start = time.perf_counter()
+        client.open(path, method=method, json=body).get_data()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run(args) -> Dict[str, Any]:
+    """Time every scenario with logging off and on"""
+    with tempfile.TemporaryDirectory(prefix="broadlink-logbench-") as tmpdir:
+        config_path = Path(tmpdir)
+        scale = generate_storage.scale_from_args(args)
+        installation = generate_storage.generate(
+            config_path, scale, args.seed, args.backend
+        )
+        ha_url = fake_ha.FakeHomeAssistant(config_path).start_in_thread()
+
+        logging.disable(logging.CRITICAL)
+        server = create_server(config_path, args.backend, ha_url)
+        client = server.app.test_client()
+        bodies = request_bodies(client)
+
+        results = {}
+        for name, method, path in SCENARIOS:
+            if method == "POST" and name not in bodies:
+                continue
+            body = bodies.get(name)
+            # Warm up lazily loaded state before either measurement
+            time_requests(client, method, path, body, 2)
+
+            logging.disable(logging.CRITICAL)
+            quiet = time_requests(client, method, path, body, args.repeat)
+
+            logging.disable(logging.NOTSET)
+            stream = configure_logging(args.log_level)
+            logged = time_requests(client, method, path, body, args.repeat)
+            logging.disable(logging.CRITICAL)
+
+            stats = summarize(logged)
+            quiet_median = summarize(quiet)["median_ms"]
+            results[name] = {
+                **stats,
+                "runs": args.repeat,
+                "quiet_median_ms": quiet_median,
+                "overhead_ms": round(stats["median_ms"] - quiet_median, 3),
+                "log_lines": round(stream.lines / args.repeat, 2),
+                "log_bytes": round(stream.bytes / args.repeat),
+            }
+            print(
+                f"{name:<18} {stats['median_ms']:9.2f} ms logged,"
+                f" {results[name]['quiet_median_ms']:9.2f} ms quiet,"
+                f" {results[name]['log_lines']:6.1f} lines"
+                f" {results[name]['log_bytes']:7d} bytes per request"
+            )
+
+    return {
+        "revision": git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "installation": installation,
+        "log_level": args.log_level,
+        "repeat": args.repeat,
+        "scenarios": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    generate_storage.add_scale_arguments(parser)
+    parser.set_defaults(scale="small")
+    parser.add_argument("--repeat", type=int, default=200, help="Timed runs")
+    parser.add_argument(
+        "--log-level", default="info", help="Level for the logged run (info, trace)"
+    )
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    parser.add_argument("--baseline", type=Path, help="Compare with a results JSON")
+    args = parser.parse_args()
+
+    results = run(args)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"✅ Results written to {args.output}")
+
+    if args.baseline:
+        print()
+        print(compare_results(json.loads(args.baseline.read_text()), results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Time the hot API endpoints against a synthetic large installation
+Generates a .storage tree (see generate_storage.py), starts the web server
+in-process and records per-scenario timings as JSON for comparison between
+revisions.
+
+Usage:
+  python benchmarks/run_benchmarks.py --output benchmarks/results/main.json
+  python benchmarks/run_benchmarks.py --baseline benchmarks/results/main.json
+  python benchmarks/run_benchmarks.py --scale small --repeat 3
+"""
+
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from unittest.mock import Mock
+
+# Add app directory to path
+app_dir = Path(__file__).parent.parent / "app"
+sys.path.insert(0, str(app_dir))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from compare import compare_results  # noqa: E402
+from config_loader import ConfigLoader  # noqa: E402
+import generate_storage  # noqa: E402
+from response_cache import response_cache  # noqa: E402
+from web_server import BroadlinkWebServer  # noqa: E402
+
+# (name, method, path, json body, clear response cache before each request)
+SCENARIOS: List[Tuple[str, str, str, Optional[dict], bool]] = [
+    ("devices_managed", "GET", "/api/devices/managed", None, True),
+    ("devices_managed_warm", "GET", "/api/devices/managed", None, False),
+    ("devices_managed_summary", "GET", "/api/devices/managed?summary=1", None, True),
+    ("learned_devices", "GET", "/api/learned-devices", None, True),
+    ("commands_untracked", "GET", "/api/commands/untracked", None, False),
+    ("commands_sync", "POST", "/api/commands/sync", {}, False),
+    ("entities_generate", "POST", "/api/entities/generate", {}, False),
+    ("smartir_platforms", "GET", "/api/smartir/platforms", None, True),
+    (
+        "smartir_profiles",
+        "GET",
+        "/api/smartir/platforms/climate/profiles",
+        None,
+        True,
+    ),
+    (
+        "smartir_profiles_warm",
+        "GET",
+        "/api/smartir/platforms/climate/profiles",
+        None,
+        False,
+    ),
+]
+
+
+def git_revision() -> Dict[str, Any]:
+    """Current commit and whether the tree has local changes"""
+    root = Path(__file__).parent.parent
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                cwd=root,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def create_server(config_path: Path, backend: str, ha_url: str) -> BroadlinkWebServer:
+    """Web server in standalone mode over a generated config directory"""
+    config_loader = Mock(spec=ConfigLoader)
+    config_loader.mode = "standalone"
+    config_loader.get_ha_url.return_value = ha_url
+    config_loader.get_ha_token.return_value = "benchmark_token"
+    config_loader.get_config_path.return_value = config_path
+    config_loader.get_storage_path.return_value = config_path / ".storage"
+    config_loader.get_broadlink_manager_path.return_value = (
+        config_path / "broadlink_manager"
+    )
+    config_loader.get_storage_backend.return_value = backend
+    config_loader.get_profiling_settings.return_value = {
+        "enabled": False,
+        "token": None,
+    }
+    config_loader.get_package_output_path.return_value = None
+    return BroadlinkWebServer(port=8099, config_loader=config_loader)
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Timing statistics in milliseconds"""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))]
+    return {
+        "min_ms": round(ordered[0] * 1000, 3),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def run_scenario(client, method, path, body, cold, repeat) -> Dict[str, Any]:
+    """
+    Time one request repeatedly
+
+    The first request is reported separately (first_ms): it pays for lazy
+    loading, and for mutating endpoints it is the one that does the work.
+    """
+    samples = []
+    first = None
+    status = None
+    size = 0
+    for i in range(repeat + 1):
+        if cold:
+            response_cache.clear()
+        start = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        data = response.get_data()
+        elapsed = time.perf_counter() - start
+        status = response.status_code
+        size = len(data)
+        if i == 0:
+            first = elapsed
+        else:
+            samples.append(elapsed)
+
+    return {
+        "status": status,
+        "bytes": size,
+        "runs": len(samples),
+        "first_ms": round(first * 1000, 3),
+        **summarize(samples),
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    """Generate the installation, start the server and time every scenario"""
+    scale = generate_storage.scale_from_args(args)
+    with tempfile.TemporaryDirectory(prefix="broadlink-bench-") as tmpdir:
+        config_path = Path(args.keep or tmpdir)
+        config_path.mkdir(parents=True, exist_ok=True)
+
+        start = time.perf_counter()
+        installation = generate_storage.generate(
+            config_path, scale, args.seed, args.backend
+        )
+        generate_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        server = create_server(config_path, args.backend, args.ha_url)
+        startup_seconds = time.perf_counter() - start
+        client = server.app.test_client()
+
+        results = {}
+        for name, method, path, body, cold in SCENARIOS:
+            if args.scenario and not any(s in name for s in args.scenario):
+                continue
+            results[name] = run_scenario(client, method, path, body, cold, args.repeat)
+            print(
+                f"{name:<26} {results[name]['median_ms']:10.1f} ms"
+                f"  (first {results[name]['first_ms']:.1f} ms,"
+                f" p95 {results[name]['p95_ms']:.1f} ms, HTTP {results[name]['status']})"
+            )
+
+    return {
+        "revision": git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "installation": installation,
+        "repeat": args.repeat,
+        "generate_seconds": round(generate_seconds, 3),
+        "startup_seconds": round(startup_seconds, 3),
+        "scenarios": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    generate_storage.add_scale_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=10, help="Timed runs")
+    parser.add_argument(
+        "--scenario", action="append", help="Only run scenarios containing this"
+    )
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    parser.add_argument("--baseline", type=Path, help="Compare with a results JSON")
+    parser.add_argument(
+        "--keep", type=Path, help="Generate into this directory and keep it"
+    )
+    parser.add_argument(
+        "--ha-url",
+        default="http://127.0.0.1:9",
+        help="Home Assistant URL (default: unreachable, calls fail fast)",
+    )
+    args = parser.parse_args()
+
+    # Request logging would dominate the timings
+    logging.disable(logging.ERROR)
+
+    results = run(args)
+    print(
+        f"Generated in {results['generate_seconds']:.1f}s,"
+        f" server started in {results['startup_seconds']:.2f}s"
+    )
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"✅ Results written to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        print()
+        print(compare_results(baseline, results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
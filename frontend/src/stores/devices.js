@@ -24,17 +24,15 @@ export const useDeviceStore = defineStore('devices', {
   },
   
   actions: {
-    async loadDevices(bustCache = false) {
+    async loadDevices() {
       this.loading = true
       this.error = null
       
       try {
         // Use managed devices endpoint to get devices with proper device_type field
-        // Add cache-busting timestamp if requested
-        const url = bustCache 
-          ? `/api/devices/managed?_t=${Date.now()}` 
-          : '/api/devices/managed'
-        const response = await api.get(url)
+        // Summaries leave out command codes (GET /api/commands/<id>/<name> has them).
+        // No cache-busting: the server answers unchanged lists with 304
+        const response = await api.get('/api/devices/managed?summary=1')
         this.devices = response.data.devices || []
         console.log('📥 Loaded devices:', this.devices)
         this.devices.forEach(device => {
@@ -42,7 +40,7 @@ export const useDeviceStore = defineStore('devices', {
             id: device.id,
             device: device.device,
             commands: device.commands,
-            commandCount: device.commands ? Object.keys(device.commands).length : 0
+            commandCount: device.command_count ?? 0
           })
         })
       } catch (error) {
@@ -101,8 +99,10 @@ export const useDeviceStore = defineStore('devices', {
       this.error = null
       
       try {
-        // Use managed devices endpoint for updates
-        const response = await api.put(`/api/devices/managed/${deviceId}`, deviceData)
+        // Use managed devices endpoint for updates. Commands are changed through
+        // the command endpoints; the listed ones are summaries without codes
+        const { commands, command_count, ...deviceFields } = deviceData
+        const response = await api.put(`/api/devices/managed/${deviceId}`, deviceFields)
         await this.loadDevices() // Reload list
         return response.data
       } catch (error) {
@@ -172,7 +172,7 @@ export const useDeviceStore = defineStore('devices', {
       
       try {
         // Fetch all managed devices (includes both Broadlink and SmartIR devices)
-        const response = await api.get('/api/devices/managed')
+        const response = await api.get('/api/devices/managed?fields=id,name')
         const allDevices = response.data.devices || []
         
         if (allDevices.length === 0) {
@@ -229,8 +229,8 @@ export const useDeviceStore = defineStore('devices', {
         // Network file system caches can take time to synchronize
         await new Promise(resolve => setTimeout(resolve, 1000))
         
-        // Reload to show updated areas with cache busting
-        await this.loadDevices(true)
+        // Reload to show updated areas
+        await this.loadDevices()
         
         console.log(`✅ Area sync complete: ${syncedCount} synced, ${notFoundCount} not found in HA, ${errorCount} errors`)
         
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Precompress built frontend assets
+Writes .gz (and .br when the brotli module is installed) next to each
+compressible file so the web server can send them without compressing
+per request.
+
+Usage:
+  # After `npm run build` (also run by the Dockerfiles):
+  python scripts/precompress_assets.py app/static/assets
+
+  # Remove variants:
+  python scripts/precompress_assets.py app/static/assets --clean
+"""
+
+import argparse
+import gzip
+import sys
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+EXTENSIONS = {".js", ".css", ".html", ".svg", ".json", ".map"}
+MIN_SIZE = 1024
+
+
+def precompress(path: Path) -> list:
+    """Write compressed variants of one file, skipping ones that don't shrink"""
+    data = path.read_bytes()
+    variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli:
+        variants.append((".br", brotli.compress(data, quality=11)))
+
+    written = []
+    for suffix, body in variants:
+        target = path.with_name(path.name + suffix)
+        if len(body) < len(data):
+            target.write_bytes(body)
+            written.append((target, len(body)))
+        elif target.exists():
+            target.unlink()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompress built frontend assets")
+    parser.add_argument("directory", type=Path, help="Assets directory")
+    parser.add_argument("--clean", action="store_true", help="Remove variants only")
+    args = parser.parse_args()
+
+    if not args.directory.is_dir():
+        print(f"❌ Not a directory: {args.directory}")
+        return 1
+
+    for variant in list(args.directory.rglob("*.gz")) + list(
+        args.directory.rglob("*.br")
+    ):
+        variant.unlink()
+    if args.clean:
+        print(f"🧹 Removed compressed variants from {args.directory}")
+        return 0
+
+    if not brotli:
+        print("⚠️  brotli module not installed - writing gzip variants only")
+
+    for path in sorted(args.directory.rglob("*")):
+        if path.suffix not in EXTENSIONS or not path.is_file():
+            continue
+        size = path.stat().st_size
+        if size < MIN_SIZE:
+            continue
+        for target, compressed in precompress(path):
+            print(f"  {target.name}: {size:,} → {compressed:,} bytes")
+
+    print(f"✅ Precompressed assets in {args.directory}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
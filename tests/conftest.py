@@ -31,10 +31,10 @@ def temp_storage_dir():
     shutil.rmtree(temp_dir)
 
 
-@pytest.fixture
-def device_manager(temp_storage_dir):
-    """Create a DeviceManager instance with temporary storage"""
-    return DeviceManager(storage_path=temp_storage_dir)
+@pytest.fixture(params=["json", "sqlite"])
+def device_manager(request, temp_storage_dir):
+    """Create a DeviceManager instance with temporary storage (per backend)"""
+    return DeviceManager(storage_path=temp_storage_dir, backend=request.param)
 
 
 @pytest.fixture
@@ -146,6 +146,8 @@ def flask_app():
     config_loader.get_config_path.return_value = temp_storage
     config_loader.get_storage_path.return_value = temp_storage
     config_loader.get_broadlink_manager_path.return_value = temp_storage / 'broadlink_manager'
+    config_loader.get_storage_backend.return_value = 'json'
+    config_loader.get_profiling_settings.return_value = {'enabled': False, 'token': None, 'keep': 20}
     
     server = BroadlinkWebServer(port=8099, config_loader=config_loader)
     server.app.config['TESTING'] = True
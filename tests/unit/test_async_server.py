@@ -0,0 +1,276 @@
+"""
+Unit tests for direct learning on the event loop and the async server
+"""
+
+import asyncio
+import json
+import pytest
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import Mock
+
+import broadlink
+from aiohttp.test_utils import TestClient, TestServer
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+import broadlink_learner
+from async_server import AsyncServer
+from broadlink_learner import BroadlinkLearner
+from config_loader import ConfigLoader
+from direct_learning import iterate_blocking, learn_direct_events
+
+PACKET = b"\x26\x00\x04\x00\x01\x02\x03\x04"
+
+
+@pytest.fixture
+def no_wait(monkeypatch):
+    """Poll without the one second pause between checks"""
+    monkeypatch.setattr(broadlink_learner, "_sleep", lambda seconds: ("sleep", 0))
+
+
+def make_learner(check_data):
+    learner = BroadlinkLearner(host="192.168.1.2", mac=b"\x00" * 6, device_type=0x2787)
+    learner.device = Mock()
+    learner.device.check_data.side_effect = check_data
+    learner._authenticated = True
+    return learner
+
+
+@pytest.mark.unit
+class TestLearningSteps:
+    """The same IR procedure run blocking and on the event loop"""
+
+    def check_data(self):
+        return [broadlink.exceptions.StorageError(), None, PACKET]
+
+    def test_blocking_ignores_storage_errors(self, no_wait):
+        learner = make_learner(self.check_data())
+
+        assert learner.learn_ir_command(timeout=5) == "JgAEAAECAwQ="
+        learner.device.enter_learning.assert_called_once()
+        assert learner.device.check_data.call_count == 3
+
+    def test_async_matches_blocking(self, no_wait):
+        learner = make_learner(self.check_data())
+
+        result = asyncio.run(learner.learn_ir_command_async(timeout=5))
+
+        assert result == "JgAEAAECAwQ="
+        assert learner.device.check_data.call_count == 3
+
+    def test_async_timeout_returns_none(self):
+        learner = make_learner(lambda: None)
+
+        assert asyncio.run(learner.learn_ir_command_async(timeout=0)) is None
+
+    def test_device_error_ends_learning(self, no_wait):
+        learner = make_learner(OSError("unreachable"))
+
+        assert asyncio.run(learner.learn_ir_command_async(timeout=5)) is None
+
+
+@pytest.mark.unit
+class TestDirectLearning:
+    """Event flow and HTTP mapping of the direct learn endpoints"""
+
+    def test_missing_fields_end_with_400(self):
+        events = list(iterate_blocking(learn_direct_events(Mock(), {})))
+
+        assert [e["status"] for e in events] == ["starting", "error"]
+        assert events[-1]["code"] == 400
+
+    def test_plain_endpoint_returns_error_status(self, client):
+        response = client.post(
+            "/api/commands/learn/direct",
+            json={
+                "device_id": "tv",
+                "entity_id": "remote.x",
+                "command_name": "power",
+                "command_type": "uv",
+            },
+        )
+
+        assert response.status_code == 400
+        assert response.get_json() == {
+            "success": False,
+            "error": 'Invalid command_type. Must be "ir" or "rf"',
+        }
+
+    def test_stream_omits_http_code(self, client):
+        response = client.post("/api/commands/learn/direct/stream", json={})
+        events = [
+            json.loads(line[len("data: ") :])
+            for line in response.get_data(as_text=True).splitlines()
+            if line
+        ]
+
+        assert [e["status"] for e in events] == ["starting", "error"]
+        assert "code" not in events[-1]
+
+
+@pytest.mark.unit
+class TestAsyncServer:
+    """Requests through the aiohttp front end"""
+
+    def request(self, flask_app, method, path, **kwargs):
+        async def run():
+            server = AsyncServer(flask_app.config["web_server"], threads=2)
+            async with TestClient(TestServer(server.make_app())) as session:
+                response = await session.request(method, path, **kwargs)
+                return response.status, response.headers, await response.read()
+
+        return asyncio.run(run())
+
+    def test_flask_routes_served_through_workers(self, flask_app):
+        status, headers, body = self.request(flask_app, "GET", "/api/devices/managed")
+
+        assert status == 200
+        assert headers["Content-Type"] == "application/json"
+        assert "devices" in json.loads(body)
+
+    def test_native_learning_route_behind_ingress(self, flask_app):
+        status, headers, body = self.request(
+            flask_app,
+            "POST",
+            "/api/hassio_ingress/abc/api/commands/learn/direct/stream",
+            json={},
+            headers={"X-Ingress-Path": "/api/hassio_ingress/abc"},
+        )
+
+        assert status == 200
+        assert headers["Content-Type"].startswith("text/event-stream")
+        assert body.decode().startswith('data: {"status": "starting"')
+
+    def test_upload_streamed_to_flask(self, flask_app, monkeypatch):
+        from aiohttp import web
+
+        async def no_buffering(request):
+            raise AssertionError("request body buffered before dispatch")
+
+        monkeypatch.setattr(web.BaseRequest, "read", no_buffering)
+        devices = [
+            {"id": f"device_{n}", "commands": {"power": {"data": "JgBQ"}}}
+            for n in range(200)
+        ]
+        document = json.dumps({"devices": devices}).encode()
+
+        async def chunks():
+            # Chunked upload: no Content-Length
+            for start in range(0, len(document), 1000):
+                yield document[start : start + 1000]
+
+        status, _, body = self.request(
+            flask_app,
+            "POST",
+            "/api/commands/import-json",
+            data=chunks(),
+            headers={"Content-Type": "application/json"},
+        )
+
+        assert status == 200
+        assert json.loads(body)["imported"] == 200
+
+    def test_oversized_upload_rejected(self, flask_app, monkeypatch):
+        import async_server
+
+        monkeypatch.setattr(async_server, "MAX_BODY_SIZE", 10)
+        status, _, _ = self.request(
+            flask_app, "POST", "/api/commands/import-json", data=b"x" * 100
+        )
+
+        assert status == 413
+
+    def test_native_plain_learning_route(self, flask_app):
+        status, _, body = self.request(
+            flask_app, "POST", "/api/commands/learn/direct", json={}
+        )
+
+        assert status == 400
+        assert json.loads(body)["success"] is False
+
+    def test_ha_learning_runs_on_the_loop(self, flask_app, monkeypatch):
+        from metrics import HTTP_REQUESTS
+
+        web_server = flask_app.config["web_server"]
+        web_server.device_manager.create_device("tv", {"name": "TV"})
+        threads = []
+
+        async def learn(data):
+            threads.append(threading.current_thread())
+            return {"success": True, "message": "sent"}
+
+        monkeypatch.setattr(web_server, "_learn_command", learn)
+        monkeypatch.setattr(web_server, "schedule_command_poll", Mock())
+        key = ("POST", "/api/commands/learn", "200")
+        before = HTTP_REQUESTS._collected().get(key, 0)
+
+        status, _, body = self.request(
+            flask_app,
+            "POST",
+            "/api/commands/learn",
+            json={"entity_id": "remote.rm4", "device_id": "tv", "command": "power"},
+        )
+
+        assert status == 200
+        assert json.loads(body)["code"] == "pending"
+        assert threads == [threading.main_thread()]
+        web_server.schedule_command_poll.assert_called_once()
+        command = web_server.device_manager.get_device("tv")["commands"]["power"]
+        assert command["data"] == "pending"
+        assert HTTP_REQUESTS._collected()[key] == before + 1
+
+    def test_ha_learning_through_flask(self, client, flask_app, monkeypatch):
+        web_server = flask_app.config["web_server"]
+
+        async def learn(data):
+            return {"success": False, "error": "unavailable"}
+
+        monkeypatch.setattr(web_server, "_learn_command", learn)
+
+        missing = client.post("/api/commands/learn", json={"entity_id": "remote.rm4"})
+        failed = client.post(
+            "/api/commands/learn",
+            json={"entity_id": "remote.rm4", "device": "tv", "command": "power"},
+        )
+
+        assert missing.status_code == 400
+        assert "command" in missing.get_json()["error"]
+        assert failed.status_code == 400
+        assert failed.get_json() == {"success": False, "error": "unavailable"}
+
+
+@pytest.mark.unit
+class TestServerSettings:
+    """server_* options"""
+
+    def settings(self, monkeypatch, **env):
+        monkeypatch.delenv("SUPERVISOR_TOKEN", raising=False)
+        for key, value in env.items():
+            monkeypatch.setenv(key, value)
+        return ConfigLoader().get_server_settings()
+
+    def test_defaults(self, monkeypatch):
+        assert self.settings(monkeypatch) == {
+            "mode": "waitress",
+            "threads": 8,
+            "connection_limit": 100,
+            "channel_timeout": 120,
+        }
+
+    def test_values_clamped_and_invalid_ignored(self, monkeypatch):
+        settings = self.settings(
+            monkeypatch,
+            SERVER_MODE="ASYNC",
+            SERVER_THREADS="500",
+            SERVER_CONNECTION_LIMIT="lots",
+        )
+
+        assert settings["mode"] == "async"
+        assert settings["threads"] == 64
+        assert settings["connection_limit"] == 100
+
+    def test_unknown_mode_falls_back(self, monkeypatch):
+        assert self.settings(monkeypatch, SERVER_MODE="gevent")["mode"] == "waitress"
@@ -0,0 +1,314 @@
+"""
+Unit tests for near-duplicate code detection
+"""
+
+import base64
+import pytest
+import random
+import sys
+from pathlib import Path
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+import pulse_decoder
+from code_similarity import (
+    DUPLICATE_DISTANCE,
+    SimilarityIndex,
+    fingerprint_packets,
+    capture_issues,
+    timing_distance,
+)
+from pulse_decoder import encode_packet
+
+POWER = [9000, 4500] + [560, 1690, 560, 560, 560, 560, 560, 1690] * 4 + [560]
+VOLUME = [9000, 4500] + [560, 560, 560, 1690, 560, 1690, 560, 560] * 4 + [560]
+GAP = 40000
+
+
+def nec(bits, mark=560, space=560, long_space=1690):
+    pulses = [9000, 4500]
+    for bit in bits:
+        pulses += [mark, long_space if bit else space]
+    return pulses + [mark]
+
+
+@pytest.fixture(params=["numpy", "python"])
+def decoder(request, monkeypatch):
+    """Run each test on the vectorized and the pure Python path"""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(pulse_decoder, "np", None)
+    return request.param
+
+
+def capture(pulses, seed, frames=1, jitter=0.05):
+    """A learned code for pulses with capture jitter and held-button repeats"""
+    rng = random.Random(seed)
+    train = []
+    for _ in range(frames):
+        if train:
+            train.append(GAP + rng.randint(-5000, 5000))
+        train.extend(
+            max(100, int(p * rng.uniform(1 - jitter, 1 + jitter))) for p in pulses
+        )
+    return base64.b64encode(encode_packet(0x26, train)).decode()
+
+
+def learn(device_manager, device_id, name, code):
+    if not device_manager.get_device(device_id):
+        device_manager.create_device(device_id, {"name": device_id})
+    assert device_manager.add_learned_command(device_id, name, code, "ir")
+
+
+@pytest.mark.unit
+class TestFingerprints:
+    """Bucket keys and timing distance"""
+
+    def test_captures_of_one_button_share_a_key(self, decoder):
+        packets = [
+            base64.b64decode(capture(POWER, seed, frames=seed)) for seed in (1, 2, 3)
+        ]
+        packets.append(base64.b64decode(capture(VOLUME, 4)))
+
+        fingerprints = fingerprint_packets(packets)
+
+        keys = [key for key, _ in fingerprints]
+        assert keys[0] == keys[1] == keys[2] != keys[3]
+        assert timing_distance(fingerprints[0][1], fingerprints[1][1]) < 0.1
+
+    def test_asymmetric_timing_with_capture_error(self, decoder):
+        # Marks longer than spaces and +/-10% jitter: no fixed grid boundary
+        # may split captures of one button
+        rng = random.Random(5)
+        for seed in range(20):
+            bits = [rng.random() < 0.5 for _ in range(32)]
+            other = list(bits)
+            other[rng.randrange(32)] ^= True
+            button = nec(bits, mark=620, space=500)
+            packets = [
+                base64.b64decode(capture(button, seed * 3, jitter=0.1)),
+                base64.b64decode(capture(button, seed * 3 + 1, jitter=0.1)),
+                base64.b64decode(
+                    capture(nec(other, mark=620, space=500), seed * 3 + 2, jitter=0.1)
+                ),
+            ]
+
+            first, second, different = fingerprint_packets(packets)
+
+            assert first[0] == second[0] != different[0]
+            assert timing_distance(first[1], second[1]) <= DUPLICATE_DISTANCE
+
+    def test_short_and_undecodable_codes_skipped(self, decoder):
+        short = encode_packet(0x26, [560, 560, 560])
+
+        assert fingerprint_packets([short, b"", b"\x01\x02"]) == [None, None, None]
+
+    def test_timing_distance_ignores_gaps(self, decoder):
+        assert timing_distance([500, 20000, 1000], [500, 90000, 1000]) == 0.0
+        assert timing_distance([500, 1000], [500, 1000, 500]) == 1.0
+
+
+@pytest.mark.unit
+class TestCaptureIssues:
+    """Noisy and cut-off captures"""
+
+    def test_clean_captures_have_no_issues(self, decoder):
+        held = base64.b64decode(capture(POWER, 1, frames=3))
+        repeat_code = encode_packet(0x26, POWER + [GAP, 9000, 2250, 560])
+        two_part = encode_packet(0x26, POWER + [GAP] + VOLUME[:20])
+
+        assert capture_issues(held) == []
+        assert capture_issues(repeat_code) == []
+        assert capture_issues(two_part) == []
+        assert capture_issues(b"\x01\x02") == []
+
+    def test_short_capture(self, decoder):
+        assert capture_issues(encode_packet(0x26, [560, 560, 560])) == ["too_short"]
+
+    def test_glitch_pulses(self, decoder):
+        noisy = POWER[:10] + [40, 520] + POWER[12:]
+
+        assert capture_issues(encode_packet(0x26, noisy)) == ["glitch_pulses"]
+
+    def test_repeat_that_disagrees_with_first_frame(self, decoder):
+        flipped = list(POWER)
+        flipped[3] = 560  # One bit read wrong in the second copy
+        dropped = POWER[:-3] + POWER[-1:]  # Last bit lost
+
+        for copy in (flipped, dropped):
+            packet = encode_packet(0x26, POWER + [GAP] + copy)
+            assert capture_issues(packet) == ["inconsistent_frames"]
+
+
+@pytest.mark.unit
+class TestLibrary:
+    """Matching against the stored library"""
+
+    def test_learned_duplicate_is_flagged(self, decoder, device_manager):
+        learn(device_manager, "tv", "power", capture(POWER, 1))
+        learn(device_manager, "tv", "volume_up", capture(VOLUME, 2))
+        code = capture(POWER, 3, frames=2)
+
+        learn(device_manager, "tv", "turn_on", code)
+
+        assert device_manager.check_learned_command("tv", "turn_on", code) == {
+            "similar_to": [{"device_id": "tv", "command": "power"}],
+            "capture_issues": [],
+        }
+        # Matches go stale when the other command changes, so none are stored
+        assert "similar_to" not in device_manager.get_command("tv", "turn_on")
+
+    def test_relearning_a_command_does_not_match_itself(self, decoder, device_manager):
+        learn(device_manager, "tv", "power", capture(POWER, 1))
+        code = capture(POWER, 2)
+
+        learn(device_manager, "tv", "power", code)
+        learn(device_manager, "tv", "waiting", "pending")
+
+        empty = {"similar_to": [], "capture_issues": []}
+        assert device_manager.check_learned_command("tv", "power", code) == empty
+        assert device_manager.check_learned_command("tv", "waiting", "pending") == empty
+
+    def test_direct_learning_reports_matches(
+        self, decoder, device_manager, monkeypatch
+    ):
+        import asyncio
+        from unittest.mock import Mock
+
+        import broadlink_learner
+        from direct_learning import learn_direct_events, learn_direct_result
+
+        learn(device_manager, "tv", "power", capture(POWER, 1))
+        code = capture(POWER, 2)
+
+        async def learned(self, timeout):
+            return code
+
+        monkeypatch.setattr(
+            broadlink_learner.BroadlinkLearner, "authenticate", lambda self: True
+        )
+        monkeypatch.setattr(
+            broadlink_learner.BroadlinkLearner, "learn_ir_command_async", learned
+        )
+        web_server = Mock(device_manager=device_manager)
+        web_server.get_cached_connection_info.return_value = {
+            "host": "192.168.1.2",
+            "mac": "00:00:00:00:00:00",
+            "mac_bytes": b"\x00" * 6,
+            "type": 0x2787,
+            "type_hex": "0x2787",
+            "model": "RM4",
+        }
+
+        async def run():
+            request = {
+                "device_id": "tv",
+                "entity_id": "remote.rm4",
+                "command_name": "turn_on",
+            }
+            return [event async for event in learn_direct_events(web_server, request)]
+
+        body, status = learn_direct_result(asyncio.run(run())[-1])
+
+        assert status == 200
+        assert body["similar_to"] == [{"device_id": "tv", "command": "power"}]
+        assert "capture_issues" not in body
+        assert "similar_to" not in device_manager.get_command("tv", "turn_on")
+
+    def test_find_similar_across_devices(self, decoder, device_manager):
+        learn(device_manager, "tv", "power", capture(POWER, 1))
+        learn(device_manager, "soundbar", "power", capture(POWER, 2))
+        raw = base64.b64decode(capture(POWER, 3))
+
+        matches = device_manager.find_similar_commands(raw)
+
+        assert {(m["device_id"], m["command"]) for m in matches} == {
+            ("tv", "power"),
+            ("soundbar", "power"),
+        }
+        assert matches[0]["distance"] <= matches[1]["distance"]
+        assert device_manager.find_similar_commands(raw, exclude=("tv", "power")) == [
+            matches[1] if matches[0]["device_id"] == "tv" else matches[0]
+        ]
+
+    def test_duplicate_groups(self, decoder, device_manager):
+        learn(device_manager, "tv", "power", capture(POWER, 1))
+        learn(device_manager, "tv", "turn_on", capture(POWER, 2))
+        learn(device_manager, "tv", "volume_up", capture(VOLUME, 3))
+        learn(device_manager, "amp", "volume_up", capture(VOLUME, 4, frames=3))
+        learn(device_manager, "amp", "mute", capture(POWER[:-8] + [560] * 8, 5))
+
+        groups = device_manager.find_duplicate_commands()
+
+        names = sorted(
+            sorted((m["device_id"], m["command"]) for m in group) for group in groups
+        )
+        assert names == [
+            [("amp", "volume_up"), ("tv", "volume_up")],
+            [("tv", "power"), ("tv", "turn_on")],
+        ]
+        assert all(group[0]["distance"] == 0.0 for group in groups)
+
+    def test_index_follows_storage_changes(self, decoder, device_manager):
+        learn(device_manager, "tv", "power", capture(POWER, 1))
+        raw = base64.b64decode(capture(POWER, 2))
+        assert len(device_manager.find_similar_commands(raw)) == 1
+
+        device_manager.delete_device("tv")
+
+        assert device_manager.find_similar_commands(raw) == []
+
+    def test_diagnostics_counts_duplicate_groups(self, decoder, device_manager):
+        from diagnostics import DiagnosticsCollector
+
+        learn(device_manager, "tv", "power", capture(POWER, 1))
+        learn(device_manager, "tv", "turn_on", capture(POWER, 2))
+
+        collector = DiagnosticsCollector("/tmp", device_manager=device_manager)
+
+        assert collector._collect_command_analysis()["duplicate_groups"] == 1
+
+
+@pytest.mark.unit
+def test_index_shared_per_storage_file(tmp_path):
+    assert SimilarityIndex.for_path(tmp_path / "devices.json") is (
+        SimilarityIndex.for_path(tmp_path / "devices.json")
+    )
+    assert SimilarityIndex.for_path(tmp_path / "a.json") is not (
+        SimilarityIndex.for_path(tmp_path / "b.json")
+    )
+
+
+@pytest.mark.unit
+def test_payload_store_bulk_views(device_manager):
+    codes = {name: capture(POWER, seed) for seed, name in enumerate(["a", "b", "c"])}
+    for name, code in codes.items():
+        learn(device_manager, "tv", name, code)
+    digests = {
+        name: device_manager.backend.get_command("tv", name).get("data_hash")
+        for name in codes
+    }
+    if None in digests.values():
+        pytest.skip("Payloads stored inline")
+
+    views = device_manager.payloads.get_views(list(digests.values()) + ["0" * 32])
+
+    assert set(views) == set(digests.values())
+    for name, digest in digests.items():
+        assert bytes(views[digest]) == base64.b64decode(codes[name])
+
+
+@pytest.mark.unit
+def test_duplicates_endpoint(flask_app):
+    device_manager = flask_app.config["device_manager"]
+    learn(device_manager, "tv", "power", capture(POWER, 1))
+    learn(device_manager, "tv", "turn_on", capture(POWER, 2))
+
+    response = flask_app.test_client().get("/api/commands/duplicates")
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["count"] == 1
+    assert {m["command"] for m in body["groups"][0]} == {"power", "turn_on"}
@@ -0,0 +1,171 @@
+"""
+Unit tests for streaming command export and batched import
+"""
+
+import pytest
+import base64
+import json
+import sys
+from pathlib import Path
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+CODE = base64.b64encode(bytes(range(64))).decode("ascii")
+
+
+def _export(device_count, commands_per_device=3):
+    return {
+        "export_format": "broadlink_manager_v2",
+        "export_version": 1,
+        "devices": [
+            {
+                "id": f"device_{n}",
+                "name": f"Device {n}",
+                "entity_type": "media_player",
+                "commands": {
+                    f"cmd_{c}": {"data": CODE, "type": "ir"}
+                    for c in range(commands_per_device)
+                },
+            }
+            for n in range(device_count)
+        ],
+    }
+
+
+@pytest.fixture
+def manager(flask_app):
+    return flask_app.config["device_manager"]
+
+
+@pytest.mark.unit
+class TestImportCommands:
+    """Test DeviceManager.import_commands"""
+
+    def test_merges_and_creates_in_one_save(self, device_manager, mocker):
+        device_manager.create_device("device_0", {"name": "Existing", "commands": {}})
+        device_manager.add_command("device_0", "keep", {"data": "JgBQ", "type": "ir"})
+        save = mocker.spy(device_manager, "_save_devices")
+        progress = []
+
+        results = device_manager.import_commands(
+            _export(3)["devices"], progress=lambda r: progress.append(r["imported"])
+        )
+
+        assert save.call_count == 1
+        assert progress == [3, 6, 9]
+        assert [d["action"] for d in results["devices"]] == [
+            "merged",
+            "created",
+            "created",
+        ]
+        merged = device_manager.get_device("device_0")
+        assert merged["name"] == "Existing"
+        assert list(merged["commands"]) == ["keep", "cmd_0", "cmd_1", "cmd_2"]
+        assert device_manager.get_command_data("device_2", "cmd_1") == CODE
+        assert (
+            "data_hash"
+            in device_manager._load_devices()["device_2"]["commands"]["cmd_1"]
+        )
+
+    def test_entries_without_id_or_commands_are_skipped(self, device_manager):
+        results = device_manager.import_commands(
+            [{"name": "No id", "commands": {"a": {}}}, {"id": "empty", "commands": {}}]
+        )
+
+        assert results["skipped"] == 2
+        assert len(results["errors"]) == 2
+        assert device_manager.get_all_devices() == {}
+
+
+@pytest.mark.unit
+class TestImportExportEndpoints:
+    """Test the streaming endpoints"""
+
+    def test_export_all_streams_indented_json(self, client, manager):
+        manager.import_commands(_export(3)["devices"])
+        manager.create_device("no_commands", {"name": "Empty"})
+
+        response = client.get("/api/commands/export-all")
+
+        assert response.is_streamed
+        text = response.get_data(as_text=True)
+        exported = json.loads(text)
+        assert text == json.dumps(exported, indent=2)
+        assert [d["id"] for d in exported["devices"]] == [
+            "device_0",
+            "device_1",
+            "device_2",
+        ]
+        assert exported["devices"][1]["commands"]["cmd_0"]["data"] == CODE
+
+    def test_export_all_without_devices(self, client):
+        text = client.get("/api/commands/export-all").get_data(as_text=True)
+
+        assert json.loads(text)["devices"] == []
+        assert text == json.dumps(json.loads(text), indent=2)
+
+    def test_export_all_failure_midstream_is_detectable(self, client, manager, mocker):
+        manager.import_commands(_export(3)["devices"])
+        resolve = manager._resolve_payloads
+        calls = []
+
+        def failing(device):
+            calls.append(device)
+            if len(calls) == 2:
+                raise OSError("payload pack unreadable")
+            return resolve(device)
+
+        mocker.patch.object(manager, "_resolve_payloads", side_effect=failing)
+
+        response = client.get("/api/commands/export-all")
+
+        assert response.status_code == 200
+        exported = json.loads(response.get_data(as_text=True))
+        assert [d["id"] for d in exported["devices"]] == ["device_0"]
+        assert exported["error"] == "payload pack unreadable"
+
+        imported = client.post("/api/commands/import-json", json=exported)
+        assert imported.status_code == 400
+        assert "incomplete" in imported.get_json()["error"]
+
+    def test_export_all_failure_before_streaming(self, client, manager, mocker):
+        manager.import_commands(_export(1)["devices"])
+        mocker.patch.object(
+            manager, "_resolve_payloads", side_effect=OSError("no payloads")
+        )
+
+        response = client.get("/api/commands/export-all")
+
+        assert response.status_code == 500
+        assert response.get_json()["error"] == "no payloads"
+
+    def test_import_json(self, client, manager):
+        response = client.post("/api/commands/import-json", json=_export(50))
+
+        assert response.get_json()["imported"] == 150
+        assert len(manager.get_all_devices()) == 50
+
+    def test_import_single_device_export(self, client, manager):
+        single = {"device": {"id": "tv"}, "commands": {"power": {"data": CODE}}}
+
+        assert client.post("/api/commands/import-json", json=single).status_code == 200
+        assert manager.get_command_data("tv", "power") == CODE
+
+    def test_import_rejects_invalid_format(self, client):
+        response = client.post("/api/commands/import-json", json={"foo": 1})
+
+        assert response.status_code == 400
+        assert "Invalid export format" in response.get_json()["error"]
+
+    def test_import_streams_progress_events(self, client, manager):
+        response = client.post("/api/commands/import-json?stream=1", json=_export(4))
+
+        events = [
+            json.loads(line[len("data: ") :])
+            for line in response.get_data(as_text=True).splitlines()
+            if line.startswith("data: ")
+        ]
+        assert [e["status"] for e in events] == ["progress"] * 4 + ["complete"]
+        assert events[-1]["imported"] == 12
+        assert len(manager.get_all_devices()) == 4
@@ -0,0 +1,100 @@
+"""
+Unit tests for response compression and precompressed assets
+"""
+
+import pytest
+import gzip
+import sys
+from pathlib import Path
+
+from flask import Flask, jsonify
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+from compression import IMMUTABLE_CACHE_CONTROL, ResponseCompressor, send_asset
+from response_cache import ResponseCache
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+@pytest.fixture
+def compressed_client(temp_storage_dir):
+    app = Flask(__name__)
+    ResponseCompressor(min_size=100).init_app(app)
+    cache = ResponseCache()
+
+    @app.route("/large")
+    @cache.cached(lambda: 1)
+    def large():
+        return jsonify({"commands": ["power"] * 100})
+
+    @app.route("/small")
+    def small():
+        return jsonify({"ok": True})
+
+    @app.route("/assets/<path:filename>")
+    def assets(filename):
+        return send_asset(temp_storage_dir, filename)
+
+    return app.test_client()
+
+
+@pytest.mark.unit
+class TestResponseCompressor:
+    """Test JSON compression negotiation"""
+
+    def test_large_json_is_gzipped(self, compressed_client):
+        response = compressed_client.get("/large", headers=GZIP)
+
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert gzip.decompress(response.data).startswith(b'{"commands"')
+
+    def test_small_or_unaccepted_responses_stay_raw(self, compressed_client):
+        assert (
+            "Content-Encoding"
+            not in compressed_client.get("/small", headers=GZIP).headers
+        )
+        assert "Content-Encoding" not in compressed_client.get("/large").headers
+
+    def test_weak_etag_still_revalidates(self, compressed_client):
+        etag = compressed_client.get("/large", headers=GZIP).headers["ETag"]
+        assert etag.startswith("W/")
+
+        response = compressed_client.get(
+            "/large", headers={**GZIP, "If-None-Match": etag}
+        )
+        assert response.status_code == 304
+
+
+@pytest.mark.unit
+class TestSendAsset:
+    """Test precompressed static assets"""
+
+    def test_precompressed_variant_with_immutable_headers(
+        self, compressed_client, temp_storage_dir
+    ):
+        (temp_storage_dir / "index-CVXaDSul.js").write_text("console.log(1)")
+        (temp_storage_dir / "index-CVXaDSul.js.gz").write_bytes(
+            gzip.compress(b"console.log(1)")
+        )
+
+        response = compressed_client.get("/assets/index-CVXaDSul.js", headers=GZIP)
+
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.mimetype == "text/javascript"
+        assert response.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+        assert gzip.decompress(response.data) == b"console.log(1)"
+
+    def test_unhashed_or_unaccepted_served_raw(
+        self, compressed_client, temp_storage_dir
+    ):
+        (temp_storage_dir / "logo.svg").write_text("<svg/>")
+        (temp_storage_dir / "logo.svg.gz").write_bytes(gzip.compress(b"<svg/>"))
+
+        response = compressed_client.get("/assets/logo.svg")
+
+        assert response.data == b"<svg/>"
+        assert "immutable" not in response.headers.get("Cache-Control", "")
+        assert compressed_client.get("/assets/../secret").status_code == 404
@@ -178,3 +178,56 @@ class TestEntityIDHelpers:
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
+
+
+class TestDeviceListingShape:
+    """Test payload-free summaries and field projection for listings"""
+
+    def test_summary_strips_payloads(self):
+        from api.devices import shape_device
+
+        device = {
+            "id": "tv",
+            "name": "TV",
+            "commands": {
+                "power": {"type": "ir", "data": "JgBQ", "tested": True},
+                "mute": {"type": "ir", "data_hash": "ab" * 16},
+                "input": {"type": "rf", "data": "pending"},
+                "menu": {"type": "ir", "data": "error"},
+            },
+        }
+
+        shaped = shape_device(device, summary=True)
+
+        assert shaped["command_count"] == 4
+        assert shaped["commands"]["power"] == {"type": "ir", "tested": True}
+        assert shaped["commands"]["mute"] == {"type": "ir"}
+        assert shaped["commands"]["input"] == {"type": "rf", "pending": True}
+        assert shaped["commands"]["menu"] == {"type": "ir", "error": True}
+        assert device["commands"]["power"]["data"] == "JgBQ"
+
+    def test_fields_projection(self):
+        from api.devices import shape_device
+
+        device = {"id": "tv", "name": "TV", "area": "Den", "commands": {"a": {}}}
+
+        assert shape_device(device, {"id", "name"}) == {"id": "tv", "name": "TV"}
+        assert shape_device(device, {"id", "command_count"}, summary=True) == {
+            "id": "tv",
+            "command_count": 1,
+        }
+
+    def test_saving_a_listed_device_keeps_codes(self, flask_app):
+        device_manager = flask_app.config["device_manager"]
+        device_manager.create_device("tv", {"name": "TV"})
+        assert device_manager.add_learned_command("tv", "power", "JgBQAAAB", "ir")
+        client = flask_app.test_client()
+
+        listed = client.get("/api/devices/managed?summary=1").get_json()["devices"][0]
+        listed["name"] = "Television"
+        response = client.put("/api/devices/managed/tv", json=listed)
+
+        assert response.status_code == 200
+        assert device_manager.get_command("tv", "power")["data"] == "JgBQAAAB"
+        assert device_manager.get_device("tv")["name"] == "Television"
+        assert "command_count" not in device_manager.get_device("tv")
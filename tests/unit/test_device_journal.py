@@ -0,0 +1,138 @@
+"""
+Unit tests for the devices.json journal
+"""
+
+import pytest
+import json
+import sys
+from pathlib import Path
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+import device_storage
+from device_journal import apply_records, diff_devices
+from device_manager import DeviceManager
+
+
+@pytest.fixture
+def manager(temp_storage_dir, sample_device_data):
+    manager = DeviceManager(storage_path=temp_storage_dir)
+    manager.backend.COMPACT_DELAY = 3600
+    manager.create_device("tv", dict(sample_device_data))
+    manager.compact_storage()
+    yield manager
+    timer = device_storage._compaction_timers.pop(str(manager.devices_file), None)
+    if timer is not None:
+        timer.cancel()
+
+
+def _snapshot(manager):
+    return json.loads(manager.devices_file.read_text())
+
+
+def _records(manager):
+    lines = manager.backend.journal.journal_file.read_text().splitlines()
+    return [json.loads(line) for line in lines[1:]]
+
+
+@pytest.mark.unit
+class TestDiff:
+    """Test record generation and replay"""
+
+    def test_replay_reproduces_new_state(self):
+        old = {
+            "a": {"name": "A", "commands": {"on": {"data": "1"}, "off": {"data": "2"}}},
+            "b": {"name": "B"},
+        }
+        new = {
+            "a": {"name": "A2", "commands": {"on": {"data": "1"}, "up": {"data": "3"}}},
+            "c": {"name": "C"},
+        }
+
+        records = diff_devices(old, new)
+        replayed = json.loads(json.dumps(old))
+        apply_records(replayed, records)
+
+        assert replayed == new
+        assert list(replayed["a"]["commands"]) == ["on", "up"]
+        assert {"op": "delete", "id": "b"} in records
+
+    def test_command_change_is_a_small_patch(self):
+        old = {"a": {"name": "A", "commands": {"on": {"data": "x" * 1000}}}}
+        new = json.loads(json.dumps(old))
+        new["a"]["commands"]["off"] = {"data": "2"}
+
+        assert diff_devices(old, new) == [
+            {"op": "patch", "id": "a", "commands_set": {"off": {"data": "2"}}}
+        ]
+
+    def test_reordered_devices_need_a_snapshot(self):
+        assert diff_devices({"a": {}, "b": {}}, {"b": {}, "a": {}}) is None
+        assert diff_devices({"a": {}}, {"a": {}}) == []
+
+
+@pytest.mark.unit
+class TestJournaledSaves:
+    """Test journaling, replay and compaction in DeviceManager"""
+
+    def test_mutation_is_journaled_not_snapshotted(self, manager):
+        manager.add_command("tv", "power", {"data": "JgBQ"})
+
+        assert "power" not in _snapshot(manager)["tv"]["commands"]
+        record = _records(manager)[-1]["commands_set"]["power"]
+        assert record["data_hash"] == manager.payloads.put_base64("JgBQ")
+        assert manager.get_command_data("tv", "power") == "JgBQ"
+
+    def test_new_instance_replays_journal(self, manager):
+        manager.add_command("tv", "power", {"data": "JgBQ"})
+        manager.delete_command("tv", "power")
+        manager.add_command("tv", "mute", {"data": "JgBR"})
+
+        # Simulate a process restart
+        device_storage._committed_state.clear()
+        device_storage._exit_compaction_paths.clear()
+        reopened = DeviceManager(storage_path=manager.storage_path)
+
+        assert list(reopened.get_device_commands("tv")) == ["mute"]
+        assert "mute" in _snapshot(manager)["tv"]["commands"]
+
+    def test_compaction_folds_journal_into_snapshot(self, manager):
+        manager.add_command("tv", "power", {"data": "JgBQ"})
+        before = manager._load_devices()
+
+        assert manager.compact_storage() is True
+        assert _snapshot(manager) == before
+        assert _records(manager) == []
+        assert manager.backend.backup_file.exists()
+
+    def test_record_threshold_triggers_compaction(self, manager):
+        manager.backend.COMPACT_RECORDS = 3
+        for i in range(3):
+            manager.add_command("tv", f"cmd_{i}", {"data": str(i)})
+
+        assert list(_snapshot(manager)["tv"]["commands"]) == ["cmd_0", "cmd_1", "cmd_2"]
+        assert _records(manager) == []
+
+    def test_torn_last_record_is_ignored(self, manager):
+        manager.add_command("tv", "power", {"data": "JgBQ"})
+        with open(manager.backend.journal.journal_file, "a") as f:
+            f.write('{"op":"patch","id":"tv","set":{"na')
+
+        assert manager.get_command_data("tv", "power") == "JgBQ"
+        manager.add_command("tv", "mute", {"data": "JgBR"})
+
+        assert [r["op"] for r in _records(manager)] == ["patch", "patch"]
+        assert set(manager.get_device_commands("tv")) == {"power", "mute"}
+
+    def test_external_snapshot_edit_wins_over_journal(self, manager):
+        manager.add_command("tv", "power", {"data": "JgBQ"})
+        manager.devices_file.write_text(json.dumps({"other": {"name": "Other"}}))
+
+        assert list(manager.get_all_devices()) == ["other"]
+
+        manager.update_device("other", {"name": "Renamed"})
+        assert manager.get_device("other")["name"] == "Renamed"
+        assert manager.backend.journal.journal_file.with_suffix(
+            ".journal.stale"
+        ).exists()
@@ -13,7 +13,7 @@ class TestDeviceManager:
     def test_initialization(self, device_manager):
         """Test DeviceManager initializes correctly"""
         assert device_manager.storage_path.exists()
-        assert device_manager.devices_file.exists()
+        assert device_manager.backend.storage_file.exists()
     
     def test_create_device(self, device_manager, sample_device_data):
         """Test creating a new device"""
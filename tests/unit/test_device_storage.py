@@ -0,0 +1,127 @@
+"""
+Unit tests for DeviceManager storage backends
+"""
+
+import pytest
+import json
+import re
+import sys
+from pathlib import Path
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+from device_manager import DeviceManager
+from device_storage import SqliteDeviceBackend, create_backend
+
+DEVICES = {
+    "tv": {
+        "name": "TV",
+        "device_type": "broadlink",
+        "broadlink_entity": "remote.living_room",
+        "area": "Living Room",
+        "commands": {
+            "power": {"type": "ir", "data": "JgBQ01"},
+            "mute": {"type": "ir", "data": "JgBQ02"},
+        },
+        "created_at": "2025-01-01T00:00:00",
+    },
+    "ac": {
+        "name": "AC",
+        "device_type": "smartir",
+        "controller_device": "remote.bedroom",
+        "area": "Bedroom",
+    },
+    "fan": {
+        "name": "Fan",
+        "broadlink_entity": "remote.bedroom",
+        "commands": {},
+    },
+}
+
+
+@pytest.fixture
+def sqlite_backend(temp_storage_dir):
+    (temp_storage_dir / "devices.json").write_text(json.dumps(DEVICES, indent=2))
+    return create_backend("sqlite", temp_storage_dir)
+
+
+@pytest.mark.unit
+class TestSqliteBackend:
+    """Test the SQLite backend against devices.json semantics"""
+
+    def test_imports_devices_json_on_first_start(self, sqlite_backend):
+        devices = sqlite_backend.load_devices()
+
+        assert json.dumps(devices) == json.dumps(DEVICES)
+        assert sqlite_backend.db_file.exists()
+
+    def test_export_round_trips(self, sqlite_backend, temp_storage_dir):
+        path = temp_storage_dir / "export.json"
+
+        assert sqlite_backend.export_json(path) == 3
+        assert path.read_text() == json.dumps(DEVICES, indent=2)
+
+    def test_find_devices_uses_field_defaults(self, sqlite_backend):
+        assert list(sqlite_backend.find_devices("device_type", "broadlink")) == [
+            "tv",
+            "fan",
+        ]
+        bedroom = sqlite_backend.find_devices("broadlink_entity", "remote.bedroom")
+        assert bedroom == {"fan": DEVICES["fan"]}
+        assert list(sqlite_backend.find_devices("area", "Bedroom")) == ["ac"]
+
+    def test_save_keeps_device_and_command_order(self, sqlite_backend):
+        device = sqlite_backend.load_device("tv")
+        del device["commands"]["power"]
+        device["commands"]["power"] = {"type": "ir", "data": "JgBQ03"}
+        device["updated_at"] = "2025-01-02T00:00:00"
+
+        assert sqlite_backend.save_device("tv", device) is True
+        assert list(sqlite_backend.load_devices()) == ["tv", "ac", "fan"]
+        assert list(sqlite_backend.load_device("tv")["commands"]) == ["mute", "power"]
+        assert sqlite_backend.get_command("tv", "power")["data"] == "JgBQ03"
+
+    def test_reordered_save_rewrites_positions(self, sqlite_backend):
+        devices = sqlite_backend.load_devices()
+        reordered = {key: devices[key] for key in ("fan", "tv", "ac")}
+
+        assert sqlite_backend.save_devices(reordered) is True
+        assert sqlite_backend.load_devices() == reordered
+        assert list(sqlite_backend.load_devices()) == ["fan", "tv", "ac"]
+
+    def test_delete_removes_command_rows(self, sqlite_backend):
+        assert sqlite_backend.save_device("tv", None) is True
+
+        assert sqlite_backend.load_device("tv") is None
+        assert sqlite_backend.get_command("tv", "power") is None
+
+
+@pytest.mark.unit
+def test_backends_produce_identical_state(temp_storage_dir, sample_command_data):
+    managers = [
+        DeviceManager(storage_path=temp_storage_dir / name, backend=name)
+        for name in ("json", "sqlite")
+    ]
+    for manager in managers:
+        manager.import_devices_json(_write_devices(temp_storage_dir))
+        manager.add_command("fan", "speed_1", dict(sample_command_data))
+        manager.update_device("ac", {"area": "Office"})
+        manager.delete_command("tv", "power")
+        manager.create_device("light", {"name": "Light"})
+        manager.delete_device("tv")
+        manager.migrate_device_field()
+
+    # Timestamps differ between the two runs
+    json_state, sqlite_state = (
+        re.sub(r'"\w+_at": "[^"]*"', "", json.dumps(m.get_all_devices()))
+        for m in managers
+    )
+    assert json_state == sqlite_state
+    assert isinstance(managers[1].backend, SqliteDeviceBackend)
+
+
+def _write_devices(directory: Path) -> Path:
+    path = directory / "seed.json"
+    path.write_text(json.dumps(DEVICES))
+    return path
@@ -555,5 +555,102 @@ class TestCollectAll:
         datetime.fromisoformat(timestamp)  # Should not raise exception
 
 
+class TestConcurrentCollection:
+    """Test concurrent collectors, timeouts and static section cache"""
+
+    def test_slow_collector_marks_report_partial(self):
+        """Test that a collector exceeding its timeout does not stall the report"""
+        import time
+
+        collector = DiagnosticsCollector("/tmp/storage")
+        collector.COLLECTORS = [
+            ("configuration", "_collect_configuration", 5),
+            ("ha_connection", "_collect_ha_connection", 0.1),
+        ]
+        collector._collect_ha_connection = lambda: time.sleep(2) or {}
+
+        started = time.monotonic()
+        data = collector.collect_all()
+
+        assert time.monotonic() - started < 1
+        assert data["partial"] is True
+        assert data["incomplete_sections"] == ["ha_connection"]
+        assert data["ha_connection"]["timed_out"] is True
+        assert "storage_path" in data["configuration"]
+
+    def test_complete_report_is_not_partial(self):
+        """Test that a report with all sections is marked complete"""
+        collector = DiagnosticsCollector("/tmp/storage")
+        data = collector.collect_all()
+
+        assert data["partial"] is False
+        assert "incomplete_sections" not in data
+        assert list(data)[1:-1] == [section for section, _, _ in collector.COLLECTORS]
+
+    def test_static_sections_are_cached(self):
+        """Test that static sections are reused across collectors"""
+        from app import diagnostics
+
+        diagnostics._static_sections.clear()
+        first = DiagnosticsCollector("/tmp/storage")
+        first.collect_all()
+
+        second = DiagnosticsCollector("/tmp/storage")
+        with patch.object(second, "_collect_dependencies") as deps:
+            second._collect_section("dependencies", "_collect_dependencies")
+
+        deps.assert_not_called()
+
+    def test_partial_report_renders_markdown(self):
+        """Test markdown generation with timed out sections"""
+        collector = DiagnosticsCollector("/tmp/storage")
+        collector.COLLECTORS = [
+            ("system", "_collect_system_info", 5),
+            ("configuration", "_collect_configuration", 5),
+            ("devices", "_collect_device_info", 5),
+            ("storage", "_collect_storage_info", 5),
+        ]
+        data = collector.collect_all()
+        timed_out = {"error": "Timed out after 5s", "timed_out": True}
+        data.update(
+            backups=timed_out,
+            command_structure=timed_out,
+            partial=True,
+            incomplete_sections=["backups", "command_structure"],
+        )
+
+        report = collector.generate_markdown_report(data)
+
+        assert "Partial report" in report
+
+
+class TestRecentErrors:
+    """Test log tail reading"""
+
+    def test_tail_lines_matches_readlines(self):
+        """Test that the reverse tail-seek returns the same lines as readlines"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            log_file = Path(tmpdir) / "broadlink_manager.log"
+            log_file.write_text(
+                "".join(f"2025-01-01 - app - INFO - line {i} {'x' * (i % 50)}\n" for i in range(5000))
+            )
+            expected = [line.rstrip("\n") for line in log_file.read_text().splitlines(True)[-100:]]
+
+            assert DiagnosticsCollector._tail_lines(log_file, 100, block_size=512) == expected
+            assert DiagnosticsCollector._tail_lines(log_file, 100) == expected
+
+    def test_tail_lines_short_file_without_trailing_newline(self):
+        """Test tail of a file shorter than the requested line count"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            log_file = Path(tmpdir) / "short.log"
+            log_file.write_text("one\ntwo\nthree")
+
+            assert DiagnosticsCollector._tail_lines(log_file, 100, block_size=4) == [
+                "one",
+                "two",
+                "three",
+            ]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,88 @@
+"""
+Unit tests for EntityDetector command classification
+"""
+
+import pytest
+import re
+import sys
+from pathlib import Path
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+from entity_detector import EntityDetector
+
+
+def _reference_detect(command_name: str):
+    """Original sequential implementation of EntityDetector.detect"""
+    command_lower = command_name.lower().strip()
+    for pattern, entity_type, command_role in EntityDetector.PATTERNS:
+        match = re.match(pattern, command_lower)
+        if match:
+            if command_role in ("speed", "temperature", "position") and match.groups():
+                return entity_type, f"{command_role}_{match.group(1)}"
+            return entity_type, command_role
+    return None, None
+
+
+@pytest.fixture
+def detector():
+    return EntityDetector()
+
+
+@pytest.mark.unit
+class TestDetect:
+    """Test the compiled classifier against the sequential one"""
+
+    def test_every_pattern_literal_matches_reference(self, detector):
+        names = []
+        for pattern, _, _ in EntityDetector.PATTERNS:
+            body = pattern.strip("^$")
+            names.append(body.replace(r"(\d+)", "3"))
+            names.extend(body.strip("()").split("|"))
+
+        for name in names:
+            assert detector.detect(name) == _reference_detect(name), name
+
+    @pytest.mark.parametrize(
+        "name, expected",
+        [
+            ("power", ("switch", "toggle")),
+            ("power_toggle", ("media_player", "power")),
+            ("stop", ("media_player", "stop")),
+            ("fan_low", ("fan", "speed_low")),
+            ("Fan_Speed_12 ", ("fan", "speed_12")),
+            ("temp_22", ("climate", "temperature_22")),
+            ("set_temp_18", ("climate", "temperature_18")),
+            ("preset_2", ("cover", "position_2")),
+            ("fan_speed_", (None, None)),
+            ("light_on_extra", (None, None)),
+            ("xlight_on", (None, None)),
+            ("", (None, None)),
+        ],
+    )
+    def test_known_names(self, detector, name, expected):
+        assert detector.detect(name) == expected
+        assert _reference_detect(name) == expected
+
+    def test_results_are_memoized_per_normalized_name(self, detector):
+        detector.detect("Light_On")
+        detector.detect(" light_on ")
+
+        assert list(detector._detect_cache) == ["light_on"]
+
+    def test_memo_is_bounded(self, detector):
+        detector.DETECT_CACHE_SIZE = 5
+        for i in range(12):
+            detector.detect(f"unknown_{i}")
+
+        assert len(detector._detect_cache) <= 5
+
+    def test_earlier_regex_shadows_later_literal(self):
+        class CustomDetector(EntityDetector):
+            PATTERNS = [
+                (r"^speed_(\d+)$", "fan", "speed"),
+                (r"^speed_1$", "switch", "turn_on"),
+            ]
+
+        assert CustomDetector().detect("speed_1") == ("fan", "speed_1")
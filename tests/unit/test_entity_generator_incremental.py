@@ -0,0 +1,262 @@
+"""
+Unit tests for incremental entity generation
+"""
+
+import pytest
+import json
+import os
+import sys
+from pathlib import Path
+from unittest.mock import Mock
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+import entity_generator
+from entity_generator import EntityGenerator
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Create a storage stub writing into a temporary directory"""
+    mock_storage = Mock()
+    mock_storage.package_file = tmp_path / "package.yaml"
+    mock_storage.helpers_file = tmp_path / "helpers.yaml"
+    mock_storage.package_output_path = None
+    mock_storage.get_all_entities.side_effect = lambda: json.loads(
+        json.dumps(mock_storage.entities)
+    )
+    mock_storage.entities = {
+        "living_room_light": {
+            "entity_type": "light",
+            "device": "living_room",
+            "broadlink_entity": "remote.rm4_pro",
+            "friendly_name": "Living Room Light",
+            "commands": {"turn_on": "light_on", "turn_off": "light_off"},
+        },
+        "bedroom_fan": {
+            "entity_type": "fan",
+            "device": "bedroom",
+            "broadlink_entity": "remote.rm4_pro",
+            "friendly_name": "Bedroom Fan",
+            "commands": {
+                "turn_off": "fan_off",
+                "speed_1": "fan_speed_1",
+                "speed_2": "fan_speed_2",
+            },
+        },
+    }
+    return mock_storage
+
+
+@pytest.fixture
+def broadlink_commands():
+    return {
+        "living_room": {"light_on": "JgBQAAAB", "light_off": "JgBQAAAC"},
+        "bedroom": {
+            "fan_off": "JgBQAAAD",
+            "fan_speed_1": "JgBQAAAE",
+            "fan_speed_2": "JgBQAAAF",
+        },
+    }
+
+
+def _body(path: Path) -> str:
+    """File content without the generation timestamp line"""
+    lines = path.read_text().splitlines(keepends=True)
+    return lines[0] + "".join(lines[2:])
+
+
+@pytest.mark.unit
+class TestIncrementalGeneration:
+    """Test change detection and skipped writes"""
+
+    def test_first_generation_reports_all_added(self, storage, broadlink_commands):
+        result = EntityGenerator(storage).generate_all(broadlink_commands)
+
+        assert result["success"] is True
+        assert result["changed"] is True
+        assert result["changed_entities"]["added"] == [
+            "bedroom_fan",
+            "living_room_light",
+        ]
+        assert (storage.package_file.parent / "generation_state.json").exists()
+
+    def test_unchanged_regeneration_skips_writes(self, storage, broadlink_commands):
+        EntityGenerator(storage).generate_all(broadlink_commands)
+        os.utime(storage.package_file, (0, 0))
+
+        result = EntityGenerator(storage).generate_all(broadlink_commands)
+
+        assert result["changed"] is False
+        assert result["files_written"] == []
+        assert result["changed_entities"] == {
+            "added": [],
+            "modified": [],
+            "removed": [],
+        }
+        assert storage.package_file.stat().st_mtime == 0
+
+    def test_changed_command_data_marks_entity_modified(
+        self, storage, broadlink_commands
+    ):
+        EntityGenerator(storage).generate_all(broadlink_commands)
+
+        broadlink_commands["bedroom"]["fan_speed_2"] = "JgBQAAAZ"
+        result = EntityGenerator(storage).generate_all(broadlink_commands)
+
+        assert result["changed"] is True
+        assert result["changed_entities"]["modified"] == ["bedroom_fan"]
+        assert "JgBQAAAZ" in storage.package_file.read_text()
+
+    def test_removed_entity_reported(self, storage, broadlink_commands):
+        EntityGenerator(storage).generate_all(broadlink_commands)
+
+        del storage.entities["bedroom_fan"]
+        result = EntityGenerator(storage).generate_all(broadlink_commands)
+
+        assert result["changed_entities"]["removed"] == ["bedroom_fan"]
+        assert "bedroom_fan" not in storage.package_file.read_text()
+
+    def test_cached_blocks_match_full_build(self, storage, broadlink_commands):
+        generator = EntityGenerator(storage)
+        entities = storage.get_all_entities()
+        full = generator._build_entities_yaml(entities, broadlink_commands)
+
+        hashes = generator._compute_entity_hashes(entities, broadlink_commands)
+        generator._build_entities_yaml(entities, broadlink_commands, hashes)
+        cached = generator._build_entities_yaml(entities, broadlink_commands, hashes)
+
+        assert cached == full
+        assert generator._build_helpers_yaml(
+            entities, hashes
+        ) == generator._build_helpers_yaml(entities)
+
+    def test_key_types_change_entity_hash(self, storage, broadlink_commands):
+        generator = EntityGenerator(storage)
+        variants = [{1: "low"}, {"1": "low"}, {True: "on"}, {"true": "on"}]
+
+        hashes = {
+            generator._compute_entity_hashes(
+                {"fan": {"entity_type": "fan", "device": "bedroom", "speeds": speeds}},
+                broadlink_commands,
+            )["fan"]
+            for speeds in variants
+        }
+
+        assert len(hashes) == len(variants)
+
+    def test_rewrites_file_edited_by_hand(self, storage, broadlink_commands):
+        EntityGenerator(storage).generate_all(broadlink_commands)
+        expected = _body(storage.package_file)
+        storage.package_file.write_text("# edited\n")
+
+        result = EntityGenerator(storage).generate_all(broadlink_commands)
+
+        assert str(storage.package_file) in result["files_written"]
+        assert _body(storage.package_file) == expected
+
+
+@pytest.mark.unit
+class TestParallelBuild:
+    """Test the process pool build path"""
+
+    def _generate(self, storage, broadlink_commands, **kwargs):
+        entity_generator._entity_block_cache.clear()
+        generator = EntityGenerator(storage, "remote.default", **kwargs)
+        result = generator.generate_all(broadlink_commands)
+        return result, _body(storage.package_file), _body(storage.helpers_file)
+
+    def test_parallel_output_matches_serial(
+        self, storage, broadlink_commands, tmp_path
+    ):
+        for i in range(20):
+            storage.entities[f"switch_{i}"] = {
+                "entity_type": "switch",
+                "device": f"device_{i % 3}",
+                "friendly_name": f"Switch {i}",
+                "commands": {"turn_on": "on", "turn_off": "off"},
+            }
+            broadlink_commands[f"device_{i % 3}"] = {"on": "JgBQ01", "off": "JgBQ02"}
+        storage.entities["ac"] = {
+            "entity_type": "climate",
+            "device": "bedroom",
+            "commands": {},
+        }
+
+        serial = self._generate(storage, broadlink_commands, parallel_threshold=None)
+
+        parallel_dir = tmp_path / "parallel"
+        parallel_dir.mkdir()
+        storage.package_file = parallel_dir / "package.yaml"
+        storage.helpers_file = parallel_dir / "helpers.yaml"
+        parallel = self._generate(
+            storage, broadlink_commands, parallel_threshold=1, max_workers=2
+        )
+
+        assert parallel[1:] == serial[1:]
+        assert parallel[0]["validation_warnings"] == serial[0]["validation_warnings"]
+
+    def test_small_rebuild_stays_serial(self, storage, broadlink_commands):
+        entity_generator._entity_block_cache.clear()
+        generator = EntityGenerator(storage, parallel_threshold=500, max_workers=4)
+        entities = storage.get_all_entities()
+        hashes = generator._compute_entity_hashes(entities, broadlink_commands)
+
+        assert generator._prebuild_blocks(entities, broadlink_commands, hashes) == 0
+
+    def test_parallel_build_is_opt_in(self, storage):
+        from entity_generator_v2 import EntityGeneratorV2
+
+        assert EntityGenerator(storage).parallel_threshold is None
+        assert EntityGeneratorV2(Mock(), "/tmp").v1_generator.parallel_threshold is None
+        enabled = EntityGeneratorV2(Mock(), "/tmp", parallel_build=True)
+        assert (
+            enabled.v1_generator.parallel_threshold
+            == entity_generator.PARALLEL_BUILD_THRESHOLD
+        )
+
+    def test_workers_limited_to_container_cpus(self, monkeypatch):
+        monkeypatch.setattr(os, "cpu_count", lambda: 64)
+        monkeypatch.setattr(os, "sched_getaffinity", lambda pid: {0, 1}, raising=False)
+
+        assert 1 <= entity_generator.available_cpus() <= 2
+
+
+@pytest.mark.unit
+class TestReloadAfterGeneration:
+    """HA reload after /api/entities/generate"""
+
+    @pytest.fixture
+    def server(self, flask_app):
+        from unittest.mock import AsyncMock
+
+        server = flask_app.config["web_server"]
+        server._reload_broadlink_config = AsyncMock(return_value=True)
+        server.area_manager = Mock()
+        server.area_manager.reload_config = AsyncMock(return_value=True)
+        return server
+
+    def _reload(self, server, config_changed):
+        import asyncio
+
+        results = {"config_changed": config_changed, "message": ""}
+        asyncio.run(server._reload_generated_config(results))
+        return results
+
+    def test_unchanged_config_skips_reload(self, server):
+        assert self._reload(server, config_changed=False)["config_reloaded"] is False
+        server.area_manager.reload_config.assert_not_awaited()
+
+    def test_failed_reload_retried_until_it_succeeds(self, server):
+        server.area_manager.reload_config.return_value = False
+        assert self._reload(server, config_changed=True)["config_reloaded"] is False
+        assert server._reload_pending_file().exists()
+
+        # Nothing changed since, but HA never loaded the last files
+        server.area_manager.reload_config.return_value = True
+        assert self._reload(server, config_changed=False)["config_reloaded"] is True
+        assert not server._reload_pending_file().exists()
+
+        assert self._reload(server, config_changed=False)["config_reloaded"] is False
+        assert server.area_manager.reload_config.await_count == 2
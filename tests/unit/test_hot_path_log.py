@@ -0,0 +1,100 @@
+"""
+Unit tests for structured, rate-limited hot path logging
+"""
+
+import logging
+import pytest
+import sys
+from pathlib import Path
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+from hot_path_log import HOT_PATH_LOGGER, HotPathLogger, configure_hot_path_logging
+
+
+@pytest.fixture
+def hot_paths_enabled():
+    category = logging.getLogger(HOT_PATH_LOGGER)
+    configure_hot_path_logging("trace")
+    yield
+    category.setLevel(logging.NOTSET)
+
+
+@pytest.mark.unit
+class TestHotPathLogger:
+    """Test formatting, laziness, rate limiting and sampling"""
+
+    def test_event_rendered_as_logfmt(self, caplog, hot_paths_enabled):
+        log = HotPathLogger("test_format")
+
+        with caplog.at_level(logging.DEBUG):
+            log.debug("ha.request", method="GET", title="Learn command", empty="")
+
+        [record] = caplog.records
+        assert (
+            record.getMessage()
+            == 'ha.request method=GET title="Learn command" empty=""'
+        )
+        assert record.event == "ha.request"
+        assert record.fields["method"] == "GET"
+        assert record.name == f"{HOT_PATH_LOGGER}.test_format"
+
+    def test_disabled_category_skips_field_callables(self, caplog):
+        log = HotPathLogger("test_lazy")
+        calls = []
+
+        with caplog.at_level(logging.INFO):
+            configure_hot_path_logging("info")
+            try:
+                log.debug("expensive", value=lambda: calls.append(1))
+                log.info("cheap", value=lambda: len(calls))
+            finally:
+                logging.getLogger(HOT_PATH_LOGGER).setLevel(logging.NOTSET)
+
+        assert calls == []
+        assert [r.getMessage() for r in caplog.records] == ["cheap value=0"]
+
+    def test_rate_limit_reports_suppressed(
+        self, caplog, hot_paths_enabled, monkeypatch
+    ):
+        now = [1000.0]
+        monkeypatch.setattr("hot_path_log.time.monotonic", lambda: now[0])
+        log = HotPathLogger("test_rate", burst=2, period=60)
+
+        with caplog.at_level(logging.DEBUG):
+            for _ in range(5):
+                log.warning("ha.request_failed", status=500)
+            log.warning("other.event")
+            now[0] += 61
+            log.warning("ha.request_failed", status=500)
+
+        assert [r.getMessage() for r in caplog.records] == [
+            "ha.request_failed status=500",
+            "ha.request_failed status=500",
+            "other.event",
+            "ha.request_failed status=500 suppressed=3",
+        ]
+
+    def test_sampling_keeps_one_in_n(self, caplog, hot_paths_enabled):
+        log = HotPathLogger("test_sample", burst=100)
+
+        with caplog.at_level(logging.DEBUG):
+            for i in range(10):
+                log.debug("notifications.seen", sample=5, i=i)
+
+        assert [r.getMessage() for r in caplog.records] == [
+            "notifications.seen i=0 sampled=1/5",
+            "notifications.seen i=5 sampled=1/5",
+        ]
+
+
+@pytest.mark.unit
+def test_command_send_logs_nothing_at_info(client, caplog):
+    with caplog.at_level(logging.INFO):
+        client.post(
+            "/api/commands/test",
+            json={"entity_id": "remote.x", "device": "tv", "command": "power"},
+        )
+
+    assert not [r for r in caplog.records if r.levelno == logging.INFO]
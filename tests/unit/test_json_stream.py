@@ -0,0 +1,59 @@
+"""
+Unit tests for incremental JSON parsing
+"""
+
+import pytest
+import io
+import json
+import sys
+from pathlib import Path
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+from json_stream import iter_members
+
+DOCUMENT = {
+    "export_format": "broadlink_manager_v2",
+    "export_version": 12345,
+    "devices": [{"id": f"dev_{n}", "name": "Télé", "n": n} for n in range(20)],
+    "done": True,
+}
+
+
+def _members(data, **kwargs):
+    return list(iter_members(io.BytesIO(data), **kwargs))
+
+
+@pytest.mark.unit
+class TestIterMembers:
+    """Test streaming a top-level JSON object"""
+
+    @pytest.mark.parametrize("chunk_size", [1, 7, 65536])
+    def test_streams_array_elements(self, chunk_size):
+        data = json.dumps(DOCUMENT, indent=2, ensure_ascii=False).encode("utf-8")
+
+        members = _members(data, stream_keys=("devices",), chunk_size=chunk_size)
+
+        assert members[:2] == [
+            ("export_format", "broadlink_manager_v2"),
+            ("export_version", 12345),
+        ]
+        assert [value for key, value in members if key == "devices"] == (
+            DOCUMENT["devices"]
+        )
+        assert members[-1] == ("done", True)
+
+    def test_unstreamed_members_are_whole_values(self):
+        data = json.dumps(DOCUMENT).encode("utf-8")
+
+        assert dict(_members(data, chunk_size=3)) == DOCUMENT
+        assert _members(b' {"devices": []} ', stream_keys=("devices",)) == []
+        assert _members(b"{}") == []
+
+    @pytest.mark.parametrize(
+        "data", [b"[1, 2]", b'{"a": 1', b'{"a": [1, 2', b'{"a" 1}']
+    )
+    def test_invalid_input_raises(self, data):
+        with pytest.raises(ValueError):
+            _members(data, stream_keys=("a",), chunk_size=2)
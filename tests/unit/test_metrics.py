@@ -0,0 +1,157 @@
+"""
+Unit tests for Prometheus metrics
+"""
+
+import pytest
+import asyncio
+import sys
+from pathlib import Path
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+from metrics import (
+    HA_REQUEST_ERRORS,
+    LEARNING_DURATION,
+    MetricsRegistry,
+    ha_endpoint,
+    timed_ha_call,
+    timed_ha_request,
+    timed_learning,
+)
+
+
+@pytest.mark.unit
+class TestMetricsRegistry:
+    """Test metric types and text exposition"""
+
+    def test_counter_and_gauge_render(self):
+        registry = MetricsRegistry()
+        requests = registry.counter("requests_total", "Requests", ("route",))
+        queue = registry.gauge("queue_length", "Queue length")
+
+        requests.inc(route="/api/devices")
+        requests.inc(2, route="/api/devices")
+        queue.collect_from("test", lambda: {(): 3})
+
+        text = registry.render()
+        assert "# TYPE requests_total counter" in text
+        assert 'requests_total{route="/api/devices"} 3.0' in text
+        assert "queue_length 3.0" in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+
+        for value in (0.05, 0.5, 5.0):
+            latency.observe(value)
+
+        text = registry.render()
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1.0"} 2' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+        assert "latency_seconds_count 3" in text
+        assert "latency_seconds_sum 5.55" in text
+
+    def test_labels_must_match(self):
+        counter = MetricsRegistry().counter("c_total", "C", ("cache",))
+
+        with pytest.raises(ValueError):
+            counter.inc(route="/")
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry()
+        registry.counter("c_total", "C", ("name",)).inc(name='say "hi"\n')
+
+        assert 'c_total{name="say \\"hi\\"\\n"} 1.0' in registry.render()
+
+
+@pytest.mark.unit
+class TestInstrumentation:
+    """Test label normalization and timing helpers"""
+
+    def test_ha_endpoint_replaces_ids(self):
+        assert ha_endpoint("states/remote.living_room") == "states/{entity_id}"
+        assert (
+            ha_endpoint("config/config_entries/entry/abc123/reload")
+            == "config/config_entries/entry/{entry_id}/reload"
+        )
+        assert ha_endpoint("services/remote/send_command") == (
+            "services/remote/send_command"
+        )
+
+    def test_failed_ha_call_counts_as_error(self):
+        async def failing():
+            return None
+
+        key = ("websocket", "test/failing", "no_result")
+        before = HA_REQUEST_ERRORS._collected().get(key, 0)
+        assert (
+            asyncio.run(timed_ha_call("websocket", "test/failing", failing())) is None
+        )
+
+        assert HA_REQUEST_ERRORS._collected()[key] == before + 1
+
+    def test_failed_ha_request_counts_status(self):
+        async def request(status, result):
+            return status, result
+
+        errors = HA_REQUEST_ERRORS._collected
+        before = errors().get(("rest", "test/status", "404"), 0)
+
+        assert asyncio.run(timed_ha_request("test/status", request(404, {}))) == {}
+        assert asyncio.run(timed_ha_request("test/status", request(200, {}))) == {}
+
+        assert errors()[("rest", "test/status", "404")] == before + 1
+        assert ("rest", "test/status", "200") not in errors()
+
+    def test_failed_ha_get_is_counted(self):
+        from web_server import BroadlinkWebServer
+
+        server = BroadlinkWebServer.__new__(BroadlinkWebServer)
+
+        async def not_found(method, endpoint, data=None):
+            return 404, {}
+
+        server._send_ha_request = not_found
+        key = ("rest", "states/{entity_id}", "404")
+        before = HA_REQUEST_ERRORS._collected().get(key, 0)
+
+        result = asyncio.run(server._make_ha_request("GET", "states/remote.tv"))
+
+        assert result == {}
+        assert HA_REQUEST_ERRORS._collected()[key] == before + 1
+
+    def test_learning_outcomes(self):
+        @timed_learning("test")
+        def learn(code):
+            if code == "boom":
+                raise RuntimeError(code)
+            return code
+
+        learn("JgBQAA==")
+        learn(None)
+        with pytest.raises(RuntimeError):
+            learn("boom")
+
+        outcomes = {key[1] for key in LEARNING_DURATION._values if key[0] == "test"}
+        assert outcomes == {"learned", "no_signal", "error"}
+
+
+@pytest.mark.unit
+def test_metrics_endpoint_reports_routes(client):
+    client.get("/api/devices/managed")
+
+    response = client.get("/api/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    assert (
+        'broadlink_manager_http_requests_total{method="GET",'
+        'route="/api/devices/managed",status="200"}'
+    ) in text
+    assert "broadlink_manager_pending_command_polls 0" in text
+    assert 'broadlink_manager_cache_lookups_total{cache="response",result="miss"}' in (
+        text
+    )
@@ -0,0 +1,244 @@
+"""
+Unit tests for the content-addressed command payload store
+"""
+
+import pytest
+import base64
+import json
+import sys
+from pathlib import Path
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+from payload_store import PayloadStore
+
+CODE = base64.b64encode(bytes(range(256)) * 2).decode("ascii")
+
+
+def _learn(manager, device_id, command_name, data=CODE):
+    manager.add_learned_command(device_id, command_name, data, "ir")
+
+
+@pytest.fixture
+def manager(device_manager, sample_device_data):
+    device_manager.create_device("tv", dict(sample_device_data))
+    device_manager.create_device("bedroom_tv", dict(sample_device_data))
+    return device_manager
+
+
+@pytest.mark.unit
+class TestPayloadStore:
+    """Test the pack file on its own"""
+
+    def test_put_is_idempotent(self, temp_storage_dir):
+        store = PayloadStore(temp_storage_dir / "payloads.pack")
+
+        first = store.put(b"\x26\x00\x50")
+        second = store.put(b"\x26\x00\x50")
+
+        assert first == second
+        assert len(store) == 1
+        assert store.get(first) == b"\x26\x00\x50"
+
+    def test_only_canonical_base64_is_stored(self, temp_storage_dir):
+        store = PayloadStore(temp_storage_dir / "payloads.pack")
+
+        assert store.put_base64("pending") is None
+        assert store.put_base64("JgBQ\n") is None
+        assert store.put_base64("") is None
+        assert store.get_base64(store.put_base64("JgBQ")) == "JgBQ"
+
+    def test_torn_record_is_truncated_on_open(self, temp_storage_dir):
+        pack_file = temp_storage_dir / "payloads.pack"
+        digest = PayloadStore(pack_file).put(b"complete")
+        size = pack_file.stat().st_size
+        with open(pack_file, "ab") as f:
+            f.write(b"\x00" * 10)
+
+        reopened = PayloadStore(pack_file)
+
+        assert reopened.get(digest) == b"complete"
+        assert pack_file.stat().st_size == size
+
+    def test_reopen_uses_offset_table(self, temp_storage_dir):
+        pack_file = temp_storage_dir / "payloads.pack"
+        store = PayloadStore(pack_file)
+        digests = [store.put(bytes([n]) * 40) for n in range(50)]
+        store.checkpoint()
+        later = store.put(b"after checkpoint")
+
+        reopened = PayloadStore(pack_file)
+
+        assert reopened.stats()["unindexed"] == 1
+        assert len(reopened) == 51
+        assert all(reopened.get(d) == bytes([n]) * 40 for n, d in enumerate(digests))
+        assert reopened.get(later) == b"after checkpoint"
+
+    def test_stale_offset_table_is_ignored(self, temp_storage_dir):
+        pack_file = temp_storage_dir / "payloads.pack"
+        store = PayloadStore(pack_file)
+        store.put(b"old")
+        store.checkpoint()
+        pack_file.write_bytes(b"")
+        digest = PayloadStore(pack_file.with_name("other.pack")).put(b"new")
+
+        reopened = PayloadStore(pack_file)
+
+        assert len(reopened) == 0
+        assert reopened.get(digest) is None
+
+    def test_get_view_does_not_copy(self, temp_storage_dir):
+        store = PayloadStore(temp_storage_dir / "payloads.pack")
+        digest = store.put(b"\x26\x00\x50\x00")
+
+        view = store.get_view(digest)
+
+        assert isinstance(view, memoryview)
+        assert view.readonly
+        assert view.tobytes() == b"\x26\x00\x50\x00"
+
+
+@pytest.mark.unit
+class TestDeviceManagerPayloads:
+    """Test payload references through DeviceManager"""
+
+    def test_identical_codes_are_stored_once(self, manager):
+        _learn(manager, "tv", "power")
+        _learn(manager, "bedroom_tv", "power")
+
+        assert len(manager.payloads) == 1
+        stored = manager._load_devices()["tv"]["commands"]["power"]
+        assert "data" not in stored
+        assert list(stored)[:3] == ["name", "type", "data_hash"]
+
+    def test_reads_resolve_references(self, manager):
+        _learn(manager, "tv", "power")
+
+        assert manager.get_command_data("tv", "power") == CODE
+        command = manager.get_device("tv")["commands"]["power"]
+        assert list(command)[:3] == ["name", "type", "data"]
+        assert command["data"] == CODE
+        assert manager.get_all_devices()["tv"]["commands"]["power"]["data"] == CODE
+
+    def test_markers_stay_inline(self, manager):
+        manager.add_command("tv", "power", {"data": "pending", "type": "ir"})
+
+        assert manager._load_devices()["tv"]["commands"]["power"]["data"] == "pending"
+        assert manager.get_command_data("tv", "power") == "pending"
+
+    def test_import_moves_inline_data(self, manager, temp_storage_dir):
+        source = temp_storage_dir / "import.json"
+        source.write_text(
+            json.dumps({"tv": {"name": "TV", "commands": {"on": {"data": CODE}}}})
+        )
+
+        assert manager.import_devices_json(source) == 1
+        assert "data_hash" in manager._load_devices()["tv"]["commands"]["on"]
+        assert manager.get_command_data("tv", "on") == CODE
+
+    def test_prune_drops_unreferenced_payloads(self, manager):
+        _learn(manager, "tv", "power")
+        _learn(manager, "tv", "mute", "JgBQ")
+        manager.delete_command("tv", "mute")
+
+        assert manager.prune_payloads() == 1
+        assert len(manager.payloads) == 1
+        assert manager.get_command_data("tv", "power") == CODE
+
+    def test_prune_keeps_payloads_of_backup(self, manager, temp_storage_dir):
+        from device_manager import DeviceManager
+
+        if manager.backend.name != "json":
+            pytest.skip("Only the JSON backend keeps a backup")
+        _learn(manager, "tv", "mute", "JgBQ")
+        manager.compact_storage()
+        manager.delete_command("tv", "mute")
+        manager.compact_storage()
+
+        # devices.json lost: the next start restores the previous snapshot
+        (temp_storage_dir / "devices.json").unlink()
+        restored = DeviceManager(storage_path=temp_storage_dir, backend="json")
+
+        assert restored.get_command_data("tv", "mute") == "JgBQ"
+
+    def test_backup_keeps_codes_inline(self, manager, temp_storage_dir):
+        if manager.backend.name != "json":
+            pytest.skip("Only the JSON backend keeps a backup")
+        _learn(manager, "tv", "power")
+        manager.compact_storage()
+        _learn(manager, "tv", "mute", "JgBQ")
+        manager.compact_storage()
+
+        backup = json.loads((temp_storage_dir / "devices.json.backup").read_text())
+        assert backup["tv"]["commands"]["power"]["data"] == CODE
+        assert "data_hash" not in backup["tv"]["commands"]["power"]
+        # devices.json itself still references the pack
+        assert "data_hash" in manager._load_devices()["tv"]["commands"]["power"]
+
+    def test_codes_missing_from_pack_are_recovered_from_backup(
+        self, manager, temp_storage_dir, tmp_path
+    ):
+        from device_manager import DeviceManager
+
+        if manager.backend.name != "json":
+            pytest.skip("Only the JSON backend keeps a backup")
+        _learn(manager, "tv", "power")
+        manager.compact_storage()
+        _learn(manager, "tv", "mute", "JgBQ")
+        manager.compact_storage()
+
+        # Restored without payloads.pack
+        for name in ("devices.json", "devices.json.backup"):
+            (tmp_path / name).write_bytes((temp_storage_dir / name).read_bytes())
+        restored = DeviceManager(storage_path=tmp_path, backend="json")
+
+        assert restored.get_command_data("tv", "power") == CODE
+        assert restored.verify_payloads() == ["tv/mute"]
+
+    def test_prune_skipped_while_references_missing(
+        self, manager, temp_storage_dir, tmp_path
+    ):
+        from device_manager import DeviceManager
+
+        if manager.backend.name != "json":
+            pytest.skip("Only the JSON backend keeps a backup")
+        _learn(manager, "tv", "power")
+        manager.compact_storage()
+        (tmp_path / "devices.json").write_bytes(
+            (temp_storage_dir / "devices.json").read_bytes()
+        )
+        restored = DeviceManager(storage_path=tmp_path, backend="json")
+        _learn(restored, "bedroom_tv", "mute", "JgBQ")
+        restored.delete_command("bedroom_tv", "mute")
+
+        assert restored.verify_payloads() == ["tv/power"]
+        assert restored.prune_payloads() == 0
+        assert len(restored.payloads) == 1
+
+    def test_export_writes_inline_data(self, manager, temp_storage_dir):
+        _learn(manager, "tv", "power")
+        path = temp_storage_dir / "export.json"
+
+        assert manager.export_devices_json(path) == 2
+        exported = json.loads(path.read_text())
+        assert exported["tv"]["commands"]["power"]["data"] == CODE
+
+    def test_command_bytes_skip_base64(self, manager):
+        _learn(manager, "tv", "power")
+        manager.add_command("tv", "pending", {"data": "pending", "type": "ir"})
+
+        raw = manager.get_command_bytes("tv", "power")
+        assert isinstance(raw, memoryview)
+        assert raw.tobytes() == base64.b64decode(CODE)
+        assert manager.get_command_bytes("tv", "pending") is None
+        assert manager.get_command_bytes("tv", "missing") is None
+
+    def test_unresolved_reads_keep_references(self, manager):
+        _learn(manager, "tv", "power")
+
+        command = manager.get_device("tv", resolve_payloads=False)["commands"]["power"]
+        assert "data" not in command
+        assert manager.get_all_devices(resolve_payloads=False)["tv"] == (
+            manager._load_devices()["tv"]
+        )
@@ -0,0 +1,205 @@
+"""
+Unit tests for pending command recovery and batched polling
+"""
+
+import json
+import pytest
+import sys
+import time
+from pathlib import Path
+from unittest.mock import AsyncMock
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+from device_manager import DeviceManager
+
+PENDING = {"type": "ir", "data": "pending"}
+
+
+def make_device(device_manager, device_id, commands):
+    assert device_manager.create_device(
+        device_id, {"name": device_id.title(), "commands": commands}
+    )
+
+
+@pytest.mark.unit
+class TestPendingIndex:
+    """get_pending_commands on both backends"""
+
+    def test_lists_pending_commands_in_device_order(self, device_manager):
+        make_device(
+            device_manager,
+            "tv",
+            {"power": PENDING, "mute": {"type": "ir", "data": "JgBQ"}},
+        )
+        make_device(device_manager, "fan", {"speed_1": PENDING, "speed_2": PENDING})
+
+        assert device_manager.get_pending_commands() == [
+            ("tv", "tv", "power"),
+            ("fan", "fan", "speed_1"),
+            ("fan", "fan", "speed_2"),
+        ]
+
+    def test_follows_learned_and_updated_commands(self, device_manager):
+        make_device(device_manager, "tv", {"power": PENDING})
+        assert device_manager.get_pending_commands() == [("tv", "tv", "power")]
+
+        device_manager.add_learned_command("tv", "mute", "pending", "ir")
+        assert len(device_manager.get_pending_commands()) == 2
+
+        device = device_manager.get_device("tv")
+        device["commands"]["power"]["data"] = "JgBQ"
+        device_manager.update_device("tv", device)
+        assert device_manager.get_pending_commands() == [("tv", "tv", "mute")]
+
+        device_manager.delete_device("tv")
+        assert device_manager.get_pending_commands() == []
+
+    def test_index_survives_reload(self, device_manager, temp_storage_dir):
+        make_device(device_manager, "tv", {"power": PENDING})
+
+        reloaded = DeviceManager(
+            storage_path=temp_storage_dir, backend=device_manager.backend.name
+        )
+
+        assert reloaded.get_pending_commands() == [("tv", "tv", "power")]
+
+
+@pytest.mark.unit
+class TestBatchedPolling:
+    """Poll cycles work off the backlog in bounded batches"""
+
+    @pytest.fixture
+    def server(self, flask_app):
+        server = flask_app.config["web_server"]
+        server._get_all_broadlink_commands = AsyncMock(
+            return_value={"tv": {"power": "JgBQ"}}
+        )
+        return server
+
+    def test_found_code_written_and_rest_kept(self, server):
+        make_device(server.device_manager, "tv", {"power": PENDING, "mute": PENDING})
+        now = time.time()
+        batch = [
+            ("tv", "tv", "power", now, None),
+            ("tv", "tv", "mute", now, None, {"note": "kept"}),
+        ]
+
+        still_pending = server._poll_batch(batch, now)
+
+        assert still_pending == [batch[1]]
+        assert server.device_manager.get_pending_commands() == [("tv", "tv", "mute")]
+        server._get_all_broadlink_commands.assert_awaited_once()
+
+    def test_found_code_is_checked_against_library(self, server, caplog):
+        nec = "JgBQAAABKZIUEhQSFDcUNxQ3FDcUEhQSFBIUNxQSFBIUEhQSFBIUNxQSFBIUEhQ3FDcUNxQ3FBIUNxQ3FDcUNxQ3FAANBQ=="
+        make_device(server.device_manager, "tv", {"turn_on": PENDING})
+        server.device_manager.add_learned_command("tv", "power", nec, "ir")
+        server._get_all_broadlink_commands.return_value = {"tv": {"turn_on": nec}}
+        now = time.time()
+
+        server._poll_batch([("tv", "tv", "turn_on", now, None)], now)
+
+        assert server.device_manager.get_command_data("tv", "turn_on") == nec
+        assert "tv/turn_on closely matches tv/power" in caplog.text
+
+    def test_one_cycle_polls_one_batch(self, server, monkeypatch):
+        cycles = []
+
+        def sleep(seconds):
+            # Stop the thread before its third cycle
+            cycles.append(seconds)
+            if len(cycles) == 3:
+                raise KeyboardInterrupt
+
+        monkeypatch.setattr(time, "sleep", sleep)
+        server.POLL_BATCH_SIZE = 2
+        now = time.time()
+        server.pending_command_polls = [
+            ("tv", "tv", f"cmd_{i}", now, None) for i in range(5)
+        ]
+        polled = []
+
+        def poll_batch(batch, current_time):
+            polled.append([item[2] for item in batch])
+            # A command queued by a request while the batch is polled
+            server.pending_command_polls.append(("tv", "tv", "new", now, None))
+            return batch[:1]
+
+        server._poll_batch = poll_batch
+        with pytest.raises(KeyboardInterrupt):
+            server._poll_pending_commands()
+
+        assert polled == [["cmd_0", "cmd_1"], ["cmd_2", "cmd_3"]]
+        assert [item[2] for item in server.pending_command_polls] == [
+            "cmd_4",
+            "new",
+            "cmd_0",
+            "new",
+            "cmd_2",
+        ]
+
+    def test_scan_runs_outside_poll_lock(self, server, monkeypatch):
+        cycles = []
+
+        def sleep(seconds):
+            cycles.append(seconds)
+            if len(cycles) == 2:
+                raise KeyboardInterrupt
+
+        def scan():
+            # A request queues a command while profiles are being read
+            assert not server.poll_lock.locked()
+            server.pending_command_polls.append(("tv", "tv", "power", 0, None))
+            return [("tv", "tv", "power", 0, None), ("tv", "tv", "mute", 0, None)]
+
+        monkeypatch.setattr(time, "sleep", sleep)
+        server._find_untracked_pending_commands = scan
+        polled = []
+        server._poll_batch = lambda batch, now: polled.append(batch) or []
+
+        with pytest.raises(KeyboardInterrupt):
+            server._poll_pending_commands()
+
+        assert [item[2] for item in polled[0]] == ["power", "mute"]
+
+    def test_startup_recovery_queues_index(self, server, monkeypatch):
+        make_device(server.device_manager, "tv", {"power": PENDING, "mute": PENDING})
+        monkeypatch.setattr(server, "_ensure_poll_thread", lambda: None)
+
+        server._check_and_start_polling_on_startup()
+        server._check_and_start_polling_for_pending()
+
+        assert [item[2] for item in server.pending_command_polls] == ["power", "mute"]
+
+
+@pytest.mark.unit
+def test_smartir_scan_reads_only_pending_profiles(flask_app):
+    server = flask_app.config["web_server"]
+    climate = (
+        server.config_loader.get_config_path()
+        / "custom_components"
+        / "smartir"
+        / "custom_codes"
+        / "climate"
+    )
+    climate.mkdir(parents=True)
+    profile = {
+        "manufacturer": "Daikin",
+        "supportedModels": ["FTX-25"],
+        "commands": {"off": "pending", "cool": "JgBQ"},
+    }
+    (climate / "10000.json").write_text(json.dumps(profile))
+    (climate / "10001.json").write_text("{not json, and nothing waiting")
+
+    found = server._find_pending_smartir_commands()
+
+    assert len(found) == 1
+    device_id, device_name, command, _, _, metadata = found[0]
+    assert (device_id, device_name, command) == (
+        "smartir_climate_10000",
+        "daikin_ftx_25",
+        "off",
+    )
+    assert metadata["smartir_profile"] == str(climate / "10000.json")
@@ -0,0 +1,186 @@
+"""
+Unit tests for the Broadlink pulse decoder
+"""
+
+import base64
+import pytest
+import random
+import sys
+from pathlib import Path
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+import pulse_decoder
+from api.commands import detect_command_type
+from diagnostics import DiagnosticsCollector
+from pulse_decoder import decode_base64, decode_packets, encode_packet, summarize
+
+# Learned IR code: 9 ms / 4.5 ms header, 109 ms trailing gap
+NEC = "JgBQAAABKZIUEhQSFDcUNxQ3FDcUEhQSFBIUNxQSFBIUEhQSFBIUNxQSFBIUEhQ3FDcUNxQ3FBIUNxQ3FDcUNxQ3FAANBQ=="
+FRAME = [9000, 4500] + [560, 1690, 560, 560] * 8 + [560]
+GAP = 40000
+
+
+@pytest.fixture(params=["numpy", "python"])
+def decoder(request, monkeypatch):
+    """Run each test on the vectorized and the pure Python path"""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(pulse_decoder, "np", None)
+    return request.param
+
+
+def close_to(actual, expected):
+    return len(actual) == len(expected) and all(
+        abs(a - b) <= 40 for a, b in zip(actual, expected)
+    )
+
+
+@pytest.mark.unit
+class TestDecoding:
+    """Header fields and pulse trains"""
+
+    def test_learned_ir_code(self, decoder):
+        batch = decode_base64([NEC])
+
+        pulses = list(batch.pulses_of(0))
+        assert len(pulses) == 62
+        assert 9000 < pulses[0] < 10000
+        assert pulses[-1] > 100000  # 0x00 0x0d 0x05 is an escaped gap here
+        assert batch.summary(0) == {
+            "type": "ir",
+            "band": "ir",
+            "repeat": 0,
+            "pulses": 62,
+            "duration_ms": round(sum(pulses) / 1000, 1),
+            "frames": 1,
+        }
+
+    def test_encoded_trailer_and_padding_dropped(self, decoder):
+        packet = encode_packet(0xB2, FRAME, repeat=3)
+        assert len(packet) % 16 == 0
+
+        batch = decode_packets([packet])
+
+        assert close_to(list(batch.pulses_of(0)), FRAME)
+        assert batch.band(0) == "rf433"
+        assert int(batch.repeats[0]) == 3
+
+    def test_undecodable_packets_are_empty(self, decoder):
+        truncated = bytes([0x26, 0, 4, 0, 20, 0, 1])  # Escape missing a byte
+        batch = decode_packets([b"", b"\x01\x02\x03\x04\x05", truncated])
+        batch_b64 = decode_base64(["pending", None, "not base64!"])
+
+        assert list(batch.pulse_counts()) == [0, 0, 1]
+        assert [batch.command_type(i) for i in range(3)] == [None, None, "ir"]
+        assert list(batch_b64.pulse_counts()) == [0, 0, 0]
+        assert summarize(batch_b64)["undecodable"] == 3
+
+    def test_bulk_matches_single(self, decoder):
+        rng = random.Random(7)
+        codes = [NEC, "pending"] + [
+            base64.b64encode(
+                encode_packet(
+                    rng.choice([0x26, 0xB2, 0xD7]),
+                    [pulse + rng.randint(-40, 40) for pulse in FRAME]
+                    * rng.randint(1, 3),
+                    repeat=rng.choice([0, 0, 1]),
+                )
+            ).decode()
+            for _ in range(50)
+        ]
+
+        batch = decode_base64(codes)
+        summaries = batch.summaries()
+
+        for index, code in enumerate(codes):
+            single = decode_base64([code])
+            assert list(batch.pulses_of(index)) == list(single.pulses_of(0))
+            assert summaries[index] == single.summary(0)
+
+
+@pytest.mark.unit
+class TestFrames:
+    """Frame splitting and the repeat-stripped canonical form"""
+
+    def canonical(self, pulses):
+        batch = decode_packets([encode_packet(0x26, pulses)])
+        return batch, batch.canonical(0)
+
+    def test_repeated_frames_stripped(self, decoder):
+        batch, canonical = self.canonical(FRAME + [GAP] + FRAME + [GAP] + FRAME)
+
+        assert list(batch.frame_counts()) == [3]
+        assert close_to(canonical, FRAME)
+
+    def test_repeat_code_stripped(self, decoder):
+        repeat_code = [9000, 2250, 560]
+        _, canonical = self.canonical(FRAME + [GAP] + repeat_code + [GAP] + repeat_code)
+
+        assert close_to(canonical, FRAME)
+
+    def test_multi_part_code_kept(self, decoder):
+        second = [3500, 1700] + [430, 1300] * 20 + [430]
+        _, canonical = self.canonical(FRAME + [GAP] + second + [GAP])
+
+        assert close_to(canonical, FRAME + [GAP] + second)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (b"\x26\x00", "ir"),
+        (b"\x26\x01", "rf"),
+        (b"\xb2\x00", "rf"),
+        (b"\xd7\x00", "rf"),
+    ],
+)
+def test_detect_command_type(header, expected):
+    assert (
+        detect_command_type(base64.b64encode(header + b"\x00" * 10).decode())
+        == expected
+    )
+
+
+@pytest.mark.unit
+def test_detect_command_type_falls_back():
+    assert detect_command_type("pending") == "ir"
+    assert detect_command_type(None) == "ir"
+    assert detect_command_type("A" * 201) == "rf"
+
+
+@pytest.mark.unit
+def test_diagnostics_command_analysis(device_manager, temp_storage_dir):
+    device_manager.create_device("tv", {"name": "TV"})
+    device_manager.add_learned_command("tv", "power", NEC, "ir")
+    device_manager.add_learned_command("tv", "waiting", "pending", "ir")
+    rf = base64.b64encode(encode_packet(0xD7, FRAME)).decode()
+    device_manager.add_learned_command("tv", "gate", rf, "rf")
+
+    assert sorted(name for _, name, _ in device_manager.iter_command_bytes()) == [
+        "gate",
+        "power",
+    ]
+
+    collector = DiagnosticsCollector(
+        str(temp_storage_dir), device_manager=device_manager
+    )
+    analysis = collector._collect_command_analysis()
+
+    assert analysis["decoded"] == 2
+    assert analysis["bands"] == {"ir": 1, "rf315": 1}
+    report = collector.generate_markdown_report(
+        {
+            "timestamp": "2024-01-01T00:00:00",
+            "system": {},
+            "configuration": {},
+            "devices": {},
+            "storage": {},
+            "command_analysis": analysis,
+        }
+    )
+    assert "## Command Analysis" in report
+    assert "- rf315: 1" in report
@@ -0,0 +1,148 @@
+"""
+Unit tests for opt-in request profiling
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+from flask import Flask
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+from request_profiler import (
+    RequestProfiler,
+    collapsed_stacks,
+    load_pstats,
+)  # noqa: E402
+
+
+def busy_work():
+    return sum(i * i for i in range(2000))
+
+
+def make_app(profiler: RequestProfiler) -> Flask:
+    app = Flask(__name__)
+
+    @app.route("/work")
+    def work():
+        return str(busy_work())
+
+    app.wsgi_app = profiler.wrap(app.wsgi_app)
+    return app
+
+
+def get(client, path, **kwargs):
+    """GET and close the response, as a WSGI server does (stores the profile)"""
+    response = client.get(path, **kwargs)
+    response.close()
+    return response
+
+
+@pytest.mark.unit
+class TestRequestProfiler:
+    """Test which requests are profiled and what is kept"""
+
+    def test_disabled_settings_install_nothing(self):
+        assert RequestProfiler.from_settings({"enabled": False, "token": None}) is None
+        assert RequestProfiler.from_settings({"token": "secret"}).enabled is False
+
+    def test_header_token_selects_requests(self):
+        profiler = RequestProfiler(token="secret")
+        client = make_app(profiler).test_client()
+
+        get(client, "/work")
+        get(client, "/work", headers={"X-Broadlink-Profile": "wrong"})
+        assert profiler.profiles() == []
+
+        response = get(client, "/work", headers={"X-Broadlink-Profile": "secret"})
+
+        assert response.status_code == 200
+        [record] = profiler.profiles()
+        assert (record.method, record.path, record.status) == ("GET", "/work", "200")
+        assert record.duration > 0
+
+    def test_keeps_last_profiles(self):
+        profiler = RequestProfiler(enabled=True, keep=2)
+        client = make_app(profiler).test_client()
+
+        for _ in range(3):
+            get(client, "/work")
+
+        assert [record.id for record in profiler.profiles()] == [3, 2]
+
+    def test_profile_formats(self):
+        profiler = RequestProfiler(enabled=True)
+        get(make_app(profiler).test_client(), "/work")
+        [record] = profiler.profiles()
+
+        stats = load_pstats(record.pstats_bytes())
+        assert any(func[2] == "busy_work" for func in stats.stats)
+
+        lines = record.collapsed().splitlines()
+        assert lines
+        assert any("busy_work (test_request_profiler.py:" in line for line in lines)
+        for line in lines:
+            stack, value = line.rsplit(" ", 1)
+            assert int(value) > 0
+
+    def test_collapsed_splits_time_between_callers(self):
+        root = ("app.py", 1, "root")
+        a = ("app.py", 2, "a")
+        b = ("app.py", 3, "b")
+        leaf = ("app.py", 4, "leaf")
+        stats = {
+            root: (1, 1, 0.0, 1.0, {}),
+            a: (1, 1, 0.0, 0.25, {root: (1, 1, 0.0, 0.25)}),
+            b: (1, 1, 0.0, 0.75, {root: (1, 1, 0.0, 0.75)}),
+            leaf: (2, 2, 1.0, 1.0, {a: (1, 1, 0.25, 0.25), b: (1, 1, 0.75, 0.75)}),
+        }
+
+        text = collapsed_stacks(stats)
+
+        assert text == (
+            "root (app.py:1);a (app.py:2);leaf (app.py:4) 250000\n"
+            "root (app.py:1);b (app.py:3);leaf (app.py:4) 750000\n"
+        )
+
+
+@pytest.mark.unit
+class TestProfileEndpoints:
+    """Test the diagnostics endpoints for stored profiles"""
+
+    def test_disabled_by_default(self, client):
+        response = client.get("/api/diagnostics/profiles")
+
+        assert response.get_json()["enabled"] is False
+        assert client.get("/api/diagnostics/profiles/1.pstats").status_code == 404
+
+    def test_list_download_and_clear(self, flask_app):
+        profiler = RequestProfiler(enabled=True)
+        flask_app.wsgi_app = profiler.wrap(flask_app.wsgi_app)
+        flask_app.config["request_profiler"] = profiler
+        client = flask_app.test_client()
+
+        get(client, "/api/devices/managed")
+        listing = client.get("/api/diagnostics/profiles").get_json()
+
+        # Listing and downloading are not profiled themselves
+        [summary] = listing["profiles"]
+        assert summary["path"] == "/api/devices/managed"
+        assert summary["top"]
+
+        pstats_response = client.get(
+            f"/api/diagnostics/profiles/{summary['id']}.pstats"
+        )
+        assert pstats_response.mimetype == "application/octet-stream"
+        assert load_pstats(pstats_response.data).total_calls > 0
+
+        collapsed = client.get(f"/api/diagnostics/profiles/{summary['id']}.collapsed")
+        assert collapsed.mimetype == "text/plain"
+        assert (
+            client.get(f"/api/diagnostics/profiles/{summary['id']}.txt").status_code
+            == 400
+        )
+
+        client.delete("/api/diagnostics/profiles")
+        assert profiler.profiles() == []
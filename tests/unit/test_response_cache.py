@@ -0,0 +1,94 @@
+"""
+Unit tests for versioned JSON response caching
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+from flask import Flask, jsonify
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+from response_cache import ResponseCache, path_version
+
+
+@pytest.fixture
+def cached_app():
+    app = Flask(__name__)
+    cache = ResponseCache()
+    state = {"version": 1, "calls": 0}
+
+    @app.route("/items")
+    @cache.cached(lambda: state["version"])
+    def items():
+        state["calls"] += 1
+        return jsonify({"version": state["version"]})
+
+    @app.route("/uncached")
+    @cache.cached(lambda: None)
+    def uncached():
+        state["calls"] += 1
+        return jsonify({})
+
+    return app.test_client(), state
+
+
+@pytest.mark.unit
+class TestResponseCache:
+    """Test memoization, ETags and conditional requests"""
+
+    def test_body_is_memoized_until_version_changes(self, cached_app):
+        client, state = cached_app
+
+        first = client.get("/items")
+        second = client.get("/items?_t=123")
+        assert state["calls"] == 1
+        assert first.get_json() == second.get_json() == {"version": 1}
+
+        state["version"] = 2
+        assert client.get("/items").get_json() == {"version": 2}
+        assert state["calls"] == 2
+
+    def test_if_none_match_returns_304(self, cached_app):
+        client, state = cached_app
+        etag = client.get("/items").headers["ETag"]
+
+        response = client.get("/items", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.data == b""
+
+        state["version"] = 2
+        response = client.get("/items", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_no_version_disables_caching(self, cached_app):
+        client, state = cached_app
+
+        client.get("/uncached")
+        response = client.get("/uncached")
+
+        assert state["calls"] == 2
+        assert "ETag" not in response.headers
+
+    def test_path_version_sees_files_in_directories(self, temp_storage_dir):
+        profile = temp_storage_dir / "1000.json"
+        profile.write_text("{}")
+        before = path_version(temp_storage_dir)
+
+        profile.write_text('{"manufacturer": "Acme"}')
+
+        assert path_version(temp_storage_dir) != before
+        assert path_version(temp_storage_dir / "missing") == (None,)
+
+
+@pytest.mark.unit
+def test_storage_version_changes_on_save(device_manager, sample_device_data):
+    before = device_manager.backend.version()
+
+    device_manager.create_device("tv", dict(sample_device_data))
+
+    assert device_manager.backend.version() != before
+    assert device_manager.backend.version() == device_manager.backend.version()
@@ -0,0 +1,305 @@
+"""
+Unit tests for SmartIRCodeStore
+"""
+
+import pytest
+import io
+import json
+import sys
+import tarfile
+import tempfile
+from pathlib import Path
+from unittest.mock import MagicMock, Mock, patch
+
+import requests
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+from smartir_code_store import SmartIRCodeStore, open_tarball_from_url
+from smartir_code_service import SmartIRCodeService
+
+
+def _code_bytes(manufacturer: str, padding: int = 0) -> bytes:
+    return json.dumps(
+        {
+            "manufacturer": manufacturer,
+            "supportedModels": ["Model"],
+            "commands": {"off": "A" * padding},
+        }
+    ).encode("utf-8")
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield Path(tmpdir)
+
+
+@pytest.fixture
+def store(temp_dir):
+    """Create a SmartIRCodeStore instance"""
+    return SmartIRCodeStore(str(temp_dir / "code_store"))
+
+
+@pytest.fixture
+def aggregator_dir(temp_dir):
+    """Create a local aggregator checkout with a few code files"""
+    root = temp_dir / "smartir-code-aggregator"
+    (root / "codes" / "climate").mkdir(parents=True)
+    (root / "codes" / "fan").mkdir(parents=True)
+    (root / "codes" / "climate" / "1000.json").write_bytes(_code_bytes("Samsung"))
+    (root / "codes" / "climate" / "1001.json").write_bytes(_code_bytes("LG"))
+    (root / "codes" / "climate" / "1002.json").write_text("{not valid json")
+    (root / "codes" / "fan" / "1000.json").write_bytes(_code_bytes("Dyson"))
+    return root
+
+
+@pytest.mark.unit
+class TestStoreReadWrite:
+    """Test put/get and content addressing"""
+
+    def test_get_missing_returns_none(self, store):
+        assert store.get("climate", "1000") is None
+        assert store.get_status()["misses"] == 1
+
+    def test_put_then_get(self, store):
+        store.put("climate", "1000", _code_bytes("Samsung"))
+
+        assert store.get("climate", "1000")["manufacturer"] == "Samsung"
+        assert store.get_status()["hits"] == 1
+
+    def test_identical_content_stored_once(self, store):
+        raw = _code_bytes("Samsung")
+        digest_a = store.put("climate", "1000", raw)
+        digest_b = store.put("fan", "2000", raw)
+
+        status = store.get_status()
+        assert digest_a == digest_b
+        assert status["entries"] == 2
+        assert status["unique_objects"] == 1
+
+    def test_index_persists_across_instances(self, temp_dir):
+        first = SmartIRCodeStore(str(temp_dir / "code_store"))
+        first.put("climate", "1000", _code_bytes("Samsung"))
+
+        second = SmartIRCodeStore(str(temp_dir / "code_store"))
+        assert second.get("climate", "1000")["manufacturer"] == "Samsung"
+
+    def test_lru_eviction_keeps_recently_used(self, temp_dir):
+        raw_size = len(_code_bytes("A", padding=100))
+        store = SmartIRCodeStore(str(temp_dir / "code_store"), max_bytes=raw_size * 2)
+
+        store.put("climate", "1", _code_bytes("A", padding=100))
+        store.put("climate", "2", _code_bytes("B", padding=100))
+        store.get("climate", "1")  # Touch 1 so 2 is least recently used
+        store.put("climate", "3", _code_bytes("C", padding=100))
+
+        assert store.contains("climate", "1")
+        assert not store.contains("climate", "2")
+        assert store.contains("climate", "3")
+
+    def test_pinned_entries_are_not_evicted(self, temp_dir):
+        store = SmartIRCodeStore(str(temp_dir / "code_store"), max_bytes=1)
+
+        store.put("climate", "1", _code_bytes("A"), pinned=True)
+        store.put("climate", "2", _code_bytes("B"))
+
+        assert store.contains("climate", "1")
+        assert not store.contains("climate", "2")
+
+    def test_clear_keeps_mirror_by_default(self, store):
+        store.put("climate", "1", _code_bytes("A"), pinned=True)
+        store.put("climate", "2", _code_bytes("B"))
+
+        assert store.clear() == 1
+        assert store.contains("climate", "1")
+        assert store.clear(include_pinned=True) == 1
+        assert store.get_status()["entries"] == 0
+
+
+@pytest.mark.unit
+class TestMirror:
+    """Test bulk mirroring"""
+
+    def test_mirror_from_directory(self, store, aggregator_dir):
+        result = store.mirror_from_directory(str(aggregator_dir))
+
+        assert result["success"] is True
+        assert result["mirrored"] == {"climate": 2, "fan": 1}
+        assert result["skipped"] == ["climate/1002"]
+        assert store.get("fan", "1000")["manufacturer"] == "Dyson"
+        assert store.get_status()["pinned_entries"] == 3
+
+    def test_mirror_from_directory_platform_filter(self, store, aggregator_dir):
+        result = store.mirror_from_directory(
+            str(aggregator_dir / "codes"), platforms=["fan"]
+        )
+
+        assert result["mirrored"] == {"fan": 1}
+        assert not store.contains("climate", "1000")
+
+    def test_fetched_entries_go_stale(self, store):
+        store.put("climate", "1000", _code_bytes("Samsung"))
+        store._refs["climate/1000"]["stored_at"] -= 7200
+
+        assert store.get("climate", "1000", max_age=3600) is None
+        assert store.get("climate", "1000", max_age=86400) is not None
+        # Stale content stays available without max_age
+        assert store.get("climate", "1000")["manufacturer"] == "Samsung"
+
+    def test_invalidate_expires_fetched_entries_of_platform(self, store):
+        store.put("climate", "1000", _code_bytes("Samsung"))
+        store.put("climate", "1001", _code_bytes("LG"), pinned=True, source="mirror")
+        store.put("fan", "1000", _code_bytes("Dyson"))
+
+        assert store.invalidate("climate") == 1
+
+        assert store.get("climate", "1000", max_age=3600) is None
+        assert store.get("climate", "1001", max_age=3600) is not None
+        assert store.get("fan", "1000", max_age=3600) is not None
+
+    def test_mirror_from_directory_missing(self, store, temp_dir):
+        result = store.mirror_from_directory(str(temp_dir / "nope"))
+
+        assert result["success"] is False
+
+    def test_mirror_from_tarball_with_archive_prefix(self, store, aggregator_dir):
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+            archive.add(aggregator_dir, arcname="smartir-code-aggregator-main")
+        buffer.seek(0)
+
+        result = store.mirror_from_tarball(buffer)
+
+        assert result["success"] is True
+        assert result["total"] == 3
+        assert store.get("climate", "1001")["manufacturer"] == "LG"
+
+    def test_lookups_not_blocked_while_reading(self, store):
+        store.put("climate", "1000", _code_bytes("Samsung"))
+
+        def files():
+            # A lookup from another request while the mirror reads its source
+            assert not store._lock.locked()
+            assert store.get("climate", "1000")["manufacturer"] == "Samsung"
+            yield "climate", "1001", _code_bytes("LG")
+
+        result = store._mirror(files(), "<test>")
+
+        assert result["total"] == 1
+
+
+@pytest.mark.unit
+class TestCodeServiceIntegration:
+    """Test SmartIRCodeService serving previews from the store"""
+
+    @pytest.fixture
+    def code_service(self, temp_dir):
+        with patch.object(SmartIRCodeService, "_load_device_index", return_value={}):
+            return SmartIRCodeService(cache_path=str(temp_dir / "cache"))
+
+    def test_fetch_full_code_populates_store(self, code_service):
+        response = Mock()
+        response.content = _code_bytes("Samsung")
+        response.json.return_value = json.loads(response.content)
+
+        with patch("smartir_code_service.requests.get", return_value=response) as get:
+            first = code_service.fetch_full_code("climate", "1000")
+            second = code_service.fetch_full_code("climate", "1000")
+
+        assert first == second
+        assert get.call_count == 1
+
+    def test_stale_code_is_refetched(self, code_service):
+        code_service.code_store.put("climate", "1000", _code_bytes("Old"))
+        code_service.code_store.invalidate()
+        response = Mock()
+        response.content = _code_bytes("Samsung")
+        response.json.return_value = json.loads(response.content)
+
+        with patch("smartir_code_service.requests.get", return_value=response) as get:
+            code = code_service.fetch_full_code("climate", "1000")
+
+        assert code["manufacturer"] == "Samsung"
+        assert get.call_count == 1
+        assert code_service.code_store.get("climate", "1000", max_age=60) == code
+
+    def test_stale_code_served_when_offline(self, code_service):
+        code_service.code_store.put("climate", "1000", _code_bytes("Samsung"))
+        code_service.code_store.invalidate()
+
+        with patch(
+            "smartir_code_service.requests.get",
+            side_effect=requests.ConnectionError("offline"),
+        ):
+            code = code_service.fetch_full_code("climate", "1000")
+
+        assert code["manufacturer"] == "Samsung"
+
+    def test_forced_refresh_invalidates_store(self, code_service):
+        code_service.code_store.put("climate", "1000", _code_bytes("Samsung"))
+
+        with patch.object(code_service, "_fetch_github_directory", return_value=None):
+            code_service.refresh_codes("climate", force=True)
+
+        assert code_service.code_store.get("climate", "1000", max_age=3600) is None
+
+    def test_mirror_from_url_streams_to_disk(self, code_service, aggregator_dir):
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+            archive.add(aggregator_dir, arcname="smartir-code-aggregator-main")
+        payload = buffer.getvalue()
+        response = MagicMock()
+        response.__enter__.return_value = response
+        response.iter_content.return_value = [payload[:100], payload[100:]]
+
+        with patch("requests.get", return_value=response) as get:
+            result = code_service.mirror_codes("https://example.com/codes.tar.gz")
+
+        assert result["total"] == 3
+        assert get.call_args.kwargs["stream"] is True
+        response.iter_content.assert_called_once()
+
+    def test_oversized_tarball_is_rejected(self):
+        response = MagicMock()
+        response.__enter__.return_value = response
+        response.iter_content.return_value = [b"x" * 10, b"x" * 10]
+
+        with patch("requests.get", return_value=response):
+            with pytest.raises(ValueError):
+                open_tarball_from_url("https://example.com/codes.tar.gz", max_bytes=15)
+
+    def test_mirrored_code_served_without_network(self, code_service, aggregator_dir):
+        result = code_service.mirror_codes(str(aggregator_dir))
+        assert result["success"] is True
+
+        with patch("smartir_code_service.requests.get") as get:
+            code = code_service.fetch_full_code("climate", "1000")
+
+        assert code["manufacturer"] == "Samsung"
+        get.assert_not_called()
+
+    def test_mirror_codes_unknown_source(self, code_service, temp_dir):
+        result = code_service.mirror_codes(str(temp_dir / "missing"))
+
+        assert result["success"] is False
+
+    def test_mirror_endpoint_ignores_source(self, flask_app):
+        with patch.object(
+            SmartIRCodeService, "mirror_codes", return_value={"success": True}
+        ) as mirror:
+            response = flask_app.test_client().post(
+                "/api/smartir/codes/mirror",
+                json={"source": "http://169.254.169.254/latest", "platforms": ["fan"]},
+            )
+
+        assert response.status_code == 200
+        mirror.assert_called_once_with(platforms=["fan"])
+
+    def test_cache_status_includes_store(self, code_service):
+        status = code_service.get_cache_status()
+
+        assert "code_store" in status
+        assert status["code_store"]["entries"] == 0
@@ -240,5 +240,144 @@ class TestSmartIRYAMLGenerator:
         assert yaml_content[0]["device_code"] == 1080
 
 
+class TestSmartIRBatchWriter:
+    """Test batch add/update/remove of SmartIR device configs"""
+
+    @pytest.fixture
+    def temp_config_dir(self):
+        """Create a temporary config directory"""
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def generator(self, temp_config_dir):
+        """Create a SmartIR YAML generator instance"""
+        return SmartIRYAMLGenerator(config_path=temp_config_dir)
+
+    @staticmethod
+    def _device(name, entity_type="climate", code="1000", controller="remote.rm4"):
+        return {
+            "name": name,
+            "entity_type": entity_type,
+            "device_code": code,
+            "controller_device": controller,
+        }
+
+    @staticmethod
+    def _read(temp_config_dir, entity_type):
+        yaml_file = Path(temp_config_dir) / "smartir" / f"{entity_type}.yaml"
+        with open(yaml_file, 'r') as f:
+            return yaml.safe_load(f)
+
+    def test_generate_many_devices_across_platforms(self, generator, temp_config_dir):
+        """Test that all devices land in their platform files in one call"""
+        devices = {f"ac_{i}": self._device(f"AC {i}") for i in range(20)}
+        devices["bedroom_fan"] = self._device("Bedroom Fan", "fan", "2000")
+
+        result = generator.generate_device_configs(devices)
+
+        assert result["success"] is True
+        assert result["success_count"] == 21
+        assert set(result["files"]) == {"climate", "fan"}
+        climate = self._read(temp_config_dir, "climate")
+        assert [d["unique_id"] for d in climate] == [f"ac_{i}" for i in range(20)]
+        assert self._read(temp_config_dir, "fan")[0]["unique_id"] == "bedroom_fan"
+
+    def test_batch_matches_sequential_output(self, generator, temp_config_dir):
+        """Test that the batch writer produces the same file as one-by-one calls"""
+        devices = {f"ac_{i}": self._device(f"AC {i}", code=str(1000 + i)) for i in range(5)}
+
+        for device_id, data in devices.items():
+            generator.generate_device_config(device_id, dict(data))
+        yaml_file = Path(temp_config_dir) / "smartir" / "climate.yaml"
+        sequential = yaml_file.read_text()
+        yaml_file.unlink()
+
+        generator.generate_device_configs(devices)
+
+        assert yaml_file.read_text() == sequential
+
+    def test_mixed_upsert_and_remove(self, generator, temp_config_dir):
+        """Test updating and removing existing devices in one pass"""
+        generator.generate_device_configs(
+            {"ac_1": self._device("AC 1"), "ac_2": self._device("AC 2")}
+        )
+
+        result = generator.apply_batch(
+            [
+                {"action": "upsert", "device_id": "ac_1", "device_data": self._device("AC 1 New", code="1080")},
+                {"action": "remove", "device_id": "ac_2", "entity_type": "climate"},
+                {"action": "upsert", "device_id": "ac_3", "device_data": self._device("AC 3")},
+            ]
+        )
+
+        assert result["success"] is True
+        climate = self._read(temp_config_dir, "climate")
+        assert [d["unique_id"] for d in climate] == ["ac_1", "ac_3"]
+        assert climate[0]["device_code"] == 1080
+        assert (Path(temp_config_dir) / "smartir" / "climate.yaml.backup").exists()
+
+    def test_invalid_device_does_not_block_others(self, generator, temp_config_dir):
+        """Test that one invalid device is reported without failing the batch file"""
+        result = generator.generate_device_configs(
+            {
+                "good_ac": self._device("Good AC"),
+                "Bad AC": self._device("Bad AC"),  # unique_id with spaces/uppercase
+                "no_remote": self._device("No Remote", controller=""),
+            }
+        )
+
+        assert result["success"] is False
+        assert result["success_count"] == 1
+        assert "validation failed" in result["results"]["Bad AC"]["error"]
+        assert "No controller_device specified" in result["results"]["no_remote"]["error"]
+        assert [d["unique_id"] for d in self._read(temp_config_dir, "climate")] == ["good_ac"]
+
+    def test_remove_missing_device(self, generator, temp_config_dir):
+        """Test removing a device that is not in the file"""
+        generator.generate_device_configs({"ac_1": self._device("AC 1")})
+
+        result = generator.apply_batch(
+            [{"action": "remove", "device_id": "ghost", "entity_type": "climate"}]
+        )
+
+        assert result["success"] is False
+        assert "not found" in result["results"]["ghost"]["error"]
+        assert len(self._read(temp_config_dir, "climate")) == 1
+
+    def test_remove_device_drops_duplicates(self, generator, temp_config_dir):
+        """Test that single-device removal goes through the batch writer"""
+        yaml_file = Path(temp_config_dir) / "smartir" / "climate.yaml"
+        entry = {"platform": "smartir", "name": "AC", "unique_id": "ac_1",
+                 "device_code": 1000, "controller_data": "remote.rm4"}
+        other = dict(entry, name="Other", unique_id="ac_2")
+        yaml_file.write_text(yaml.safe_dump([entry, other, entry], sort_keys=False))
+
+        result = generator.remove_device_from_file("ac_1", "climate")
+
+        assert result["success"] is True
+        assert result["removed_count"] == 2
+        assert [d["unique_id"] for d in self._read(temp_config_dir, "climate")] == ["ac_2"]
+        assert (Path(temp_config_dir) / "smartir" / "climate.yaml.backup").exists()
+
+    def test_single_device_write_is_atomic(self, generator, temp_config_dir, monkeypatch):
+        """Test that a failed single-device write leaves the old file in place"""
+        generator.generate_device_config("ac_1", self._device("AC 1"))
+        yaml_file = Path(temp_config_dir) / "smartir" / "climate.yaml"
+        before = yaml_file.read_text()
+
+        def fail(self, target):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(Path, "replace", fail)
+        result = generator.generate_device_config("ac_2", self._device("AC 2"))
+
+        assert result["success"] is False
+        assert "disk full" in result["error"]
+        assert yaml_file.read_text() == before
+        assert not yaml_file.with_suffix(".yaml.tmp").exists()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
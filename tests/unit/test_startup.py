@@ -0,0 +1,123 @@
+"""
+Unit tests for startup timing, lazy subsystems and warm-up
+"""
+
+import pytest
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+from diagnostics import DiagnosticsCollector
+from startup import LazySubsystem, StartupTimer, startup_timer
+
+
+@pytest.mark.unit
+class TestLazySubsystem:
+    """Built once, on first use"""
+
+    def test_built_on_first_attribute_access(self):
+        built = []
+
+        def factory():
+            built.append(1)
+            return {"answer": 42}
+
+        lazy = LazySubsystem("test_lazy", factory)
+        assert not lazy.lazy_loaded
+        assert built == []
+
+        assert lazy.get("answer") == 42
+        assert lazy.get("answer") == 42
+        assert built == [1]
+        assert lazy.lazy_loaded
+        assert "test_lazy" in startup_timer.lazy
+
+    def test_concurrent_first_use_builds_once(self):
+        built = []
+
+        def factory():
+            time.sleep(0.05)
+            built.append(1)
+            return object()
+
+        lazy = LazySubsystem("test_concurrent", factory)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(lazy.lazy_instance()))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert built == [1]
+        assert len({id(result) for result in results}) == 1
+
+    def test_missing_attribute_raises(self):
+        lazy = LazySubsystem("test_missing", object)
+
+        with pytest.raises(AttributeError):
+            lazy.no_such_attribute
+
+
+@pytest.mark.unit
+def test_timer_summary_keeps_phase_order():
+    timer = StartupTimer()
+    with timer.phase("imports"):
+        pass
+    with timer.phase("init"):
+        pass
+    timer.mark_ready()
+
+    summary = timer.summary()
+    assert list(summary["phases"]) == ["imports", "init"]
+    assert summary["ready_ms"] is not None
+    assert summary["warm_ms"] is None
+
+
+@pytest.mark.unit
+class TestWebServerStartup:
+    """Slow subsystems are deferred until first use or warm-up"""
+
+    def test_subsystems_not_built_by_constructor(self, flask_app):
+        server = flask_app.config["web_server"]
+
+        assert not server.smartir_code_service.lazy_loaded
+        assert not server.area_manager.lazy_loaded
+        assert not (server.broadlink_manager_path / "package.yaml").exists()
+
+    def test_first_use_builds_code_service(self, flask_app):
+        service = flask_app.config["smartir_code_service"]
+
+        assert service.get_cache_status()["cached_entity_types"] == []
+        assert flask_app.config["web_server"].smartir_code_service.lazy_loaded
+
+    def test_warm_up(self, flask_app):
+        server = flask_app.config["web_server"]
+        try:
+            server._warm_up()
+        finally:
+            server.file_observer.stop()
+            server.file_observer.join()
+
+        assert server.smartir_code_service.lazy_loaded
+        assert (server.broadlink_manager_path / "package.yaml").exists()
+        assert "warmup.pending_commands" in startup_timer.phases
+        assert startup_timer.warm_ms is not None
+
+    def test_diagnostics_startup_section(self, flask_app, temp_storage_dir):
+        server = flask_app.config["web_server"]
+        collector = DiagnosticsCollector(str(temp_storage_dir), web_server=server)
+
+        section = collector._collect_startup()
+
+        assert "init.routes" in section["phases"]
+        assert section["subsystems"] == {
+            "area_manager": False,
+            "smartir_code_service": False,
+        }
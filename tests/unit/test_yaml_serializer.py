@@ -0,0 +1,142 @@
+"""
+Unit tests for the YAML serializer and fragment cache
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
+
+import yaml_serializer
+from yaml_serializer import FragmentCache
+
+
+def _light(entity_id: str, command: str) -> dict:
+    return {
+        "unique_id": entity_id,
+        "name": entity_id.replace("_", " ").title(),
+        "state": f"{{{{ is_state('input_boolean.{entity_id}_state', 'on') }}}}",
+        "turn_on": [
+            {
+                "action": "remote.send_command",
+                "target": {"entity_id": "remote.rm4_pro"},
+                "data": {
+                    "command": (
+                        "{% if brightness > states('input_number."
+                        + entity_id
+                        + "_brightness') | int %}\n"
+                        f"  b64:{command}\n"
+                        "{% else %}\n"
+                        f"  b64:{command[::-1]}\n"
+                        "{% endif %}"
+                    )
+                },
+            }
+        ],
+    }
+
+
+@pytest.fixture
+def package_document():
+    """Build a package.yaml-shaped document"""
+    return {
+        "media_player": [
+            {"platform": "universal", "name": "Living Room TV", "unique_id": "tv"}
+        ],
+        "template": [
+            {"light": [_light(f"light_{i}", "JgBQAAAB" * 20) for i in range(5)]},
+            {"fan": [{"unique_id": "fan_1", "name": "Fan Ünïcode"}]},
+        ],
+        "input_boolean": {
+            f"light_{i}_state": {"name": f"Light {i} State", "initial": False}
+            for i in range(5)
+        },
+        "input_select": {},
+    }
+
+
+@pytest.mark.unit
+class TestDumpAndLoad:
+    """Test the libyaml-backed dump/load helpers"""
+
+    def test_round_trip(self, package_document):
+        text = yaml_serializer.dump(package_document)
+
+        assert yaml_serializer.safe_load(text) == package_document
+
+    def test_keeps_insertion_order(self):
+        text = yaml_serializer.dump({"zeta": 1, "alpha": 2})
+
+        assert text.index("zeta") < text.index("alpha")
+
+    def test_shared_objects_are_not_aliased(self):
+        target = {"entity_id": "remote.rm4_pro"}
+        text = yaml_serializer.dump({"a": [{"target": target}, {"target": target}]})
+
+        assert "&id" not in text
+        assert "*id" not in text
+
+    def test_safe_load_rejects_python_tags(self):
+        with pytest.raises(Exception):
+            yaml_serializer.safe_load("!!python/object/apply:os.system ['true']")
+
+
+@pytest.mark.unit
+class TestFragmentCache:
+    """Test fragment-based document serialization"""
+
+    def test_document_matches_whole_dump(self, package_document):
+        cache = FragmentCache()
+
+        assert cache.dump_document(package_document) == yaml_serializer.dump(
+            package_document
+        )
+
+    def test_non_simple_keys_fall_back(self):
+        document = {
+            "on": [1, 2],
+            "Mixed Key": {"x": 1},
+            "helpers": {"Bad Key": {"a": 1}},
+        }
+        cache = FragmentCache()
+
+        assert cache.dump_document(document) == yaml_serializer.dump(document)
+
+    def test_unchanged_entities_hit_cache(self, package_document):
+        cache = FragmentCache()
+        cache.dump_document(package_document)
+        first_misses = cache.get_stats()["misses"]
+
+        package_document["template"][0]["light"][2]["name"] = "Renamed"
+        text = cache.dump_document(package_document)
+
+        stats = cache.get_stats()
+        assert stats["misses"] == first_misses + 1
+        assert stats["hits"] == first_misses - 1
+        assert text == yaml_serializer.dump(package_document)
+
+    def test_key_order_change_is_not_a_cache_hit(self):
+        cache = FragmentCache()
+        first = cache.dump_document({"items": [{"a": 1, "b": 2}]})
+        second = cache.dump_document({"items": [{"b": 2, "a": 1}]})
+
+        assert first != second
+        assert second == yaml_serializer.dump({"items": [{"b": 2, "a": 1}]})
+
+    def test_key_type_change_is_not_a_cache_hit(self):
+        cache = FragmentCache()
+        for document in (
+            {"items": [{1: "a"}]},
+            {"items": [{"1": "a"}]},
+            {"items": [{True: "a"}]},
+            {"items": [{"true": "a"}]},
+        ):
+            assert cache.dump_document(document) == yaml_serializer.dump(document)
+
+    def test_lru_limit(self):
+        cache = FragmentCache(max_entries=3)
+        cache.dump_document({"items": [{"n": i} for i in range(10)]})
+
+        assert cache.get_stats()["entries"] == 3